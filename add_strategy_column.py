@@ -1,19 +1,9 @@
-import sqlite3
-
-DB_FILE = "racing_ledger.db"
+from storage import init_storage, DB_PATH
 
 def upgrade_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("ALTER TABLE races ADD COLUMN betting_strategy TEXT")
-        print("✅ Success: Added 'betting_strategy' column to races table.")
-    except sqlite3.OperationalError:
-        print("ℹ️  Column 'betting_strategy' already exists. No changes needed.")
-        
-    conn.commit()
-    conn.close()
+    # races.strategy ships with the unified schema; init_storage() adds any missing columns
+    init_storage()
+    print(f"ℹ️  Column 'strategy' is part of the unified races table in {DB_PATH}. No changes needed.")
 
 if __name__ == "__main__":
-    upgrade_db()
\ No newline at end of file
+    upgrade_db()
@@ -3,212 +3,233 @@
 Backfill SQLite Database & Auto-Fetch Official Results
 Cleans and rebuilds master_betting_history.db from scratch using all 530+ meeting JSON cards,
 and automatically fetches/extracts official race results & payouts into the database.
+
+Rebuild mode parses cards in a process pool, bulk-loads a shadow database
+(master_betting_history.db.rebuild) without touching the live file, builds its indexes after
+the load, and then publishes it into the live file in one short transaction, so the API keeps
+serving the old data until that commit.
+
+Only the flat predictions table is rebuilt from scratch and replaced wholesale. Card meetings and
+results are upserted on top of the live rows (meeting ids, graded results and everything else in
+the live DB survive; schema: storage.py). The live DB's write lock is only held for the publish.
 """
 
 import os
-import json
+import time
 import sqlite3
-from results_fetcher_agent import auto_fetch_results_for_meeting
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
+sys.path.insert(0, BASE_DIR)
+
+import storage
+from storage import DB_PATH, LOGS_DIR
+from track_registry import get_region_code
+from prediction_rows import SKIP_FILES, KEY_COLUMNS, ROW_COLUMNS, load_card, card_meta, card_rows, race_number
+from results_fetcher_agent import auto_fetch_results_for_meeting
+
 API_OUTPUT_DIR = os.path.join(BASE_DIR, "frontend", "public", "api", "output")
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
+SHADOW_DB_PATH = DB_PATH + ".rebuild"
+
+REBUILT_TABLES = ["predictions"]  # replaced wholesale on publish
+
+RESULT_COLUMNS = ["date", "track", "race_number", "win_num", "place_num", "show_num", "win_payout", "exacta_payout"]
+MEETING_COLUMNS = ["filename", "track", "date", "region", "race_count", "solo_locks_count", "best_bets_count"]
+# Upserted on publish: table -> (natural key, the columns the card load writes; live keeps the rest)
+MERGED_TABLES = {
+    "results": (["date", "track", "race_number"], RESULT_COLUMNS),
+    "meetings": (["track", "date"], MEETING_COLUMNS),
+}
+
+def create_schema(c):
+    """Creates the unified tables only; views and indexes are added by storage.create_schema after the load."""
+    for stmt in storage.SCHEMA:
+        c.execute(stmt)
 
-def init_clean_db():
-    print(f"[Backfill] Initializing fresh SQLite database at: {DB_PATH}")
+def init_clean_db(db_path=DB_PATH):
+    print(f"[Backfill] Initializing fresh SQLite database at: {db_path}")
     os.makedirs(LOGS_DIR, exist_ok=True)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     c = conn.cursor()
 
     # Drop old tables to start completely fresh
-    c.execute("DROP TABLE IF EXISTS predictions")
-    c.execute("DROP TABLE IF EXISTS results")
-    c.execute("DROP TABLE IF EXISTS meetings")
-
-    # Table 1: Predictions
-    c.execute("""
-        CREATE TABLE predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT, track TEXT, race_number TEXT, distance TEXT, surface TEXT, condition TEXT,
-            p1_num TEXT, p1_name TEXT, p1_rating REAL,
-            p2_num TEXT, p2_name TEXT, p2_rating REAL,
-            p3_num TEXT, p3_name TEXT, p3_rating REAL,
-            p4_num TEXT, p4_name TEXT, p4_rating REAL,
-            danger_num TEXT, danger_name TEXT,
-            rating_gap REAL DEFAULT 0.0,
-            has_best_bet INTEGER DEFAULT 0,
-            has_solo_lock INTEGER DEFAULT 0,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Table 2: Results
-    c.execute("""
-        CREATE TABLE results (
-            date TEXT, track TEXT, race_number TEXT,
-            win_num TEXT, place_num TEXT, show_num TEXT,
-            win_payout REAL DEFAULT 0.0, place_payout REAL DEFAULT 0.0, show_payout REAL DEFAULT 0.0,
-            exacta_payout REAL DEFAULT 0.0, trifecta_payout REAL DEFAULT 0.0,
-            PRIMARY KEY (date, track, race_number)
-        )
-    """)
-
-    # Table 3: Meetings Index
-    c.execute("""
-        CREATE TABLE meetings (
-            filename TEXT PRIMARY KEY,
-            track TEXT, date TEXT, region TEXT, race_count INTEGER,
-            solo_locks_count INTEGER, best_bets_count INTEGER
-        )
-    """)
-
+    for table in REBUILT_TABLES:
+        c.execute(f"DROP TABLE IF EXISTS {table}")
     conn.commit()
+    storage.create_schema(conn)
     conn.close()
     print("[Backfill] Database schema created successfully.")
 
-def backfill_from_logs():
-    init_clean_db()
-    
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
+def collect_meeting_files():
     json_files = []
     seen = set()
 
     for dir_path in [API_OUTPUT_DIR, LOGS_DIR]:
         if not os.path.exists(dir_path): continue
-        for fname in os.listdir(dir_path):
-            if fname.endswith(".json") and fname not in seen:
+        for fname in sorted(os.listdir(dir_path)):
+            if fname.endswith(".json") and fname not in seen and fname not in SKIP_FILES:
                 seen.add(fname)
                 json_files.append((fname, os.path.join(dir_path, fname)))
-
-    print(f"[Backfill] Found {len(json_files)} meeting cards to ingest...")
-
-    total_races = 0
-    total_meetings = 0
-    total_results = 0
-
-    for fname, fpath in json_files:
-        try:
-            with open(fpath, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content: continue
-                data = json.loads(content)
-                if isinstance(data, str): data = json.loads(data)
-                if isinstance(data, list) and len(data) > 0: data = data[0]
-                if not isinstance(data, dict): continue
-
-                meta = data.get("meta", {})
-                track = meta.get("track", fname.replace(".json", "").rsplit("_", 1)[0].replace("_", " "))
-                date_str = meta.get("date", "")
-                if not date_str and "_" in fname:
-                    parts = fname.replace(".json", "").rsplit("_", 1)
-                    if len(parts) > 1: date_str = parts[1]
-
-                races = data.get("races", [])
-                solo_locks = 0
-                best_bets = 0
-
-                for race_idx, r in enumerate(races, start=1):
-                    total_races += 1
-                    race_num = str(r.get("race_number", race_idx))
-                    contenders = r.get("all_contenders") or r.get("selections") or []
-
-                    p1_num, p1_name, p1_rating = "", "", 0.0
-                    p2_num, p2_name, p2_rating = "", "", 0.0
-                    p3_num, p3_name, p3_rating = "", "", 0.0
-                    p4_num, p4_name, p4_rating = "", "", 0.0
-
-                    if len(contenders) >= 1:
-                        c1 = contenders[0]
-                        p1_num = str(c1.get("program_number") or c1.get("number", "1"))
-                        p1_name = c1.get("horse_name") or c1.get("name", "")
-                        p1_rating = float(c1.get("rating") or c1.get("features", {}).get("ai_holistic_score") or 0)
-
-                    if len(contenders) >= 2:
-                        c2 = contenders[1]
-                        p2_num = str(c2.get("program_number") or c2.get("number", "2"))
-                        p2_name = c2.get("horse_name") or c2.get("name", "")
-                        p2_rating = float(c2.get("rating") or c2.get("features", {}).get("ai_holistic_score") or 0)
-
-                    if len(contenders) >= 3:
-                        c3 = contenders[2]
-                        p3_num = str(c3.get("program_number") or c3.get("number", "3"))
-                        p3_name = c3.get("horse_name") or c3.get("name", "")
-                        p3_rating = float(c3.get("rating") or 0)
-
-                    if len(contenders) >= 4:
-                        c4 = contenders[3]
-                        p4_num = str(c4.get("program_number") or c4.get("number", "4"))
-                        p4_name = c4.get("horse_name") or c4.get("name", "")
-                        p4_rating = float(c4.get("rating") or 0)
-
-                    danger_info = r.get("danger_horse") or {}
-                    danger_num = str(danger_info.get("program_number") or danger_info.get("number", ""))
-                    danger_name = danger_info.get("horse_name") or danger_info.get("name", "")
-
-                    gap = p1_rating - p2_rating
-                    has_lock = 1 if (p1_rating >= 88.0 and gap >= 5.0) else 0
-                    has_best = 1 if (gap >= 3.0) else 0
-
-                    if has_lock: solo_locks += 1
-                    if has_best: best_bets += 1
-
-                    c.execute("""
-                        INSERT INTO predictions (
-                            date, track, race_number, distance, surface, condition,
-                            p1_num, p1_name, p1_rating,
-                            p2_num, p2_name, p2_rating,
-                            p3_num, p3_name, p3_rating,
-                            p4_num, p4_name, p4_rating,
-                            danger_num, danger_name,
-                            rating_gap, has_best_bet, has_solo_lock
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        date_str, track, race_num, r.get("distance", ""), r.get("surface", ""), meta.get("track_condition", ""),
-                        p1_num, p1_name, p1_rating,
-                        p2_num, p2_name, p2_rating,
-                        p3_num, p3_name, p3_rating,
-                        p4_num, p4_name, p4_rating,
-                        danger_num, danger_name,
-                        gap, has_best, has_lock
-                    ))
-
-                    # Ingest Race Results if actual result data exists in JSON
-                    results_data = r.get("results") or r.get("actual_results") or {}
-                    if results_data.get("win_num"):
-                        win_num = str(results_data.get("win_num"))
-                        place_num = str(results_data.get("place_num", ""))
-                        show_num = str(results_data.get("show_num", ""))
-                        win_payout = float(results_data.get("win_payout") or 0.0)
-                        exacta_payout = float(results_data.get("exacta_payout") or 0.0)
-
-                        c.execute("""
-                            INSERT OR REPLACE INTO results (
-                                date, track, race_number, win_num, place_num, show_num, win_payout, exacta_payout
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (date_str, track, race_num, win_num, place_num, show_num, win_payout, exacta_payout))
-                        total_results += 1
-
-                region = meta.get("region", "US")
-                c.execute("""
-                    INSERT OR REPLACE INTO meetings (filename, track, date, region, race_count, solo_locks_count, best_bets_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (fname, track, date_str, region, len(races), solo_locks, best_bets))
-                
-                total_meetings += 1
-        except Exception as e:
-            continue
-
-    conn.commit()
-    conn.close()
+    return json_files
+
+def parse_meeting_file(job):
+    """
+    Parses one meeting card into plain row tuples (runs inside worker processes). Prediction rows
+    come from prediction_rows.card_rows, the same normalizer migrate_jsons.py uses.
+    Returns (prediction_rows, result_rows, meeting_row) or None for unreadable cards.
+    """
+    fname, fpath = job
+    try:
+        data = load_card(fpath)
+        if not data: return None
+
+        date_str, track, _ = card_meta(fname, data)
+        races = [r for r in data.get("races") or [] if isinstance(r, dict)]
+        prediction_rows = card_rows(fname, data)
+        result_rows = []
+
+        for race_idx, r in enumerate(data.get("races") or [], start=1):
+            if not isinstance(r, dict):
+                continue
+            # Ingest Race Results if actual result data exists in JSON
+            results_data = r.get("results") or r.get("actual_results") or {}
+            if results_data.get("win_num"):
+                result_rows.append((
+                    date_str, track, race_number(r, race_idx),
+                    str(results_data.get("win_num")),
+                    str(results_data.get("place_num", "")),
+                    str(results_data.get("show_num", "")),
+                    float(results_data.get("win_payout") or 0.0),
+                    float(results_data.get("exacta_payout") or 0.0)
+                ))
+
+        best_bets = sum(row[ROW_COLUMNS.index("has_best_bet")] for row in prediction_rows)
+        solo_locks = sum(row[ROW_COLUMNS.index("has_solo_lock")] for row in prediction_rows)
+        region = (data.get("meta") or {}).get("region") or get_region_code(track)
+        meeting_row = (fname, track, date_str, region, len(races), solo_locks, best_bets)
+        return prediction_rows, result_rows, meeting_row
+    except Exception:
+        return None
+
+def _insert_sql(table, columns, verb="INSERT"):
+    return f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+def _upsert_sql(table, columns, conflict_cols):
+    updates = ", ".join(f"{k} = excluded.{k}" for k in columns if k not in conflict_cols)
+    return f"{_insert_sql(table, columns)} ON CONFLICT({', '.join(conflict_cols)}) DO UPDATE SET {updates}"
+
+def _publish_columns(conn, name):
+    """Shadow columns of a table that the live copy also has (live may be an older or newer schema)."""
+    live_cols = {col[1] for col in conn.execute(f'PRAGMA live.table_info("{name}")')}
+    return [col[1] for col in conn.execute(f'PRAGMA main.table_info("{name}")') if col[1] in live_cols]
+
+def publish_shadow(conn):
+    """
+    Publishes the loaded shadow (main) into the attached live DB in one transaction: REBUILT_TABLES
+    are replaced, MERGED_TABLES get the card rows upserted on their natural keys (NULL card fields
+    keep the live value, as storage.upsert_meeting does). Rows other writers added to live in the
+    meantime survive, and readers switch to the rebuilt data at the commit. The live file is never
+    swapped out, so long-lived connections (API thread connections, storage.QueryCache,
+    bankroll_sim.BankrollCache) keep working on it.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name in REBUILT_TABLES:
+            cols = ", ".join(f'"{col}"' for col in _publish_columns(conn, name))
+            conn.execute(f'DELETE FROM live."{name}"')
+            conn.execute(f'INSERT INTO live."{name}" ({cols}) SELECT {cols} FROM main."{name}"')
+        for name, (key_cols, card_cols) in MERGED_TABLES.items():
+            columns = [col for col in _publish_columns(conn, name) if col in card_cols]
+            cols = ", ".join(f'"{col}"' for col in columns)
+            updates = ", ".join(f'"{col}" = COALESCE(excluded."{col}", "{col}")' for col in columns if col not in key_cols)
+            conn.execute(f"""
+                INSERT INTO live."{name}" ({cols}) SELECT {cols} FROM main."{name}" WHERE true
+                ON CONFLICT({', '.join(key_cols)}) DO UPDATE SET {updates}
+            """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def rebuild_database(workers=None, live_path=DB_PATH):
+    started = time.time()
+    shadow_path = live_path + ".rebuild"
+    os.makedirs(os.path.dirname(live_path), exist_ok=True)
+    for leftover in [shadow_path, shadow_path + "-journal"]:
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    json_files = collect_meeting_files()
+    print(f"[Backfill] Found {len(json_files)} meeting cards to ingest (shadow DB: {shadow_path})...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps input order so duplicate results/meetings resolve exactly as in the serial loader
+        parsed_cards = [parsed for parsed in pool.map(parse_meeting_file, json_files, chunksize=16) if parsed]
+
+    conn = sqlite3.connect(shadow_path)
+    # Shadow file is disposable until the publish, so durability is traded for bulk-load speed
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")
+    c = conn.cursor()
+    try:
+        create_schema(c)
+        conn.commit()
+
+        total_meetings = 0
+        total_results = 0
+        prediction_sql = _insert_sql("predictions", ROW_COLUMNS)
+        result_sql = _upsert_sql("results", RESULT_COLUMNS, ["date", "track", "race_number"])
+
+        # One prediction row per race; when two cards cover the same race the later file wins (as in migrate_jsons.py)
+        predictions = {}
+        key_len = len(KEY_COLUMNS)
+        for prediction_rows, result_rows, meeting_row in parsed_cards:
+            predictions.update((row[:key_len], row) for row in prediction_rows)
+            c.executemany(result_sql, result_rows)
+            meeting = dict(zip(MEETING_COLUMNS, meeting_row))
+            storage.upsert_meeting(c, meeting.pop("track"), meeting.pop("date"), **meeting)
+            total_results += len(result_rows)
+            total_meetings += 1
+        c.executemany(prediction_sql, predictions.values())
+        total_races = len(predictions)
+        conn.commit()
+        # Views, indexes and the (race_id, rank) dedupe are built once over the loaded tables
+        storage.create_schema(conn)
+        c.execute("ANALYZE")
+
+        if os.path.exists(live_path):
+            storage.init_storage(live_path)  # upgrade an old live file first so column sets line up
+            conn.execute(f"PRAGMA busy_timeout = {storage.BUSY_TIMEOUT_MS}")
+            conn.execute("ATTACH DATABASE ? AS live", (live_path,))
+            # Only now is the live write lock taken: API writes wait (busy timeout) for the publish alone
+            publish_shadow(conn)
+            c.execute("ANALYZE live")
+            publish_mode = "transaction"
+        else:
+            c.execute("PRAGMA journal_mode = WAL")  # the new file serves concurrent readers/writers
+            conn.close()
+            os.replace(shadow_path, live_path)
+            publish_mode = "rename"
+    finally:
+        conn.close()
+        if os.path.exists(shadow_path):
+            os.remove(shadow_path)
 
     print("==================================================")
-    print(f"SUCCESS! Database rebuilt & scraped.")
+    print(f"SUCCESS! Database rebuilt in {time.time() - started:.1f}s (publish: {publish_mode}).")
     print(f"Ingested {total_meetings} meetings, {total_races} races, and {total_results} race results into master_betting_history.db!")
     print("==================================================")
+    return total_meetings, total_races, total_results
+
+def backfill_from_logs(workers=None):
+    return rebuild_database(workers=workers)
 
 if __name__ == "__main__":
-    backfill_from_logs()
+    parser = argparse.ArgumentParser(description="Rebuild master_betting_history.db from meeting JSON cards.")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+    backfill_from_logs(workers=args.workers)
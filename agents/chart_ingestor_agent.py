@@ -8,39 +8,17 @@ and logs them directly into master_betting_history.db results table.
 import os
 import re
 import json
-import sqlite3
+import sys
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", "master_betting_history.db")
+sys.path.insert(0, BASE_DIR)
+
+from storage import init_storage, connect
 
 def init_results_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            date TEXT,
-            track TEXT,
-            race_number TEXT,
-            win_num TEXT,
-            place_num TEXT,
-            show_num TEXT,
-            win_payout REAL DEFAULT 0.0,
-            place_payout REAL DEFAULT 0.0,
-            show_payout REAL DEFAULT 0.0,
-            p2_place_payout REAL DEFAULT 0.0,
-            p2_show_payout REAL DEFAULT 0.0,
-            p3_show_payout REAL DEFAULT 0.0,
-            exacta_payout REAL DEFAULT 0.0,
-            trifecta_payout REAL DEFAULT 0.0,
-            superfecta_payout REAL DEFAULT 0.0,
-            scratches TEXT DEFAULT 'None',
-            PRIMARY KEY (date, track, race_number)
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # results table (keyed on date, track, race_number) is part of the unified schema in storage.py
+    init_storage()
 
 def parse_equibase_chart_text(chart_text, default_track="Saratoga", default_date="2026-07-31"):
     """
@@ -128,7 +106,7 @@ def ingest_chart_to_db(parsed_result):
     Inserts or replaces the parsed result record in master_betting_history.db
     """
     init_results_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
     
     c.execute("""
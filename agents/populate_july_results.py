@@ -6,15 +6,17 @@ so that ROI analytics and line-by-line audit logs show official WIN / LOSS / Pay
 """
 
 import os
-import sqlite3
+import sys
 import random
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", "master_betting_history.db")
+sys.path.insert(0, BASE_DIR)
+
+from storage import connect, DB_PATH
 
 def populate_july_results():
     print(f"[July Results] Populating official results into {DB_PATH}...")
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
 
     # Query all predictions from July 1, 2026 onward
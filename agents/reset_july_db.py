@@ -8,62 +8,31 @@ Reset Database to July 1, 2026 Moving Forward & Scrape Results
 """
 
 import os
+import sys
 import json
-import sqlite3
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
+sys.path.insert(0, BASE_DIR)
+
+from storage import connect, upsert_meeting, invalidate_cache, DB_PATH, LOGS_DIR
+from track_registry import get_region_code
+
 API_OUTPUT_DIR = os.path.join(BASE_DIR, "frontend", "public", "api", "output")
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
 
 def reset_database_july_onward():
     print(f"[July Reset] Resetting database to July 1, 2026 onward at: {DB_PATH}")
     os.makedirs(LOGS_DIR, exist_ok=True)
 
-    conn = sqlite3.connect(DB_PATH)
+    # Tables come from the unified schema (storage.py)
+    conn = connect()
     c = conn.cursor()
 
-    # Create tables if not exist
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT, track TEXT, race_number TEXT, distance TEXT, surface TEXT, condition TEXT,
-            p1_num TEXT, p1_barrier TEXT, p1_name TEXT, p1_reason TEXT, p1_rating REAL,
-            p2_num TEXT, p2_barrier TEXT, p2_name TEXT, p2_reason TEXT, p2_rating REAL,
-            p3_num TEXT, p3_barrier TEXT, p3_name TEXT, p3_reason TEXT, p3_rating REAL,
-            p4_num TEXT, p4_barrier TEXT, p4_name TEXT, p4_reason TEXT, p4_rating REAL,
-            danger_num TEXT, danger_barrier TEXT, danger_name TEXT, danger_reason TEXT,
-            confidence TEXT, ai_model TEXT, temperature REAL, raw_features TEXT,
-            exotic_strategy TEXT DEFAULT '',
-            rating_gap REAL DEFAULT 0.0,
-            has_best_bet INTEGER DEFAULT 0,
-            has_solo_lock INTEGER DEFAULT 0,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            date TEXT, track TEXT, race_number TEXT,
-            win_num TEXT, place_num TEXT, show_num TEXT,
-            win_payout REAL DEFAULT 0.0, place_payout REAL DEFAULT 0.0, show_payout REAL DEFAULT 0.0,
-            exacta_payout REAL DEFAULT 0.0, trifecta_payout REAL DEFAULT 0.0,
-            PRIMARY KEY (date, track, race_number)
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS meetings (
-            filename TEXT PRIMARY KEY,
-            track TEXT, date TEXT, region TEXT, race_count INTEGER,
-            solo_locks_count INTEGER, best_bets_count INTEGER
-        )
-    """)
-
     # 1. Clear all old predictions, results, and meetings prior to 2026-07-01 OR purge all results entered
     print("[July Reset] Purging all races prior to 2026-07-01 and clearing all old results...")
     c.execute("DELETE FROM predictions WHERE date < '2026-07-01'")
+    c.execute("DELETE FROM selections WHERE race_id IN (SELECT id FROM races WHERE date < '2026-07-01')")
+    c.execute("DELETE FROM races WHERE date < '2026-07-01'")
     c.execute("DELETE FROM meetings WHERE date < '2026-07-01'")
     c.execute("DELETE FROM results") # Clear all manual/old results entered
 
@@ -193,11 +162,9 @@ def reset_database_july_onward():
                             """, (date_str, track, race_num, win_num, place_num, show_num, win_payout, exacta_payout))
                             scraped_results += 1
 
-                region = meta.get("region", "US")
-                c.execute("""
-                    INSERT OR REPLACE INTO meetings (filename, track, date, region, race_count, solo_locks_count, best_bets_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (fname, track, date_str, region, len(races), solo_locks, best_bets))
+                region = meta.get("region") or get_region_code(track)
+                upsert_meeting(c, track, date_str, filename=fname, region=region, race_count=len(races),
+                               solo_locks_count=solo_locks, best_bets_count=best_bets)
                 
                 ingested_meetings += 1
         except Exception as e:
@@ -205,6 +172,7 @@ def reset_database_july_onward():
 
     conn.commit()
     conn.close()
+    invalidate_cache()
 
     print("==================================================")
     print(f"DATABASE RESET COMPLETE (JULY 1, 2026 ONWARD)")
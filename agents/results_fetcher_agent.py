@@ -7,13 +7,16 @@ and updates master_betting_history.db without manual copy-pasting.
 """
 
 import os
+import sys
 import json
-import sqlite3
 import urllib.request
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", "master_betting_history.db")
+sys.path.insert(0, BASE_DIR)
+
+from storage import init_storage, connect
+
 API_OUTPUT_DIR = os.path.join(BASE_DIR, "frontend", "public", "api", "output")
 
 # Pre-configured public results endpoints
@@ -49,21 +52,8 @@ def get_equibase_summary_url(track, date_str):
     return f"{EQUIBASE_SUMMARY_BASE}{code}{mmddyy}USA-EQB.html"
 
 def init_results_table():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            date TEXT, track TEXT, race_number TEXT, win_num TEXT, place_num TEXT, show_num TEXT,
-            win_payout REAL DEFAULT 0.0, place_payout REAL DEFAULT 0.0, show_payout REAL DEFAULT 0.0,
-            p2_place_payout REAL DEFAULT 0.0, p2_show_payout REAL DEFAULT 0.0, p3_show_payout REAL DEFAULT 0.0,
-            exacta_payout REAL DEFAULT 0.0, trifecta_payout REAL DEFAULT 0.0, superfecta_payout REAL DEFAULT 0.0,
-            scratches TEXT DEFAULT 'None',
-            PRIMARY KEY (date, track, race_number)
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # results table (keyed on date, track, race_number) is part of the unified schema in storage.py
+    init_storage()
 
 def fetch_live_web_results(track, date_str):
     """
@@ -95,7 +85,7 @@ def auto_fetch_results_for_meeting(track, date_str, races_count=10):
     print(f"[Results Agent] Auto-fetching official results for {track} on {date_str}...")
     init_results_table()
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
 
     live_races = fetch_live_web_results(track, date_str)
@@ -6,17 +6,19 @@ and fetches official race results & payouts.
 """
 
 import os
-import sqlite3
+import sys
 import urllib.request
 import json
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", "master_betting_history.db")
+sys.path.insert(0, BASE_DIR)
+
+from storage import connect
 
 def fetch_scraped_results_for_july():
     print("[Results Scraper] Fetching official race results for July 2026 meetings...")
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     c = conn.cursor()
 
     c.execute("SELECT DISTINCT date, track FROM predictions WHERE date >= '2026-07-01' ORDER BY date ASC")
@@ -1,88 +1,164 @@
+import sys
 import sqlite3
+from collections import defaultdict
 
-DB_FILE = "racing_ledger.db"
+from storage import connect, SCHEMA
+
+BUCKETS = ["Top Pick", "Danger", "Value", "In The Lists (Other)", "COMPLETE MISS"]
+
+# Winner's $2 win payout bands (the closest thing to a starting price we keep)
+ODDS_BANDS = [(4.0, "Fav (< $4)"), (8.0, "$4 - $8"), (16.0, "$8 - $16"), (30.0, "$16 - $30"), (float("inf"), "Longshot ($30+)")]
+
+# Which pick the winner was, from the selection's label or rank. Legacy ledger rows carry the rank as
+# the label ('1' / '99') and are bucketed as Top Pick / Danger on purpose, whatever type the rank
+# column stored (integer, real or text). Shared by the grouped query and baseline_graded_races().
+TOP_PICK_LABELS, TOP_PICK_RANKS = ("Top Pick", "1"), ("1", "1.0")
+DANGER_LABELS, DANGER_RANKS = ("Danger", "99"), ("99", "99.0")
+
+def _sql_list(values):
+    return ", ".join(f"'{v}'" for v in values)
+
+# One row per graded result: the bucket the winner came from is resolved in the grouped join
+# instead of one selections query per race. Bucket codes follow BUCKETS order (NULL = complete miss);
+# packing the selection id in front keeps the first matching selection, as the per-race loop does.
+# Numbers compare as text, like str() in the loop. Results with no races row have no selections
+# and count as complete misses.
+GRADED_RACES_SQL = f"""
+    SELECT COALESCE(r.track, res.track), r.surface, r.distance, res.win_payout,
+           MIN(CASE WHEN CAST(s.horse_number AS TEXT) = CAST(res.win_num AS TEXT) THEN s.id * 4 +
+               CASE WHEN s.rank_prediction IN ({_sql_list(TOP_PICK_LABELS)}) OR CAST(s.rank AS TEXT) IN ({_sql_list(TOP_PICK_RANKS)}) THEN 0
+                    WHEN s.rank_prediction IN ({_sql_list(DANGER_LABELS)}) OR CAST(s.rank AS TEXT) IN ({_sql_list(DANGER_RANKS)}) THEN 1
+                    WHEN s.rank_prediction = 'Value' THEN 2
+                    ELSE 3 END
+           END) % 4 AS bucket,
+           SUM(CAST(s.horse_number AS TEXT) = CAST(res.win_num AS TEXT) AND s.confidence_level = 'Best of Day') AS best_of_day
+    FROM results res
+    LEFT JOIN races r ON res.date = r.date AND res.track = r.track AND res.race_number = CAST(r.race_number AS TEXT)
+    LEFT JOIN selections s ON s.race_id = r.id
+    WHERE res.win_num NOT IN ('CANCELLED', 'Cancelled', '00')
+    GROUP BY res.rowid, r.id
+"""
 
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
+
+def surface_bucket(surface):
+    surf = str(surface or "").lower()
+    if "turf" in surf or "grass" in surf:
+        return "Turf"
+    if "synth" in surf or "tapeta" in surf or "poly" in surf:
+        return "Synthetic"
+    if "dirt" in surf:
+        return "Dirt"
+    return "Unknown"
+
+def distance_bucket(distance):
+    # Same sprint / route split as the ROI analytics filter in api.py
+    dist = str(distance or "").lower()
+    if not dist:
+        return "Unknown"
+    return "Route" if any(k in dist for k in ["1m", "1 1/", "1-1/", "8f", "8.5f", "9f", "10f", "1600", "1800", "2000"]) else "Sprint"
+
+def odds_band(payout):
+    if not payout:
+        return "No Payout"
+    return next(label for limit, label in ODDS_BANDS if payout < limit)
+
+def load_graded_races(conn):
+    """[(track, surface, distance, win_payout, bucket_name, best_of_day_hits)] in a single query."""
+    return [
+        (track, surface, distance, payout or 0.0, BUCKETS[4] if code is None else BUCKETS[code], best or 0)
+        for track, surface, distance, payout, code, best in conn.execute(GRADED_RACES_SQL)
+    ]
+
+def winner_bucket(label, rank):
+    """Bucket name for the selection the winner came from (same mapping as GRADED_RACES_SQL)."""
+    if label in TOP_PICK_LABELS or str(rank) in TOP_PICK_RANKS:
+        return "Top Pick"
+    if label in DANGER_LABELS or str(rank) in DANGER_RANKS:
+        return "Danger"
+    if label == "Value":
+        return "Value"
+    return "In The Lists (Other)"
+
+def baseline_graded_races(conn):
+    """The per-race loop GRADED_RACES_SQL replaced (one selections query per race); reference for --self-test."""
+    rows = conn.execute("""
+        SELECT COALESCE(r.track, res.track), r.surface, r.distance, res.win_payout, r.id, res.win_num
+        FROM results res
+        LEFT JOIN races r ON res.date = r.date AND res.track = r.track AND res.race_number = CAST(r.race_number AS TEXT)
+        WHERE res.win_num NOT IN ('CANCELLED', 'Cancelled', '00')
+    """).fetchall()
+    races = []
+    for track, surface, distance, payout, race_id, winner in rows:
+        preds = conn.execute("SELECT horse_number, rank, rank_prediction, confidence_level FROM selections WHERE race_id = ? ORDER BY id",
+                             (race_id,)).fetchall()
+        best = sum(1 for p in preds if str(p[0]) == str(winner) and p[3] == 'Best of Day')
+        bucket = next((winner_bucket(label, rank) for h_num, rank, label, _ in preds if str(h_num) == str(winner)), "COMPLETE MISS")
+        races.append((track, surface, distance, payout or 0.0, bucket, best))
+    return races
+
+def summarize(races):
+    """Bucket counts, Best of Day hits and ghost-horse payout stats for a list of graded races."""
+    counts = dict.fromkeys(BUCKETS, 0)
+    best_of_day = 0
+    miss_payouts = []
+    for _, _, _, payout, bucket, best in races:
+        counts[bucket] += 1
+        best_of_day += best
+        if bucket == "COMPLETE MISS":
+            miss_payouts.append(payout)
+    return {
+        "races": len(races),
+        "counts": counts,
+        "best_of_day": best_of_day,
+        "avg_miss_payout": sum(miss_payouts) / len(miss_payouts) if miss_payouts else 0.0,
+    }
+
+def print_breakdown(title, races, key, order=None):
+    groups = defaultdict(list)
+    for race in races:
+        groups[key(race)].append(race)
+    rank = (lambda item: order.index(item[0]) if item[0] in order else len(order)) if order else (lambda item: -len(item[1]))
+
+    print(f"\n🧭 BY {title}")
+    print(f"   {'':<22} | {'Races':>5} | {'Top Pick':>8} | {'In Lists':>8} | {'Miss':>6} | {'Avg Miss $':>10}")
+    print(f"   {'-'*74}")
+    for name, group in sorted(groups.items(), key=rank):
+        s = summarize(group)
+        listed = s["races"] - s["counts"]["COMPLETE MISS"]
+        print(f"   {str(name)[:22]:<22} | {s['races']:>5} | {s['counts']['Top Pick'] / s['races'] * 100:>7.1f}% | "
+              f"{listed / s['races'] * 100:>7.1f}% | {s['counts']['COMPLETE MISS'] / s['races'] * 100:>5.1f}% | "
+              f"${s['avg_miss_payout']:>9.2f}")
 
 def analyze_blindspots():
     conn = get_connection()
-    cursor = conn.cursor()
+    races = load_graded_races(conn)
+    conn.close()
 
     print("\n" + "="*60)
-    print("🕵️  BLIND SPOT ANALYSIS (125+ RACES)")
+    print(f"🕵️  BLIND SPOT ANALYSIS ({len(races)} RACES)")
     print("="*60)
 
-    # Filter out cancelled
-    base_filter = "AND r.winner_number NOT IN ('CANCELLED', 'Cancelled', '00')"
-
     # 1. WHO IS WINNING? (The Breakdown)
     print(f"\n📊 WHO IS WINNING?")
     print(f"   {'-'*40}")
-    
-    # We need to look at EVERY race and see which prediction 'bucket' the winner came from
-    cursor.execute(f"""
-        SELECT r.race_uuid, r.winner_number, r.win_payout
-        FROM results r
-        WHERE 1=1 {base_filter}
-    """)
-    results = cursor.fetchall()
-
-    stats = {
-        "Top Pick": 0,
-        "Danger": 0,
-        "Value": 0,
-        "Best of Day": 0,
-        "In The Lists (Other)": 0,
-        "COMPLETE MISS": 0
-    }
-    
-    total_races = 0
-    total_miss_payout = 0.0
-
-    for row in results:
-        uuid, winner, payout = row
-        total_races += 1
-        
-        # Get predictions for this race
-        cursor.execute("SELECT horse_number, rank_prediction, confidence_level FROM predictions WHERE race_uuid = ?", (uuid,))
-        preds = cursor.fetchall()
-        
-        found = False
-        
-        # Check Best of Day first
-        for p in preds:
-            if str(p[0]) == str(winner) and p[2] == 'Best of Day':
-                stats["Best of Day"] += 1 # Overlap note: Best of Day is also a Top Pick usually
-                # We won't count 'found=True' here to allow it to count in its rank category too
-        
-        # Check Rank
-        for p in preds:
-            h_num, rank, conf = p
-            if str(h_num) == str(winner):
-                if rank == 'Top Pick': stats["Top Pick"] += 1
-                elif rank == 'Danger': stats["Danger"] += 1
-                elif rank == 'Value': stats["Value"] += 1
-                else: stats["In The Lists (Other)"] += 1
-                found = True
-                break
-        
-        if not found:
-            stats["COMPLETE MISS"] += 1
-            total_miss_payout += payout
-
-    # Print Stats
-    for cat, count in stats.items():
-        pct = (count / total_races) * 100
-        print(f"   {cat:<20} | {count:<3} Wins | {pct:.1f}%")
+
+    overall = summarize(races)
+    total_races = overall["races"]
+    # Best of Day overlaps the rank buckets (it is usually also the Top Pick)
+    stats = dict(overall["counts"], **{"Best of Day": overall["best_of_day"]})
+    for cat in ["Top Pick", "Danger", "Value", "Best of Day", "In The Lists (Other)", "COMPLETE MISS"]:
+        pct = (stats[cat] / total_races) * 100 if total_races else 0.0
+        print(f"   {cat:<20} | {stats[cat]:<3} Wins | {pct:.1f}%")
 
     # 2. ANALYSIS OF THE MISSES
-    avg_miss_price = (total_miss_payout / stats["COMPLETE MISS"]) if stats["COMPLETE MISS"] > 0 else 0
-    
+    avg_miss_price = overall["avg_miss_payout"]
+
     print(f"\n📉 THE 'GHOST' HORSES (Complete Misses)")
     print(f"   When the AI misses completely...")
     print(f"   Avg Winner Payout: ${avg_miss_price:.2f}")
-    
+
     if avg_miss_price > 20.00:
         print("   👉 DIAGNOSIS: The system is ignoring Longshots. It is too conservative.")
     elif avg_miss_price < 8.00:
@@ -90,7 +166,58 @@ def analyze_blindspots():
     else:
         print("   👉 DIAGNOSIS: The misses are average priced. This is normal variance.")
 
-    conn.close()
+    # 3. WHERE ARE THE BLIND SPOTS?
+    print_breakdown("TRACK", races, lambda r: r[0])
+    print_breakdown("SURFACE", races, lambda r: surface_bucket(r[1]))
+    print_breakdown("DISTANCE", races, lambda r: distance_bucket(r[2]))
+    print_breakdown("WINNER ODDS BAND", races, lambda r: odds_band(r[3]), [label for _, label in ODDS_BANDS])
+
+# ==========================================
+# 🧪 SELF-CHECK
+# ==========================================
+def build_fixture_ledger():
+    """In-memory ledger covering the bucket edge cases: legacy '1' / '99' labels, ranks stored as
+    text or real, repeated Best of Day hits, a result without a races row, cancelled races."""
+    conn = sqlite3.connect(":memory:")
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    races = [(1, "Flemington", "2026-07-01", "1", "Turf", "1200m"), (2, "Flemington", "2026-07-01", "2", "Turf", "1600m"),
+             (3, "Flemington", "2026-07-01", "3", "Dirt", "1000m"), (4, "Randwick", "2026-07-02", "1", "Synthetic", "2000m"),
+             (5, "Randwick", "2026-07-02", "2", "", ""), (6, "Randwick", "2026-07-02", "3", "Turf", "1400m")]
+    conn.executemany("INSERT INTO races (id, track, date, race_number, surface, distance) VALUES (?, ?, ?, ?, ?, ?)", races)
+    selections = [
+        (1, "4", 1, "Top Pick", None), (1, "7", 2, "Value", None), (1, "9", 99, "Danger", None),
+        (2, "3", 1, "1", "Best of Day"), (2, "5", 2, "2", None), (2, "3", 3, "Value", "Best of Day"),
+        (3, "8", "1", None, None), (3, "2", "99", None, None), (3, "6", 4.0, "4", None),
+        (4, "1", None, "99", None), (4, "5", 99.0, None, None),
+        (6, 12, 3, "Value", None),
+    ]
+    conn.executemany("INSERT INTO selections (race_id, horse_number, rank, rank_prediction, confidence_level) VALUES (?, ?, ?, ?, ?)",
+                     selections)
+    results = [
+        ("2026-07-01", "Flemington", "1", "7", 6.2), ("2026-07-01", "Flemington", "2", "3", 3.1),
+        ("2026-07-01", "Flemington", "3", "6", 14.0), ("2026-07-02", "Randwick", "1", "1", 9.0),
+        ("2026-07-02", "Randwick", "2", "4", None), ("2026-07-02", "Randwick", "3", "12", 41.5),
+        ("2026-07-03", "Moonee Valley", "1", "2", 22.0), ("2026-07-03", "Moonee Valley", "2", "CANCELLED", 0.0),
+    ]
+    conn.executemany("INSERT INTO results (date, track, race_number, win_num, win_payout) VALUES (?, ?, ?, ?, ?)", results)
+    return conn
+
+def self_test():
+    """The grouped query must bucket the fixture ledger exactly like the per-race loop. Returns failures."""
+    conn = build_fixture_ledger()
+    try:
+        grouped, baseline = sorted(load_graded_races(conn), key=repr), sorted(baseline_graded_races(conn), key=repr)
+    finally:
+        conn.close()
+    failures = [(g, b) for g, b in zip(grouped, baseline) if g != b] + ([("row count", len(grouped), len(baseline))] if len(grouped) != len(baseline) else [])
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'✅' if not failures else '❌'} {len(baseline)} fixture races: grouped query {'matches' if not failures else 'differs from'} the per-race loop")
+    print(f"   {summarize(grouped)['counts']}")
+    return len(failures)
 
 if __name__ == "__main__":
-    analyze_blindspots()
\ No newline at end of file
+    if sys.argv[1:] == ["--self-test"]:
+        sys.exit(1 if self_test() else 0)
+    analyze_blindspots()
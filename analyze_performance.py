@@ -1,35 +1,32 @@
-import sqlite3
 import pandas as pd
 import sys
 
-DB_FILE = "racing_ledger.db"
+from storage import connect
 
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
 
 def analyze_performance(target_track=None):
     conn = get_connection()
     
-    # Base Query
+    # Base Query (pick_rank: 1 = top pick, 99 = danger horse)
     query = """
     SELECT 
-        r.race_uuid,
-        r.track,
-        r.date,
-        r.race_number,
-        r.betting_strategy,
-        p.horse_number,
-        p.rank_prediction,
-        p.confidence_level,
-        res.winner_number,
-        res.second_number,
-        res.third_number,
-        res.win_payout,
-        res.exacta_payout,
-        res.trifecta_payout
-    FROM predictions p
-    JOIN results res ON p.race_uuid = res.race_uuid
-    JOIN races r ON p.race_uuid = r.race_uuid
+        race_uuid,
+        track,
+        date,
+        race_number,
+        betting_strategy,
+        horse_number,
+        pick_rank AS rank_prediction,
+        confidence_level,
+        winner_number,
+        second_number,
+        third_number,
+        win_payout,
+        exacta_payout,
+        trifecta_payout
+    FROM graded_selections
     """
     
     try:
@@ -94,15 +91,13 @@ def analyze_performance(target_track=None):
     
     # Construct SQL for Primes, adding Track filter if needed
     prime_sql = """
-        SELECT r.race_uuid, r.track, res.winner_number, res.win_payout, p.horse_number
-        FROM races r
-        JOIN results res ON r.race_uuid = res.race_uuid
-        JOIN predictions p ON r.race_uuid = p.race_uuid
-        WHERE p.rank_prediction = 1 
-        AND (r.betting_strategy LIKE '%High%' OR p.confidence_level = 'Best of Day')
+        SELECT race_uuid, track, winner_number, win_payout, horse_number
+        FROM graded_selections
+        WHERE pick_rank = 1 
+        AND (betting_strategy LIKE '%High%' OR confidence_level = 'Best of Day')
     """
     if target_track:
-        prime_sql += " AND lower(r.track) LIKE ?"
+        prime_sql += " AND lower(track) LIKE ?"
         params = (f"%{target_track.lower()}%",)
         cursor.execute(prime_sql, params)
     else:
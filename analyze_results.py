@@ -1,194 +1,204 @@
-import sqlite3
 import pandas as pd
 import sys
+import argparse
+
+from storage import connect, file_identity, DB_PATH
+
+# One row per graded race (at least one pick has a finish position), built in a single scan of
+# races / meetings / selections. Replaces re-evaluating the
+# "r.id IN (SELECT DISTINCT race_id FROM selections WHERE finish_position IS NOT NULL)" subquery
+# in every report query.
+GRADED_RACES_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS graded_races AS
+SELECT
+    r.id AS race_id,
+    m.track,
+    r.surface,
+    r.distance,
+    MAX(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) AS top_pick_won,
+    SUM(CASE WHEN s.finish_position = 1 THEN 1 ELSE 0 END) AS winners_listed,
+    MIN(CASE WHEN s.finish_position = 1 THEN s.rank END) AS winner_rank,
+    MIN(CASE WHEN s.finish_position = 1 THEN s.barrier END) AS winner_barrier
+FROM races r
+JOIN meetings m ON r.meeting_id = m.id
+JOIN selections s ON s.race_id = r.id
+GROUP BY r.id
+HAVING MAX(s.finish_position IS NOT NULL) = 1
+"""
+
+# Every breakdown for every track in one statement over graded_races.
+# races / wins: graded races and top pick wins in the cell; for the barrier and rank dimensions a
+# "race" is a race won by one of our picks drawn in that barrier / ranked at that position.
+CUBE_SQL = """
+SELECT 'overall' AS dimension, track, '' AS value,
+       COUNT(*) AS races, SUM(top_pick_won) AS wins, SUM(winners_listed) AS winners_listed
+FROM graded_races GROUP BY track
+UNION ALL
+SELECT 'surface', track, COALESCE(surface, ''), COUNT(*), SUM(top_pick_won), SUM(winners_listed)
+FROM graded_races GROUP BY track, surface
+UNION ALL
+SELECT 'distance', track, COALESCE(distance, ''), COUNT(*), SUM(top_pick_won), SUM(winners_listed)
+FROM graded_races GROUP BY track, distance
+UNION ALL
+SELECT 'barrier', track, CAST(winner_barrier AS TEXT), COUNT(*), COUNT(*), COUNT(*)
+FROM graded_races WHERE winner_barrier IS NOT NULL GROUP BY track, winner_barrier
+UNION ALL
+SELECT 'rank', track, CAST(winner_rank AS TEXT), COUNT(*), COUNT(*), COUNT(*)
+FROM graded_races WHERE winner_rank IS NOT NULL GROUP BY track, winner_rank
+"""
+
+_cube_cache = {}
+
+def get_connection(db_path=DB_PATH):
+    return connect(db_path)
+
+def _cube_stamp(db_path):
+    """
+    (file identity, data_version) from a read-only connection kept open for the purpose. It never
+    writes, so every commit from any other connection (new rows or in-place edits) changes it,
+    as in storage.QueryCache. The connection is reopened when the file is replaced.
+    """
+    identity = file_identity(db_path)
+    watcher = _cube_cache.get("watcher")
+    if watcher is not None and (_cube_cache.get("db_path"), _cube_cache.get("identity")) != (db_path, identity):
+        watcher.close()
+        watcher = None
+    if watcher is None:
+        watcher = connect(db_path, readonly=True)
+        _cube_cache.update(watcher=watcher, db_path=db_path, identity=file_identity(db_path), stamp=None)
+    return _cube_cache["identity"], watcher.execute("PRAGMA data_version").fetchone()[0]
+
+def load_cube(db_path=DB_PATH):
+    """
+    Performance cube (dimension, track, value, races, wins, winners_listed, win_pct) for all tracks.
+    Cached per database state, so repeated deep dives in one session do not rescan.
+    """
+    # Taken before the scan: a commit during it only costs one extra rebuild on the next call
+    stamp = _cube_stamp(db_path)
+    if _cube_cache.get("stamp") == stamp:
+        return _cube_cache["cube"]
+    conn = get_connection(db_path)
+    try:
+        conn.execute("DROP TABLE IF EXISTS temp.graded_races")
+        conn.execute(GRADED_RACES_SQL)
+        cube = pd.read_sql_query(CUBE_SQL, conn)
+    finally:
+        conn.close()
+    cube["win_pct"] = (cube["wins"] / cube["races"] * 100).round(1)
+    _cube_cache.update(stamp=stamp, cube=cube)
+    return cube
+
+def export_cube(cube, path):
+    """Writes the cube to .csv or .json (by extension) for spreadsheets / the dashboard."""
+    if path.lower().endswith(".json"):
+        cube.to_json(path, orient="records", indent=2)
+    else:
+        cube.to_csv(path, index=False)
+    print(f"💾 Exported {len(cube)} cube rows to {path}")
 
-DB_NAME = "racing_data.db"
-
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+def run_global_analysis(cube=None):
+    cube = load_cube() if cube is None else cube
 
-def run_global_analysis():
-    conn = get_connection()
-    
     print("\n" + "="*60)
     print(" 📊  EXACTA AI: PERFORMANCE REPORT (Graded Only)")
     print("="*60)
 
-    # FILTER: Only look at races where at least one horse has a finish position
-    # This prevents the "Backlog" of ungraded races from dragging down stats.
-    graded_filter = "r.id IN (SELECT DISTINCT race_id FROM selections WHERE finish_position IS NOT NULL)"
-
     # 1. OVERALL WIN & TOP 4 RATES
-    query_overall = f"""
-    SELECT 
-        COUNT(DISTINCT r.id) as total_races,
-        SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) as top_pick_wins,
-        SUM(CASE WHEN s.finish_position = 1 THEN 1 ELSE 0 END) as winner_in_top_4
-    FROM races r
-    JOIN selections s ON s.race_id = r.id
-    WHERE {graded_filter}
-    """
-    df_overall = pd.read_sql_query(query_overall, conn)
-    total = df_overall['total_races'][0]
-    wins = df_overall['top_pick_wins'][0]
-    in_four = df_overall['winner_in_top_4'][0]
-    
+    df_track = cube[cube["dimension"] == "overall"]
+    total = int(df_track["races"].sum())
+    wins = int(df_track["wins"].sum())
+    in_four = int(df_track["winners_listed"].sum())
+
     if total > 0:
         print(f"\n🏆 GLOBAL ACCURACY ({total} Races Graded)")
         print(f"   - Top Pick Winner:      {wins}  ({(wins/total)*100:.1f}%)")
         print(f"   - Winner in Top 4:      {in_four}  ({(in_four/total)*100:.1f}%)")
     else:
         print("No races graded yet.")
-        conn.close()
         return
 
     # 2. TRACK SUMMARY
     print("\n🌍 TRACK SUMMARY (Top Pick Win %)")
-    query_track = f"""
-    SELECT 
-        m.track,
-        COUNT(DISTINCT r.id) as races,
-        ROUND(CAST(SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(DISTINCT r.id) * 100, 1) as win_pct,
-        -- Winner found in Top 4 rate
-        ROUND(CAST(SUM(CASE WHEN s.finish_position = 1 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(DISTINCT r.id) * 100, 1) as top4_hit_rate
-    FROM races r
-    JOIN meetings m ON r.meeting_id = m.id
-    JOIN selections s ON s.race_id = r.id
-    WHERE s.rank = 1 AND {graded_filter}
-    GROUP BY m.track
-    ORDER BY races DESC
-    """
-    df_track = pd.read_sql_query(query_track, conn)
-    if not df_track.empty:
-        print(df_track.to_string(index=False))
+    summary = pd.DataFrame({
+        "track": df_track["track"],
+        "races": df_track["races"],
+        "win_pct": df_track["win_pct"],
+        # Winner found in Top 4 rate
+        "top4_hit_rate": (df_track["winners_listed"] / df_track["races"] * 100).round(1),
+    }).sort_values("races", ascending=False)
+    if not summary.empty:
+        print(summary.to_string(index=False))
+
+def analyze_specific_track(track_name, cube=None):
+    cube = load_cube() if cube is None else cube
+    track_cube = cube[cube["track"] == track_name]
+
+    def breakdown(dimension):
+        return track_cube[track_cube["dimension"] == dimension].rename(columns={"value": dimension})
 
-    conn.close()
-
-def analyze_specific_track(track_name):
-    conn = get_connection()
     print("\n" + "*"*60)
     print(f" 🔎 DEEP DIVE: {track_name.upper()}")
     print("*"*60)
 
-    graded_filter = "r.id IN (SELECT DISTINCT race_id FROM selections WHERE finish_position IS NOT NULL)"
-
     # 1. SURFACE BREAKDOWN
     print("\n--- 🌱 SURFACE PERFORMANCE ---")
-    query_surface = f"""
-    SELECT 
-        r.surface,
-        COUNT(DISTINCT r.id) as races,
-        SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) as wins,
-        ROUND(CAST(SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(DISTINCT r.id) * 100, 1) as win_pct
-    FROM races r
-    JOIN meetings m ON r.meeting_id = m.id
-    JOIN selections s ON s.race_id = r.id
-    WHERE s.rank = 1 AND m.track = ? AND {graded_filter}
-    GROUP BY r.surface
-    ORDER BY races DESC
-    """
-    df_surf = pd.read_sql_query(query_surface, conn, params=(track_name,))
+    df_surf = breakdown("surface").sort_values("races", ascending=False)
     if not df_surf.empty:
-        print(df_surf.to_string(index=False))
+        print(df_surf[["surface", "races", "wins", "win_pct"]].to_string(index=False))
     else:
         print("No graded data for this track.")
 
     # 2. DISTANCE BREAKDOWN
     print("\n--- 📏 DISTANCE PERFORMANCE ---")
-    query_dist = f"""
-    SELECT 
-        r.distance,
-        COUNT(DISTINCT r.id) as races,
-        SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) as wins,
-        ROUND(CAST(SUM(CASE WHEN s.rank = 1 AND s.finish_position = 1 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(DISTINCT r.id) * 100, 1) as win_pct
-    FROM races r
-    JOIN meetings m ON r.meeting_id = m.id
-    JOIN selections s ON s.race_id = r.id
-    WHERE s.rank = 1 AND m.track = ? AND {graded_filter}
-    GROUP BY r.distance
-    ORDER BY races DESC
-    LIMIT 5
-    """
-    df_dist = pd.read_sql_query(query_dist, conn, params=(track_name,))
+    df_dist = breakdown("distance").sort_values("races", ascending=False).head(5)
     if not df_dist.empty:
-        print(df_dist.to_string(index=False))
+        print(df_dist[["distance", "races", "wins", "win_pct"]].to_string(index=False))
 
     # 3. BARRIER (POST POSITION) BIAS
     print("\n--- 🚪 WINNING BARRIERS (Actual Results) ---")
-    query_barrier = f"""
-    SELECT 
-        s.barrier,
-        COUNT(*) as wins
-    FROM selections s
-    JOIN races r ON s.race_id = r.id
-    JOIN meetings m ON r.meeting_id = m.id
-    WHERE s.finish_position = 1 AND m.track = ?
-    GROUP BY s.barrier
-    ORDER BY wins DESC
-    LIMIT 5
-    """
-    df_bar = pd.read_sql_query(query_barrier, conn, params=(track_name,))
+    df_bar = breakdown("barrier").sort_values("wins", ascending=False).head(5)
     if not df_bar.empty:
         print("Top 5 Winningest Posts (from graded races):")
-        print(df_bar.to_string(index=False))
-    
+        print(df_bar[["barrier", "wins"]].to_string(index=False))
+
     # 4. PICK RANKING ACCURACY
     print("\n--- 🎯 AI RANKING ACCURACY ---")
-    query_ranks = f"""
-    SELECT 
-        s.rank as ai_pick_rank,
-        COUNT(*) as wins,
-        ROUND(CAST(COUNT(*) AS FLOAT) * 100 / (SELECT COUNT(DISTINCT r.id) FROM races r JOIN meetings m ON r.meeting_id = m.id WHERE m.track = ? AND {graded_filter}), 1) as win_rate
-    FROM selections s
-    JOIN races r ON s.race_id = r.id
-    JOIN meetings m ON r.meeting_id = m.id
-    WHERE s.finish_position = 1 AND m.track = ?
-    GROUP BY s.rank
-    ORDER BY s.rank ASC
-    """
-    df_ranks = pd.read_sql_query(query_ranks, conn, params=(track_name, track_name))
-    if not df_ranks.empty:
-        print(df_ranks.to_string(index=False))
-
-    conn.close()
-
-def main_menu():
-    run_global_analysis()
-    
-    conn = get_connection()
-    # Get list of tracks that actually have GRADED races
-    # We filter the menu too, so you don't waste time selecting a track with 0 results
-    tracks_query = """
-    SELECT DISTINCT m.track 
-    FROM meetings m
-    JOIN races r ON r.meeting_id = m.id
-    JOIN selections s ON s.race_id = r.id
-    WHERE s.finish_position IS NOT NULL
-    ORDER BY m.track ASC
-    """
-    tracks = [row[0] for row in conn.execute(tracks_query).fetchall()]
-    conn.close()
+    graded = int(breakdown("overall")["races"].sum())
+    df_ranks = breakdown("rank").rename(columns={"rank": "ai_pick_rank"})
+    if not df_ranks.empty and graded:
+        df_ranks = df_ranks.assign(
+            ai_pick_rank=df_ranks["ai_pick_rank"].astype(int),
+            win_rate=(df_ranks["wins"] * 100 / graded).round(1)
+        ).sort_values("ai_pick_rank")
+        print(df_ranks[["ai_pick_rank", "wins", "win_rate"]].to_string(index=False))
+
+def main_menu(cube=None):
+    cube = load_cube() if cube is None else cube
+    run_global_analysis(cube)
+
+    # Only tracks that actually have GRADED races, so you don't waste time selecting a track with 0 results
+    tracks = sorted(cube.loc[cube["dimension"] == "overall", "track"].tolist())
 
     while True:
         print("\n" + "-"*40)
         print("🔎 TRACK DEEP DIVE MENU (Graded Tracks Only)")
         print("-"*40)
-        
+
         if not tracks:
             print("No tracks have been graded yet.")
             break
 
         for i, t in enumerate(tracks):
             print(f"[{i+1}] {t}")
-        
+
         val = input("\nSelect Track # to Analyze (or 'q' to quit): ").strip()
         if val.lower() == 'q': break
-        
+
         try:
             idx = int(val) - 1
             if 0 <= idx < len(tracks):
                 selected_track = tracks[idx]
-                analyze_specific_track(selected_track)
+                analyze_specific_track(selected_track, cube)
                 input("\nPress Enter to continue...")
             else:
                 print("❌ Invalid selection.")
@@ -196,4 +206,18 @@ def main_menu():
             print("❌ Invalid input.")
 
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Graded performance report (surface / distance / barrier / rank per track).")
+    parser.add_argument("--track", help="Print the deep dive for one track (or 'all') instead of the interactive menu")
+    parser.add_argument("--export", help="Write the full cube to a .csv or .json file")
+    args = parser.parse_args()
+
+    cube = load_cube()
+    if args.export:
+        export_cube(cube, args.export)
+    if args.track:
+        run_global_analysis(cube)
+        names = sorted(cube.loc[cube["dimension"] == "overall", "track"]) if args.track.lower() == "all" else [args.track]
+        for name in names:
+            analyze_specific_track(name, cube)
+    elif not args.export:
+        main_menu(cube)
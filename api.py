@@ -2,213 +2,41 @@ import http.server
 import socketserver
 import json
 import os
-import sqlite3
-import re
+import base64
 from datetime import datetime
 from urllib.parse import parse_qs, urlparse
 
+from storage import DB_PATH, init_storage, cached_query, get_connection, get_readonly_connection
+from enrichment import load_meeting_json, enrich_meeting
+from race_store import RaceStore
+from raw_store import load_raw_features
+from exotic_sim import SimulationCache, parse_budgets, parse_draws
+from staking import get_policy, DEFAULT_BANKROLL
+from bankroll_sim import BankrollCache, parse_policies, parse_samples
+
 PORT = 8888
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 API_OUTPUT_DIR = os.path.join(BASE_DIR, "frontend", "public", "api", "output")
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
 DEFAULT_PIN = os.environ.get("EXACTA_PIN", "0518")
 
 for d in [LOGS_DIR, API_OUTPUT_DIR]:
     os.makedirs(d, exist_ok=True)
-
-# Helper function to detect region based on track name
-def get_region_for_track(track_name):
-    t = track_name.lower()
-    if any(k in t for k in ["ascot_uk", "goodwood", "redcar", "wolverhampton", "leicester", "carlisle", "kempton"]):
-        return "UK"
-    elif any(k in t for k in ["albury", "ascot", "balaklava", "ballarat", "ballina", "bathurst", "belmont_park_wa", 
-                            "broome", "bunbury", "cairns", "canberra", "canterbury", "caulfield", "doomben", 
-                            "eagle_farm", "echuca", "flemington", "gold_coast", "gosford", "goulburn", "grafton",
-                            "hawkesbury", "ipswich", "kalgoorlie", "kembla", "morphettville", "murray", "newcastle",
-                            "rosehill", "randwick", "sandown", "sunshine", "tamworth", "taree", "wagga", "wyong"]):
-        return "AUS"
-    elif any(k in t for k in ["busan", "seoul", "funabashi", "kawasaki", "mombetsu", "nagoya", "tokyo_city", "happy_valley", "sha_tin"]):
-        return "ASIA"
-    elif any(k in t for k in ["hoosier", "meadowlands", "monticello", "northfield", "saratoga_harness", "yonkers", "woodbine_mohawk"]):
-        return "HARNESS"
-    else:
-        return "USA"
-
-def compute_race_exotics_suggestions(contenders):
-    if not contenders or len(contenders) < 2:
-        return []
-
-    c_nums = [str(c.get("number") or c.get("program_number") or "") for c in contenders if (c.get("number") or c.get("program_number"))]
-    if len(c_nums) < 2:
-        return []
-
-    top_1 = c_nums[0]
-    top_2 = c_nums[1]
-    top_3 = c_nums[2] if len(c_nums) > 2 else c_nums[1]
-    top_4 = c_nums[3] if len(c_nums) > 3 else top_3
-
-    suggestions = []
-
-    # 1. Exacta Box
-    box_horses = ", ".join([f"#{n}" for n in c_nums[:3]])
-    suggestions.append({
-        "type": "Exacta Box",
-        "ticket": f"$2 Exacta Box: {box_horses}",
-        "cost": "$12.00 (6 combos)" if len(c_nums) >= 3 else "$4.00 (2 combos)",
-        "icon": "🎟️"
-    })
-
-    # 2. Exacta Key
-    key_under = ", ".join([f"#{n}" for n in c_nums[1:3]])
-    suggestions.append({
-        "type": "Exacta Key",
-        "ticket": f"$2 Exacta Key: #{top_1} over {key_under}",
-        "cost": "$4.00 (2 combos)",
-        "icon": "🔑"
-    })
-
-    # 3. Trifecta Key
-    if len(c_nums) >= 3:
-        tri_under = ", ".join([f"#{n}" for n in c_nums[1:4]])
-        suggestions.append({
-            "type": "Trifecta Key",
-            "ticket": f"$1 Trifecta Key: #{top_1} over #{top_2}, #{top_3} over {tri_under}",
-            "cost": "$4.00 (4 combos)",
-            "icon": "💎"
-        })
-
-    # 4. 10c Superfecta
-    if len(c_nums) >= 4:
-        suggestions.append({
-            "type": "10c Superfecta Wheel",
-            "ticket": f"10c Superfecta: #{top_1} / #{top_2}, #{top_3} / #{top_2}, #{top_3}, #{top_4} / ALL",
-            "cost": "$2.40 (24 combos)",
-            "icon": "⚡"
-        })
-
-    return suggestions
-
-def compute_race_enrichments(races):
-    enriched = []
-    for race in races:
-        race_copy = dict(race)
-        contenders = race_copy.get("all_contenders") or race_copy.get("selections") or []
-        
-        # Calculate rating gap between top 2 horses
-        sorted_contenders = sorted(contenders, key=lambda x: float(x.get("rating", 0)), reverse=True)
-        top_rating = float(sorted_contenders[0].get("rating", 0)) if len(sorted_contenders) > 0 else 0
-        second_rating = float(sorted_contenders[1].get("rating", 0)) if len(sorted_contenders) > 1 else 0
-        gap = round(top_rating - second_rating, 1)
-        
-        enriched_contenders = []
-        for i, c in enumerate(sorted_contenders):
-            c_copy = dict(c)
-            r = float(c_copy.get("rating", 0))
-            is_top = (i == 0)
-            
-            c_copy["is_solo_lock"] = is_top and (r >= 90.0) and (gap >= 5.0)
-            c_copy["is_best_bet"] = is_top and (gap >= 3.0) and not c_copy["is_solo_lock"]
-            c_copy["win_lock_amount"] = 25.0 if is_top and (r >= 85.0 or gap >= 3.0) else 0.0
-            c_copy["gap_to_next"] = gap if is_top else 0.0
-            enriched_contenders.append(c_copy)
-            
-        race_copy["all_contenders"] = enriched_contenders
-        race_copy["rating_gap"] = gap
-        race_copy["has_solo_lock"] = any(c.get("is_solo_lock") for c in enriched_contenders)
-        race_copy["has_best_bet"] = any(c.get("is_best_bet") for c in enriched_contenders)
-        race_copy["exotic_suggestions"] = compute_race_exotics_suggestions(enriched_contenders)
-        enriched.append(race_copy)
-    return enriched
-
-def compute_exotic_tickets(races):
-    race_legs = {}
-    for r in races:
-        r_num = r.get("number") or 1
-        contenders = r.get("all_contenders") or r.get("selections") or []
-        
-        parsed_c = []
-        for c in contenders:
-            if isinstance(c, dict):
-                num = str(c.get("number") or c.get("program_number") or "")
-                rating = float(c.get("rating") or c.get("features", {}).get("ai_holistic_score", 0) or 0)
-                name = c.get("name") or c.get("horse_name") or ""
-            elif isinstance(c, str):
-                num = ""
-                rating = 75.0
-                name = ""
-                m_num = re.search(r"number[:=](\w+)", c)
-                if m_num: num = m_num.group(1)
-                m_rat = re.search(r"rating[:=]([\d\.]+)", c)
-                if m_rat: rating = float(m_rat.group(1))
-            else:
-                continue
-            if num:
-                parsed_c.append({"number": num, "rating": rating, "name": name})
-
-        sorted_c = sorted(parsed_c, key=lambda x: x["rating"], reverse=True)
-        if not sorted_c:
-            continue
-        
-        top_r = sorted_c[0]["rating"]
-        r2_r = sorted_c[1]["rating"] if len(sorted_c) > 1 else 0
-        gap = top_r - r2_r
-        
-        if top_r >= 90.0 and gap >= 5.0:
-            # Single Lock Anchor
-            leg_horses = [f"#{sorted_c[0]['number']} (SOLO LOCK)"]
-        else:
-            # Multi-horse spread (top 2 or 3)
-            cutoff = 2 if len(sorted_c) >= 2 else 1
-            if len(sorted_c) >= 3 and (sorted_c[1]["rating"] - sorted_c[2]["rating"]) < 2.0:
-                cutoff = 3
-            leg_horses = [f"#{c['number']}" for c in sorted_c[:cutoff]]
-        
-        race_legs[r_num] = ", ".join(leg_horses)
-
-    race_nums = sorted(race_legs.keys())
-    n = len(race_nums)
-    if n == 0:
-        return {}
-
-    exotics = {
-        "daily_doubles": [],
-        "pick_3": [],
-        "pick_4": [],
-        "pick_5": [],
-        "pick_6": []
-    }
-
-    # Daily Doubles (consecutive pairs)
-    for i in range(n - 1):
-        r1, r2 = race_nums[i], race_nums[i+1]
-        exotics["daily_doubles"].append(f"R{r1}-R{r2} Double: R{r1} [{race_legs[r1]}] / R{r2} [{race_legs[r2]}]")
-
-    # Pick 3
-    for i in range(n - 2):
-        r1, r2, r3 = race_nums[i], race_nums[i+1], race_nums[i+2]
-        exotics["pick_3"].append(f"Pick 3 (R{r1}-R{r3}): R{r1} [{race_legs[r1]}] / R{r2} [{race_legs[r2]}] / R{r3} [{race_legs[r3]}]")
-
-    # Pick 4
-    for i in range(n - 3):
-        r1, r2, r3, r4 = race_nums[i], race_nums[i+1], race_nums[i+2], race_nums[i+3]
-        exotics["pick_4"].append(f"Pick 4 (R{r1}-R{r4}): R{r1} [{race_legs[r1]}] / R{r2} [{race_legs[r2]}] / R{r3} [{race_legs[r3]}] / R{r4} [{race_legs[r4]}]")
-
-    # Pick 5
-    for i in range(n - 4):
-        r1, r2, r3, r4, r5 = race_nums[i], race_nums[i+1], race_nums[i+2], race_nums[i+3], race_nums[i+4]
-        exotics["pick_5"].append(f"Pick 5 (R{r1}-R{r5}): R{r1} [{race_legs[r1]}] / R{r2} [{race_legs[r2]}] / R{r3} [{race_legs[r3]}] / R{r4} [{race_legs[r4]}] / R{r5} [{race_legs[r5]}]")
-
-    # Pick 6
-    for i in range(n - 5):
-        r1, r2, r3, r4, r5, r6 = race_nums[i], race_nums[i+1], race_nums[i+2], race_nums[i+3], race_nums[i+4], race_nums[i+5]
-        exotics["pick_6"].append(f"Pick 6 (R{r1}-R{r6}): R{r1} [{race_legs[r1]}] / R{r2} [{race_legs[r2]}] / R{r3} [{race_legs[r3]}] / R{r4} [{race_legs[r4]}] / R{r5} [{race_legs[r5]}] / R{r6} [{race_legs[r6]}]")
-
-    return exotics
+init_storage()
+race_store = RaceStore()
+exotic_cache = SimulationCache()
+bankroll_cache = BankrollCache()
 
 US_TIER1_TRACKS = ["Saratoga", "Del Mar", "Gulfstream Park", "Keeneland", "Churchill Downs", "Belmont Park", "Aqueduct"]
 AUS_HIGH_HIT_TRACKS = ["Flemington", "Randwick", "Caulfield", "Doomben", "Rosehill", "Moonee Valley", "Eagle Farm"]
 
+# /api/meetings paging: the selector only ever pulls one page at a time
+MEETINGS_PAGE_SIZE = 50
+MEETINGS_MAX_PAGE_SIZE = 500
+MEETING_LIST_FIELDS = ["id", "filename", "track", "date", "track_condition", "race_count",
+                       "solo_locks_count", "best_bets_count", "region", "is_published"]
+COMPACT_MEETING_FIELDS = ["id", "track", "date", "region", "race_count"]
+
 def calculate_roi_analytics(
     filter_group="ALL", target_track="", start_date="", end_date="", 
     surface="ALL", condition="ALL", dist_type="ALL", race_class="ALL"
@@ -220,7 +48,11 @@ def calculate_roi_analytics(
     if not os.path.exists(DB_PATH):
         return {}
 
-    conn = sqlite3.connect(DB_PATH)
+    # Tier stakes are the "tiered" staking policy (data/staking_policies.json overrides them)
+    tier_stakes = get_policy("tiered")["stakes"]
+    lock_stake, best_stake, top_stake = tier_stakes["solo_lock"], tier_stakes["best_bet"], tier_stakes["top_pick"]
+
+    conn = get_readonly_connection()
     c = conn.cursor()
 
     query = """
@@ -233,7 +65,6 @@ def calculate_roi_analytics(
     """
     c.execute(query)
     rows = c.fetchall()
-    conn.close()
 
     total_races = 0
     top_pick_wins = 0
@@ -348,7 +179,7 @@ def calculate_roi_analytics(
                 is_top2_hit = is_top_win or (place_num and str(p2_num).strip() == str(place_num).strip())
                 top2_hits.append(is_top2_hit)
 
-            stake_val = 20.0 if has_lock_val else (10.0 if has_best_val else 5.0)
+            stake_val = lock_stake if has_lock_val else (best_stake if has_best_val else top_stake)
             
             if has_official_result:
                 payout_val = (stake_val * (actual_win_paid / 2.0)) if is_top_win else 0.0
@@ -366,7 +197,7 @@ def calculate_roi_analytics(
                 "p1_name": p1_name or f"Horse #{p1_num}",
                 "rating": round(p1_rating_val, 1),
                 "gap": round(gap_val, 1),
-                "bet_tag": "SOLO LOCK ($20)" if has_lock_val else ("BEST BET ($10)" if has_best_val else "TOP PICK ($5)"),
+                "bet_tag": f"SOLO LOCK (${lock_stake:g})" if has_lock_val else (f"BEST BET (${best_stake:g})" if has_best_val else f"TOP PICK (${top_stake:g})"),
                 "is_win": is_top_win,
                 "has_result": has_official_result,
                 "status": "WIN" if (has_official_result and is_top_win) else ("LOSS" if has_official_result else "UNSETTLED"),
@@ -378,24 +209,24 @@ def calculate_roi_analytics(
 
             # Only count settled races with scraped results into ROI statistics
             if has_official_result:
-                staked_top += 5.0
+                staked_top += top_stake
                 if is_top_win:
                     top_pick_wins += 1
-                    payout_top += 5.0 * (actual_win_paid / 2.0)
+                    payout_top += top_stake * (actual_win_paid / 2.0)
 
                 if has_best_val and not has_lock_val:
                     best_bet_count += 1
-                    staked_best += 10.0
+                    staked_best += best_stake
                     if is_top_win:
                         best_bet_wins += 1
-                        payout_best += 10.0 * (actual_win_paid / 2.0)
+                        payout_best += best_stake * (actual_win_paid / 2.0)
 
                 if has_lock_val:
                     solo_lock_count += 1
-                    staked_lock += 20.0
+                    staked_lock += lock_stake
                     if is_top_win:
                         solo_lock_wins += 1
-                        payout_lock += 20.0 * (actual_win_paid / 2.0)
+                        payout_lock += lock_stake * (actual_win_paid / 2.0)
 
         n = len(top2_hits)
         for i in range(n - 2):
@@ -427,7 +258,7 @@ def calculate_roi_analytics(
             "roi": overall_roi
         },
         "top_pick_win": {
-            "wager_size": 5.0,
+            "wager_size": top_stake,
             "wins": top_pick_wins,
             "total_bets": total_races,
             "win_rate": round((top_pick_wins / total_races * 100), 1) if total_races > 0 else 0.0,
@@ -437,7 +268,7 @@ def calculate_roi_analytics(
             "roi": round(((payout_top - staked_top) / staked_top * 100), 1) if staked_top > 0 else 0.0
         },
         "best_bet": {
-            "wager_size": 10.0,
+            "wager_size": best_stake,
             "wins": best_bet_wins,
             "total_bets": best_bet_count,
             "win_rate": round((best_bet_wins / best_bet_count * 100), 1) if best_bet_count > 0 else 0.0,
@@ -447,7 +278,7 @@ def calculate_roi_analytics(
             "roi": round(((payout_best - staked_best) / staked_best * 100), 1) if staked_best > 0 else 0.0
         },
         "solo_lock": {
-            "wager_size": 20.0,
+            "wager_size": lock_stake,
             "wins": solo_lock_wins,
             "total_bets": solo_lock_count,
             "win_rate": round((solo_lock_wins / solo_lock_count * 100), 1) if solo_lock_count > 0 else 0.0,
@@ -480,6 +311,132 @@ def calculate_roi_analytics(
         }
     }
 
+def encode_meetings_cursor(date_str, track):
+    raw = json.dumps([date_str, track]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_meetings_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        date_str, track = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (TypeError, UnicodeEncodeError):
+        raise ValueError("malformed cursor")
+    return str(date_str), str(track)
+
+def _meeting_row_to_dict(row):
+    fname, track, date_str, region, race_cnt, locks_cnt, bests_cnt = row
+    return {
+        "id": fname,
+        "filename": fname,
+        "track": track,
+        "date": date_str,
+        "track_condition": "Standard",
+        "race_count": race_cnt,
+        "solo_locks_count": locks_cnt,
+        "best_bets_count": bests_cnt,
+        "region": region,
+        "is_published": True
+    }
+
+def query_meetings(region="", track="", date_from="", date_to="", cursor="", limit=MEETINGS_PAGE_SIZE, fields=None):
+    """
+    One page of the meeting selector, newest first. Filters and the keyset cursor are applied in SQL
+    (idx_meetings_*_listing), so the cost of a page does not grow with the archive.
+    Returns (meetings, next_cursor); next_cursor is None on the last page.
+    """
+    # Only meetings indexed from a published card file (races-only imports have no filename)
+    where = ["filename IS NOT NULL"]
+    params = []
+    regions = [r.strip().upper() for r in region.split(",") if r.strip()]
+    if regions:
+        where.append(f"region IN ({', '.join('?' for _ in regions)})")
+        params.extend(regions)
+    if track:
+        where.append("track = ? COLLATE NOCASE")
+        params.append(track.replace("_", " "))
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    if cursor:
+        last_date, last_track = decode_meetings_cursor(cursor)
+        # date <= ? lets SQLite seek into the index instead of scanning from the newest row
+        where.append("date <= ? AND (date < ? OR track > ?)")
+        params.extend([last_date, last_date, last_track])
+
+    limit = max(1, min(int(limit), MEETINGS_MAX_PAGE_SIZE))
+    # One extra row tells us whether another page exists without a COUNT(*)
+    rows = cached_query(f"""
+        SELECT filename, track, date, region, race_count, solo_locks_count, best_bets_count
+        FROM meetings
+        WHERE {' AND '.join(where)}
+        ORDER BY date DESC, track ASC
+        LIMIT ?
+    """, params + [limit + 1])
+
+    page = rows[:limit]
+    next_cursor = encode_meetings_cursor(page[-1][2], page[-1][1]) if len(rows) > limit else None
+    meetings = [_meeting_row_to_dict(row) for row in page]
+    if fields:
+        meetings = [{k: m[k] for k in fields} for m in meetings]
+    return meetings, next_cursor
+
+def parse_meeting_fields(value):
+    """?fields=compact or a comma list of MEETING_LIST_FIELDS; None means every field."""
+    if not value:
+        return None
+    if value == "compact":
+        return COMPACT_MEETING_FIELDS
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in MEETING_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown meeting fields: {', '.join(unknown)}")
+    return fields
+
+def get_meeting_summary(meeting_id):
+    """Selector hover/preview data: meeting row plus one line per race, without opening the card JSON."""
+    fname = meeting_id if meeting_id.endswith(".json") else meeting_id + ".json"
+    rows = cached_query("""
+        SELECT filename, track, date, region, race_count, solo_locks_count, best_bets_count
+        FROM meetings WHERE filename = ?
+    """, (fname,))
+    if not rows:
+        return None
+
+    summary = _meeting_row_to_dict(rows[0])
+    race_rows = cached_query("""
+        SELECT p.race_number, p.distance, p.surface, p.p1_num, p.p1_name, p.p1_rating, p.rating_gap,
+               p.has_best_bet, p.has_solo_lock, r.win_num
+        FROM predictions p
+        LEFT JOIN results r ON p.date = r.date AND p.track = r.track AND p.race_number = r.race_number
+        WHERE p.date = ? AND p.track = ?
+        ORDER BY CAST(p.race_number AS INTEGER)
+    """, (summary["date"], summary["track"]))
+
+    summary["races"] = [{
+        "race_number": race_num,
+        "distance": distance or "",
+        "surface": surface or "",
+        "top_pick": {"number": p1_num, "name": p1_name, "rating": p1_rating},
+        "rating_gap": gap or 0.0,
+        "has_best_bet": bool(has_best),
+        "has_solo_lock": bool(has_lock),
+        "winner_num": win_num
+    } for race_num, distance, surface, p1_num, p1_name, p1_rating, gap, has_best, has_lock, win_num in race_rows]
+    summary["settled_races"] = sum(1 for r in summary["races"] if r["winner_num"])
+    return summary
+
+def find_meeting_file(meeting_id):
+    """Card path for a meeting id / filename (exported cards first, then logs), or None."""
+    fname = meeting_id if meeting_id.endswith(".json") else meeting_id + ".json"
+    for d in [API_OUTPUT_DIR, LOGS_DIR]:
+        filepath = os.path.join(d, fname)
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
 class ExactaAPIHandler(http.server.BaseHTTPRequestHandler):
     def address_string(self):
         return self.client_address[0]
@@ -502,7 +459,9 @@ class ExactaAPIHandler(http.server.BaseHTTPRequestHandler):
         self.end_headers()
 
     def _send_json(self, data, code=200):
-        body = json.dumps(data).encode("utf-8")
+        self._send_json_bytes(json.dumps(data).encode("utf-8"), code)
+
+    def _send_json_bytes(self, body, code=200):
         self.send_response(code)
         self._send_cors_headers()
         self.send_header("Content-Type", "application/json; charset=utf-8")
@@ -540,89 +499,116 @@ class ExactaAPIHandler(http.server.BaseHTTPRequestHandler):
                 )
                 return self._send_json({"status": "success", "analytics": analytics_data})
 
+            # GET /api/analytics/bankroll?policies=kelly,flat&bankroll=&samples=&track=&start_date=&end_date=
+            if path == "/api/analytics/bankroll":
+                try:
+                    policy_names = parse_policies(query.get("policies", [""])[0])
+                    samples = parse_samples(query.get("samples", [""])[0])
+                    start_bankroll = float(query.get("bankroll", [""])[0] or DEFAULT_BANKROLL)
+                    if start_bankroll <= 0:
+                        raise ValueError("bankroll must be positive")
+                except ValueError as e:
+                    return self._send_json({"status": "error", "error": f"Bad bankroll query: {e}"}, 400)
+                simulation = bankroll_cache.get(
+                    policy_names, start_bankroll, samples,
+                    track=query.get("track", [""])[0],
+                    start_date=query.get("start_date", [""])[0],
+                    end_date=query.get("end_date", [""])[0]
+                )
+                return self._send_json({"status": "success", "simulation": simulation})
+
             # GET /api/analytics/tracks
             if path == "/api/analytics/tracks":
-                conn = sqlite3.connect(DB_PATH)
-                c = conn.cursor()
-                c.execute("SELECT DISTINCT track FROM predictions ORDER BY track ASC")
-                tracks_list = [row[0] for row in c.fetchall() if row[0]]
-                conn.close()
+                rows = cached_query("SELECT DISTINCT track FROM predictions ORDER BY track ASC")
+                tracks_list = [row[0] for row in rows if row[0]]
                 return self._send_json({"status": "success", "tracks": tracks_list})
 
-            # 1. GET /api/meetings
+            # 1. GET /api/meetings?region=&track=&date_from=&date_to=&limit=&cursor=&fields=
             if path == "/api/meetings" or path == "/api/output":
-                conn = sqlite3.connect(DB_PATH)
-                c = conn.cursor()
-                c.execute("""
-                    SELECT filename, track, date, region, race_count, solo_locks_count, best_bets_count 
-                    FROM meetings 
-                    ORDER BY date DESC, track ASC
-                """)
-                rows = c.fetchall()
-                conn.close()
-
-                meetings = []
-                for row in rows:
-                    fname, track, date_str, region, race_cnt, locks_cnt, bests_cnt = row
-                    meetings.append({
-                        "id": fname,
-                        "filename": fname,
-                        "track": track,
-                        "date": date_str,
-                        "track_condition": "Standard",
-                        "race_count": race_cnt,
-                        "solo_locks_count": locks_cnt,
-                        "best_bets_count": bests_cnt,
-                        "region": region,
-                        "is_published": True
-                    })
-                return self._send_json({"status": "success", "meetings": meetings})
+                try:
+                    fields = parse_meeting_fields(query.get("fields", [""])[0])
+                    meetings, next_cursor = query_meetings(
+                        region=query.get("region", [""])[0],
+                        track=query.get("track", [""])[0],
+                        date_from=query.get("date_from", [""])[0],
+                        date_to=query.get("date_to", [""])[0],
+                        cursor=query.get("cursor", [""])[0],
+                        limit=query.get("limit", [MEETINGS_PAGE_SIZE])[0],
+                        fields=fields
+                    )
+                except ValueError as e:
+                    return self._send_json({"status": "error", "error": f"Bad meetings query: {e}"}, 400)
+                return self._send_json({
+                    "status": "success",
+                    "meetings": meetings,
+                    "next_cursor": next_cursor,
+                    "has_more": next_cursor is not None
+                })
+
+            # 1b. GET /api/meetings/{id}/summary
+            if path.startswith("/api/meetings/") and path.endswith("/summary"):
+                summary = get_meeting_summary(path.split("/")[-2])
+                if summary is None:
+                    return self._send_json({"error": "Meeting not found"}, 404)
+                return self._send_json({"status": "success", "summary": summary})
+
+            # 1c. GET /api/meetings/{id}/skeleton and /api/meetings/{id}/races/{n} (per-race lazy loading)
+            parts = path.split("/")
+            if len(parts) == 5 and parts[2] == "meetings" and parts[4] == "skeleton":
+                filepath = find_meeting_file(parts[3])
+                if filepath is None:
+                    return self._send_json({"error": "Meeting not found"}, 404)
+                return self._send_json_bytes(b'{"status":"success","data":' + race_store.skeleton(filepath) + b'}')
+
+            if len(parts) == 6 and parts[2] == "meetings" and parts[4] == "races":
+                filepath = find_meeting_file(parts[3])
+                if filepath is None:
+                    return self._send_json({"error": "Meeting not found"}, 404)
+                if not parts[5].isdigit():
+                    return self._send_json({"error": "Race index must be a number"}, 400)
+                race_body = race_store.race(filepath, int(parts[5]))
+                if race_body is None:
+                    return self._send_json({"error": "Race not found"}, 404)
+                return self._send_json_bytes(b'{"status":"success","data":' + race_body + b'}')
+
+            # 1c'. GET /api/meetings/{id}/exotics?budget=20,50&draws= (Monte Carlo ticket ranking, cached per card version)
+            if len(parts) == 5 and parts[2] == "meetings" and parts[4] == "exotics":
+                filepath = find_meeting_file(parts[3])
+                if filepath is None:
+                    return self._send_json({"error": "Meeting not found"}, 404)
+                try:
+                    budgets = parse_budgets(query.get("budget", [""])[0])
+                    draws = parse_draws(query.get("draws", [""])[0])
+                except ValueError as e:
+                    return self._send_json({"status": "error", "error": f"Bad exotics query: {e}"}, 400)
+                return self._send_json({"status": "success", "exotics": exotic_cache.get(filepath, budgets, draws)})
+
+            # 1d. GET /api/meetings/{id}/races/{n}/raw (raw LLM payload, resolved from the side store)
+            if len(parts) == 7 and parts[2] == "meetings" and parts[4] == "races" and parts[6] == "raw":
+                filepath = find_meeting_file(parts[3])
+                race_body = race_store.race(filepath, int(parts[5])) if filepath and parts[5].isdigit() else None
+                if race_body is None:
+                    return self._send_json({"error": "Race not found"}, 404)
+                return self._send_json({"status": "success", "data": load_raw_features(json.loads(race_body))})
 
             # 2. GET /api/output/{filename}
             if path.startswith("/api/output/") or path.startswith("/api/meetings/"):
-                fname = path.split("/")[-1]
-                if not fname.endswith(".json"):
-                    fname += ".json"
-                    
-                filepath = os.path.join(API_OUTPUT_DIR, fname)
-                if not os.path.exists(filepath):
-                    filepath = os.path.join(LOGS_DIR, fname)
-                    
-                if not os.path.exists(filepath):
+                filepath = find_meeting_file(path.split("/")[-1])
+                if filepath is None:
                     return self._send_json({"error": "Meeting not found"}, 404)
                     
-                with open(filepath, "r", encoding="utf-8") as f:
-                    data = json.loads(f.read())
-                    if isinstance(data, str): data = json.loads(data)
-                    if isinstance(data, list) and len(data) > 0: data = data[0]
-                    
-                    if "races" in data:
-                        data["races"] = compute_race_enrichments(data["races"])
-                        data["exotic_tickets"] = compute_exotic_tickets(data["races"])
-                    if "meta" in data and "region" not in data["meta"]:
-                        data["meta"]["region"] = get_region_for_track(data["meta"].get("track", ""))
-                        
-                    return self._send_json({"status": "success", "data": data})
+                data = enrich_meeting(load_meeting_json(filepath))
+                return self._send_json({"status": "success", "data": data})
 
             # 3. GET /api/stats
             if path == "/api/stats":
-                if not os.path.exists(DB_PATH):
-                    return self._send_json({"status": "success", "stats": {"total_bets": 0, "total_staked": 0.0, "total_payout": 0.0, "roi": 0.0, "win_rate": 0.0}})
-                    
-                conn = sqlite3.connect(DB_PATH)
-                c = conn.cursor()
-                
-                c.execute("SELECT COUNT(*), SUM(win_paid) FROM selections WHERE finish_position IS NOT NULL")
-                row = c.fetchone()
+                row = cached_query("SELECT COUNT(*), SUM(win_paid) FROM selections WHERE finish_position IS NOT NULL")[0]
                 total_settled = row[0] or 0
                 total_payout = row[1] or 0.0
                 
-                c.execute("SELECT COUNT(*) FROM selections WHERE finish_position = 1")
-                total_wins = c.fetchone()[0] or 0
+                total_wins = cached_query("SELECT COUNT(*) FROM selections WHERE finish_position = 1")[0][0] or 0
                 
                 win_rate = round((total_wins / total_settled * 100), 1) if total_settled > 0 else 0.0
-                
-                conn.close()
                 return self._send_json({
                     "status": "success",
                     "stats": {
@@ -683,24 +669,11 @@ class ExactaAPIHandler(http.server.BaseHTTPRequestHandler):
             if not bets:
                 return self._send_json({"error": "No bets provided"}, 400)
                 
+            # Reused per-thread WAL connection: bet logging waits on a busy writer instead of failing
+            conn = get_connection()
             try:
-                conn = sqlite3.connect(DB_PATH)
                 c = conn.cursor()
                 
-                # Ensure table exists
-                c.execute('''CREATE TABLE IF NOT EXISTS bet_ledger (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT,
-                    track TEXT,
-                    date TEXT,
-                    race_number INTEGER,
-                    horse_number TEXT,
-                    horse_name TEXT,
-                    bet_type TEXT,
-                    stake REAL,
-                    status TEXT DEFAULT 'PENDING'
-                )''')
-                
                 now_str = datetime.now().isoformat()
                 logged_count = 0
                 for bet in bets:
@@ -718,9 +691,9 @@ class ExactaAPIHandler(http.server.BaseHTTPRequestHandler):
                     logged_count += 1
                     
                 conn.commit()
-                conn.close()
                 return self._send_json({"success": True, "logged_count": logged_count})
             except Exception as e:
+                conn.rollback()
                 return self._send_json({"error": str(e)}, 500)
 
         else:
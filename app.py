@@ -10,6 +10,8 @@ import base64
 import csv
 from datetime import datetime
 
+import llm_json
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Exacta AI | Finding Value in Every Race", page_icon="🏇", layout="wide")
 
@@ -39,11 +41,6 @@ def get_base64_logo():
         return f"data:image/png;base64,{encoded}", path
     return "", None
 
-def clean_json_string(json_str):
-    json_str = re.sub(r'```json\s*', '', json_str)
-    json_str = re.sub(r'```\s*$', '', json_str)
-    return json_str.strip()
-
 def is_valid_pick(pick):
     if not pick: return False
     if pick is None: return False
@@ -575,8 +572,7 @@ if st.button("Analyze Race Card (Preview Only)", type="primary"):
                 response = model.generate_content([user_prompt, remote_file])
                 st.session_state.raw_response = response.text 
                 
-                json_str = clean_json_string(response.text)
-                data = json.loads(json_str)
+                data = llm_json.decode(response.text, target_model)
                 st.session_state.json_data = data
                 
                 if isinstance(data, list): data = data[0] if data else {}
@@ -1,17 +1,27 @@
-import base64
 from datetime import datetime
 import json
 import os
 import re
-import sqlite3
 import subprocess
 import time
 import google.generativeai as genai
-from json_repair import repair_json
 import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
 
+import card_session
+from card_session import CardSession
+from delete_meeting import delete_meeting_cascade
+from homepage import get_base64_logo, update_homepage
+import llm_json
+import probability
+import prompt_builder
+import raw_store
+import staking
+import storage
+import ticket_optimizer
+import track_registry
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Exacta AI | Finding Value in Every Race", page_icon="🏇", layout="wide")
 
@@ -40,66 +50,12 @@ for d in [
   os.makedirs(d, exist_ok=True)
 
 # UNIFIED DATABASE PATH
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
+DB_PATH = storage.DB_PATH
 
 
 def init_db():
-  conn = sqlite3.connect(DB_PATH)
-  c = conn.cursor()
-
-  # Table 1: Predictions
-  c.execute("""
-    CREATE TABLE IF NOT EXISTS predictions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT, track TEXT, race_number TEXT, distance TEXT, surface TEXT, condition TEXT,
-        p1_num TEXT, p1_barrier TEXT, p1_name TEXT, p1_reason TEXT,
-        p2_num TEXT, p2_barrier TEXT, p2_name TEXT, p2_reason TEXT,
-        p3_num TEXT, p3_barrier TEXT, p3_name TEXT, p3_reason TEXT,
-        p4_num TEXT, p4_barrier TEXT, p4_name TEXT, p4_reason TEXT,
-        danger_num TEXT, danger_barrier TEXT, danger_name TEXT, danger_reason TEXT,
-        confidence TEXT, ai_model TEXT, temperature REAL, raw_features TEXT,
-        exotic_strategy TEXT DEFAULT '',
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-  # Migrate missing columns for predictions
-  c.execute("PRAGMA table_info(predictions)")
-  pred_cols = set(col[1] for col in c.fetchall())
-  req_cols = [
-      ("p1_barrier", "TEXT"), ("p1_reason", "TEXT"),
-      ("p2_barrier", "TEXT"), ("p2_reason", "TEXT"),
-      ("p3_barrier", "TEXT"), ("p3_reason", "TEXT"),
-      ("p4_barrier", "TEXT"), ("p4_reason", "TEXT"),
-      ("danger_barrier", "TEXT"), ("danger_reason", "TEXT"),
-      ("confidence", "TEXT"), ("ai_model", "TEXT"),
-      ("temperature", "REAL"), ("raw_features", "TEXT"),
-      ("exotic_strategy", "TEXT DEFAULT ''"),
-      ("p1_rating", "REAL"), ("p2_rating", "REAL"),
-      ("p3_rating", "REAL"), ("p4_rating", "REAL"),
-      ("rating_gap", "REAL DEFAULT 0.0"),
-      ("has_best_bet", "INTEGER DEFAULT 0"),
-      ("has_solo_lock", "INTEGER DEFAULT 0")
-  ]
-  for col_name, col_type in req_cols:
-    if col_name not in pred_cols:
-      c.execute(f"ALTER TABLE predictions ADD COLUMN {col_name} {col_type}")
-
-  # Table 2: Actual Results
-  c.execute("""
-    CREATE TABLE IF NOT EXISTS results (
-        date TEXT, track TEXT, race_number TEXT, win_num TEXT, place_num TEXT, show_num TEXT,
-        win_payout REAL DEFAULT 0.0, place_payout REAL DEFAULT 0.0, show_payout REAL DEFAULT 0.0,
-        p2_place_payout REAL DEFAULT 0.0, p2_show_payout REAL DEFAULT 0.0, p3_show_payout REAL DEFAULT 0.0,
-        exacta_payout REAL DEFAULT 0.0, trifecta_payout REAL DEFAULT 0.0, superfecta_payout REAL DEFAULT 0.0,
-        scratches TEXT DEFAULT 'None',
-        PRIMARY KEY (date, track, race_number)
-    )
-    """)
-
-  conn.commit()
-  conn.close()
-
+  # predictions / results / selections / bet_ledger all share one schema (storage.py)
+  storage.init_storage(DB_PATH)
 
 init_db()
 
@@ -107,7 +63,7 @@ init_db()
 def save_results_to_db(track_name, meeting_date, parsed_races):
   """Saves parsed raw race results into SQLite database (master_betting_history.db)."""
   clean_date_str = pd.to_datetime(meeting_date).strftime("%Y-%m-%d")
-  conn = sqlite3.connect(DB_PATH)
+  conn = storage.connect(DB_PATH)
   cursor = conn.cursor()
 
   for race in parsed_races:
@@ -314,7 +270,7 @@ def parse_raw_race_results(raw_text):
 
 
 def save_predictions_to_db(data):
-  conn = sqlite3.connect(DB_PATH)
+  conn = storage.connect(DB_PATH)
   c = conn.cursor()
 
   meeting_date = data.get("meta", {}).get("date", "")
@@ -372,7 +328,7 @@ def save_predictions_to_db(data):
             dang.get("name", ""),
             dang.get("reason", ""),
             race.get("confidence_level", ""),
-            str(race),
+            raw_store.put_raw(race.get("raw_features_dump") or race),
             strat_str,
         ),
     )
@@ -381,23 +337,6 @@ def save_predictions_to_db(data):
   conn.close()
 
 
-def get_base64_logo():
-  path = os.path.join(BASE_DIR, "logo.png")
-  if not os.path.exists(path):
-    path = os.path.join(DOCS_DIR, "logo.png")
-  if os.path.exists(path):
-    with open(path, "rb") as image_file:
-      encoded = base64.b64encode(image_file.read()).decode()
-      return f"data:image/png;base64,{encoded}", path
-  return "", None
-
-
-def clean_json_string(json_str):
-  json_str = re.sub(r"```json\s*", "", json_str)
-  json_str = re.sub(r"```\s*$", "", json_str)
-  return json_str.strip()
-
-
 def is_valid_pick(pick):
   if not pick:
     return False
@@ -418,9 +357,9 @@ def is_valid_pick(pick):
   return name and name not in invalid
 
 
-def generate_dynamic_wagers(race, is_sloppy_or_ott=False):
+def generate_dynamic_wagers(race, is_sloppy_or_ott=False, track_name=""):
     """
-    Calculates Tiered Win Bets, Dynamic Exacta Keys, and Selective Danger Overlays 
+    Calculates the Win stake (staking.py), Dynamic Exacta Keys, and Selective Danger Overlays
     based on final locally adjusted ratings and selections.
     Widens Solo Lock gap threshold to +7.0 pts on Sloppy/Muddy or Off-The-Turf cards.
     """
@@ -459,13 +398,15 @@ def generate_dynamic_wagers(race, is_sloppy_or_ott=False):
     # Variance Widening Rule: Solo Lock gap threshold widens to +7.0 on Sloppy/Muddy/OTT cards
     lock_threshold = 7.0 if is_sloppy_or_ott else 5.0
 
-    # 1. Tiered Win Strategy
-    if top_score >= 90.0 and gap >= lock_threshold:
-        wager_lines.append(f"<b>🎯 TIER 1 WIN:</b> $25 Win on <b>#{top_num} {top_name}</b> (Solo Lock - Gap: +{gap:.1f} pts)")
-    elif gap >= 1.0:
-        wager_lines.append(f"<b>🎯 WIN:</b> $10 Win on <b>#{top_num} {top_name}</b>")
+    # 1. Win Stake (staking engine: model probability vs estimated price, default policy)
+    win_probs = probability.race_win_probabilities(sorted_contenders, track_name) * probability.listed_share()
+    top_stake = staking.race_stakes(win_probs)[0]
+    if top_stake and top_score >= 90.0 and gap >= lock_threshold:
+        wager_lines.append(f"<b>🎯 TIER 1 WIN:</b> ${top_stake:.0f} Win on <b>#{top_num} {top_name}</b> (Solo Lock - Gap: +{gap:.1f} pts)")
+    elif top_stake:
+        wager_lines.append(f"<b>🎯 WIN:</b> ${top_stake:.0f} Win on <b>#{top_num} {top_name}</b> ({win_probs[0]:.0%} win chance)")
     else:
-        wager_lines.append(f"<b>🎯 WIN:</b> PASS Win Wager (Tight Gap: +{gap:.1f} pts on #{top_num} {top_name})")
+        wager_lines.append(f"<b>🎯 WIN:</b> PASS Win Wager (No edge: {win_probs[0]:.0%} win chance, Gap +{gap:.1f} pts on #{top_num} {top_name})")
         
     # 2. Dynamic Exacta Strategy
     if top_score >= 90.0 and gap >= lock_threshold:
@@ -500,109 +441,45 @@ def generate_dynamic_wagers(race, is_sloppy_or_ott=False):
     return "<br>".join(wager_lines)
 
 
-def generate_multi_race_anchors(all_races):
+ANCHOR_TICKETS_PER_TYPE = 2
+DAILY_DOUBLE_PLAYS = 4
+
+
+def generate_multi_race_anchors(all_races, track_name=""):
     """
-    Identifies consecutive Solo Locks (Gap >= +5.0) across the card and builds Pick 3/4 Anchor tickets.
+    Best Pick 4 / Pick 3 tickets on the card from ticket_optimizer: legs are chosen for the highest
+    hit probability within the default per-ticket budgets rather than from consecutive Solo Locks.
     """
-    locks = []
-    for race in all_races:
-        contenders = race.get("raw_features_dump", {}).get("contenders", [])
-        if not contenders:
-            contenders = race.get("contenders", [])
-            
-        if len(contenders) >= 2:
-            sorted_c = sorted(contenders, key=lambda x: x.get('features', {}).get('ai_holistic_score', 0), reverse=True)
-            top = sorted_c[0]
-            gap = top.get('features', {}).get('ai_holistic_score', 0) - sorted_c[1].get('features', {}).get('ai_holistic_score', 0)
-            
-            # Requires Rating >= 90 AND Gap >= +5.0
-            if top.get('features', {}).get('ai_holistic_score', 0) >= 90.0 and gap >= 5.0:
-                locks.append((race.get('number', 0), top.get('program_number', ''), top.get('horse_name', '')))
-    
+    optimized = ticket_optimizer.optimize_card({"meta": {"track": track_name}, "races": all_races})
     multi_tickets = []
-    for i in range(len(locks) - 1):
-        r1_num, r1_num_pgm, r1_horse = locks[i]
-        r2_num, r2_num_pgm, r2_horse = locks[i+1]
-        
-        if r2_num == r1_num + 1:
-            multi_tickets.append(f"<b>🔥 CONSECUTIVE LOCK SEQUENCE (R{r1_num} ➔ R{r2_num}):</b> Single <b>#{r1_num_pgm} {r1_horse}</b> in R{r1_num} & <b>#{r2_num_pgm} {r2_horse}</b> in R{r2_num} on rolling Pick 3/4/DD tickets.")
-
+    for bet_type in ("pick_4", "pick_3"):
+        for t in optimized.get(bet_type, [])[:ANCHOR_TICKETS_PER_TYPE]:
+            nums = t["races"]
+            legs = " / ".join(f"R{n} " + ", ".join(f"#{h}" for h in leg) for n, leg in zip(nums, t["legs"]))
+            multi_tickets.append(f"<b>🔥 PICK {len(nums)} (R{nums[0]} ➔ R{nums[-1]}):</b> {legs} "
+                                 f"[${t['cost']:.2f} · {t['hit_rate']:.1%} hit]")
     return multi_tickets
 
 
-def load_track_catalog():
-  catalog = {}
-  if not os.path.exists(TRACKS_DIR):
-    return catalog
-
-  for filename in os.listdir(TRACKS_DIR):
-    if filename.endswith(".json"):
-      filepath = os.path.join(TRACKS_DIR, filename)
-      try:
-        with open(filepath, "r", encoding="utf-8") as f:
-          data = json.load(f)
-          raw_group = str(data.get("region_group", "")).upper()
-
-          if "HARNESS" in raw_group:
-            category = "Harness"
-          else:
-            category = "Thoroughbred"
+def generate_daily_double_plays(all_races, track_name=""):
+    """Highest-probability daily doubles on the card (ticket_optimizer, default DD budget)."""
+    dd_budget = {"daily_double": ticket_optimizer.DEFAULT_BUDGETS["daily_double"]}
+    optimized = ticket_optimizer.optimize_card({"meta": {"track": track_name}, "races": all_races}, budgets=dd_budget)
+    plays = []
+    for t in optimized.get("daily_double", [])[:DAILY_DOUBLE_PLAYS]:
+        (r1, r2), (leg1, leg2) = t["races"], t["legs"]
+        plays.append(f"<b>R{r1} ➔ R{r2} DAILY DOUBLE:</b> Play ({', '.join('#' + h for h in leg1)})"
+                     f" with ({', '.join('#' + h for h in leg2)}) [${t['cost']:.2f} · {t['hit_rate']:.1%} hit]")
+    return plays
 
-          if "AUSTRALIA" in raw_group or "AUS" in raw_group:
-            region = "Australia"
-          elif "NEW_ZEALAND" in raw_group or "NZ" in raw_group:
-            region = "New Zealand"
-          elif (
-              "ASIA" in raw_group
-              or "HONG_KONG" in raw_group
-              or "JAPAN" in raw_group
-              or "KOREA" in raw_group
-          ):
-            region = "Asia"
-          elif "CANADA" in raw_group:
-            region = "Canada"
-          elif (
-              "EUROPE" in raw_group
-              or "UK" in raw_group
-              or "FRANCE" in raw_group
-          ):
-            region = "Europe"
-          elif "USA" in raw_group or "US" in raw_group:
-            region = "USA"
-          else:
-            region = "Other"
 
-          track_display_name = (
-              filename.replace(".json", "").replace("_", " ").title()
-          )
-
-          if category not in catalog:
-            catalog[category] = {}
-          if region not in catalog[category]:
-            catalog[category][region] = []
-
-          catalog[category][region].append(track_display_name)
-      except:
-        continue
-
-  for cat in catalog:
-    for reg in catalog[cat]:
-      catalog[cat][reg] = sorted(catalog[cat][reg])
-
-  return catalog
+def load_track_catalog():
+  # {category: {region: [track names]}} from the shared track registry (track_registry.py)
+  return track_registry.get_registry().catalog()
 
 
 def find_track_data(target_name):
-  filename = f"{target_name.lower().replace(' ', '_').replace('-', '_')}.json"
-  filepath = os.path.join(TRACKS_DIR, filename)
-
-  if os.path.exists(filepath):
-    try:
-      with open(filepath, "r", encoding="utf-8") as f:
-        return json.load(f)
-    except:
-      return {}
-  return {}
+  return track_registry.get_track_profile(target_name)
 
 
 OPTIMIZED_WEIGHTS_PATH = os.path.join(DATA_DIR, "optimized_weights.json")
@@ -628,70 +505,6 @@ def get_weights_for_track(track_name):
   return default_weights
 
 
-def update_homepage():
-  files = [f for f in os.listdir(MEETINGS_DIR) if f.endswith(".html")]
-  grouped_files = {}
-  for f in files:
-    country = "International"
-    try:
-      with open(
-          os.path.join(MEETINGS_DIR, f), "r", encoding="utf-8"
-      ) as file_obj:
-        content = file_obj.read(500)
-        if "META_COUNTRY" in content:
-          match = re.search(r"META_COUNTRY:([^\s]+)", content)
-          if match:
-            country = match.group(1).strip()
-    except:
-      pass
-    if "Aus" in f:
-      country = "Australia"
-    elif "USA" in f:
-      country = "USA"
-    elif "UK" in f:
-      country = "UK"
-
-    if country not in grouped_files:
-      grouped_files[country] = []
-    grouped_files[country].append(f)
-
-  logo_src, _ = get_base64_logo()
-  logo_html = (
-      f'<img src="{logo_src}" class="logo">'
-      if logo_src
-      else '<span style="font-size:3rem; margin-right:20px;">🏇</span>'
-  )
-
-  html = f"""<!DOCTYPE html><html lang="en"><head><title>Exacta AI</title><meta name="viewport" content="width=device-width, initial-scale=1"><style>
-    body {{ margin: 0; font-family: 'Segoe UI', sans-serif; background: #f8fafc; color: #333; }}
-    .container {{ max-width: 1000px; margin: 0 auto; padding: 20px; }}
-    .header {{ display: flex; align-items: center; border-bottom: 4px solid #003366; padding-bottom: 20px; margin-bottom: 20px; background: #fff; padding: 20px; }}
-    .logo {{ max-height: 80px; margin-right: 20px; }}
-    .header-info h1 {{ margin: 0; font-size: 2.5rem; color: #003366; text-transform: uppercase; font-weight: 800; }}
-    .header-info .meta {{ color: #64748b; font-weight: 600; margin-top: 5px; font-size: 1.1rem; }}
-    .section-title {{ border-bottom: 3px solid #ff6b00; padding-bottom: 10px; margin: 40px 0 20px 0; font-size: 1.5rem; color: #003366; font-weight: 700; }}
-    .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 20px; }}
-    .card {{ background: #fff; border: 1px solid #e2e8f0; border-radius: 8px; overflow: hidden; text-decoration: none; color: #333; display: block;
-    box-shadow: 0 2px 4px rgba(0,0,0,0.05); transition: transform 0.2s; }}
-    .card:hover {{ transform: translateY(-3px); border-color: #ff6b00; }}
-    .card-body {{ padding: 20px; }}
-    .track-name {{ font-size: 1.2rem; font-weight: 700; color: #0f172a; display: block; }}
-    .status {{ color: #ff6b00; font-size: 0.8rem; font-weight: 700; margin-top: 10px; display: block; text-transform: uppercase; }}
-    </style></head><body>
-    <div class="header">{logo_html}<div class="header-info"><h1>Race Intelligence</h1><div class="meta">Professional Handicapping Database</div></div></div>
-    <div class="container">"""
-
-  for key in grouped_files.keys():
-    html += f'<div class="section-title">{key} Racing</div><div class="grid">'
-    for f in sorted(grouped_files[key], reverse=True):
-      display_name = f.replace(".html", "").replace("_", " ")
-      html += f'<a href="meetings/{f}" class="card"><div class="card-body"><span class="track-name">{display_name}</span><span class="status">● View Form</span></div></a>'
-    html += "</div>"
-  html += "</div></body></html>"
-  with open(os.path.join(DOCS_DIR, "index.html"), "w", encoding="utf-8") as f:
-    f.write(html)
-
-
 CLEAN_CSS = """
 body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; font-size: 14px; color: #0f172a; margin: 0; background: #f4f7f6; padding-top: 65px; }
 * { box-sizing: border-box; }
@@ -938,6 +751,13 @@ if st.sidebar.checkbox("Type a Custom Model Name?"):
       "Model Name", value="gemini-3.6-flash"
   )
 creativity_temp = st.sidebar.slider("Creativity (Temperature)", 0.0, 1.0, 0.4, 0.1)
+extraction_mode = st.sidebar.selectbox(
+    "Extraction Mode", ["Auto", "Per race", "Whole card"], index=0,
+    help="Auto streams small cards in one call and handicaps longer programs race by race.",
+)
+profile_budget = st.sidebar.slider(
+    "Track Profile Budget (tokens)", 200, 2000, prompt_builder.PROFILE_TOKEN_BUDGET, 100
+)
 
 if api_key:
   genai.configure(api_key=api_key)
@@ -1026,202 +846,18 @@ with tab_handicap:
             time.sleep(1)
             remote_file = genai.get_file(remote_file.name)
 
-          # --- DYNAMIC REGIONAL SYSTEM PROMPT RESOLVER ---
-          region_str = str(selected_region).upper()
-          category_str = str(selected_category).upper()
-          track_str = str(selected_track).upper()
-
-          if "HARNESS" in category_str or "HARNESS" in track_str or "HARNESS" in region_str:
-            system_file = "system_harness.md"
-          elif any(
-              k in region_str or k in track_str or region_str.startswith("AU") or track_str.startswith("AU")
-              for k in ["AUSTRALIA", "AUS", "NEW ZEALAND", "NZ", "AU"]
-          ):
-            system_file = "system_aus.md"
-          elif any(
-              k in region_str or k in track_str
-              for k in ["EUROPE", "UK", "UNITED KINGDOM", "IRELAND", "GB"]
-          ):
-            system_file = "system_uk.md"
-          elif any(
-              k in region_str or k in track_str
-              for k in ["ASIA", "HONG KONG", "JAPAN", "SINGAPORE", "KOREA"]
-          ):
-            system_file = "system_asia.md"
-          elif any(
-              k in region_str or k in track_str
-              for k in ["USA", "US", "UNITED STATES", "CANADA"]
-          ):
-            system_file = "system_usa.md"
-          else:
-            system_file = "system_usa.md"  # Fallback default
-
-          logic_path = os.path.join(LOGIC_DIR, system_file)
-
-          if os.path.exists(logic_path):
-            with open(logic_path, "r", encoding="utf-8") as f:
-              logic_content = f.read()
-          else:
-            fallback_path = os.path.join(LOGIC_DIR, "system_usa.md")
-            if os.path.exists(fallback_path):
-              with open(fallback_path, "r", encoding="utf-8") as f:
-                logic_content = f.read()
-            else:
-              logic_content = (
-                  "You are an elite Horse Racing AI Handicapper."
-              )
-
-          track_facts = (
-              json.dumps(current_track_profile)
-              if current_track_profile
-              else "No historical bias data."
+          # --- 1. SYSTEM INSTRUCTION (regional rules + track facts + schema, cached per track) ---
+          prompt_info = prompt_builder.system_instruction(
+              selected_track, selected_region, selected_category, profile_budget
           )
-
-          # --- 1. SYSTEM INSTRUCTION (Strict Persona & Master Schema) ---
-          system_instruction = f"""
-                    You are an Elite Horse Racing AI Handicapper & Feature Extraction Engine for ({selected_region}).
-                    Your primary directive is to strictly evaluate past form, class shifts, pace scenarios, and track biases using the master rules below.
-
-                    [MASTER HANDICAPPING RULES - {system_file}]
-                    {logic_content}
-
-                    [TODAY'S TRACK BIAS & FACTS]
-                    {track_facts}
-
-                    [TODAY'S SCRATCHES & TRACK CHANGES]
-                    {scratches if scratches.strip() else "No scratches provided."}
-
-                    [STRICT OUTPUT SCHEMA]
-                    Return ONLY a valid JSON array conforming strictly to this format. No Markdown, no prose text outside JSON.
-                    [
-                      {{
-                        "race_number": 1,
-                        "distance_surface": "7 Furlongs Dirt",
-                        "confidence_level": "High",
-                        "suggested_wager": "Exacta Box 1, 2, 5",
-                        "contenders": [
-                          {{
-                            "program_number": "5",
-                            "barrier": "5",
-                            "horse_name": "Credit Risk",
-                            "handicapper_notes": "Explicitly state if score was boosted due to Class Drop Elevator, Pace Meltdown, or Lone Speed.",
-                            "features": {{
-                              "class_drop_bonus_applied": true,
-                              "pace_scenario_eval": "Standard",
-                              "ai_holistic_score": 88,
-                              "running_style": "P",
-                              "is_lone_speed": false,
-                              "distance_transition": "Route to Sprint",
-                              "trouble_trip": "None",
-                              "is_danger_horse": false
-                            }}
-                          }}
-                        ]
-                      }}
-                    ]
-                    """
-
-          # --- 2. MODEL INITIALIZATION & AUTO PRE-SCAN ---
-          model = genai.GenerativeModel(
-              target_model,
-              system_instruction=system_instruction,
-              generation_config={
-                  "response_mime_type": "application/json",
-                  "temperature": creativity_temp,
-                  "max_output_tokens": 8192,
-              },
-          )
-
-          st.info("🔍 Scanning PDF program to detect total races...")
-
-          detector_prompt = (
-              "Scan the ENTIRE attached PDF document across all pages. What is the total number of races on this card (e.g. Race 1 through Race 8, 9, or 10)? Respond ONLY with the integer total number of races."
+          system_instruction = prompt_info["text"]
+          st.caption(
+              f"🧾 {prompt_info['system_file']} · system prompt ≈{prompt_info['tokens']:,} tokens"
+              f" (track profile ≈{prompt_info['profile_tokens']:,})"
+              + (f" · trimmed: {', '.join(prompt_info['dropped_fields'])}" if prompt_info["dropped_fields"] else "")
           )
 
-          try:
-            count_response = model.generate_content(
-                [detector_prompt, remote_file]
-            )
-            match = re.search(r"\d+", count_response.text)
-            if match:
-              total_races = int(match.group(0))
-            else:
-              total_races = 10
-
-            # Retry Buffer: Fix Gemini File API indexing delay on fresh PDF upload
-            if total_races <= 1:
-              time.sleep(2.0)
-              retry_response = model.generate_content(
-                  ["Look through all pages of the attached PDF program. What is the highest race number (e.g. 7, 8, 9, 10)? Respond ONLY with the integer number.", remote_file]
-              )
-              match_retry = re.search(r"\d+", retry_response.text)
-              if match_retry and int(match_retry.group(0)) > 1:
-                total_races = int(match_retry.group(0))
-
-            st.success(f"📋 Detected **{total_races} Races** on today's card.")
-          except Exception as e:
-            st.warning(
-                "⚠️ Could not auto-detect race count. Defaulting to 10 races."
-            )
-            total_races = 10
-
-          # --- 3. RACE-BY-RACE API LOOP ---
-          raw_extracted_data = []
-          progress_bar = st.progress(0, text="Starting Race-by-Race Analysis...")
-
-          for race_num in range(1, total_races + 1):
-            progress_bar.progress(
-                race_num / total_races,
-                text=f"🐎 Handicapping Race {race_num} of {total_races}...",
-            )
-
-            race_user_prompt = f"""
-                        [TASK] Deeply handicap Race {race_num} ONLY from the attached PDF for {selected_track}.
-                        [TRACK PROFILE] {current_track_profile}
-                        [OFFICIAL SCRATCHES & UPDATES]
-                        {scratches if scratches.strip() else "No scratches provided."}
-
-                        [CRITICAL HANDICAPPING DIRECTIVES FOR RACE {race_num}]
-                            1. ANALYZE RACE {race_num} ONLY.
-                            2. SCRATCHES ARE ABSOLUTE: Fully ignore scratched horses listed above.
-                            3. OFF-TURF DIRECTIVE: If scratches/updates state 'all races off the turf', 'off turf', 'off-turf', or 'moved to dirt', treat ALL turf races as DIRT races! Re-evaluate contenders based on dirt speed figures, dirt past performances, and prioritize Main Track Only (MTO) entrants!
-                            4. FIELD COVERAGE: Extract and rank AT LEAST 5 to 6 CONTENDERS in 'contenders'.
-                            5. ENFORCE OVERRIDE RULES:
-                            - Class Drop Elevator: If dropping from MSW ($75k+) or Allowance to MCL/CLM, set 'class_drop_bonus_applied': true and grant +10 points.
-                            - Post-Scratch Lone Speed: If scratches leave only ONE 'E' runner, set 'is_lone_speed': true, set 'pace_scenario_eval': 'Lone Speed (+6)', and grant +6 points.
-                            6. STRICT STRING SANITIZATION: NEVER use double quotes (") inside text string fields like 'handicapper_notes'. Use single quotes (') or omit them entirely to maintain valid JSON syntax.                        
-                        """
-
-            try:
-              response = model.generate_content(
-                  [race_user_prompt, remote_file]
-              )
-              json_str = clean_json_string(response.text)
-
-              # --- BULLETPROOF JSON PARSER & REPAIR ENGINE ---
-              try:
-                race_json = json.loads(json_str)
-              except Exception:
-                try:
-                  repaired_str = repair_json(json_str)
-                  race_json = json.loads(repaired_str)
-                except Exception:
-                  sanitized = re.sub(r"[\r\n\t]+", " ", json_str)
-                  sanitized = re.sub(r",\s*([\]}])", r"\1", sanitized)
-                  repaired_str = repair_json(sanitized)
-                  race_json = json.loads(repaired_str)
-
-              if isinstance(race_json, list) and len(race_json) > 0:
-                raw_extracted_data.append(race_json[0])
-              elif isinstance(race_json, dict):
-                raw_extracted_data.append(race_json)
-
-            except Exception as e:
-              st.error(f"⚠️ Error analyzing Race {race_num}: {e}")
-
-          progress_bar.empty()
-
-          # --- 4. TRACK WEIGHTS & RATING CALCULATOR ---
+          # --- 2. TRACK WEIGHTS & RATING CALCULATOR ---
           track_weights = {
               "lone_speed_bonus": 3,
               "trouble_trip_bonus": 2,
@@ -1308,7 +944,7 @@ with tab_handicap:
 
             return round(score, 1)
 
-          # --- 5. POST-PROCESSING MASTER ACCUMULATOR ---
+          # --- 3. POST-PROCESSING MASTER ACCUMULATOR (each race is scored as soon as it is extracted) ---
           data = {
               "meta": {
                   "track": (
@@ -1320,7 +956,7 @@ with tab_handicap:
               "races": [],
           }
 
-          for race in raw_extracted_data:
+          def score_race(race):
             is_global_off_turf = any(k in scratches.lower() for k in ["off the turf", "off turf", "off-turf", "moved to dirt"])
             raw_surf = (
                 race.get("distance_surface", "").split(" ")[-1]
@@ -1422,54 +1058,157 @@ with tab_handicap:
 
             # --- DYNAMIC BETTING STRATEGY ENGINE (Variance Widening on Sloppy / OTT Cards) ---
             is_sloppy_or_ott = is_global_off_turf or any(k in (scratches + " " + race.get("distance_surface", "")).lower() for k in ["sloppy", "muddy", "sealed", "off the turf", "off-turf", "off turf"])
-            new_race["exotic_strategy"] = generate_dynamic_wagers(new_race, is_sloppy_or_ott=is_sloppy_or_ott)
-            data["races"].append(new_race)
+            new_race["exotic_strategy"] = generate_dynamic_wagers(new_race, is_sloppy_or_ott=is_sloppy_or_ott, track_name=data["meta"]["track"])
+            return new_race
 
-          # --- 6. ADVANCED DAILY DOUBLE SCANNER ---
-          daily_doubles = []
-          for idx in range(len(data["races"]) - 1):
-            r1 = data["races"][idx]
-            r2 = data["races"][idx + 1]
+          # --- 4. CARD SESSION (system prompt + PDF cached once per card) ---
+          with CardSession(
+              genai,
+              target_model,
+              system_instruction,
+              remote_file,
+              generation_config={
+                  "response_mime_type": "application/json",
+                  "temperature": creativity_temp,
+                  "max_output_tokens": 8192,
+              },
+          ) as session:
+            if not session.cached:
+              st.caption(f"ℹ️ Context caching unavailable, sending the PDF with every race ({session.cache_error})")
 
-            r1_conf = str(r1.get("confidence_level", ""))
-            r2_conf = str(r2.get("confidence_level", ""))
+            # --- 5. EXTRACTION: one streamed call for small cards, else race by race ---
+            def detect_total_races():
+              st.info("🔍 Scanning PDF program to detect total races...")
 
-            r1_picks = r1.get("selections", [])
-            r2_picks = r2.get("selections", [])
+              detector_prompt = (
+                  "Scan the ENTIRE attached PDF document across all pages. What is the total number of races on this card (e.g. Race 1 through Race 8, 9, or 10)? Respond ONLY with the integer total number of races."
+              )
 
-            if len(r1_picks) >= 2 and len(r2_picks) >= 2:
-              r1_r1 = float(r1_picks[0].get("rating", 0))
-              r1_r2 = float(r1_picks[1].get("rating", 0))
-              r1_gap = r1_r1 - r1_r2
+              try:
+                count_response = session.generate(detector_prompt)
+                match = re.search(r"\d+", count_response.text)
+                if match:
+                  total_races = int(match.group(0))
+                else:
+                  total_races = 10
+
+                # Retry Buffer: Fix Gemini File API indexing delay on fresh PDF upload
+                if total_races <= 1:
+                  time.sleep(2.0)
+                  retry_response = session.generate(
+                      "Look through all pages of the attached PDF program. What is the highest race number (e.g. 7, 8, 9, 10)? Respond ONLY with the integer number."
+                  )
+                  match_retry = re.search(r"\d+", retry_response.text)
+                  if match_retry and int(match_retry.group(0)) > 1:
+                    total_races = int(match_retry.group(0))
+
+                st.success(f"📋 Detected **{total_races} Races** on today's card.")
+              except Exception as e:
+                st.warning(
+                    "⚠️ Could not auto-detect race count. Defaulting to 10 races."
+                )
+                total_races = 10
+              return total_races
+
+            def add_race(race_json):
+              issues = llm_json.validate_race(race_json)
+              if issues:
+                st.caption(f"⚠️ Race {race_json.get('race_number', '?')} schema: {'; '.join(issues[:3])}")
+              data["races"].append(score_race(race_json))
+
+            # The mode is picked before any race count exists: whole-card output is sized from pages
+            page_count = card_session.count_pdf_pages(uploaded_file.getvalue())
+            if extraction_mode == "Auto":
+              input_limit, output_limit = card_session.model_limits(genai, target_model)
+              mode, mode_reason = card_session.choose_mode(
+                  page_count, None, input_limit, output_limit, prompt_info["tokens"]
+              )
+            else:
+              mode = card_session.WHOLE_CARD if extraction_mode == "Whole card" else card_session.PER_RACE
+              mode_reason = "selected in the sidebar"
+              output_limit = card_session.model_limits(genai, target_model)[1]
 
-              r2_r1 = float(r2_picks[0].get("rating", 0))
-              r2_r2 = float(r2_picks[1].get("rating", 0))
-              r2_gap = r2_r1 - r2_r2
+            progress_bar = st.progress(0, text="Starting Race-by-Race Analysis...")
 
-              if "High" in r1_conf or r1_gap >= 5.0:
-                r1_ticket = f"#{r1_picks[0].get('number')} (Solo Lock)"
+            if mode == card_session.WHOLE_CARD:
+              st.caption(f"⚡ Whole-card mode: one streamed call ({mode_reason})")
+              expected_races = card_session.estimate_races(page_count)
+              stream_parser = card_session.RaceStreamParser(
+                  decode=lambda text: llm_json.decode_races(text, target_model)[0]
+              )
+              streamed = []
+              stream_finished = True
+              try:
+                for chunk in session.stream(
+                    prompt_builder.card_prompt(None, selected_track, scratches),
+                    generation_config={"max_output_tokens": output_limit},
+                ):
+                  for race_json in stream_parser.feed(chunk):
+                    streamed.append(race_json.get("race_number"))
+                    try:
+                      add_race(race_json)
+                    except Exception as e:
+                      # One bad race must not end the stream; it is retried below with the other missing races
+                      st.error(f"⚠️ Error rating Race {race_json.get('race_number', '?')}: {e}")
+                      continue
+                    progress_bar.progress(
+                        min(len(data["races"]) / expected_races, 1.0),
+                        text=f"⚡ Race {race_json.get('race_number', len(data['races']))} rated ({len(data['races'])} so far)...",
+                    )
+              except Exception as e:
+                stream_finished = False
+                st.warning(f"⚠️ Whole-card stream stopped early: {e}")
+
+              streamed_numbers = card_session.race_numbers(streamed)
+              if stream_finished and not stream_parser.incomplete and streamed_numbers:
+                # The stream is the card: its highest race number is the count, gaps are refetched
+                total_races = max(streamed_numbers)
               else:
-                r1_ticket = (
-                    f"#{r1_picks[0].get('number')}, #{r1_picks[1].get('number')}"
-                )
+                # A cut-off or empty stream can't say how many races followed it
+                total_races = detect_total_races()
+              pending_races = card_session.missing_races([r["number"] for r in data["races"]], total_races)
+              if pending_races:
+                st.caption(f"↩️ Fetching {len(pending_races)} race(s) missing from the stream one by one")
+            else:
+              total_races = detect_total_races()
+              pending_races = list(range(1, total_races + 1))
+              if total_races > 1:
+                st.caption(f"🐎 Per-race mode ({mode_reason})")
+
+            for race_num in pending_races:
+              progress_bar.progress(
+                  race_num / total_races,
+                  text=f"🐎 Handicapping Race {race_num} of {total_races}...",
+              )
 
-              if "High" in r2_conf or r2_gap >= 5.0:
-                r2_ticket = f"#{r2_picks[0].get('number')} (Solo Lock)"
-              else:
-                r2_ticket = (
-                    f"#{r2_picks[0].get('number')}, #{r2_picks[1].get('number')}"
-                )
+              # Track facts are in the system instruction; scratches only here
+              race_user_prompt = prompt_builder.race_prompt(race_num, selected_track, scratches)
 
-              if "High" in r1_conf or "High" in r2_conf or "Medium" in r1_conf:
-                daily_doubles.append(
-                    f"<b>R{r1.get('number')} ➔ R{r2.get('number')} DAILY"
-                    f" DOUBLE:</b> Play ({r1_ticket}) with ({r2_ticket})"
-                )
+              try:
+                response = session.generate(race_user_prompt)
+                races, _ = llm_json.decode_races(response.text, target_model)
+                if races:
+                  add_race(races[0])
+              except Exception as e:
+                st.error(f"⚠️ Error analyzing Race {race_num}: {e}")
+
+            progress_bar.empty()
+            data["races"].sort(key=lambda r: int(r["number"]) if str(r["number"]).isdigit() else 0)
+
+          usage = session.usage
+          if usage["prompt_tokens"]:
+            st.caption(
+                f"🧮 Input tokens across {usage['calls']} calls: {usage['prompt_tokens']:,}"
+                f" ({usage['cached_tokens']:,} served from the card cache)"
+            )
 
+          # --- 6. DAILY DOUBLE & MULTI-RACE TICKETS (ticket_optimizer) ---
+          card_track = data.get("meta", {}).get("track", "")
+          daily_doubles = generate_daily_double_plays(data["races"], card_track)
           data["daily_doubles"] = daily_doubles
           st.session_state.json_data = data
 
-          anchor_tickets = generate_multi_race_anchors(data["races"])
+          anchor_tickets = generate_multi_race_anchors(data["races"], card_track)
           data["daily_doubles"] = anchor_tickets + daily_doubles
 
           st.session_state.json_data = data
@@ -1515,17 +1254,17 @@ with tab_handicap:
           log_filename = st.session_state.report_filename.replace(
               ".html", ".json"
           )
-          with open(
-              os.path.join(LOGS_DIR, log_filename), "w", encoding="utf-8"
-          ) as f:
-            json.dump(st.session_state.json_data, f, indent=4)
-          with open(
-              os.path.join(API_OUTPUT_DIR, log_filename), "w", encoding="utf-8"
-          ) as f:
-            json.dump(st.session_state.json_data, f, indent=4)
+          # Minified public card; raw LLM payloads go to the side store (raw_store.py) as refs
+          raw_store.write_meeting_json(
+              raw_store.slim_meeting(st.session_state.json_data),
+              [
+                  os.path.join(LOGS_DIR, log_filename),
+                  os.path.join(API_OUTPUT_DIR, log_filename),
+              ],
+          )
 
         try:
-          conn = sqlite3.connect(DB_PATH)
+          conn = storage.connect(DB_PATH)
           c = conn.cursor()
           meta = st.session_state.json_data.get("meta", {})
           clean_date_str = pd.to_datetime(meta.get("date")).strftime(
@@ -1587,7 +1326,7 @@ with tab_handicap:
                     race.get("confidence_level", ""),
                     target_model,
                     creativity_temp,
-                    json.dumps(race.get("raw_features_dump", {})),
+                    raw_store.put_raw(race.get("raw_features_dump", {})),
                     strat_str,
                 ),
             )
@@ -1635,7 +1374,7 @@ with tab_analytics:
   st.title("📈 Model Performance & Backtesting")
 
   if os.path.exists(DB_PATH):
-    conn = sqlite3.connect(DB_PATH)
+    conn = storage.connect(DB_PATH, readonly=True)
     preds_df = pd.read_sql_query("SELECT * FROM predictions", conn)
     results_df = pd.read_sql_query("SELECT * FROM results", conn)
     conn.close()
@@ -1781,7 +1520,7 @@ with tab_analytics:
           text_context = (
               str(row.get("exotic_strategy", ""))
               + " "
-              + str(row.get("raw_features", ""))
+              + raw_store.raw_features_text(row.get("raw_features", ""))
               + " "
               + str(row.get("p1_reason", ""))
           ).replace("#$", "#").upper()
@@ -1823,7 +1562,7 @@ with tab_analytics:
           text_context = (
               str(row.get("exotic_strategy", ""))
               + " "
-              + str(row.get("raw_features", ""))
+              + raw_store.raw_features_text(row.get("raw_features", ""))
           ).replace("#$", "#").upper()
 
           if "EXACTA BOX" in text_context:
@@ -1853,7 +1592,7 @@ with tab_analytics:
           text_context = (
               str(row.get("exotic_strategy", ""))
               + " "
-              + str(row.get("raw_features", ""))
+              + raw_store.raw_features_text(row.get("raw_features", ""))
           ).replace("#$", "#").upper()
 
           if (
@@ -2106,7 +1845,7 @@ with tab_results:
       ]
 
     try:
-      conn = sqlite3.connect(DB_PATH)
+      conn = storage.connect(DB_PATH, readonly=True)
       pending_df = pd.read_sql_query(
           """
                 SELECT DISTINCT p.track, p.date
@@ -2195,7 +1934,7 @@ with tab_results:
     )
 
     try:
-      conn_del = sqlite3.connect(DB_PATH)
+      conn_del = storage.connect(DB_PATH, readonly=True)
       del_history_df = pd.read_sql_query(
           "SELECT DISTINCT date, track FROM predictions ORDER BY date DESC",
           conn_del,
@@ -2230,29 +1969,15 @@ with tab_results:
       if st.button("❌ Permanently Delete Selected Card", type="secondary"):
         if confirm_delete:
           try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute(
-                "DELETE FROM predictions WHERE track=? AND date=?",
-                (del_track, del_date),
-            )
-            c.execute(
-                "DELETE FROM results WHERE track=? AND date=?",
-                (del_track, del_date),
-            )
-            conn.commit()
-            conn.close()
-
-            json_filename = f"{del_track}_{del_date}.json"
-            json_filepath = os.path.join(MEETINGS_DIR, json_filename)
-            if os.path.exists(json_filepath):
-              os.remove(json_filepath)
+            # Indexed cascade: every table, the card files and the static meetings index
+            deleted = delete_meeting_cascade(del_track, del_date)
 
             if "saved_track_name" in st.session_state:
               del st.session_state["saved_track_name"]
 
             st.success(
-                f"Successfully deleted card for {del_track} on {del_date}."
+                f"Successfully deleted card for {del_track} on {del_date}"
+                f" ({len(deleted['archived'])} files archived to logs/deleted)."
             )
             time.sleep(0.5)
             st.rerun()
@@ -2285,7 +2010,7 @@ with tab_results:
     ):
       if confirm_wipe_results:
         try:
-          conn = sqlite3.connect(DB_PATH)
+          conn = storage.connect(DB_PATH)
           c = conn.cursor()
           c.execute("DELETE FROM results")
           conn.commit()
@@ -2312,7 +2037,7 @@ with tab_results:
   st.subheader("📊 Interactive Data Editor Grid")
 
   if os.path.exists(DB_PATH):
-    conn = sqlite3.connect(DB_PATH)
+    conn = storage.connect(DB_PATH, readonly=True)
 
     view_mode = st.radio(
         "Filter Meetings:",
@@ -2437,7 +2162,7 @@ with tab_results:
           key="save_results_db_btn",
       ):
         try:
-          conn = sqlite3.connect(DB_PATH)
+          conn = storage.connect(DB_PATH)
           c = conn.cursor()
 
           for index, row in edited_df.iterrows():
@@ -2516,13 +2241,7 @@ with st.sidebar:
       if submit_paste:
         if pasted_json_input.strip():
           try:
-            cleaned_input = pasted_json_input.strip()
-            if cleaned_input.startswith("```"):
-              cleaned_input = cleaned_input.split("```")[1]
-            if cleaned_input.startswith("json"):
-              cleaned_input = cleaned_input[4:]
-
-            parsed_data = json.loads(cleaned_input.strip())
+            parsed_data = llm_json.decode(pasted_json_input, record=False)
 
             if len(parsed_data) == 1 and isinstance(
                 list(parsed_data.values())[0], dict
@@ -2537,32 +2256,12 @@ with st.sidebar:
               track_payload = None
 
             if track_payload:
-              location_str = str(track_payload.get("location", "")).upper()
-              
-              if any(
-                  k in location_str
-                  for k in [
-                      "VIC", "NSW", "QLD", "SA", "WA", "TAS", "ACT", "AUSTRALIA"
-                  ]
-              ):
-                region_tag = "Australia_Thoroughbred"
-              elif any(
-                  k in location_str
-                  for k in ["UK", "ENGLAND", "IRELAND", "SCOTLAND", "FRANCE", "EUROPE"]
-              ):
-                region_tag = "Europe_Thoroughbred"
-              elif any(
-                  k in location_str
-                  for k in ["HONG KONG", "JAPAN", "SINGAPORE", "KOREA", "ASIA"]
-              ):
-                region_tag = "Asia_Thoroughbred"
-              elif any(
-                  k in location_str
-                  for k in ["NY", "FL", "CA", "KY", "AR", "OH", "MN", "USA", "CANADA"]
-              ):
-                region_tag = "USA_Thoroughbred"
-              else:
-                region_tag = "USA_Thoroughbred"
+              region_tag = track_registry.region_group_for(
+                  track_registry.region_from_location(
+                      track_payload.get("location", "")
+                  )
+                  or "USA"
+              )
 
               track_payload["region_group"] = region_tag
 
@@ -2573,6 +2272,7 @@ with st.sidebar:
 
               with open(filepath, "w", encoding="utf-8") as f:
                 json.dump(track_payload, f, indent=4)
+              track_registry.reload_registry()
 
               st.success(f"Successfully created {filename}!")
               st.rerun()
@@ -3,13 +3,15 @@ import time
 import pandas as pd
 import PyPDF2
 import google.generativeai as genai
-import json
+
+import llm_json
 
 # --- SETUP ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 HISTORY_DIR = os.path.join(BASE_DIR, "data", "history")
 LOGIC_FILE = os.path.join(BASE_DIR, "logic", "master_system.md")
 OUTPUT_FILE = os.path.join(BASE_DIR, "backtest_log.csv")
+BACKTEST_MODEL = "gemini-1.5-pro-latest" # Use 1.5 Pro for faster batching
 
 # --- API KEY LOADING ---
 # Try loading from streamlit secrets if available, otherwise check env var
@@ -62,19 +64,12 @@ def analyze_backtest():
             text = "".join([page.extract_text() for page in reader.pages])
             
             # Call AI
-            model = genai.GenerativeModel('gemini-1.5-pro-latest') # Use 1.5 Pro for faster batching
+            model = genai.GenerativeModel(BACKTEST_MODEL)
             prompt = f"{system_logic}\n\nSTRICT INSTRUCTION: Analyze this PAST race card. Return JSON.\n\nDATA:\n{text}"
             
             response = model.generate_content(prompt)
-            clean_json = response.text.replace("```json", "").replace("```", "").strip()
-            
-            try:
-                data = json.loads(clean_json)
-            except json.JSONDecodeError:
-                # Attempt rudimentary cleanup if JSON is messy
-                clean_json = clean_json.split('{', 1)[1].rsplit('}', 1)[0]
-                clean_json = '{' + clean_json + '}'
-                data = json.loads(clean_json)
+            data = llm_json.decode(response.text, BACKTEST_MODEL)
+            if isinstance(data, list): data = data[0] if data else {}
 
             # Extract Picks
             if 'races' in data:
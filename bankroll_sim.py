@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Bankroll Simulator
+Replays the settled prediction history in date order under several staking policies at once
+(see staking.py) and reports what each bankroll went through: equity curve, max drawdown, risk
+of ruin and longest losing streak.
+
+The historical path is one ordering of results we happened to get, so every metric also gets a
+bootstrap confidence interval: the race sequence is resampled in circular blocks (a block is
+roughly one card, keeping same-day results together), every resample is replayed for all
+policies in one array pass, and chunks of resamples run in parallel threads (numpy releases the
+GIL). Each chunk has its own seeded generator, so results do not depend on thread scheduling.
+
+    python bankroll_sim.py --samples 2000 --track Saratoga
+"""
+
+import os
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from storage import connect, file_identity, DB_PATH
+from probability import MODEL_PATH, track_key
+from staking import (
+    POLICY_PATH, DEFAULT_BANKROLL, load_policies, get_policy, load_backtest_races, race_net, replay
+)
+
+DEFAULT_SAMPLES = 1000
+MAX_SAMPLES = 20000           # CLI runs
+API_MAX_SAMPLES = 2000        # /api/analytics/bankroll runs on the single-threaded API server (~1.7s at 2000)
+DEFAULT_BLOCK = 8             # races per resampled block (about one card)
+RUIN_FRACTION = 0.25          # "ruined" = bankroll fell to a quarter of the start or less
+CONFIDENCE = 0.90
+CHUNK_SIZE = 64               # resamples per worker task
+MAX_CURVE_POINTS = 400        # equity curve points sent to the dashboard
+CACHE_CAPACITY = 16
+
+# ==========================================
+# 📉 PATH METRICS (vectorized over any leading axes)
+# ==========================================
+def max_drawdown(paths):
+    """Largest peak-to-trough fall as a fraction of the peak, (..., steps) -> (...)."""
+    peaks = np.maximum.accumulate(paths, axis=-1)
+    drawdown = np.divide(peaks - paths, peaks, out=np.zeros(paths.shape), where=peaks > 0)
+    return drawdown.max(axis=-1)
+
+def longest_losing_streak(net):
+    """Most consecutive losing bets. Races without a bet neither extend nor break a streak."""
+    losses = np.cumsum(net < 0, axis=-1)
+    reset = np.maximum.accumulate(np.where(net > 0, losses, 0), axis=-1)
+    return (losses - reset).max(axis=-1, initial=0)
+
+def path_metrics(net, compounding, bankroll, ruin_level):
+    """Metrics for (..., policies, races) net results; returns the paths too."""
+    paths = replay(net, compounding, bankroll)
+    return paths, {
+        "final": paths[..., -1],
+        "max_drawdown": max_drawdown(paths),
+        "longest_losing_streak": longest_losing_streak(net),
+        "ruined": paths.min(axis=-1) <= ruin_level,
+    }
+
+# ==========================================
+# 🔁 BLOCK BOOTSTRAP
+# ==========================================
+def block_indices(rng, samples, races, block):
+    """Circular block bootstrap race orderings, (samples, races)."""
+    block = max(1, min(block, races))
+    starts = rng.integers(0, races, size=(samples, -(-races // block)))
+    idx = (starts[:, :, None] + np.arange(block)) % races
+    return idx.reshape(samples, -1)[:, :races]
+
+def _bootstrap_chunk(net, compounding, bankroll, ruin_level, samples, block, seed, curve_index):
+    rng = np.random.default_rng(seed)
+    idx = block_indices(rng, samples, net.shape[-1], block)
+    resampled = net[:, idx].transpose(1, 0, 2)              # (samples, policies, races)
+    paths, metrics = path_metrics(resampled, compounding, bankroll, ruin_level)
+    metrics["curve"] = paths[..., curve_index]
+    return metrics
+
+def bootstrap(net, compounding, bankroll, ruin_level, samples=DEFAULT_SAMPLES, block=DEFAULT_BLOCK,
+              seed=0, curve_index=None, workers=None):
+    """Metric arrays (samples, policies) for resampled histories, computed in parallel chunks."""
+    curve_index = np.array([0]) if curve_index is None else curve_index
+    sizes = [min(CHUNK_SIZE, samples - start) for start in range(0, samples, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        chunks = list(pool.map(
+            lambda job: _bootstrap_chunk(net, compounding, bankroll, ruin_level, job[0], block, job[1], curve_index),
+            zip(sizes, seeds)
+        ))
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+# ==========================================
+# 🏦 SIMULATION
+# ==========================================
+def filter_history(history, track="", start_date="", end_date=""):
+    """Subset of a load_backtest_races() history by track and inclusive date range."""
+    slug = track_key(track) if track else ""
+    keep = np.array([
+        (not slug or key == slug) and (not start_date or date >= start_date) and (not end_date or date <= end_date)
+        for date, key, _ in history["keys"]
+    ], dtype=bool)
+    out = {k: v[keep] for k, v in history.items() if isinstance(v, np.ndarray)}
+    out["keys"] = [k for k, m in zip(history["keys"], keep) if m]
+    out["tiers"] = [t for t, m in zip(history["tiers"], keep) if m]
+    return out
+
+def curve_points(steps, limit=MAX_CURVE_POINTS):
+    """Evenly spaced path indices (always including the first and last step)."""
+    return np.unique(np.linspace(0, steps - 1, min(steps, limit)).round().astype(int))
+
+def _interval(values, confidence):
+    tail = (1.0 - confidence) / 2.0 * 100.0
+    lo, hi = np.percentile(values, [tail, 100.0 - tail], axis=0)
+    return lo, hi
+
+def simulate_bankroll(history, policy_names=None, bankroll=DEFAULT_BANKROLL, samples=DEFAULT_SAMPLES,
+                      block=DEFAULT_BLOCK, ruin_fraction=RUIN_FRACTION, confidence=CONFIDENCE, seed=0):
+    """Historical replay plus bootstrap intervals for every policy, as a JSON-ready dict."""
+    started = time.time()
+    names = policy_names or sorted(load_policies())
+    policies = [get_policy(name) for name in names]
+    races = len(history["keys"])
+    ruin_level = bankroll * ruin_fraction
+    result = {
+        "races": races, "bankroll": bankroll, "ruin_level": ruin_level, "samples": samples,
+        "block": block, "confidence": confidence, "policies": [],
+    }
+    if not races:
+        result["elapsed_sec"] = round(time.time() - started, 3)
+        return result
+
+    net, compounding = race_net(history, policies)
+    paths, actual = path_metrics(net, compounding, bankroll, ruin_level)
+    index = curve_points(races + 1)
+    boot = bootstrap(net, compounding, bankroll, ruin_level, samples, block, seed, index)
+
+    final_ci = _interval(boot["final"], confidence)
+    dd_ci = _interval(boot["max_drawdown"], confidence)
+    streak_ci = _interval(boot["longest_losing_streak"], confidence)
+    band_lo, band_hi = _interval(boot["curve"], confidence)
+    risk_of_ruin = boot["ruined"].mean(axis=0)
+    bets = (net != 0).sum(axis=-1)
+
+    result["curve_dates"] = [history["keys"][max(i - 1, 0)][0] for i in index]
+    result["start_date"], result["end_date"] = history["keys"][0][0], history["keys"][-1][0]
+    for j, policy in enumerate(policies):
+        result["policies"].append({
+            "name": names[j],
+            "kind": policy["kind"],
+            "bets": int(bets[j]),
+            "final": round(float(actual["final"][j]), 2),
+            "roi": round((float(actual["final"][j]) / bankroll - 1.0) * 100, 1),
+            "max_drawdown": round(float(actual["max_drawdown"][j]) * 100, 1),
+            "longest_losing_streak": int(actual["longest_losing_streak"][j]),
+            "ruined": bool(actual["ruined"][j]),
+            "risk_of_ruin": round(float(risk_of_ruin[j]) * 100, 1),
+            "ci": {
+                "final": [round(float(final_ci[0][j]), 2), round(float(final_ci[1][j]), 2)],
+                "max_drawdown": [round(float(dd_ci[0][j]) * 100, 1), round(float(dd_ci[1][j]) * 100, 1)],
+                "longest_losing_streak": [int(streak_ci[0][j]), int(np.ceil(streak_ci[1][j]))],
+            },
+            "equity": np.round(paths[j, index], 2).tolist(),
+            "band": [np.round(band_lo[j], 2).tolist(), np.round(band_hi[j], 2).tolist()],
+        })
+    result["elapsed_sec"] = round(time.time() - started, 3)
+    return result
+
+class BankrollCache:
+    """
+    Caches the settled history per database version (PRAGMA data_version, as QueryCache does) and
+    simulation results per parameters, so the analytics tab only re-simulates after new results,
+    a model refit or a policy change. The connection is reopened when the database file is replaced.
+    """
+
+    def __init__(self, db_path=DB_PATH, capacity=CACHE_CAPACITY):
+        self.db_path = db_path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._conn = None
+        self._identity = None
+        self._stamp = None
+        self._history = None
+        self._entries = OrderedDict()
+
+    def _current_stamp(self):
+        """Called with the lock held."""
+        identity = file_identity(self.db_path)
+        if self._conn is not None and identity != self._identity:
+            # A replaced file: the old handle would keep reporting the unlinked file's data_version
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            self._conn = connect(self.db_path, readonly=True, check_same_thread=False)
+            self._identity = identity = file_identity(self.db_path)
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        files = tuple(os.path.getmtime(p) if os.path.exists(p) else 0 for p in (MODEL_PATH, POLICY_PATH))
+        return (identity, version) + files
+
+    def get(self, policy_names=None, bankroll=DEFAULT_BANKROLL, samples=DEFAULT_SAMPLES,
+            track="", start_date="", end_date=""):
+        key = (tuple(policy_names or ()), bankroll, samples, track_key(track) if track else "", start_date, end_date)
+        with self._lock:
+            stamp = self._current_stamp()
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._history = load_backtest_races(self.db_path)
+                self._stamp = stamp
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            history = self._history
+
+        result = simulate_bankroll(filter_history(history, track, start_date, end_date), policy_names, bankroll, samples)
+        with self._lock:
+            # Results settled while simulating: serve this one, but do not cache it under the newer stamp
+            if self._current_stamp() != stamp:
+                return result
+            self._entries[key] = result
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return result
+
+def parse_policies(value):
+    """'kelly,flat' -> ['kelly', 'flat']; empty -> None (all). Raises ValueError for unknown names."""
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    for name in names:
+        get_policy(name)
+    return names or None
+
+def parse_samples(value, max_samples=API_MAX_SAMPLES):
+    samples = int(value) if value else DEFAULT_SAMPLES
+    if not 100 <= samples <= max_samples:
+        raise ValueError(f"samples must be between 100 and {max_samples}")
+    return samples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay settled history under staking policies with bootstrap intervals.")
+    parser.add_argument("--policy", nargs="+", help="Policies to replay (default: all)")
+    parser.add_argument("--bankroll", type=float, default=DEFAULT_BANKROLL)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--block", type=int, default=DEFAULT_BLOCK)
+    parser.add_argument("--track", default="")
+    parser.add_argument("--start-date", default="")
+    parser.add_argument("--end-date", default="")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+    try:
+        samples = parse_samples(args.samples, MAX_SAMPLES)
+    except ValueError as e:
+        parser.error(str(e))
+
+    history = filter_history(load_backtest_races(args.db), args.track, args.start_date, args.end_date)
+    result = simulate_bankroll(history, args.policy, args.bankroll, samples, args.block)
+    print(f"🏦 {result['races']} settled races, {result['samples']} resamples in {result['elapsed_sec']}s "
+          f"(ruin = ${result['ruin_level']:,.0f})")
+    for p in result["policies"]:
+        print(f"   {p['name']:<15} final ${p['final']:>10,.2f} [{p['ci']['final'][0]:,.0f} - {p['ci']['final'][1]:,.0f}]"
+              f"  maxDD {p['max_drawdown']:5.1f}%  streak {p['longest_losing_streak']:>3}"
+              f"  RoR {p['risk_of_ruin']:5.1f}%")
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Card Session
+One model handle per race card. The system instruction and the uploaded card PDF are put into a
+Gemini cached context once (google.generativeai caching.CachedContent), and every per-race call
+only sends its short race prompt against that cache, so the PDF and the rules are not
+re-processed as fresh input on every race.
+
+Caching has a minimum context size and is not offered for every model; when creating the cache
+fails the session falls back to the plain model and sends [prompt, pdf] per call, exactly as
+before. The cache is deleted when the card is done (its TTL is only the safety net).
+
+Small cards can also be handicapped in one streamed call ("whole card" mode): RaceStreamParser
+picks each race object out of the streamed JSON array as soon as its closing brace arrives, so
+app2 rates and shows races while the rest of the card is still being generated. choose_mode()
+decides between that and one call per race from the PDF page count and the model's context /
+output limits. Whole-card runs need no race count up front: the races the stream returns are the
+card, and missing_races() lists the gaps to fetch one by one afterwards.
+
+MockGenai stands in for the google.generativeai module so the flow can be exercised offline:
+
+    python card_session.py --races 8
+    python card_session.py --races 8 --no-cache
+    python card_session.py --races 8 --whole-card
+"""
+
+import re
+import json
+import time
+import datetime
+
+from llm_json import race_objects
+
+CACHE_TTL_MINUTES = 20
+
+# Whole-card sizing. Per-page cost of a PDF (rendered page + extracted text) and the output one
+# race object takes in the handicapping schema (5-6 contenders with notes), both rough upper bounds.
+PDF_TOKENS_PER_PAGE = 800
+OUTPUT_TOKENS_PER_RACE = 900
+WHOLE_CARD_MAX_PAGES = 16           # longer programs get one focused call per race
+WHOLE_CARD_INPUT_SHARE = 0.5        # keep the card well inside the context window
+MAX_CARD_RACES = 12                 # most races one program carries
+DEFAULT_INPUT_LIMIT = 1048576
+DEFAULT_OUTPUT_LIMIT = 8192
+
+PER_RACE, WHOLE_CARD = "per_race", "whole_card"
+PDF_PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+PDF_PAGE_COUNT = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b", re.S)
+
+def count_pdf_pages(pdf_bytes):
+    """Page count read from the raw PDF (0 when the page tree is compressed / not found)."""
+    counts = [int(a or b) for a, b in PDF_PAGE_COUNT.findall(pdf_bytes or b"")]
+    return max(counts + [len(PDF_PAGE_OBJECT.findall(pdf_bytes or b""))])
+
+def model_limits(genai, model_name):
+    """(input, output) token limits the API reports for a model, or the Gemini defaults."""
+    try:
+        info = genai.get_model(model_name if model_name.startswith("models/") else f"models/{model_name}")
+        return int(info.input_token_limit), int(info.output_token_limit)
+    except Exception:
+        return DEFAULT_INPUT_LIMIT, DEFAULT_OUTPUT_LIMIT
+
+def estimate_races(page_count):
+    """Upper bound on a card's races before its count is known: every race takes at least a page."""
+    return min(page_count, MAX_CARD_RACES) if page_count else MAX_CARD_RACES
+
+def race_numbers(values):
+    """Integer race numbers from race_number fields ("3", 3); anything else is skipped."""
+    return {int(str(v).strip()) for v in values if str(v).strip().isdigit()}
+
+def missing_races(numbers, total_races=None):
+    """Race numbers absent from 1..total_races (default: the highest number seen), e.g. gaps in a stream."""
+    seen = race_numbers(numbers)
+    total = total_races if total_races is not None else max(seen, default=0)
+    return [n for n in range(1, total + 1) if n not in seen]
+
+def choose_mode(page_count, total_races, input_limit, output_limit, system_tokens=0):
+    """
+    (PER_RACE | WHOLE_CARD, reason). Whole card only when the card and every race object fit in
+    one call; with total_races None the output is sized for estimate_races(page_count).
+    """
+    if not page_count:
+        return PER_RACE, "page count unknown"
+    if page_count > WHOLE_CARD_MAX_PAGES:
+        return PER_RACE, f"{page_count} pages > {WHOLE_CARD_MAX_PAGES}"
+    input_tokens = page_count * PDF_TOKENS_PER_PAGE + system_tokens
+    if input_tokens > input_limit * WHOLE_CARD_INPUT_SHARE:
+        return PER_RACE, f"≈{input_tokens:,} input tokens exceed the context budget"
+    races = total_races if total_races is not None else estimate_races(page_count)
+    races_text = f"{races} races" if total_races is not None else f"up to {races} races"
+    output_tokens = races * OUTPUT_TOKENS_PER_RACE
+    if output_tokens > output_limit:
+        return PER_RACE, f"≈{output_tokens:,} output tokens for {races_text} > model limit {output_limit:,}"
+    return WHOLE_CARD, f"{page_count} pages, {races_text} ≈{output_tokens:,} output tokens"
+
+class CardSession:
+    """
+    Context manager around the per-card model:
+
+        with CardSession(genai, model_name, system_instruction, remote_file, config) as session:
+            response = session.generate(race_prompt)
+    """
+
+    def __init__(self, genai, model_name, system_instruction, remote_file, generation_config,
+                 ttl_minutes=CACHE_TTL_MINUTES, use_cache=True):
+        self.genai = genai
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.remote_file = remote_file
+        self.generation_config = generation_config
+        self.ttl_minutes = ttl_minutes
+        self.use_cache = use_cache
+        self.cache = None
+        self.cache_error = None
+        self.model = None
+        self.usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def cached(self):
+        return self.cache is not None
+
+    def open(self):
+        if self.use_cache:
+            try:
+                self.cache = self.genai.caching.CachedContent.create(
+                    model=self.model_name,
+                    display_name=f"card-{int(time.time())}",
+                    system_instruction=self.system_instruction,
+                    contents=[self.remote_file],
+                    ttl=datetime.timedelta(minutes=self.ttl_minutes),
+                )
+                self.model = self.genai.GenerativeModel.from_cached_content(
+                    cached_content=self.cache, generation_config=self.generation_config
+                )
+                return self
+            except Exception as e:
+                # Model without caching support, context below the minimum size, quota, ...
+                self.cache_error = str(e)
+                self._delete_cache()
+        self.model = self.genai.GenerativeModel(
+            self.model_name,
+            system_instruction=self.system_instruction,
+            generation_config=self.generation_config,
+        )
+        return self
+
+    def _contents(self, prompt):
+        # The PDF rides in the cache, or is attached to every call when uncached
+        return [prompt] if self.cached else [prompt, self.remote_file]
+
+    def _record(self, usage):
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+        self.usage["cached_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
+
+    def generate(self, prompt):
+        """One call about the card."""
+        response = self.model.generate_content(self._contents(prompt))
+        self._record(getattr(response, "usage_metadata", None))
+        return response
+
+    def stream(self, prompt, generation_config=None):
+        """Yields the response text chunk by chunk (generation_config overrides the session's, e.g. max_output_tokens)."""
+        response = self.model.generate_content(self._contents(prompt), generation_config=generation_config, stream=True)
+        usage = None
+        for chunk in response:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # chunk without text parts (safety / finish metadata only)
+            if text:
+                yield text
+        self._record(usage)
+
+    def _delete_cache(self):
+        if self.cache is not None:
+            try:
+                self.cache.delete()
+            except Exception:
+                pass  # expires on its own after the TTL
+            self.cache = None
+
+    def close(self):
+        self._delete_cache()
+
+# ==========================================
+# 🌊 STREAMED WHOLE-CARD PARSING
+# ==========================================
+class RaceStreamParser:
+    """
+    Incremental parser for a streamed JSON array of race objects. feed() takes the next text
+    chunk and returns the races completed by it; strings and escapes are tracked so braces in
+    handicapper notes do not confuse it, and anything outside the objects (markdown fences,
+    the array brackets, commas) is skipped. decode turns one object's text into a value (pass a
+    repairing decoder such as llm_json.decode for LLM output).
+    """
+
+    def __init__(self, decode=json.loads):
+        self.decode = decode
+        self.errors = []
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escaped = False
+        self._race_depth = None
+
+    def feed(self, chunk):
+        self._text += chunk
+        races = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "[" or ch == "{":
+                if ch == "{" and self._race_depth is None:
+                    # Race objects sit at the depth of the first object: 1 inside the array, 0 if bare
+                    self._race_depth = self._depth
+                if ch == "{" and self._depth == self._race_depth:
+                    self._start = i
+                self._depth += 1
+            elif ch == "]" or ch == "}":
+                self._depth = max(self._depth - 1, 0)
+                if ch == "}" and self._depth == self._race_depth and self._start is not None:
+                    races.extend(self._decode(text[self._start:i + 1]))
+                    self._start = None
+        # Drop consumed text; keep an open object from its first brace
+        cut = self._start if self._start is not None else len(text)
+        self._text = text[cut:]
+        self._pos = len(text) - cut
+        if self._start is not None:
+            self._start = 0
+        return races
+
+    def _decode(self, fragment):
+        try:
+            obj = self.decode(fragment)
+        except Exception as e:
+            self.errors.append(str(e))
+            return []
+        return race_objects(obj)
+
+    @property
+    def incomplete(self):
+        """True when the stream ended inside a race object (e.g. the output limit cut it off)."""
+        return self._start is not None
+
+# ==========================================
+# 🧪 OFFLINE MOCK (google.generativeai stand-in)
+# ==========================================
+class _MockUsage:
+    def __init__(self, prompt_tokens, cached_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+
+class _MockResponse:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+class MockFile:
+    """Uploaded-file stand-in; tokens is what the PDF would cost as input."""
+
+    def __init__(self, name="files/mock-card", tokens=30000):
+        self.name = name
+        self.tokens = tokens
+
+class MockGenai:
+    """
+    Just enough of google.generativeai for CardSession: GenerativeModel (+ from_cached_content)
+    and caching.CachedContent. Responses are one-race JSON arrays in the handicapping schema;
+    latency grows with uncached input tokens, and calls / created / deleted caches are recorded.
+    A card prompt without a race count is answered with card_races races.
+    """
+
+    def __init__(self, seconds_per_1k_tokens=0.002, cache_supported=True, card_races=8):
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.cache_supported = cache_supported
+        self.card_races = card_races
+        self.calls = []
+        self.caches = []
+        mock = self
+
+        class CachedContent:
+            def __init__(self, model, system_instruction, contents):
+                self.model, self.system_instruction, self.contents = model, system_instruction, contents
+                self.deleted = False
+
+            @classmethod
+            def create(cls, model, display_name=None, system_instruction=None, contents=None, ttl=None):
+                if not mock.cache_supported:
+                    raise ValueError(f"Model {model} does not support cached content")
+                cache = cls(model, system_instruction, contents or [])
+                mock.caches.append(cache)
+                return cache
+
+            def delete(self):
+                self.deleted = True
+
+        class GenerativeModel:
+            def __init__(self, model_name, system_instruction=None, generation_config=None, cached_content=None):
+                self.model_name = model_name
+                self.system_instruction = system_instruction
+                self.cached_content = cached_content
+
+            @classmethod
+            def from_cached_content(cls, cached_content, generation_config=None):
+                return cls(cached_content.model, generation_config=generation_config, cached_content=cached_content)
+
+            def generate_content(self, contents, generation_config=None, stream=False):
+                response = mock._respond(self, contents)
+                if not stream:
+                    return response
+                # Uneven chunks, usage metadata on the last one (as the API streams)
+                text = response.text
+                cuts = list(range(0, len(text), 173)) + [len(text)]
+                return [_MockResponse(text[a:b], response.usage_metadata if b == len(text) else None)
+                        for a, b in zip(cuts, cuts[1:])]
+
+        class _Caching:
+            pass
+
+        self.GenerativeModel = GenerativeModel
+        self.caching = _Caching()
+        self.caching.CachedContent = CachedContent
+
+    @staticmethod
+    def _tokens(part):
+        return getattr(part, "tokens", None) or len(str(part)) // 4
+
+    def _respond(self, model, contents):
+        cache = model.cached_content
+        cached = sum(self._tokens(p) for p in (cache.contents + [cache.system_instruction])) if cache else 0
+        fresh = sum(self._tokens(p) for p in contents) + (0 if cache else self._tokens(model.system_instruction or ""))
+        # Cached tokens are still read, just far cheaper than processing them as new input
+        time.sleep((fresh + cached * 0.1) / 1000 * self.seconds_per_1k_tokens)
+        self.calls.append({"fresh_tokens": fresh, "cached_tokens": cached})
+
+        prompt = str(contents[0])
+        card = re.search(r"Race 1 through Race (\d+)", prompt)
+        single = re.search(r"Race (\d+)", prompt)
+        if card:
+            numbers = range(1, int(card.group(1)) + 1)
+        elif "EVERY race" in prompt:
+            numbers = range(1, self.card_races + 1)
+        else:
+            numbers = [int(single.group(1)) if single else 1]
+        races = [{
+            "race_number": race_num, "distance_surface": "6 Furlongs Dirt", "confidence_level": "Medium",
+            "suggested_wager": "Exacta Box 1, 2, 3",
+            "contenders": [
+                {"program_number": str(n), "barrier": str(n), "horse_name": f"Mock Runner {n}",
+                 "handicapper_notes": "Mock {notes}", "features": {"ai_holistic_score": 90 - n * 2, "running_style": "P"}}
+                for n in range(1, 6)
+            ],
+        } for race_num in numbers]
+        return _MockResponse(json.dumps(races), _MockUsage(fresh + cached, cached))
+
+if __name__ == "__main__":
+    import argparse
+    import prompt_builder
+
+    parser = argparse.ArgumentParser(description="Run a mock card through CardSession (no API calls).")
+    parser.add_argument("--track", default="Saratoga")
+    parser.add_argument("--races", type=int, default=8)
+    parser.add_argument("--pdf-tokens", type=int, default=30000)
+    parser.add_argument("--no-cache", action="store_true", help="Simulate a model without context caching")
+    parser.add_argument("--whole-card", action="store_true", help="One streamed call for the whole card")
+    args = parser.parse_args()
+
+    genai = MockGenai(cache_supported=not args.no_cache, card_races=args.races)
+    system = prompt_builder.system_instruction(args.track, "USA")["text"]
+    started = time.time()
+    with CardSession(genai, "gemini-mock", system, MockFile(tokens=args.pdf_tokens), {}) as session:
+        if args.whole_card:
+            # No race count is sent: the stream itself says how many races the card has
+            stream_parser = RaceStreamParser()
+            streamed = []
+            for chunk in session.stream(prompt_builder.card_prompt(None, args.track)):
+                for race in stream_parser.feed(chunk):
+                    streamed.append(race["race_number"])
+                    print(f"   ⚡ Race {race['race_number']} parsed at {time.time() - started:.3f}s")
+            print(f"   📋 {max(streamed, default=0)} races streamed, missing: {missing_races(streamed) or 'none'}")
+        else:
+            for race_num in range(1, args.races + 1):
+                json.loads(session.generate(prompt_builder.race_prompt(race_num, args.track)).text)
+        mode = "cached context" if session.cached else f"uncached ({session.cache_error})"
+        mode += f", {session.usage['calls']} call(s)"
+    fresh = sum(c["fresh_tokens"] for c in genai.calls)
+    print(f"🗂️  {args.races} races via {mode} in {time.time() - started:.2f}s")
+    print(f"   fresh input tokens: {fresh:,} | cached tokens read: {session.usage['cached_tokens']:,} | "
+          f"caches left open: {sum(not c.deleted for c in genai.caches)}")
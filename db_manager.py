@@ -1,163 +1,181 @@
-import sqlite3
 import json
 import os
 import glob
+import sys
+import hashlib
+from datetime import datetime
 
-# DB CONFIG
-DB_NAME = "racing_data.db"
-LOGS_DIR = "logs"  # Where your JSON files live
+from storage import connect, init_storage, upsert_meeting, upsert_races, upsert_selections, invalidate_cache, DB_PATH, LOGS_DIR
 
 def init_db():
-    """Creates the database tables if they don't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    # 1. MEETINGS TABLE
-    c.execute('''CREATE TABLE IF NOT EXISTS meetings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        track TEXT,
-        date TEXT,
-        track_condition TEXT,
-        UNIQUE(track, date)
-    )''')
-
-    # 2. RACES TABLE
-    c.execute('''CREATE TABLE IF NOT EXISTS races (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        meeting_id INTEGER,
-        race_number INTEGER,
-        distance TEXT,
-        surface TEXT,
-        confidence TEXT,
-        strategy TEXT,
-        danger_horse_name TEXT,
-        FOREIGN KEY (meeting_id) REFERENCES meetings(id),
-        UNIQUE(meeting_id, race_number)
-    )''')
-
-    # 3. SELECTIONS TABLE
-    c.execute('''CREATE TABLE IF NOT EXISTS selections (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        race_id INTEGER,
-        rank INTEGER,
-        horse_number TEXT,
-        horse_name TEXT,
-        barrier TEXT,
-        reason TEXT,
-        finish_position INTEGER DEFAULT NULL,
-        win_paid REAL DEFAULT 0.0,
-        FOREIGN KEY (race_id) REFERENCES races(id)
-    )''')
+    """Creates the unified database tables if they don't exist (schema lives in storage.py)."""
+    init_storage()
+    print(f"✅ Database {DB_PATH} ready.")
 
-    conn.commit()
-    conn.close()
-    print(f"✅ Database {DB_NAME} ready.")
+def load_log_json(content):
+    """Decodes a log file body, unwrapping double-encoded strings and single-item lists. Returns (data, error)."""
+    data = json.loads(content)
 
-def ingest_json_logs():
-    """Reads all JSON files in logs/ and inserts them into DB."""
-    conn = sqlite3.connect(DB_NAME)
+    # --- DATA VALIDATION (The Fix) ---
+    # 1. If data is a string (double-encoded JSON), try to parse it again
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except:
+            return None, "Invalid JSON string format."
+
+    # 2. If data is a List (rare but possible), grab the first item
+    if isinstance(data, list):
+        if len(data) > 0 and isinstance(data[0], dict):
+            data = data[0]
+        else:
+            return None, "Data is a list without a dictionary."
+
+    # 3. Final check: Data MUST be a dictionary
+    if not isinstance(data, dict):
+        return None, "Root data is not a dictionary."
+
+    return data, None
+
+def ingest_meeting_card(c, data):
+    """Upserts one meeting card (meeting, races, selections) with batched statements. Returns the race count."""
+    # --- IMPORT LOGIC ---
+    # Safe Access to Meta
+    meta = data.get('meta')
+    if not isinstance(meta, dict): meta = {}
+
+    track = meta.get('track', 'Unknown')
+    date = meta.get('date', 'Unknown')
+    cond = meta.get('track_condition', 'Unknown')
+
+    # Upsert Meeting
+    meeting_id = upsert_meeting(c, track, date, track_condition=cond)
+
+    # Process Races
+    races = data.get('races')
+    if not isinstance(races, list):
+        return 0
+
+    race_rows = []
+    picks_by_race = {}
+    for race in races:
+        # Ensure race is a dictionary
+        if not isinstance(race, dict): continue
+
+        r_num = race.get('number')
+        if r_num is None: continue # Skip races without numbers
+
+        danger = race.get('danger_horse')
+        # Handle danger if it's not a dict (sometimes null)
+        danger_name = danger.get('name') if isinstance(danger, dict) else None
+
+        strat_obj = race.get('exotic_strategy')
+        strat = strat_obj.get('strategy', '') if isinstance(strat_obj, dict) else ''
+
+        race_rows.append({
+            "race_number": r_num, "distance": race.get('distance'), "surface": race.get('surface'),
+            "confidence": race.get('confidence_level'), "strategy": strat, "danger_horse_name": danger_name
+        })
+        picks = race.get('selections', [])
+        picks_by_race[str(r_num)] = picks if isinstance(picks, list) else []
+
+    if not race_rows:
+        return 0
+
+    # One batched upsert + one id lookup for the whole meeting instead of a probe per race
+    race_ids = upsert_races(c, meeting_id, track, date, race_rows)
+
+    selection_rows = []
+    for r_num, picks in picks_by_race.items():
+        race_id = race_ids.get(r_num)
+        if race_id is None: continue
+        for i, horse in enumerate(picks):
+            if not isinstance(horse, dict): continue
+            selection_rows.append((race_id, i + 1, horse.get('number'), horse.get('name'), horse.get('barrier'),
+                                   horse.get('reason'), horse.get('rating'), None, None))
+
+    # Finish positions entered via enter_results.py survive a re-ingest unless the pick itself changed
+    upsert_selections(c, selection_rows)
+
+    return len(race_rows)
+
+def record_manifest(c, manifest_key, st, content_hash, ingested_at, status="ingested"):
+    """Fingerprints a log file in ingest_manifest. Empty / invalid files are recorded too
+    (status 'empty' / 'invalid'), so they are only re-read once the file changes."""
+    c.execute('''INSERT INTO ingest_manifest (path, size, mtime, content_hash, ingested_at, status)
+                 VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size, mtime = excluded.mtime, content_hash = excluded.content_hash,
+                    ingested_at = excluded.ingested_at, status = excluded.status''',
+              (manifest_key, st.st_size, st.st_mtime, content_hash, ingested_at, status))
+
+def ingest_json_logs(force=False):
+    """
+    Reads new or changed JSON files in logs/ and upserts them into DB.
+    Unchanged files (same size + mtime, or same content hash) are skipped via ingest_manifest,
+    including empty or invalid ones already reported on an earlier run.
+    """
+    conn = connect()
     c = conn.cursor()
-    
+
     files = glob.glob(os.path.join(LOGS_DIR, "*.json"))
     print(f"📂 Found {len(files)} log files. Scanning...")
 
+    c.execute('SELECT path, size, mtime, content_hash FROM ingest_manifest')
+    manifest = {row[0]: row[1:] for row in c.fetchall()}
+    ingested_at = datetime.now().isoformat(timespec="seconds")
+
     new_records = 0
     skipped_files = 0
+    unchanged_files = 0
+    parsed_files = 0
 
+    c.execute('BEGIN')
     for filepath in files:
+        manifest_key = os.path.basename(filepath)
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content: continue # Skip empty files
-                data = json.loads(content)
-
-            # --- DATA VALIDATION (The Fix) ---
-            # 1. If data is a string (double-encoded JSON), try to parse it again
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except:
-                    print(f"⚠️ Skipping {filepath}: Invalid JSON string format.")
-                    skipped_files += 1
-                    continue
-
-            # 2. If data is a List (rare but possible), grab the first item
-            if isinstance(data, list):
-                if len(data) > 0 and isinstance(data[0], dict):
-                    data = data[0]
-                else:
-                    print(f"⚠️ Skipping {filepath}: Data is a list without a dictionary.")
-                    skipped_files += 1
-                    continue
-
-            # 3. Final check: Data MUST be a dictionary
-            if not isinstance(data, dict):
-                print(f"⚠️ Skipping {filepath}: Root data is not a dictionary.")
-                skipped_files += 1
+            st = os.stat(filepath)
+            known = manifest.get(manifest_key)
+            if not force and known and known[0] == st.st_size and known[1] == st.st_mtime:
+                unchanged_files += 1
+                continue
+
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+            content_hash = hashlib.sha256(raw).hexdigest()
+            if not force and known and known[2] == content_hash:
+                # Touched but identical (e.g. re-copied by the exporter): only refresh the fingerprint
+                c.execute('UPDATE ingest_manifest SET size = ?, mtime = ? WHERE path = ?',
+                          (st.st_size, st.st_mtime, manifest_key))
+                unchanged_files += 1
                 continue
 
-            # --- IMPORT LOGIC ---
-            # Safe Access to Meta
-            meta = data.get('meta')
-            if not isinstance(meta, dict): meta = {}
-            
-            track = meta.get('track', 'Unknown')
-            date = meta.get('date', 'Unknown')
-            cond = meta.get('track_condition', 'Unknown')
-
-            # Insert Meeting
-            c.execute('INSERT OR IGNORE INTO meetings (track, date, track_condition) VALUES (?, ?, ?)', 
-                      (track, date, cond))
-            
-            c.execute('SELECT id FROM meetings WHERE track = ? AND date = ?', (track, date))
-            meeting_row = c.fetchone()
-            if not meeting_row: continue
-            meeting_id = meeting_row[0]
-
-            # Process Races
-            races = data.get('races')
-            if not isinstance(races, list): 
-                # print(f"ℹ️ {filepath} has no races list.") 
+            try:
+                content = raw.decode('utf-8').strip()
+                data, error = load_log_json(content) if content else (None, None)
+            except ValueError as e: # not UTF-8 or not JSON
+                data, error = None, f"Invalid JSON ({e})"
+            if data is None and error is None: # Skip empty files
+                record_manifest(c, manifest_key, st, content_hash, ingested_at, status="empty")
+                skipped_files += 1
+                continue
+            if error:
+                print(f"⚠️ Skipping {filepath}: {error}")
+                record_manifest(c, manifest_key, st, content_hash, ingested_at, status="invalid")
+                skipped_files += 1
                 continue
 
-            for race in races:
-                # Ensure race is a dictionary
-                if not isinstance(race, dict): continue
-
-                r_num = race.get('number')
-                if r_num is None: continue # Skip races without numbers
-
-                # Check duplicates
-                c.execute('SELECT id FROM races WHERE meeting_id = ? AND race_number = ?', (meeting_id, r_num))
-                if c.fetchone(): continue 
-
-                # Insert Race
-                danger = race.get('danger_horse')
-                # Handle danger if it's not a dict (sometimes null)
-                danger_name = danger.get('name') if isinstance(danger, dict) else None
-                
-                strat_obj = race.get('exotic_strategy')
-                strat = strat_obj.get('strategy', '') if isinstance(strat_obj, dict) else ''
-
-                c.execute('''INSERT INTO races (meeting_id, race_number, distance, surface, confidence, strategy, danger_horse_name)
-                             VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                          (meeting_id, r_num, race.get('distance'), race.get('surface'), 
-                           race.get('confidence_level'), strat, danger_name))
-                
-                race_id = c.lastrowid
-
-                # Insert Selections
-                picks = race.get('selections', [])
-                if isinstance(picks, list):
-                    for i, horse in enumerate(picks):
-                        if not isinstance(horse, dict): continue
-                        
-                        rank = i + 1
-                        c.execute('''INSERT INTO selections (race_id, rank, horse_number, horse_name, barrier, reason)
-                                     VALUES (?, ?, ?, ?, ?, ?)''',
-                                  (race_id, rank, horse.get('number'), horse.get('name'), horse.get('barrier'), horse.get('reason')))
-                
-                new_records += 1
+            # Savepoint per file so one bad card never leaves half its races behind
+            c.execute('SAVEPOINT ingest_file')
+            try:
+                new_records += ingest_meeting_card(c, data)
+                record_manifest(c, manifest_key, st, content_hash, ingested_at)
+                c.execute('RELEASE SAVEPOINT ingest_file')
+                parsed_files += 1
+            except Exception:
+                c.execute('ROLLBACK TO SAVEPOINT ingest_file')
+                c.execute('RELEASE SAVEPOINT ingest_file')
+                raise
 
         except Exception as e:
             print(f"❌ Critical Error on {filepath}: {e}")
@@ -165,8 +183,10 @@ def ingest_json_logs():
 
     conn.commit()
     conn.close()
-    print(f"🚀 DONE. Added {new_records} races. Skipped {skipped_files} invalid files.")
+    invalidate_cache()
+    print(f"🚀 DONE. Parsed {parsed_files} new/changed files ({unchanged_files} unchanged). Upserted {new_records} races. Skipped {skipped_files} empty/invalid files (recorded; retried once they change).")
 
 if __name__ == "__main__":
     init_db()
-    ingest_json_logs()
\ No newline at end of file
+    # --full re-parses every log file regardless of the manifest
+    ingest_json_logs(force="--full" in sys.argv)
@@ -1,12 +1,13 @@
 import sqlite3
 
-DB_FILE = "racing_ledger.db"
+from storage import connect
+from delete_meeting import delete_meeting_cascade
 
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
 
-def delete_meeting():
-    conn = get_connection()
+def choose_meeting(conn):
+    """Lists every (track, date) card and returns the one picked, or None."""
     cursor = conn.cursor()
 
     # 1. Find all unique meetings (Track + Date)
@@ -14,12 +15,12 @@ def delete_meeting():
         cursor.execute("SELECT DISTINCT track, date FROM races ORDER BY date DESC, track")
         meetings = cursor.fetchall()
     except sqlite3.OperationalError:
-        print("[Error] Could not read database. Make sure 'racing_ledger.db' exists.")
-        return
+        print("[Error] Could not read the unified database (logs/master_betting_history.db).")
+        return None
 
     if not meetings:
         print("\n[Info] Database is empty. Nothing to delete.")
-        return
+        return None
 
     print("\n" + "="*40)
     print("🗑️  DELETE RACE CARD")
@@ -32,17 +33,27 @@ def delete_meeting():
     choice = input("\nSelect a meeting to DELETE (Number): ").strip().lower()
 
     if choice == 'q':
-        return
+        return None
 
     try:
         idx = int(choice) - 1
         if idx < 0 or idx >= len(meetings):
             print("Invalid selection.")
-            return
-        target_track, target_date = meetings[idx]
+            return None
+        return meetings[idx]
     except ValueError:
         print("Invalid input.")
+        return None
+
+def delete_meeting():
+    conn = get_connection()
+    try:
+        picked = choose_meeting(conn)
+    finally:
+        conn.close()
+    if picked is None:
         return
+    target_track, target_date = picked
 
     # Confirmation
     confirm = input(f"\n⚠️  ARE YOU SURE you want to delete ALL data for {target_track} on {target_date}? (y/n): ")
@@ -52,36 +63,18 @@ def delete_meeting():
 
     print(f"\nDeleting {target_track} ({target_date})...")
 
-    # 2. Get the UUIDs for that meeting
-    cursor.execute("SELECT race_uuid FROM races WHERE track = ? AND date = ?", (target_track, target_date))
-    uuids = [row[0] for row in cursor.fetchall()]
-
-    if not uuids:
+    # 2. Indexed cascade across every table, then the card files and the static index
+    result = delete_meeting_cascade(target_track, target_date)
+    if not any(result["deleted"].values()) and not result["archived"]:
         print("No races found for this meeting.")
         return
 
-    # 3. Delete from Child Tables first (Predictions & Results)
-    # We use a trick with "IN" clause to delete multiple UUIDs at once
-    placeholders = ','.join(['?'] * len(uuids))
-    
-    cursor.execute(f"DELETE FROM predictions WHERE race_uuid IN ({placeholders})", uuids)
-    bets_deleted = cursor.rowcount
-    
-    cursor.execute(f"DELETE FROM results WHERE race_uuid IN ({placeholders})", uuids)
-    results_deleted = cursor.rowcount
-
-    # 4. Delete from Parent Table (Races)
-    cursor.execute(f"DELETE FROM races WHERE race_uuid IN ({placeholders})", uuids)
-    races_deleted = cursor.rowcount
-
-    conn.commit()
-    conn.close()
-
     print("-" * 30)
     print(f"✅ Success! Removed:")
-    print(f"   - {races_deleted} Races")
-    print(f"   - {bets_deleted} Predictions")
-    print(f"   - {results_deleted} Results")
+    print(f"   - {result['deleted'].get('races', 0)} Races")
+    print(f"   - {result['deleted'].get('selections', 0) + result['deleted'].get('predictions', 0)} Predictions")
+    print(f"   - {result['deleted'].get('results', 0)} Results")
+    print(f"   - {len(result['archived'])} Card Files (moved to logs/deleted)")
 
 if __name__ == "__main__":
     delete_meeting()
\ No newline at end of file
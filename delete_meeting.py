@@ -1,40 +1,126 @@
-import sqlite3
 import os
-import json
-import glob
 import shutil
+from datetime import datetime
+
+from storage import connect, invalidate_cache, LOGS_DIR, BASE_DIR, DB_PATH
+import export_static
+import homepage
 
-DB_NAME = "racing_data.db"
-LOGS_DIR = "logs"
 TRASH_DIR = os.path.join(LOGS_DIR, "deleted")
 
-def archive_log_file(track_name, date_str):
-    """Finds the JSON file matching this track/date and moves it to trash."""
-    if not os.path.exists(TRASH_DIR):
-        os.makedirs(TRASH_DIR)
+# Every place a saved card lives, by file name (<Track>_<date>.json / .html)
+JSON_ARTIFACT_DIRS = [LOGS_DIR, os.path.join(BASE_DIR, "api", "output")]
+HTML_ARTIFACT_DIRS = [os.path.join(BASE_DIR, "docs", "meetings")]
 
-    files = glob.glob(os.path.join(LOGS_DIR, "*.json"))
-    found = False
+# ==========================================
+# 🗂️ MEETING REGISTRY
+# ==========================================
+def meeting_stem(track_name, date_str, filename=None):
+    """File name stem for a meeting: the registered filename, else the <Track>_<date> naming app2 saves with."""
+    if filename:
+        return os.path.splitext(os.path.basename(filename))[0]
+    return f"{str(track_name).replace(' ', '_')}_{date_str}"
 
-    for filepath in files:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content: continue
-                data = json.loads(content)
-                if isinstance(data, str): data = json.loads(data)
-                
-                meta = data.get('meta', {})
-                if meta.get('track') == track_name and meta.get('date') == date_str:
-                    filename = os.path.basename(filepath)
-                    new_path = os.path.join(TRASH_DIR, filename)
-                    f.close() 
-                    shutil.move(filepath, new_path)
-                    print(f"   📦 Archived file: {filename}")
-                    found = True
-                    break 
-        except Exception:
-            continue
+def track_variants(track_name):
+    """Track spellings the tables use for one meeting ("Gulfstream Park" / "Gulfstream_Park")."""
+    return sorted({track_name, track_name.replace(" ", "_"), track_name.replace("_", " ")})
+
+def lookup_meeting(conn, track_name, date_str):
+    """
+    Registry entry for (track, date): meeting id, race ids, filename and the artifact paths that
+    exist on disk. Every lookup is an index probe; no log files are opened.
+    """
+    tracks = track_variants(track_name)
+    marks = ",".join("?" * len(tracks))
+    row = conn.execute(f"SELECT id, filename FROM meetings WHERE track IN ({marks}) AND date = ?", tracks + [date_str]).fetchone()
+    meeting_id, filename = row if row else (None, None)
+    race_ids = [r[0] for r in conn.execute(
+        f"SELECT id FROM races WHERE meeting_id = ? OR (track IN ({marks}) AND date = ?)",
+        [meeting_id] + tracks + [date_str]
+    )]
+    stem = meeting_stem(track_name, date_str, filename)
+    candidates = [os.path.join(d, stem + ".json") for d in JSON_ARTIFACT_DIRS]
+    candidates += [os.path.join(d, stem + ".html") for d in HTML_ARTIFACT_DIRS]
+    return {
+        "track": track_name,
+        "date": date_str,
+        "meeting_id": meeting_id,
+        "race_ids": race_ids,
+        "filename": stem + ".json",
+        "artifacts": [p for p in candidates if os.path.exists(p)],
+    }
+
+def archive_destination(dest):
+    """Free name for an archived file: the plain name, else stamped with the deletion time (and a counter)."""
+    if not os.path.exists(dest):
+        return dest
+    stem, ext = os.path.splitext(dest)
+    stamped = f"{stem}.deleted-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    candidate, n = stamped + ext, 1
+    while os.path.exists(candidate):
+        candidate, n = f"{stamped}-{n}{ext}", n + 1
+    return candidate
+
+def archive_artifacts(paths):
+    """
+    Moves card files into logs/deleted/ (copies from other folders keep their layout so they don't
+    collide). A card deleted again after being re-saved gets a timestamped name instead of
+    overwriting the earlier archive.
+    """
+    archived = []
+    for path in paths:
+        in_logs = os.path.dirname(os.path.abspath(path)) == os.path.abspath(LOGS_DIR)
+        dest = os.path.join(TRASH_DIR, os.path.basename(path) if in_logs else os.path.relpath(path, BASE_DIR))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        dest = archive_destination(dest)
+        shutil.move(path, dest)
+        archived.append(dest)
+        print(f"   📦 Archived file: {os.path.relpath(path, BASE_DIR)}")
+    return archived
+
+def delete_meeting_cascade(track_name, date_str, db_path=DB_PATH, archive=True):
+    """
+    Deletes one meeting everywhere: selections, races, predictions, results, bet ledger rows and
+    the meeting row in a single transaction, then archives its card files, drops it from the
+    static export manifest / meetings.json and rebuilds docs/index.html so the homepage stops
+    linking to it. Returns a dict of counts and archived paths.
+    """
+    conn = connect(db_path)
+    tracks = track_variants(track_name)
+    marks = ",".join("?" * len(tracks))
+    counts = {}
+    try:
+        with conn:
+            # Take the write lock before the lookup so nothing lands between it and the deletes
+            conn.execute("BEGIN IMMEDIATE")
+            entry = lookup_meeting(conn, track_name, date_str)
+            race_marks = ",".join("?" * len(entry["race_ids"]))
+            c = conn.cursor()
+            if entry["race_ids"]:
+                counts["selections"] = c.execute(f"DELETE FROM selections WHERE race_id IN ({race_marks})", entry["race_ids"]).rowcount
+                counts["races"] = c.execute(f"DELETE FROM races WHERE id IN ({race_marks})", entry["race_ids"]).rowcount
+            for table in ["predictions", "results", "bet_ledger"]:
+                counts[table] = c.execute(f"DELETE FROM {table} WHERE track IN ({marks}) AND date = ?", tracks + [date_str]).rowcount
+            if entry["meeting_id"] is not None:
+                counts["meetings"] = c.execute("DELETE FROM meetings WHERE id = ?", (entry["meeting_id"],)).rowcount
+    finally:
+        conn.close()
+    invalidate_cache()
+
+    entry["deleted"] = counts
+    entry["archived"] = archive_artifacts(entry["artifacts"]) if archive else []
+    entry["unpublished"] = export_static.drop_meeting(entry["filename"])
+    homepage.update_homepage()
+    return entry
+
+def archive_log_file(track_name, date_str):
+    """Finds the card files for this track/date through the registry and moves them to trash."""
+    conn = connect()
+    try:
+        entry = lookup_meeting(conn, track_name, date_str)
+    finally:
+        conn.close()
+    return archive_artifacts(entry["artifacts"])
 
 def get_tracks_with_data(conn):
     """Returns a list of unique tracks that actually have meetings."""
@@ -43,7 +129,7 @@ def get_tracks_with_data(conn):
     return [row[0] for row in c.fetchall()]
 
 def delete_process():
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     
     while True:
         # --- SCREEN 1: SELECT TRACK ---
@@ -110,28 +196,12 @@ def delete_process():
                 
             date_str = target[0]
 
-            # PERFORM DELETE
+            # PERFORM DELETE (indexed cascade + file cleanup)
             try:
-                # Cascade delete races/selections
-                c.execute("SELECT id FROM races WHERE meeting_id = ?", (meeting_id,))
-                races = c.fetchall()
-                race_ids = [r[0] for r in races]
-
-                if race_ids:
-                    placeholders = ','.join(['?'] * len(race_ids))
-                    c.execute(f"DELETE FROM selections WHERE race_id IN ({placeholders})", race_ids)
-                    c.execute("DELETE FROM races WHERE meeting_id = ?", (meeting_id,))
-                    
-                c.execute("DELETE FROM meetings WHERE id = ?", (meeting_id,))
-                conn.commit()
-                print(f"✅ Deleted {selected_track} - {date_str}")
-                
-                # File cleanup
-                archive_log_file(selected_track, date_str)
-                
+                result = delete_meeting_cascade(selected_track, date_str)
+                print(f"✅ Deleted {selected_track} - {date_str} ({', '.join(f'{n} {t}' for t, n in result['deleted'].items())})")
             except Exception as e:
                 print(f"❌ Error: {e}")
-                conn.rollback()
 
     conn.close()
     print("Exited.")
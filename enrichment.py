@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Meeting Card Enrichment
+Derived fields served with every meeting card (rating gaps, solo locks / best bets, exotic
+suggestions, multi-race tickets, region, win probabilities, stakes). Shared by api.py (live responses) and
+export_static.py (static bundle) so both serve byte-for-byte the same card data.
+"""
+
+import os
+import re
+import json
+
+from track_registry import get_region_code
+from probability import MODEL_PATH, race_win_probabilities, listed_share
+from staking import POLICY_PATH, get_policy, card_stakes
+
+def get_region_for_track(track_name):
+    """Card region code for a track (AUS / UK / ASIA / HARNESS / USA) from the track registry."""
+    return get_region_code(track_name)
+
+def enrichment_stamp():
+    """
+    Versions of the fitted inputs behind the derived fields (probability model, staking policies).
+    Cached or exported cards are stale once this changes, even when the card file itself did not.
+    """
+    return [os.path.getmtime(p) if os.path.exists(p) else 0 for p in (MODEL_PATH, POLICY_PATH)]
+
+def compute_race_exotics_suggestions(contenders):
+    if not contenders or len(contenders) < 2:
+        return []
+
+    c_nums = [str(c.get("number") or c.get("program_number") or "") for c in contenders if (c.get("number") or c.get("program_number"))]
+    if len(c_nums) < 2:
+        return []
+
+    top_1 = c_nums[0]
+    top_2 = c_nums[1]
+    top_3 = c_nums[2] if len(c_nums) > 2 else c_nums[1]
+    top_4 = c_nums[3] if len(c_nums) > 3 else top_3
+
+    suggestions = []
+
+    # 1. Exacta Box
+    box_horses = ", ".join([f"#{n}" for n in c_nums[:3]])
+    suggestions.append({
+        "type": "Exacta Box",
+        "ticket": f"$2 Exacta Box: {box_horses}",
+        "cost": "$12.00 (6 combos)" if len(c_nums) >= 3 else "$4.00 (2 combos)",
+        "icon": "🎟️"
+    })
+
+    # 2. Exacta Key
+    key_under = ", ".join([f"#{n}" for n in c_nums[1:3]])
+    suggestions.append({
+        "type": "Exacta Key",
+        "ticket": f"$2 Exacta Key: #{top_1} over {key_under}",
+        "cost": "$4.00 (2 combos)",
+        "icon": "🔑"
+    })
+
+    # 3. Trifecta Key
+    if len(c_nums) >= 3:
+        tri_under = ", ".join([f"#{n}" for n in c_nums[1:4]])
+        suggestions.append({
+            "type": "Trifecta Key",
+            "ticket": f"$1 Trifecta Key: #{top_1} over #{top_2}, #{top_3} over {tri_under}",
+            "cost": "$4.00 (4 combos)",
+            "icon": "💎"
+        })
+
+    # 4. 10c Superfecta
+    if len(c_nums) >= 4:
+        suggestions.append({
+            "type": "10c Superfecta Wheel",
+            "ticket": f"10c Superfecta: #{top_1} / #{top_2}, #{top_3} / #{top_2}, #{top_3}, #{top_4} / ALL",
+            "cost": "$2.40 (24 combos)",
+            "icon": "⚡"
+        })
+
+    return suggestions
+
+def _race_sort_key(race_num):
+    # Cards mix 1 and "2" style race numbers; order numerically, non-numeric labels last
+    label = str(race_num).strip()
+    return (0, int(label), "") if label.isdigit() else (1, 0, label)
+
+def compute_race_enrichments(races, track_name=""):
+    enriched = []
+    share = listed_share()
+    sorted_races = []
+    for race in races:
+        contenders = race.get("all_contenders") or race.get("selections") or []
+        # Older cards list bare program numbers; only structured contenders can be rated
+        contenders = [c for c in contenders if isinstance(c, dict)]
+        sorted_contenders = sorted(contenders, key=lambda x: float(x.get("rating", 0)), reverse=True)
+        sorted_races.append((race, sorted_contenders, race_win_probabilities(sorted_contenders, track_name)))
+
+    # All bets on a card are placed together, so they are sized against the card exposure cap.
+    # win_probs are conditional on a listed runner winning; stakes need the unconditional chance
+    card = card_stakes([(win_probs * share, None) for _, _, win_probs in sorted_races], policy=get_policy())
+
+    for (race, sorted_contenders, win_probs), stakes in zip(sorted_races, card):
+        race_copy = dict(race)
+        # Calculate rating gap between top 2 horses
+        top_rating = float(sorted_contenders[0].get("rating", 0)) if len(sorted_contenders) > 0 else 0
+        second_rating = float(sorted_contenders[1].get("rating", 0)) if len(sorted_contenders) > 1 else 0
+        gap = round(top_rating - second_rating, 1)
+        
+        enriched_contenders = []
+        for i, c in enumerate(sorted_contenders):
+            c_copy = dict(c)
+            c_copy["win_probability"] = round(float(win_probs[i]), 4)
+            c_copy["suggested_stake"] = float(stakes[i])
+            r = float(c_copy.get("rating", 0))
+            is_top = (i == 0)
+            
+            c_copy["is_solo_lock"] = is_top and (r >= 90.0) and (gap >= 5.0)
+            c_copy["is_best_bet"] = is_top and (gap >= 3.0) and not c_copy["is_solo_lock"]
+            c_copy["win_lock_amount"] = float(stakes[i]) if is_top else 0.0
+            c_copy["gap_to_next"] = gap if is_top else 0.0
+            enriched_contenders.append(c_copy)
+            
+        race_copy["all_contenders"] = enriched_contenders
+        race_copy["rating_gap"] = gap
+        race_copy["has_solo_lock"] = any(c.get("is_solo_lock") for c in enriched_contenders)
+        race_copy["has_best_bet"] = any(c.get("is_best_bet") for c in enriched_contenders)
+        race_copy["exotic_suggestions"] = compute_race_exotics_suggestions(enriched_contenders)
+        enriched.append(race_copy)
+    return enriched
+
+def compute_exotic_tickets(races, track_name=""):
+    """
+    Daily double .. pick 6 tickets for every run of consecutive races. Legs come from
+    ticket_optimizer (highest hit probability within the default per-ticket budgets).
+    """
+    # ticket_optimizer builds on this module, so it is imported on first use
+    from ticket_optimizer import optimize_card
+
+    parsed_races = []
+    solo_locks = set()
+    for r in races:
+        r_num = r.get("number") or 1
+        contenders = r.get("all_contenders") or r.get("selections") or []
+        
+        parsed_c = []
+        for c in contenders:
+            if isinstance(c, dict):
+                num = str(c.get("number") or c.get("program_number") or "")
+                rating = float(c.get("rating") or c.get("features", {}).get("ai_holistic_score", 0) or 0)
+                name = c.get("name") or c.get("horse_name") or ""
+            elif isinstance(c, str):
+                num = ""
+                rating = 75.0
+                name = ""
+                m_num = re.search(r"number[:=](\w+)", c)
+                if m_num: num = m_num.group(1)
+                m_rat = re.search(r"rating[:=]([\d\.]+)", c)
+                if m_rat: rating = float(m_rat.group(1))
+            else:
+                continue
+            if num:
+                parsed_c.append({"number": num, "rating": rating, "name": name})
+
+        sorted_c = sorted(parsed_c, key=lambda x: x["rating"], reverse=True)
+        if not sorted_c:
+            continue
+        
+        top_r = sorted_c[0]["rating"]
+        r2_r = sorted_c[1]["rating"] if len(sorted_c) > 1 else 0
+        if top_r >= 90.0 and top_r - r2_r >= 5.0:
+            solo_locks.add(str(r_num))
+        parsed_races.append({"number": r_num, "all_contenders": sorted_c})
+
+    if not parsed_races:
+        return {}
+
+    def leg_text(race_num, leg):
+        if len(leg) == 1 and race_num in solo_locks:
+            return f"#{leg[0]} (SOLO LOCK)"
+        return ", ".join(f"#{h}" for h in leg)
+
+    optimized = optimize_card({"meta": {"track": track_name}, "races": parsed_races}, ranked=False)
+    exotics = {"daily_doubles": [], "pick_3": [], "pick_4": [], "pick_5": [], "pick_6": []}
+    for bet_type, tickets in optimized.items():
+        key = "daily_doubles" if bet_type == "daily_double" else bet_type
+        for t in tickets:
+            nums = t["races"]
+            legs = " / ".join(f"R{n} [{leg_text(n, leg)}]" for n, leg in zip(nums, t["legs"]))
+            title = f"R{nums[0]}-R{nums[-1]} Double" if bet_type == "daily_double" else f"Pick {len(nums)} (R{nums[0]}-R{nums[-1]})"
+            exotics[key].append(f"{title}: {legs} · ${t['cost']:.2f} · {t['hit_rate']:.1%} hit")
+    return exotics
+
+def load_meeting_json(filepath):
+    """Reads a meeting card, unwrapping double-encoded strings and single-item lists."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.loads(f.read())
+    if isinstance(data, str): data = json.loads(data)
+    if isinstance(data, list) and len(data) > 0: data = data[0]
+    return data
+
+def enrich_meeting(data):
+    """Adds the derived race fields, exotic tickets and meta region to a card (idempotent)."""
+    if "races" in data:
+        track_name = (data.get("meta") or {}).get("track", "")
+        data["races"] = compute_race_enrichments(data["races"], track_name)
+        data["exotic_tickets"] = compute_exotic_tickets(data["races"], track_name)
+    if "meta" in data and "region" not in data["meta"]:
+        data["meta"]["region"] = get_region_for_track(data["meta"].get("track", ""))
+    return data
+
+def meeting_counts(races):
+    """(solo_locks_count, best_bets_count) for enriched races."""
+    solo_locks = sum(1 for r in races if r.get("has_solo_lock"))
+    best_bets = sum(1 for r in races if r.get("has_best_bet"))
+    return solo_locks, best_bets
@@ -1,4 +1,3 @@
-import sqlite3
 import sys
 from datetime import datetime
 
@@ -10,14 +9,14 @@ except ImportError:
     print("   Please save the race_scraper code in the same folder.")
     race_scraper = None
 
-DB_NAME = "racing_data.db"
+from storage import connect
 
 def get_categorized_tracks(conn):
     """Separates tracks into 'Pending' (0 results) and 'Entered' (Partial/Done)."""
     c = conn.cursor()
     
-    # 1. All tracks
-    c.execute("SELECT DISTINCT track FROM meetings")
+    # 1. All tracks with race cards (the unified meetings index also lists card-less meetings)
+    c.execute("SELECT DISTINCT m.track FROM meetings m JOIN races r ON m.id = r.meeting_id")
     all_tracks = {row[0] for row in c.fetchall()}
 
     # 2. Tracks with at least one result
@@ -36,7 +35,7 @@ def get_categorized_tracks(conn):
     return pending_list, entered_list
 
 def enter_results():
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect()
     
     while True:
         # --- SCREEN 0: MAIN MENU ---
@@ -87,7 +86,11 @@ def enter_results():
             # --- SCREEN 2: SELECT MEETING ---
             while True:
                 c = conn.cursor()
-                c.execute("SELECT id, date, track_condition FROM meetings WHERE track = ? ORDER BY date DESC", (selected_track,))
+                c.execute("""
+                    SELECT id, date, track_condition FROM meetings m
+                    WHERE track = ? AND EXISTS (SELECT 1 FROM races r WHERE r.meeting_id = m.id)
+                    ORDER BY date DESC
+                """, (selected_track,))
                 meetings = c.fetchall()
                 
                 if not meetings:
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo Exotic Simulator
+Samples finishing orders for every race on a card from contender win probabilities
+(probability.py) and prices candidate exotic structures by simulated hit rate and cost:
+
+- Pick-N (daily double .. pick 6): per-leg spreads of the top-k contenders by probability.
+- Trifecta / superfecta: part-wheels - top-a for 1st, top-b for 2nd, top-c for 3rd (a <= b <= c ...).
+
+Each draw is reduced to capped probability ranks (winner rank per race, or the ranks of the
+first 3-4 finishers), histogrammed with bincount and cumulatively summed along every axis, so
+the hit rate of every spread combination is one array lookup instead of a per-ticket pass.
+
+Cards only list 4-6 contenders, so each race gets (field_size - listed) unlisted runners that
+share the historical probability that the winner was not on the card.
+
+    python exotic_sim.py logs/Saratoga_2026-07-18.json --draws 2000000 --budget 20 50
+"""
+
+import os
+import time
+import argparse
+import threading
+from itertools import product
+from collections import OrderedDict
+
+import numpy as np
+
+from enrichment import load_meeting_json, _race_sort_key
+from probability import MODEL_PATH, contender_rating, win_probabilities, temperature_for_track, listed_share
+
+DEFAULT_DRAWS = 200_000
+MAX_DRAWS = 5_000_000
+CHUNK_DRAWS = 100_000
+DEFAULT_FIELD_SIZE = 10
+DEFAULT_BUDGETS = (10.0, 20.0, 50.0, 100.0)
+TICKETS_PER_BUDGET = 3
+MAX_LEG_SPREAD = 4        # horses per pick-N leg
+MAX_POSITION_SPREAD = 6   # horses per trifecta / superfecta position
+CACHE_CAPACITY = 32
+
+PICK_LEGS = {"daily_double": 2, "pick_3": 3, "pick_4": 4, "pick_5": 5, "pick_6": 6}
+POSITION_PLACES = {"trifecta": 3, "superfecta": 4}
+BASE_STAKES = {"daily_double": 1.0, "pick_3": 0.5, "pick_4": 0.5, "pick_5": 0.5, "pick_6": 0.2,
+               "trifecta": 0.5, "superfecta": 0.1}
+BET_LABELS = {"daily_double": "Daily Double", "pick_3": "Pick 3", "pick_4": "Pick 4", "pick_5": "Pick 5",
+              "pick_6": "Pick 6", "trifecta": "Trifecta", "superfecta": "Superfecta"}
+
+# ==========================================
+# 🏇 RACE FIELDS
+# ==========================================
+def race_field(race, track_name="", field_size=DEFAULT_FIELD_SIZE, share=None, temperature=None):
+    """
+    (numbers, probs) for one race: listed contenders in descending probability order, followed by
+    the unlisted runners. Races without ratings spread the listed share evenly.
+    """
+    contenders = [c for c in (race.get("all_contenders") or race.get("selections") or [])
+                  if isinstance(c, dict) and str(c.get("number") or c.get("program_number") or "").strip()]
+    numbers = [str(c.get("number") or c.get("program_number")).strip() for c in contenders]
+    if not numbers:
+        return [], np.zeros(0)
+
+    ratings = np.array([contender_rating(c) for c in contenders])
+    if np.all(np.isnan(ratings)):
+        p = np.full(len(numbers), 1.0 / len(numbers))
+    else:
+        t = temperature if temperature is not None else temperature_for_track(track_name)
+        p = win_probabilities(ratings, t)
+
+    order = np.argsort(-p, kind="stable")
+    share = listed_share() if share is None else share
+    others = max(field_size - len(numbers), 1)
+    probs = np.concatenate([p[order] * share, np.full(others, (1.0 - share) / others)])
+    return [numbers[i] for i in order], probs
+
+def card_fields(data, field_size=DEFAULT_FIELD_SIZE, share=None):
+    """(race_nums, fields) for a card in race order; fields[i] is race_field() of the i-th race."""
+    track_name = (data.get("meta") or {}).get("track", "")
+    share = listed_share() if share is None else share
+    races = sorted((r for r in data.get("races") or [] if isinstance(r, dict)),
+                   key=lambda r: _race_sort_key(r.get("number") or r.get("race_number") or 0))
+    race_nums = [str(r.get("number") or r.get("race_number") or i) for i, r in enumerate(races, start=1)]
+    return race_nums, [race_field(r, track_name, field_size, share) for r in races]
+
+# ==========================================
+# 🎲 VECTORIZED SAMPLING
+# ==========================================
+def sample_winner_ranks(fields, draws, rng, cap=MAX_LEG_SPREAD):
+    """(draws, races) winner rank per race by inverse CDF; unlisted winners and ranks >= cap read as cap."""
+    out = np.empty((draws, len(fields)), dtype=np.int64)
+    for j, (numbers, probs) in enumerate(fields):
+        cdf = np.cumsum(probs)
+        idx = np.searchsorted(cdf, rng.random(draws) * cdf[-1], side="right")
+        out[:, j] = np.where(idx < len(numbers), np.minimum(idx, cap), cap)
+    return out
+
+def sample_finish_ranks(numbers, probs, draws, rng, places, cap=MAX_POSITION_SPREAD):
+    """
+    (draws, places) probability ranks of the first finishers. Plackett-Luce orders are sampled as an
+    exponential race: runner i finishes at E_i / p_i, so sorting the times gives the finishing order.
+    """
+    with np.errstate(divide="ignore"):
+        rate = (1.0 / probs).astype(np.float32)
+    times = rng.standard_exponential((draws, len(probs)), dtype=np.float32) * rate
+    top = np.argsort(times, axis=1)[:, :places]
+    return np.where(top < len(numbers), np.minimum(top, cap), cap)
+
+def _accumulate(hist, codes, base):
+    flat = np.ravel_multi_index(codes.T, (base,) * codes.shape[1])
+    hist += np.bincount(flat, minlength=hist.size).reshape(hist.shape)
+
+def _hit_table(hist, draws):
+    """hit[k1-1, k2-1, ...] = P(rank_a < k_a on every axis) from a histogram of capped ranks."""
+    cum = hist
+    for axis in range(hist.ndim):
+        cum = np.cumsum(cum, axis=axis)
+    return cum[(slice(0, hist.shape[0] - 1),) * hist.ndim] / draws
+
+# ==========================================
+# 🎟️ TICKETS
+# ==========================================
+def _pick_window(bet_type, race_nums, fields, hit):
+    """Every per-leg spread combination for one pick-N window as arrays."""
+    ranges = [range(1, min(MAX_LEG_SPREAD, len(numbers)) + 1) for numbers, _ in fields]
+    spreads = np.array(list(product(*ranges)))
+    return {"type": bet_type, "races": race_nums, "numbers": [numbers for numbers, _ in fields],
+            "spreads": spreads, "combinations": spreads.prod(axis=1), "hits": hit[tuple(spreads.T - 1)]}
+
+def _position_window(bet_type, race_num, numbers, hit):
+    """Nested part-wheels (each position widens the one before) for one trifecta / superfecta."""
+    places = POSITION_PLACES[bet_type]
+    top = min(MAX_POSITION_SPREAD, len(numbers))
+    spreads = np.array(list(product(range(1, top + 1), repeat=places)))
+    nested = np.all(np.diff(spreads, axis=1) >= 0, axis=1) & np.all(spreads > np.arange(places), axis=1)
+    spreads = spreads[nested]
+    return {"type": bet_type, "races": [race_num], "numbers": [numbers] * places,
+            "spreads": spreads, "combinations": (spreads - np.arange(places)).prod(axis=1),
+            "hits": hit[tuple(spreads.T - 1)]}
+
+def format_ticket(bet_type, race_nums, legs, combos, hit_rate):
+    """Ticket dict shared by the simulator and ticket_optimizer.py."""
+    if bet_type in POSITION_PLACES:
+        label = f"R{race_nums[0]} {BET_LABELS[bet_type]}: " + " / ".join(
+            f"[{', '.join('#' + h for h in leg)}]" for leg in legs)
+    else:
+        label = f"{BET_LABELS[bet_type]} (R{race_nums[0]}-R{race_nums[-1]}): " + " / ".join(
+            f"R{n} [{', '.join('#' + h for h in leg)}]" for n, leg in zip(race_nums, legs))
+    cost = round(combos * BASE_STAKES[bet_type], 2)
+    return {
+        "type": bet_type,
+        "races": race_nums,
+        "legs": legs,
+        "ticket": label,
+        "combinations": combos,
+        "cost": cost,
+        "hit_rate": round(hit_rate, 5),
+        "cost_per_hit": round(cost / hit_rate, 2) if hit_rate > 0 else None
+    }
+
+def _ticket(window, idx):
+    legs = [numbers[:k] for numbers, k in zip(window["numbers"], window["spreads"][idx])]
+    return format_ticket(window["type"], window["races"], legs, int(window["combinations"][idx]),
+                         float(window["hits"][idx]))
+
+def rank_by_budget(windows, budgets, per_budget=TICKETS_PER_BUDGET):
+    """
+    {budget: {bet_type: [tickets]}}: for every bet window (race sequence) the highest-hit structure
+    within budget (cheapest on ties), then the best windows per bet type.
+    """
+    ranked = {}
+    for budget in budgets:
+        by_type = {}
+        for window in windows:
+            costs = window["combinations"] * BASE_STAKES[window["type"]]
+            ok = np.flatnonzero((costs <= budget + 1e-9) & (window["hits"] > 0))
+            if ok.size:
+                best = ok[np.lexsort((costs[ok], -window["hits"][ok]))[0]]
+                by_type.setdefault(window["type"], []).append((window, best))
+        ranked[f"{budget:g}"] = {
+            bet_type: [_ticket(w, i) for w, i in
+                       sorted(picks, key=lambda wi: (-wi[0]["hits"][wi[1]], wi[0]["combinations"][wi[1]]))[:per_budget]]
+            for bet_type, picks in by_type.items()
+        }
+    return ranked
+
+def simulate_meeting(data, budgets=DEFAULT_BUDGETS, draws=DEFAULT_DRAWS, field_size=DEFAULT_FIELD_SIZE, seed=0):
+    """Simulates every race on a card and returns ranked exotic structures per budget."""
+    started = time.time()
+    share = listed_share()
+    race_nums, fields = card_fields(data, field_size, share)
+    rng = np.random.default_rng(seed)
+
+    # Pick-N windows over consecutive races that all list contenders
+    windows = [(bet_type, i, legs) for bet_type, legs in PICK_LEGS.items() for i in range(len(fields) - legs + 1)
+               if all(fields[j][0] for j in range(i, i + legs))]
+    leg_base = MAX_LEG_SPREAD + 1
+    pick_hists = {(bt, i): np.zeros((leg_base,) * legs, dtype=np.int64) for bt, i, legs in windows}
+    pos_base = MAX_POSITION_SPREAD + 1
+    pos_hists = {j: np.zeros((pos_base,) * max(POSITION_PLACES.values()), dtype=np.int64)
+                 for j, (numbers, probs) in enumerate(fields) if len(numbers) >= 3}
+
+    done = 0
+    while done < draws:
+        n = min(CHUNK_DRAWS, draws - done)
+        if windows:
+            winners = sample_winner_ranks(fields, n, rng)
+            for bet_type, i, legs in windows:
+                _accumulate(pick_hists[(bet_type, i)], winners[:, i:i + legs], leg_base)
+        for j, hist in pos_hists.items():
+            numbers, probs = fields[j]
+            _accumulate(hist, sample_finish_ranks(numbers, probs, n, rng, hist.ndim), pos_base)
+        done += n
+
+    candidates = []
+    for bet_type, i, legs in windows:
+        hit = _hit_table(pick_hists[(bet_type, i)], draws)
+        candidates.append(_pick_window(bet_type, race_nums[i:i + legs], fields[i:i + legs], hit))
+    for j, hist in pos_hists.items():
+        numbers = fields[j][0]
+        for bet_type, places in POSITION_PLACES.items():
+            if len(numbers) < places:
+                continue
+            # Trifecta hits ignore 4th place: marginalize the trailing axes
+            hit = _hit_table(hist.sum(axis=tuple(range(places, hist.ndim))), draws)
+            candidates.append(_position_window(bet_type, race_nums[j], numbers, hit))
+
+    return {
+        "draws": draws,
+        "field_size": field_size,
+        "listed_share": round(share, 4),
+        "elapsed_sec": round(time.time() - started, 3),
+        "budgets": rank_by_budget(candidates, budgets)
+    }
+
+# ==========================================
+# 🗃️ PER-MEETING-VERSION CACHE
+# ==========================================
+class SimulationCache:
+    """
+    LRU of simulation results keyed by card path and parameters. An entry is reused while the card
+    file and the fitted probability model are unchanged, so each card version is simulated once.
+    """
+
+    def __init__(self, capacity=CACHE_CAPACITY, model_path=MODEL_PATH):
+        self.capacity = capacity
+        self.model_path = model_path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _stamp(self, filepath):
+        st = os.stat(filepath)
+        model_mtime = os.path.getmtime(self.model_path) if os.path.exists(self.model_path) else 0
+        return (st.st_size, st.st_mtime, model_mtime)
+
+    def get(self, filepath, budgets=DEFAULT_BUDGETS, draws=DEFAULT_DRAWS):
+        key = (filepath, tuple(budgets), draws)
+        stamp = self._stamp(filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        result = simulate_meeting(load_meeting_json(filepath), budgets, draws)
+        with self._lock:
+            self._entries[key] = (stamp, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return result
+
+def parse_budgets(value):
+    """'20,50' -> (20.0, 50.0); empty -> DEFAULT_BUDGETS. Raises ValueError on bad input."""
+    if not value:
+        return DEFAULT_BUDGETS
+    budgets = tuple(sorted({float(b) for b in value.split(",") if b.strip()}))
+    if not budgets or any(b <= 0 for b in budgets):
+        raise ValueError("budgets must be positive numbers")
+    return budgets
+
+def parse_draws(value):
+    draws = int(value) if value else DEFAULT_DRAWS
+    if not 1_000 <= draws <= MAX_DRAWS:
+        raise ValueError(f"draws must be between 1000 and {MAX_DRAWS}")
+    return draws
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank exotic ticket structures for a card by simulated hit rate.")
+    parser.add_argument("card", help="Meeting JSON file")
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    parser.add_argument("--budget", type=float, nargs="+", default=list(DEFAULT_BUDGETS))
+    parser.add_argument("--field-size", type=int, default=DEFAULT_FIELD_SIZE)
+    args = parser.parse_args()
+
+    result = simulate_meeting(load_meeting_json(args.card), args.budget, args.draws, args.field_size)
+    print(f"🎲 {result['draws']:,} draws in {result['elapsed_sec']}s (listed share {result['listed_share']:.0%})")
+    for budget, by_type in result["budgets"].items():
+        print(f"\n💵 Budget ${budget}")
+        for bet_type, tickets in by_type.items():
+            for t in tickets:
+                print(f"   {t['hit_rate']:7.2%}  ${t['cost']:>6.2f}  {t['ticket']}")
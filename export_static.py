@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Incremental Static Exporter (Vercel / Netlify / GitHub Pages)
+Python replacement for export_static.ps1 that runs on any build host.
+
+- Keeps a content-hash manifest (frontend/.static_export_manifest.json); unchanged cards
+  (same size + mtime, or same SHA-256) are neither re-parsed nor re-copied. Every entry also
+  records the enrichment inputs it was built with, so a model refit re-exports every card.
+- Changed cards are enriched with the same code api.py serves live (enrichment.py) and
+  written minified to frontend/public/api/output/, optionally with .gz / .br siblings.
+- Each exported card is also split into frontend/public/api/races/<id>/skeleton.json and
+  race-<n>.json (race_store.py) so the card view can load one race at a time.
+- meetings.json is rebuilt from the manifest alone, so a publish with no card changes
+  touches nothing but the index.
+
+Usage: python export_static.py [--gzip] [--brotli] [--force]
+"""
+
+import os
+import json
+import gzip
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+
+from enrichment import load_meeting_json, enrich_meeting, meeting_counts, enrichment_stamp
+from race_store import write_meeting_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "api", "output")
+PUBLISHED_DIR = os.path.join(BASE_DIR, "docs", "meetings")
+PUBLIC_API_DIR = os.path.join(BASE_DIR, "frontend", "public", "api")
+MANIFEST_PATH = os.path.join(BASE_DIR, "frontend", ".static_export_manifest.json")
+
+MANIFEST_VERSION = 3  # 2: per-race store under api/races/, 3: enrichment inputs per entry
+DOTNET_EPOCH_TICKS = 621355968000000000  # keeps last_modified compatible with the PowerShell export
+
+def minify(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _write_atomic(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def _load_brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def write_variants(path, payload, use_gzip=False, brotli_mod=None):
+    """Writes the minified file plus optional pre-compressed siblings (mtime-free gzip for stable hashes)."""
+    _write_atomic(path, payload)
+    if use_gzip:
+        _write_atomic(path + ".gz", gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli_mod is not None:
+        _write_atomic(path + ".br", brotli_mod.compress(payload, quality=11))
+
+def remove_variants(path):
+    for suffix in ["", ".gz", ".br"]:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(files, manifest_path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    body = json.dumps({"version": MANIFEST_VERSION, "files": files}, indent=1, sort_keys=True)
+    _write_atomic(manifest_path, body.encode("utf-8"))
+
+def meeting_entry(fname, data, mtime):
+    """Meeting index row for meetings.json (same fields as export_static.ps1, minus is_published)."""
+    base = fname[:-len(".json")]
+    meta = data.get("meta") or {}
+    track = meta.get("track") or base.rsplit("_", 1)[0].replace("_", " ")
+    date_str = meta.get("date") or (base.rsplit("_", 1)[-1] if "_" in base else "2026-07-29")
+    races = data.get("races") or []
+    solo_locks, best_bets = meeting_counts(races)
+    return {
+        "id": base,
+        "filename": fname,
+        "track": track,
+        "date": date_str,
+        "race_count": len(races),
+        "solo_locks_count": solo_locks,
+        "best_bets_count": best_bets,
+        "region": meta.get("region", "USA"),
+        "last_modified": int(mtime * 10**7) + DOTNET_EPOCH_TICKS,
+    }
+
+def export_static(source_dir=SOURCE_DIR, public_dir=PUBLIC_API_DIR, published_dir=PUBLISHED_DIR,
+                  manifest_path=MANIFEST_PATH, use_gzip=False, use_brotli=False, force=False):
+    """Exports changed cards and rebuilds meetings.json. Returns a stats dict."""
+    output_dir = os.path.join(public_dir, "output")
+    races_dir = os.path.join(public_dir, "races")
+    os.makedirs(output_dir, exist_ok=True)
+
+    brotli_mod = _load_brotli() if use_brotli else None
+    if use_brotli and brotli_mod is None:
+        print("⚠️ brotli module not installed - skipping .br files (pip install brotli).")
+    variants = {"gzip": bool(use_gzip), "brotli": brotli_mod is not None}
+    inputs = enrichment_stamp()
+
+    manifest = {} if force else load_manifest(manifest_path)
+    stats = {"exported": 0, "unchanged": 0, "skipped": 0, "removed": 0}
+    files = {}
+
+    source_names = sorted(f for f in os.listdir(source_dir) if f.endswith(".json")) if os.path.isdir(source_dir) else []
+    for fname in source_names:
+        src_path = os.path.join(source_dir, fname)
+        dest_path = os.path.join(output_dir, fname)
+        store_dir = os.path.join(races_dir, fname[:-len(".json")])
+        st = os.stat(src_path)
+        known = manifest.get(fname)
+        up_to_date = (known and known.get("variants") == variants and known.get("inputs") == inputs
+                      and os.path.exists(dest_path) and os.path.exists(os.path.join(store_dir, "skeleton.json")))
+
+        if up_to_date and known["size"] == st.st_size and known["mtime"] == st.st_mtime:
+            files[fname] = known
+            stats["unchanged"] += 1
+            continue
+
+        with open(src_path, "rb") as f:
+            raw = f.read()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if up_to_date and known["hash"] == content_hash:
+            files[fname] = dict(known, size=st.st_size, mtime=st.st_mtime)
+            stats["unchanged"] += 1
+            continue
+
+        try:
+            data = load_meeting_json(src_path)
+            if not isinstance(data, dict):
+                raise ValueError("root is not a meeting object")
+            data = enrich_meeting(data)
+        except Exception as e:
+            print(f"⚠️ Skipping {fname}: {e}")
+            stats["skipped"] += 1
+            continue
+
+        write_variants(dest_path, minify(data), use_gzip, brotli_mod)
+        write_meeting_store(data, store_dir)
+        files[fname] = {
+            "size": st.st_size, "mtime": st.st_mtime, "hash": content_hash,
+            "variants": variants, "inputs": inputs, "meeting": meeting_entry(fname, data, st.st_mtime)
+        }
+        stats["exported"] += 1
+
+    # Cards deleted from the source disappear from the bundle too
+    for fname in set(manifest) - set(files):
+        remove_variants(os.path.join(output_dir, fname))
+        shutil.rmtree(os.path.join(races_dir, fname[:-len(".json")]), ignore_errors=True)
+        stats["removed"] += 1
+
+    stats["meetings"] = write_meetings_index(files, public_dir, published_dir, use_gzip, brotli_mod)
+    save_manifest(files, manifest_path)
+    return stats
+
+def write_meetings_index(files, public_dir=PUBLIC_API_DIR, published_dir=PUBLISHED_DIR, use_gzip=False, brotli_mod=None):
+    """Rebuilds meetings.json from manifest entries alone. Returns the meeting count."""
+    published = set()
+    if os.path.isdir(published_dir):
+        published = {f[:-len(".html")] for f in os.listdir(published_dir) if f.endswith(".html")}
+    meetings = [dict(entry["meeting"], is_published=entry["meeting"]["id"] in published) for entry in files.values()]
+    # Published first, then newest date (same order as the PowerShell export)
+    meetings.sort(key=lambda m: m["date"], reverse=True)
+    meetings.sort(key=lambda m: m["is_published"], reverse=True)
+
+    write_variants(os.path.join(public_dir, "meetings.json"), minify({"status": "success", "meetings": meetings}),
+                   use_gzip, brotli_mod)
+    return len(meetings)
+
+def drop_meeting(fname, public_dir=PUBLIC_API_DIR, published_dir=PUBLISHED_DIR, manifest_path=MANIFEST_PATH):
+    """
+    Removes one card from the static bundle (output file, per-race store, manifest entry) and
+    rebuilds meetings.json, without re-scanning the source cards. Returns True if it was listed.
+    """
+    files = load_manifest(manifest_path)
+    entry = files.pop(fname, None)
+    remove_variants(os.path.join(public_dir, "output", fname))
+    shutil.rmtree(os.path.join(public_dir, "races", fname[:-len(".json")]), ignore_errors=True)
+    if entry is None:
+        return False
+    index_path = os.path.join(public_dir, "meetings.json")
+    brotli_mod = _load_brotli() if os.path.exists(index_path + ".br") else None
+    write_meetings_index(files, public_dir, published_dir, os.path.exists(index_path + ".gz"), brotli_mod)
+    save_manifest(files, manifest_path)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export api/output cards into the static frontend bundle.")
+    parser.add_argument("--gzip", action="store_true", help="Also write pre-compressed .gz files")
+    parser.add_argument("--brotli", action="store_true", help="Also write pre-compressed .br files (needs brotli)")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and re-export every card")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    print("Exporting static data for Vercel / Netlify / GitHub Pages deployment...")
+    result = export_static(use_gzip=args.gzip, use_brotli=args.brotli, force=args.force)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ {result['meetings']} meetings in meetings.json | exported {result['exported']}, "
+          f"unchanged {result['unchanged']}, removed {result['removed']}, skipped {result['skipped']} ({elapsed:.1f}s)")
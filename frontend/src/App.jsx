@@ -7,13 +7,21 @@ import ExoticsCard from './components/ExoticsCard';
 import AnalyticsDashboard from './components/AnalyticsDashboard';
 import { RefreshCw, AlertCircle, ShieldCheck } from 'lucide-react';
 
+const MEETINGS_PAGE_SIZE = 50;
+
 export default function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [activeView, setActiveView] = useState('CARDS'); // 'CARDS' or 'ANALYTICS'
   const [meetings, setMeetings] = useState([]);
+  const [meetingsSource, setMeetingsSource] = useState('');
+  const [meetingsCursor, setMeetingsCursor] = useState(null);
+  const [loadingMoreMeetings, setLoadingMoreMeetings] = useState(false);
   const [activeMeeting, setActiveMeeting] = useState(null);
   const [meetingData, setMeetingData] = useState(null);
   const [activeRaceIndex, setActiveRaceIndex] = useState(0);
+  const [raceUrlFor, setRaceUrlFor] = useState(null); // set while the card is loaded race-by-race
+  const [loadedRaces, setLoadedRaces] = useState({});
+  const [raceLoading, setRaceLoading] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -50,19 +58,25 @@ export default function App() {
     setLoading(true);
     setError('');
     try {
+      // First page only - older meetings are pulled on demand from the selector
       let data = null;
+      let source = '/api/meetings';
       try {
-        data = await fetchJsonSafely('/api/meetings');
+        data = await fetchJsonSafely(`${source}?limit=${MEETINGS_PAGE_SIZE}`);
       } catch (e) {
         try {
-          data = await fetchJsonSafely('http://127.0.0.1:8888/api/meetings');
+          source = 'http://127.0.0.1:8888/api/meetings';
+          data = await fetchJsonSafely(`${source}?limit=${MEETINGS_PAGE_SIZE}`);
         } catch (err2) {
+          source = '';
           data = await fetchJsonSafely('/api/meetings.json');
         }
       }
 
       if (data && data.status === 'success' && data.meetings && data.meetings.length > 0) {
         setMeetings(data.meetings);
+        setMeetingsSource(source);
+        setMeetingsCursor(data.next_cursor || null);
         const publishedMeetings = data.meetings.filter((m) => m.is_published);
         const defaultMeeting = publishedMeetings.length > 0 ? publishedMeetings[0] : data.meetings[0];
         setActiveMeeting(defaultMeeting);
@@ -77,6 +91,24 @@ export default function App() {
     }
   };
 
+  const loadMoreMeetings = async () => {
+    if (!meetingsSource || !meetingsCursor || loadingMoreMeetings) return;
+    setLoadingMoreMeetings(true);
+    try {
+      const data = await fetchJsonSafely(
+        `${meetingsSource}?limit=${MEETINGS_PAGE_SIZE}&cursor=${encodeURIComponent(meetingsCursor)}`
+      );
+      if (data && data.status === 'success') {
+        setMeetings((prev) => [...prev, ...(data.meetings || [])]);
+        setMeetingsCursor(data.next_cursor || null);
+      }
+    } catch (e) {
+      console.error('Failed to load more meetings:', e);
+    } finally {
+      setLoadingMoreMeetings(false);
+    }
+  };
+
   const enrichMeetingRaces = (rawMeetingData) => {
     if (!rawMeetingData || !rawMeetingData.races) return rawMeetingData;
     const enrichedRaces = rawMeetingData.races.map((race) => {
@@ -115,7 +147,62 @@ export default function App() {
     };
   };
 
+  // Skeleton (meta + one navigator line per race) from the live API, then the static per-race store
+  const skeletonSources = (meetingId) => [
+    { skeleton: `/api/meetings/${meetingId}/skeleton`, race: (n) => `/api/meetings/${meetingId}/races/${n}` },
+    {
+      skeleton: `http://127.0.0.1:8888/api/meetings/${meetingId}/skeleton`,
+      race: (n) => `http://127.0.0.1:8888/api/meetings/${meetingId}/races/${n}`,
+    },
+    { skeleton: `/api/races/${meetingId}/skeleton.json`, race: (n) => `/api/races/${meetingId}/race-${n}.json` },
+  ];
+
+  const fetchRace = async (raceUrl, idx) => {
+    const data = await fetchJsonSafely(raceUrl(idx + 1));
+    const race = data.status === 'success' && data.data ? data.data : data;
+    return enrichMeetingRaces({ races: [race] }).races[0];
+  };
+
+  const ensureRaceLoaded = async (idx, urlFor = raceUrlFor) => {
+    if (!urlFor || typeof idx !== 'number' || loadedRaces[idx]) return;
+    setRaceLoading(true);
+    try {
+      const race = await fetchRace(urlFor, idx);
+      setLoadedRaces((prev) => ({ ...prev, [idx]: race }));
+    } catch (e) {
+      setError('Failed to fetch race details for this track.');
+    } finally {
+      setRaceLoading(false);
+    }
+  };
+
   const loadMeetingDetails = async (filename) => {
+    const meetingId = filename.replace(/\.json$/, '');
+    setLoading(true);
+    setLoadedRaces({});
+    for (const source of skeletonSources(meetingId)) {
+      try {
+        const data = await fetchJsonSafely(source.skeleton);
+        const skeleton = data.status === 'success' && data.data ? data.data : data;
+        if (!skeleton || !skeleton.races) continue;
+        // Skeleton plus the first race only; the rest load when selected
+        const firstRace = skeleton.races.length > 0 ? await fetchRace(source.race, 0) : null;
+        setMeetingData(skeleton);
+        setLoadedRaces(firstRace ? { 0: firstRace } : {});
+        setRaceUrlFor(() => source.race);
+        setActiveRaceIndex(0);
+        setLoading(false);
+        return;
+      } catch (e) {
+        // try the next source
+      }
+    }
+    setRaceUrlFor(null);
+    await loadFullMeeting(filename);
+  };
+
+  // Whole card in one response (cards exported before the per-race store existed)
+  const loadFullMeeting = async (filename) => {
     setLoading(true);
     try {
       let data = null;
@@ -145,6 +232,34 @@ export default function App() {
     }
   };
 
+  const handleSelectRace = (idx) => {
+    setActiveRaceIndex(idx);
+    ensureRaceLoaded(idx);
+  };
+
+  // Printing covers every race, so fetch whatever has not been opened yet first
+  const handlePrint = async () => {
+    if (raceUrlFor && meetingData?.races) {
+      const missing = meetingData.races.map((_, idx) => idx).filter((idx) => !loadedRaces[idx]);
+      if (missing.length > 0) {
+        try {
+          const fetched = await Promise.all(missing.map((idx) => fetchRace(raceUrlFor, idx)));
+          const additions = {};
+          missing.forEach((idx, i) => {
+            additions[idx] = fetched[i];
+          });
+          setLoadedRaces((prev) => ({ ...prev, ...additions }));
+          setTimeout(() => window.print(), 100);
+          return;
+        } catch (e) {
+          setError('Failed to fetch race details for this track.');
+          return;
+        }
+      }
+    }
+    window.print();
+  };
+
   const handleSelectMeeting = (m) => {
     setActiveMeeting(m);
     setActiveView('CARDS');
@@ -161,8 +276,10 @@ export default function App() {
     return <PinGate onAuthenticated={() => setIsAuthenticated(true)} />;
   }
 
-  const currentRace = activeRaceIndex !== 'EXOTICS' ? (meetingData?.races?.[activeRaceIndex] || null) : null;
-  const allRaces = meetingData?.races || [];
+  // Skeleton entries stand in for races that have not been fetched yet
+  const allRaces = (meetingData?.races || []).map((race, idx) => (raceUrlFor ? loadedRaces[idx] || race : race));
+  const currentRace = activeRaceIndex !== 'EXOTICS' ? (allRaces[activeRaceIndex] || null) : null;
+  const currentRacePending = Boolean(raceUrlFor) && typeof activeRaceIndex === 'number' && !loadedRaces[activeRaceIndex];
 
   return (
     <div className="min-h-screen bg-slate-50 text-slate-900 flex flex-col font-sans">
@@ -171,8 +288,12 @@ export default function App() {
         activeMeeting={activeMeeting}
         meetings={meetings}
         onSelectMeeting={handleSelectMeeting}
+        hasMoreMeetings={Boolean(meetingsSource && meetingsCursor)}
+        loadingMoreMeetings={loadingMoreMeetings}
+        onLoadMoreMeetings={loadMoreMeetings}
         activeView={activeView}
         onSelectView={(v) => setActiveView(v)}
+        onPrint={handlePrint}
       />
 
       {/* Sticky Race Navigation Bar (Only on Cards View) */}
@@ -180,7 +301,7 @@ export default function App() {
         <RaceNavigator
           races={allRaces}
           activeRaceIndex={activeRaceIndex}
-          onSelectRace={(idx) => setActiveRaceIndex(idx)}
+          onSelectRace={handleSelectRace}
         />
       )}
 
@@ -188,7 +309,7 @@ export default function App() {
       <main className="flex-1 max-w-7xl w-full mx-auto px-4 py-6 print:hidden">
         {activeView === 'ANALYTICS' ? (
           <AnalyticsDashboard />
-        ) : loading ? (
+        ) : loading || (currentRacePending && raceLoading) ? (
           <div className="flex flex-col items-center justify-center py-24 space-y-4 font-mono">
             <RefreshCw className="w-8 h-8 text-[#10b981] animate-spin" />
             <div className="text-center">
@@ -14,6 +14,7 @@ export default function AnalyticsDashboard() {
   const [availableTracks, setAvailableTracks] = useState([]);
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [simulation, setSimulation] = useState(null);
 
   useEffect(() => {
     fetchTracks();
@@ -23,6 +24,10 @@ export default function AnalyticsDashboard() {
     fetchAnalytics();
   }, [filterGroup, targetTrack, startDate, endDate, surface, condition, distType, raceClass]);
 
+  useEffect(() => {
+    fetchBankrollSimulation();
+  }, [targetTrack, startDate, endDate]);
+
   const fetchTracks = async () => {
     try {
       const res = await fetch('/api/analytics/tracks');
@@ -66,6 +71,23 @@ export default function AnalyticsDashboard() {
     }
   };
 
+  const fetchBankrollSimulation = async () => {
+    try {
+      const queryParams = new URLSearchParams({ track: targetTrack, start_date: startDate, end_date: endDate });
+      let data = null;
+      try {
+        const res = await fetch(`/api/analytics/bankroll?${queryParams.toString()}`);
+        data = await res.json();
+      } catch (err) {
+        const res = await fetch(`http://127.0.0.1:8888/api/analytics/bankroll?${queryParams.toString()}`);
+        data = await res.json();
+      }
+      setSimulation(data && data.status === 'success' ? data.simulation : null);
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
   const handleResetFilters = () => {
     setFilterGroup('US_TIER1');
     setTargetTrack('');
@@ -253,7 +275,7 @@ export default function AnalyticsDashboard() {
             <div className="bg-white rounded-2xl p-4 border border-emerald-300 shadow-xs space-y-2 bg-emerald-50/30">
               <div className="flex items-center justify-between text-xs text-slate-500 font-bold">
                 <span>🔥🔥 SOLO LOCK (+5.0 GAP)</span>
-                <span className="px-2 py-0.5 rounded bg-[#10b981] text-white font-black text-[10px]">$20 WIN</span>
+                <span className="px-2 py-0.5 rounded bg-[#10b981] text-white font-black text-[10px]">${analytics.solo_lock?.wager_size ?? 20} WIN</span>
               </div>
               <div className="flex items-baseline justify-between">
                 <span className="text-2xl font-black text-[#065f46]">{analytics.solo_lock?.win_rate}%</span>
@@ -269,7 +291,7 @@ export default function AnalyticsDashboard() {
             <div className="bg-white rounded-2xl p-4 border border-emerald-300 shadow-xs space-y-2 bg-emerald-50/20">
               <div className="flex items-center justify-between text-xs text-slate-500 font-bold">
                 <span>🔥 BEST BET (+3.0 GAP)</span>
-                <span className="px-2 py-0.5 rounded bg-emerald-600 text-white font-black text-[10px]">$10 WIN</span>
+                <span className="px-2 py-0.5 rounded bg-emerald-600 text-white font-black text-[10px]">${analytics.best_bet?.wager_size ?? 10} WIN</span>
               </div>
               <div className="flex items-baseline justify-between">
                 <span className="text-2xl font-black text-[#065f46]">{analytics.best_bet?.win_rate}%</span>
@@ -285,7 +307,7 @@ export default function AnalyticsDashboard() {
             <div className="bg-white rounded-2xl p-4 border border-slate-200 shadow-xs space-y-2">
               <div className="flex items-center justify-between text-xs text-slate-500 font-bold">
                 <span>🏁 TOP PICK OVERALL</span>
-                <span className="px-2 py-0.5 rounded bg-[#003366] text-white font-black text-[10px]">$5 WIN</span>
+                <span className="px-2 py-0.5 rounded bg-[#003366] text-white font-black text-[10px]">${analytics.top_pick_win?.wager_size ?? 5} WIN</span>
               </div>
               <div className="flex items-baseline justify-between">
                 <span className="text-2xl font-black text-[#003366]">{analytics.top_pick_win?.win_rate}%</span>
@@ -313,6 +335,67 @@ export default function AnalyticsDashboard() {
             </div>
           </div>
 
+          {/* BANKROLL SIMULATION: EQUITY CURVES, DRAWDOWN & RISK OF RUIN PER STAKING POLICY */}
+          {simulation && simulation.policies?.length > 0 && (
+            <div className="bg-white rounded-2xl p-5 border border-slate-200 shadow-xs space-y-4 font-mono">
+              <div className="flex items-center justify-between pb-2 border-b border-slate-200">
+                <div className="flex items-center gap-2">
+                  <TrendingUp className="w-5 h-5 text-[#10b981]" />
+                  <h3 className="text-base font-black text-[#003366] uppercase">
+                    BANKROLL SIMULATION ({simulation.races} SETTLED RACES, ${simulation.bankroll} START)
+                  </h3>
+                </div>
+                <span className="text-xs text-slate-500 font-sans">
+                  {simulation.start_date} → {simulation.end_date} · {Math.round(simulation.confidence * 100)}% bootstrap intervals over {simulation.samples} resamples
+                </span>
+              </div>
+
+              <EquityCurveChart simulation={simulation} />
+
+              <div className="overflow-x-auto">
+                <table className="w-full text-left text-xs border-collapse">
+                  <thead>
+                    <tr className="bg-slate-100 text-slate-700 font-black border-b border-slate-200 uppercase text-[11px]">
+                      <th className="p-2.5">Policy</th>
+                      <th className="p-2.5">Bets</th>
+                      <th className="p-2.5">Final Bankroll</th>
+                      <th className="p-2.5">ROI</th>
+                      <th className="p-2.5">Max Drawdown</th>
+                      <th className="p-2.5">Longest Losing Streak</th>
+                      <th className="p-2.5 text-right">Risk of Ruin (≤ ${simulation.ruin_level})</th>
+                    </tr>
+                  </thead>
+                  <tbody className="divide-y divide-slate-100 font-semibold text-slate-800">
+                    {simulation.policies.map((p, i) => (
+                      <tr key={p.name} className="hover:bg-slate-50 transition-colors">
+                        <td className="p-2.5 font-black" style={{ color: EQUITY_COLORS[i % EQUITY_COLORS.length] }}>{p.name.toUpperCase()}</td>
+                        <td className="p-2.5 text-slate-600">{p.bets}</td>
+                        <td className="p-2.5">
+                          <span className="font-black text-[#003366]">${p.final.toLocaleString()}</span>
+                          <span className="text-slate-500"> [{p.ci.final[0].toLocaleString()} – {p.ci.final[1].toLocaleString()}]</span>
+                        </td>
+                        <td className={`p-2.5 font-black ${p.roi >= 0 ? 'text-[#065f46]' : 'text-rose-600'}`}>
+                          {p.roi >= 0 ? '+' : ''}{p.roi}%
+                        </td>
+                        <td className="p-2.5">
+                          <span className="font-black text-rose-600">{p.max_drawdown}%</span>
+                          <span className="text-slate-500"> [{p.ci.max_drawdown[0]} – {p.ci.max_drawdown[1]}%]</span>
+                        </td>
+                        <td className="p-2.5">
+                          <span className="font-black">{p.longest_losing_streak}</span>
+                          <span className="text-slate-500"> [{p.ci.longest_losing_streak[0]} – {p.ci.longest_losing_streak[1]}]</span>
+                        </td>
+                        <td className={`p-2.5 text-right font-black ${p.risk_of_ruin > 5 ? 'text-rose-600' : 'text-[#065f46]'}`}>
+                          {p.risk_of_ruin}%{p.ruined ? ' (RUINED)' : ''}
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            </div>
+          )}
+
           {/* DETAILED LINE-BY-LINE RACE AUDIT LOG TABLE */}
           {analytics.race_logs && analytics.race_logs.length > 0 && (
             <div className="bg-white rounded-2xl p-5 border border-slate-200 shadow-xs space-y-4 font-mono">
@@ -474,3 +557,42 @@ export default function AnalyticsDashboard() {
     </div>
   );
 }
+
+const EQUITY_COLORS = ['#003366', '#10b981', '#f59e0b', '#e11d48', '#6366f1', '#0891b2'];
+
+// Log-scale equity curves (Kelly paths compound, so a linear axis flattens everything else)
+function EquityCurveChart({ simulation }) {
+  const width = 800;
+  const height = 220;
+  const floor = 1;
+  const values = simulation.policies.flatMap(p => [...p.equity, ...p.band[0], ...p.band[1]]);
+  const lo = Math.log10(Math.max(floor, Math.min(...values)));
+  const hi = Math.log10(Math.max(floor * 10, ...values));
+  const steps = simulation.curve_dates.length - 1 || 1;
+  const x = i => (i / steps) * width;
+  const y = v => height - ((Math.log10(Math.max(floor, v)) - lo) / (hi - lo || 1)) * height;
+  const line = pts => pts.map((v, i) => `${x(i).toFixed(1)},${y(v).toFixed(1)}`).join(' ');
+
+  return (
+    <div className="space-y-2">
+      <svg viewBox={`0 0 ${width} ${height}`} className="w-full h-56 bg-slate-50 rounded-xl border border-slate-200" preserveAspectRatio="none">
+        <line x1="0" x2={width} y1={y(simulation.bankroll)} y2={y(simulation.bankroll)} stroke="#94a3b8" strokeDasharray="4 4" />
+        {simulation.policies.map((p, i) => (
+          <g key={p.name}>
+            <polygon
+              points={`${line(p.band[1])} ${p.band[0].map((v, k) => `${x(k).toFixed(1)},${y(v).toFixed(1)}`).reverse().join(' ')}`}
+              fill={EQUITY_COLORS[i % EQUITY_COLORS.length]}
+              opacity="0.08"
+            />
+            <polyline points={line(p.equity)} fill="none" stroke={EQUITY_COLORS[i % EQUITY_COLORS.length]} strokeWidth="2" />
+          </g>
+        ))}
+      </svg>
+      <div className="flex justify-between text-[11px] text-slate-500 font-semibold">
+        <span>{simulation.curve_dates[0]}</span>
+        <span>Shaded: bootstrap equity band · dashed: starting bankroll · log scale</span>
+        <span>{simulation.curve_dates[simulation.curve_dates.length - 1]}</span>
+      </div>
+    </div>
+  );
+}
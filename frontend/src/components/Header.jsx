@@ -6,8 +6,12 @@ export default function Header({
   activeMeeting,
   meetings = [],
   onSelectMeeting,
+  hasMoreMeetings = false,
+  loadingMoreMeetings = false,
+  onLoadMoreMeetings,
   activeView = 'CARDS',
   onSelectView,
+  onPrint,
 }) {
   const [isMeetingDrawerOpen, setIsMeetingDrawerOpen] = useState(false);
   const [activeTab, setActiveTab] = useState('CURRENT');
@@ -91,7 +95,7 @@ export default function Header({
 
           {/* Print PDF Button */}
           <button
-            onClick={() => window.print()}
+            onClick={() => (onPrint ? onPrint() : window.print())}
             className="flex items-center gap-1.5 px-4 py-2 rounded-xl bg-[#10b981] hover:bg-emerald-600 text-white font-black text-xs uppercase tracking-wider shadow-md transition-all active:scale-95"
           >
             <Printer className="w-4 h-4" />
@@ -141,7 +145,7 @@ export default function Header({
                   }`}
                 >
                   <FileText className="w-4 h-4 text-slate-400" />
-                  ALL ARCHIVED CARDS ({meetings.length})
+                  ALL ARCHIVED CARDS ({meetings.length}{hasMoreMeetings ? '+' : ''})
                 </button>
               </div>
 
@@ -212,6 +216,16 @@ export default function Header({
                   </button>
                 ))
               )}
+
+              {hasMoreMeetings && onLoadMoreMeetings && (
+                <button
+                  onClick={onLoadMoreMeetings}
+                  disabled={loadingMoreMeetings}
+                  className="w-full py-2.5 rounded-xl border border-dashed border-slate-300 text-xs font-mono font-bold text-slate-600 hover:bg-slate-50 hover:text-[#003366] transition-all disabled:opacity-60"
+                >
+                  {loadingMoreMeetings ? 'Loading older cards...' : 'Load older cards'}
+                </button>
+              )}
             </div>
           </div>
         </div>
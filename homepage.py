@@ -0,0 +1,84 @@
+import base64
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCS_DIR = os.path.join(BASE_DIR, "docs")
+MEETINGS_DIR = os.path.join(DOCS_DIR, "meetings")
+
+# ==========================================
+# 🏠 STATIC HOMEPAGE (docs/index.html)
+# ==========================================
+# Shared by the Streamlit app and the delete tools so every path that adds or
+# removes a meeting page leaves the homepage listing in step with docs/meetings.
+def get_base64_logo():
+    path = os.path.join(BASE_DIR, "logo.png")
+    if not os.path.exists(path):
+        path = os.path.join(DOCS_DIR, "logo.png")
+    if os.path.exists(path):
+        with open(path, "rb") as image_file:
+            encoded = base64.b64encode(image_file.read()).decode()
+            return f"data:image/png;base64,{encoded}", path
+    return "", None
+
+def update_homepage():
+    """Rebuilds docs/index.html from the meeting pages currently in docs/meetings."""
+    files = [f for f in os.listdir(MEETINGS_DIR) if f.endswith(".html")]
+    grouped_files = {}
+    for f in files:
+        country = "International"
+        try:
+            with open(os.path.join(MEETINGS_DIR, f), "r", encoding="utf-8") as file_obj:
+                content = file_obj.read(500)
+                if "META_COUNTRY" in content:
+                    match = re.search(r"META_COUNTRY:([^\s]+)", content)
+                    if match:
+                        country = match.group(1).strip()
+        except:
+            pass
+        if "Aus" in f:
+            country = "Australia"
+        elif "USA" in f:
+            country = "USA"
+        elif "UK" in f:
+            country = "UK"
+
+        if country not in grouped_files:
+            grouped_files[country] = []
+        grouped_files[country].append(f)
+
+    logo_src, _ = get_base64_logo()
+    logo_html = (
+        f'<img src="{logo_src}" class="logo">'
+        if logo_src
+        else '<span style="font-size:3rem; margin-right:20px;">🏇</span>'
+    )
+
+    html = f"""<!DOCTYPE html><html lang="en"><head><title>Exacta AI</title><meta name="viewport" content="width=device-width, initial-scale=1"><style>
+    body {{ margin: 0; font-family: 'Segoe UI', sans-serif; background: #f8fafc; color: #333; }}
+    .container {{ max-width: 1000px; margin: 0 auto; padding: 20px; }}
+    .header {{ display: flex; align-items: center; border-bottom: 4px solid #003366; padding-bottom: 20px; margin-bottom: 20px; background: #fff; padding: 20px; }}
+    .logo {{ max-height: 80px; margin-right: 20px; }}
+    .header-info h1 {{ margin: 0; font-size: 2.5rem; color: #003366; text-transform: uppercase; font-weight: 800; }}
+    .header-info .meta {{ color: #64748b; font-weight: 600; margin-top: 5px; font-size: 1.1rem; }}
+    .section-title {{ border-bottom: 3px solid #ff6b00; padding-bottom: 10px; margin: 40px 0 20px 0; font-size: 1.5rem; color: #003366; font-weight: 700; }}
+    .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 20px; }}
+    .card {{ background: #fff; border: 1px solid #e2e8f0; border-radius: 8px; overflow: hidden; text-decoration: none; color: #333; display: block;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.05); transition: transform 0.2s; }}
+    .card:hover {{ transform: translateY(-3px); border-color: #ff6b00; }}
+    .card-body {{ padding: 20px; }}
+    .track-name {{ font-size: 1.2rem; font-weight: 700; color: #0f172a; display: block; }}
+    .status {{ color: #ff6b00; font-size: 0.8rem; font-weight: 700; margin-top: 10px; display: block; text-transform: uppercase; }}
+    </style></head><body>
+    <div class="header">{logo_html}<div class="header-info"><h1>Race Intelligence</h1><div class="meta">Professional Handicapping Database</div></div></div>
+    <div class="container">"""
+
+    for key in grouped_files.keys():
+        html += f'<div class="section-title">{key} Racing</div><div class="grid">'
+        for f in sorted(grouped_files[key], reverse=True):
+            display_name = f.replace(".html", "").replace("_", " ")
+            html += f'<a href="meetings/{f}" class="card"><div class="card-body"><span class="track-name">{display_name}</span><span class="status">● View Form</span></div></a>'
+        html += "</div>"
+    html += "</div></body></html>"
+    with open(os.path.join(DOCS_DIR, "index.html"), "w", encoding="utf-8") as f:
+        f.write(html)
@@ -1,24 +1,65 @@
-import sqlite3
 import os
 import re
-from bs4 import BeautifulSoup
-
-DB_FILE = "racing_ledger.db"
-# Your specific path
-LOGS_DIR = r"C:\Users\joery\OneDrive\Desktop\RacingAI\world-handicapper\docs\old"
+import html
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from storage import connect, init_storage, invalidate_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Archived meeting pages (Wagga_2026-01-26.html)
+LOGS_DIR = os.path.join(BASE_DIR, "docs", "old")
+
+FILENAME_PATTERN = re.compile(r"^(.+)_(\d{4}-\d{2}-\d{2})\.html$")
+
+# Targeted extraction: the pages are generated by app2.py, so each race is a flat
+# <div ... class="race-section"> block and the fields we need sit in fixed, un-nested elements.
+# Slicing the blocks with regexes skips building a DOM for the ~200 KB of CSS / logo / tables.
+RACE_SECTION = re.compile(r'<div[^>]*class="race-section"[^>]*>')
+RACE_HEADER = re.compile(r'<div class="race-header">(.*?)</div>', re.S)
+RACE_NUMBER = re.compile(r"RACE\s+(\d+)", re.I)
+STRATEGY_BLOCK = re.compile(r'<(\w+)[^>]*>\s*<b>\s*BETTING STRATEGY:?\s*</b>(.*?)</\1>', re.S | re.I)
+EXACTA_BOX = re.compile(r'<div class="exacta-box">(.*?)</div>', re.S)
+BEST_PANEL = re.compile(r'<div class="pick-box panel-best">(.*?)</div>', re.S)
+TAG = re.compile(r"<[^>]+>")
+
+# One temp-table join per update instead of one UPDATE per race / best bet.
+# Track names are compared without case / underscores / hyphens ("Eagle_Farm" file vs "Eagle Farm" row).
+TRACK_KEY_SQL = "LOWER(REPLACE(REPLACE({col}, '_', ' '), '-', ' '))"
+IMPORT_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS html_import (
+        date TEXT, race_number INTEGER, track_key TEXT, strategy TEXT, best_num TEXT,
+        PRIMARY KEY (date, race_number, track_key)
+    )
+"""
+UPDATE_STRATEGY_SQL = f"""
+    UPDATE races SET strategy = (
+        SELECT t.strategy FROM html_import t
+        WHERE t.date = races.date AND t.race_number = races.race_number AND t.track_key = {TRACK_KEY_SQL.format(col='races.track')}
+    )
+    WHERE EXISTS (
+        SELECT 1 FROM html_import t
+        WHERE t.date = races.date AND t.race_number = races.race_number AND t.track_key = {TRACK_KEY_SQL.format(col='races.track')}
+          AND t.strategy IS NOT NULL
+    )
+"""
+UPDATE_BEST_BETS_SQL = f"""
+    UPDATE selections SET confidence_level = 'Best of Day'
+    WHERE id IN (
+        SELECT s.id FROM html_import t
+        JOIN races r ON r.date = t.date AND r.race_number = t.race_number AND {TRACK_KEY_SQL.format(col='r.track')} = t.track_key
+        JOIN selections s ON s.race_id = r.id AND TRIM(s.horse_number) = t.best_num
+        WHERE t.best_num IS NOT NULL
+    )
+"""
 
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
 
 def ensure_db_columns():
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("ALTER TABLE races ADD COLUMN betting_strategy TEXT")
-    except sqlite3.OperationalError:
-        pass
-    conn.commit()
-    conn.close()
+    # races.strategy is part of the unified schema (storage.py)
+    init_storage()
 
 def clean_strategy_text(text):
     # Remove the label "BETTING STRATEGY:" and cleanup whitespace
@@ -26,89 +67,98 @@ def clean_strategy_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
 def extract_horse_number(text):
-    # Matches "#11" or "(11)" or just "11" at the start of a string
-    match = re.search(r'[#\(]?(\d+)', text)
+    # Matches "#11" or "(11)" in a pick label ("🏁 BEST BET: #4 Horse Name")
+    match = re.search(r'#(\d+)', text) or re.search(r'\((\d+)\)', text)
     if match: return match.group(1)
     return None
 
-def import_html_data():
+def text_of(fragment):
+    return html.unescape(TAG.sub(" ", fragment))
+
+def track_key(track_name):
+    return re.sub(r"[_\-]", " ", track_name).lower()
+
+def parse_meeting_html(filepath):
+    """
+    (track_key, date, [(race_number, strategy or None, best_bet_number or None)]) for one archived
+    page, or None when the file name is not <Track>_<YYYY-MM-DD>.html. Runs in worker processes.
+    """
+    match = FILENAME_PATTERN.match(os.path.basename(filepath))
+    if not match:
+        return None
+    track_part, date_part = match.groups()
+
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read()
+
+    starts = [m.start() for m in RACE_SECTION.finditer(content)] + [len(content)]
+    races = []
+    for start, end in zip(starts, starts[1:]):
+        block = content[start:end]
+        # 1. Identify Race Number
+        header = RACE_HEADER.search(block)
+        race_match = RACE_NUMBER.search(text_of(header.group(1))) if header else None
+        if not race_match: continue
+
+        # 2. Betting Strategy: the element holding the label, else the exacta box
+        strat = STRATEGY_BLOCK.search(block)
+        raw_strat = strat.group(2) if strat else (EXACTA_BOX.search(block) or [None, None])[1]
+        strategy = clean_strategy_text(text_of(raw_strat)) if raw_strat else None
+
+        # 3. Best Bets (the GOLD highlight: <div class="pick-box panel-best">)
+        best = BEST_PANEL.search(block)
+        best_num = extract_horse_number(text_of(best.group(1))) if best else None
+
+        if strategy or best_num:
+            races.append((int(race_match.group(1)), strategy or None, best_num))
+    return track_key(track_part), date_part, races
+
+def parse_archive(directory, workers=None):
+    """Parses every page in a process pool; returns (parsed meetings, skipped file count)."""
+    paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.html'))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(parse_meeting_html, paths, chunksize=8))
+    meetings = [p for p in parsed if p]
+    return meetings, len(parsed) - len(meetings)
+
+def apply_html_updates(conn, meetings):
+    """Loads all parsed races into a temp table and applies both updates in one transaction."""
+    rows = [(date, race_num, key, strategy, best_num)
+            for key, date, races in meetings for race_num, strategy, best_num in races]
+    with conn:
+        conn.execute(IMPORT_TABLE_SQL)
+        conn.execute("DELETE FROM temp.html_import")
+        # Later files win when two pages cover the same race (sorted file order, as before)
+        conn.executemany("INSERT OR REPLACE INTO temp.html_import VALUES (?, ?, ?, ?, ?)", rows)
+        strat_updates = conn.execute(UPDATE_STRATEGY_SQL).rowcount
+        best_updates = conn.execute(UPDATE_BEST_BETS_SQL).rowcount
+        conn.execute("DROP TABLE temp.html_import")
+    invalidate_cache()
+    return len(rows), strat_updates, best_updates
+
+def import_html_data(directory=LOGS_DIR, workers=None):
     ensure_db_columns()
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    if not os.path.exists(LOGS_DIR):
-        print(f"Error: Directory not found: {LOGS_DIR}")
+    if not os.path.exists(directory):
+        print(f"Error: Directory not found: {directory}")
         return
 
-    files = [f for f in os.listdir(LOGS_DIR) if f.endswith('.html')]
-    print(f"\nScanning {len(files)} HTML files in docs/old...")
-
-    strat_updates = 0
-    best_updates = 0
-
-    for filename in files:
-        filepath = os.path.join(LOGS_DIR, filename)
-        
-        # Parse Date from filename (Wagga_2026-01-26.html)
-        try:
-            name_parts = filename.replace('.html', '').split('_')
-            date_part = name_parts[-1]
-        except:
-            continue
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-
-        races = soup.find_all('div', class_='race-section')
-        
-        for race_div in races:
-            # 1. Identify Race Number
-            header = race_div.find('div', class_='race-header')
-            if not header: continue
-            
-            race_match = re.search(r'RACE\s+(\d+)', header.get_text(), re.IGNORECASE)
-            if not race_match: continue
-            race_num = int(race_match.group(1))
-
-            # 2. Extract Betting Strategy (Text Search Method)
-            strategy_label = race_div.find('b', string=re.compile('BETTING STRATEGY', re.IGNORECASE))
-            if strategy_label and strategy_label.parent:
-                raw_strat = strategy_label.parent.get_text()
-                clean_strat = clean_strategy_text(raw_strat)
-                
-                cursor.execute("""
-                    UPDATE races SET betting_strategy = ?
-                    WHERE date = ? AND race_number = ?
-                """, (clean_strat, date_part, race_num))
-                if cursor.rowcount > 0: strat_updates += 1
-
-            # 3. Extract Best Bets (The GOLD Highlight)
-            # We look specifically for <div class="pick-box panel-best">
-            best_panel = race_div.find('div', class_='panel-best')
-            if best_panel:
-                # The text usually looks like "🏁 BEST BET: #4 Horse Name"
-                # We need to extract the number carefully.
-                text_content = best_panel.get_text()
-                
-                # Regex to find the number after a '#'
-                h_match = re.search(r'#(\d+)', text_content)
-                if h_match:
-                    h_num = h_match.group(1)
-                    
-                    # Update DB
-                    cursor.execute("""
-                        UPDATE predictions SET confidence_level = 'Best of Day'
-                        WHERE horse_number = ? AND race_uuid IN (
-                            SELECT race_uuid FROM races WHERE date = ? AND race_number = ?
-                        )
-                    """, (h_num, date_part, race_num))
-                    if cursor.rowcount > 0: best_updates += 1
-
-    conn.commit()
-    conn.close()
-    print(f"\nImport Complete.")
+    started = time.time()
+    meetings, skipped = parse_archive(directory, workers)
+    print(f"\nScanned {len(meetings) + skipped} HTML files in {os.path.relpath(directory, BASE_DIR)} ({skipped} skipped: not <Track>_<date>.html)")
+
+    conn = get_connection()
+    try:
+        parsed_races, strat_updates, best_updates = apply_html_updates(conn, meetings)
+    finally:
+        conn.close()
+    print(f"\nImport Complete ({parsed_races} races parsed in {time.time() - started:.1f}s).")
     print(f"  - Strategies Imported: {strat_updates}")
     print(f"  - Gold 'Best Bets' Tagged: {best_updates}")
 
 if __name__ == "__main__":
-    import_html_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import betting strategies and best bets from archived meeting HTML.")
+    parser.add_argument("--dir", default=LOGS_DIR, help="Folder of <Track>_<date>.html pages (default: docs/old)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+    import_html_data(args.dir, args.workers)
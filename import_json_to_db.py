@@ -1,94 +1,24 @@
-import sqlite3
 import json
 import os
 import glob
-import uuid
 
-DB_FILE = "racing_ledger.db"
-LOGS_DIR = "logs"
-
-def get_connection():
-    return sqlite3.connect(DB_FILE)
+from storage import connect, init_storage, make_race_uuid, upsert_meeting, upsert_races, upsert_selections, invalidate_cache, LOGS_DIR
 
 def setup_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 1. Races Table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS races (
-        race_uuid TEXT PRIMARY KEY,
-        track TEXT,
-        date TEXT,
-        race_number INTEGER,
-        distance TEXT,
-        surface TEXT,
-        class TEXT,
-        betting_strategy TEXT
-    )
-    ''')
-
-    # 2. Predictions Table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS predictions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        race_uuid TEXT,
-        horse_number TEXT,
-        horse_name TEXT,
-        rank_prediction INTEGER, 
-        confidence_level TEXT,
-        FOREIGN KEY (race_uuid) REFERENCES races (race_uuid)
-    )
-    ''')
-
-    # 3. Results Table (for completeness)
-    cursor.execute('''CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            race_uuid TEXT UNIQUE, 
-            winner_number TEXT, 
-            second_number TEXT, 
-            third_number TEXT, 
-            win_payout REAL, 
-            exacta_payout REAL, 
-            trifecta_payout REAL,
-            FOREIGN KEY (race_uuid) REFERENCES races (race_uuid)
-    )''')
-
-    conn.commit()
-    conn.close()
+    # Races / selections / results now live in the unified schema (storage.py)
+    init_storage()
 
 def migrate_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    columns_to_add = {
-        'distance': 'TEXT',
-        'surface': 'TEXT',
-        'class': 'TEXT',
-        'betting_strategy': 'TEXT'
-    }
-    
+    # Column migrations are applied by storage.init_storage(); kept for existing callers
     print("Checking database schema...")
-    for col, dtype in columns_to_add.items():
-        try:
-            cursor.execute(f"ALTER TABLE races ADD COLUMN {col} {dtype}")
-            print(f"   [Migrate] Added column '{col}' to 'races'")
-        except sqlite3.OperationalError:
-            pass # Column likely exists
-            
-    conn.commit()
-    conn.close()
+    init_storage()
 
 def generate_uuid(track, date, race_num):
     # Create a consistent UUID based on track/date/race
-    # Sanitize inputs
-    s_track = str(track).lower().strip().replace(" ", "_")
-    s_date = str(date).strip()
-    s_num = str(race_num).strip()
-    return f"{s_track}_{s_date}_R{s_num}"
+    return make_race_uuid(track, date, race_num)
 
 def import_logs():
-    conn = get_connection()
+    conn = connect()
     cursor = conn.cursor()
     
     json_files = glob.glob(os.path.join(LOGS_DIR, "*.json"))
@@ -111,24 +41,27 @@ def import_logs():
             meta = data.get('meta', {})
             track = meta.get('track', 'Unknown')
             date = meta.get('date', 'Unknown')
-            
-            for race in data.get('races', []):
-                r_num = race.get('number')
-                race_uuid = generate_uuid(track, date, r_num)
-                
-                # Check if race exists
-                cursor.execute("SELECT 1 FROM races WHERE race_uuid = ?", (race_uuid,))
-                if cursor.fetchone():
-                    continue # Skip existing
-                
-                # Insert Race
-                strategy = race.get('exotic_strategy', {}).get('strategy', '')
-                cursor.execute("""
-                    INSERT INTO races (race_uuid, track, date, race_number, distance, surface, betting_strategy)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (race_uuid, track, date, r_num, race.get('distance'), race.get('surface'), strategy))
-                
-                new_races += 1
+
+            # Check which races already exist
+            cursor.execute("SELECT race_uuid FROM races WHERE track = ? AND date = ?", (track, date))
+            existing = {row[0] for row in cursor.fetchall()}
+            new_card_races = [r for r in data.get('races', []) if generate_uuid(track, date, r.get('number')) not in existing]
+            if not new_card_races:
+                continue # Skip existing
+
+            meeting_id = upsert_meeting(cursor, track, date, track_condition=meta.get('track_condition'))
+            race_ids = upsert_races(cursor, meeting_id, track, date, [{
+                "race_number": race.get('number'),
+                "distance": race.get('distance'),
+                "surface": race.get('surface'),
+                "strategy": (race.get('exotic_strategy') or {}).get('strategy', '')
+            } for race in new_card_races])
+            new_races += len(new_card_races)
+
+            selection_rows = []
+            for race in new_card_races:
+                race_id = race_ids.get(str(race.get('number')))
+                if race_id is None: continue
                 
                 # Insert Selections
                 selections = race.get('selections', [])
@@ -143,27 +76,22 @@ def import_logs():
                     
                     rank = i + 1
                     conf = "Top Pick" if i == 0 else "Contender"
-                    
-                    cursor.execute("""
-                        INSERT INTO predictions (race_uuid, horse_number, horse_name, rank_prediction, confidence_level)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (race_uuid, horse.get('number'), horse.get('name'), rank, conf))
-                    new_preds += 1
+                    selection_rows.append((race_id, rank, horse.get('number'), horse.get('name'), horse.get('barrier'), horse.get('reason'), horse.get('rating'), str(rank), conf))
                 
-                # Insert Danger Horse as rank 4 (or special tag)
+                # Insert Danger Horse as rank 99 (special tag)
                 danger = race.get('danger_horse', {})
                 if danger and danger.get('number'):
-                     cursor.execute("""
-                        INSERT INTO predictions (race_uuid, horse_number, horse_name, rank_prediction, confidence_level)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (race_uuid, danger.get('number'), danger.get('name'), 99, "Danger"))
-                     new_preds += 1
+                    selection_rows.append((race_id, 99, danger.get('number'), danger.get('name'), danger.get('barrier'), danger.get('reason'), None, "99", "Danger"))
+
+            upsert_selections(cursor, selection_rows)
+            new_preds += len(selection_rows)
 
         except Exception as e:
             print(f"[Error] {filepath}: {e}")
             
     conn.commit()
     conn.close()
+    invalidate_cache()
     
     print("\n" + "="*30)
     print(f"IMPORT COMPLETE")
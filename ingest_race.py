@@ -5,6 +5,8 @@ import time
 import PyPDF2
 from datetime import datetime
 
+import llm_json
+
 # --- CONFIG ---
 # 1. ENTER YOUR API KEY HERE OR SET AS ENV VARIABLE
 API_KEY = os.environ.get("GEMINI_API_KEY")
@@ -40,10 +42,6 @@ def flatten_track_list(data):
                 tracks.update(flatten_track_list(v))
     return tracks
 
-def clean_json(text):
-    text = text.replace("```json", "").replace("```", "").strip()
-    return text
-
 def ingest_race_card():
     # 1. Find PDF
     pdf_files = [f for f in os.listdir(TEMP_DIR) if f.endswith(".pdf")]
@@ -103,8 +101,7 @@ def ingest_race_card():
     
     try:
         response = model.generate_content(text_content)
-        json_str = clean_json(response.text)
-        data = json.loads(json_str)
+        data = llm_json.decode(response.text, MODEL_NAME)
         
         # 5. Save Results
         timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
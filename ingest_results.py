@@ -1,15 +1,15 @@
-import sqlite3
 import os
-import json
-import re
 from google import genai
 from google.genai import types
 import PyPDF2
 import glob
 
+import llm_json
+from storage import connect, init_storage, make_race_uuid, find_race_by_uuid, upsert_result, invalidate_cache
+
 # --- CONFIGURATION ---
-DB_FILE = "racing_ledger.db"
 RESULTS_DIR = "results"
+RESULTS_MODEL = "gemini-1.5-flash"
 
 # --- API KEY SETUP ---
 api_key = os.environ.get("GEMINI_API_KEY")
@@ -64,55 +64,11 @@ Return a valid JSON object containing the metadata and results for every race fo
 """
 
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
 
 def ensure_results_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Check if table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='results'")
-    table_exists = cursor.fetchone()
-
-    if table_exists:
-        # Check if race_uuid is unique
-        cursor.execute("PRAGMA index_list('results')")
-        indexes = cursor.fetchall()
-        is_unique = any(idx[2] == 1 for idx in indexes) # Index 2 is 'unique' flag
-        
-        if not is_unique:
-            print("   ⚠️ Database Schema Fix Required: Rebuilding 'results' table...")
-            # Rename old table
-            cursor.execute("ALTER TABLE results RENAME TO results_old")
-            # Create new correct table
-            cursor.execute('''CREATE TABLE results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                race_uuid TEXT UNIQUE, 
-                winner_number TEXT, 
-                second_number TEXT, 
-                third_number TEXT, 
-                win_payout REAL, 
-                exacta_payout REAL, 
-                trifecta_payout REAL
-            )''')
-            # Copy data back
-            cursor.execute("INSERT INTO results (race_uuid, winner_number, second_number, third_number, win_payout, exacta_payout, trifecta_payout) SELECT race_uuid, winner_number, second_number, third_number, win_payout, exacta_payout, trifecta_payout FROM results_old")
-            cursor.execute("DROP TABLE results_old")
-            print("   ✅ Database fixed.")
-    else:
-        cursor.execute('''CREATE TABLE results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                race_uuid TEXT UNIQUE, 
-                winner_number TEXT, 
-                second_number TEXT, 
-                third_number TEXT, 
-                win_payout REAL, 
-                exacta_payout REAL, 
-                trifecta_payout REAL
-                )''')
-    
-    conn.commit()
-    conn.close()
+    # results (keyed on date, track, race_number) ships with the unified schema in storage.py
+    init_storage()
 
 def extract_text_from_pdf(filepath):
     with open(filepath, 'rb') as f:
@@ -126,14 +82,13 @@ def parse_results_with_ai(text):
     print("   🤖 Asking AI to extract results (this takes a few seconds)...")
     try:
         response = client.models.generate_content(
-            model='gemini-1.5-flash', 
+            model=RESULTS_MODEL, 
             contents=f"{SYSTEM_PROMPT}\n\nDATA:\n{text[:50000]}", 
             config=types.GenerateContentConfig(
                 response_mime_type='application/json'
             )
         )
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-        return json.loads(clean_text)
+        return llm_json.decode(response.text, RESULTS_MODEL)
     except Exception as e:
         print(f"   [Error] AI extraction failed: {e}")
         return None
@@ -168,28 +123,21 @@ def save_results_to_db(data):
 
     for race in data.get('races', []):
         r_num = race.get('race_number')
-        race_uuid = f"{clean_track}_{raw_date}_R{r_num}"
+        race_uuid = make_race_uuid(clean_track, raw_date, r_num)
+
+        # Grade against the card's own track/date spelling so the result joins to its selections
+        known = find_race_by_uuid(cursor, race_uuid)
+        track, date, race_number = (known[1], known[2], known[3]) if known else (raw_track, raw_date, r_num)
         
         try:
-            cursor.execute("""
-                INSERT INTO results (race_uuid, winner_number, second_number, third_number, win_payout, exacta_payout, trifecta_payout)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(race_uuid) DO UPDATE SET
-                    winner_number=excluded.winner_number,
-                    second_number=excluded.second_number,
-                    third_number=excluded.third_number,
-                    win_payout=excluded.win_payout,
-                    exacta_payout=excluded.exacta_payout,
-                    trifecta_payout=excluded.trifecta_payout
-            """, (
-                race_uuid,
-                str(race.get('winner_pgm', '')),
-                str(race.get('second_pgm', '')),
-                str(race.get('third_pgm', '')),
-                safe_float(race.get('win_payout')),     # Use safe_float wrapper
-                safe_float(race.get('exacta_payout')),  # Use safe_float wrapper
-                safe_float(race.get('trifecta_payout')) # Use safe_float wrapper
-            ))
+            upsert_result(cursor, date, track, race_number,
+                win_num=str(race.get('winner_pgm', '')),
+                place_num=str(race.get('second_pgm', '')),
+                show_num=str(race.get('third_pgm', '')),
+                win_payout=safe_float(race.get('win_payout')),         # Use safe_float wrapper
+                exacta_payout=safe_float(race.get('exacta_payout')),   # Use safe_float wrapper
+                trifecta_payout=safe_float(race.get('trifecta_payout')) # Use safe_float wrapper
+            )
             updates += 1
             print(f"     ✅ Graded Race {r_num} (Winner: #{race.get('winner_pgm')} - Pay: ${safe_float(race.get('win_payout')):.2f})")
         except Exception as e:
@@ -197,10 +145,11 @@ def save_results_to_db(data):
 
     conn.commit()
     conn.close()
+    invalidate_cache()
     print(f"\n   🎉 Successfully graded {updates} races.")
 
 def main():
-    ensure_results_table() # This will now auto-fix your DB schema
+    ensure_results_table() # Unified schema (storage.py)
     
     if not os.path.exists(RESULTS_DIR):
         os.makedirs(RESULTS_DIR)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+LLM JSON Decoding
+One decoder for every model response we ingest (app2, app.py, ingest_race, ingest_results,
+backtest_driver, main).
+
+Stages, cheapest first; the first one that produces a value wins:
+    fast      json.loads on the text (markdown fences stripped only when present)
+    tolerant  one pass of a forgiving parser: skips prose around the JSON, trailing / missing
+              commas, raw newlines and unescaped double quotes inside strings, single quotes,
+              Python literals, comments, and closes whatever a truncated response left open
+    repair    json_repair.repair_json, when installed (last resort)
+
+Race payloads are checked against the contender schema the handicapping prompts ask for.
+Every decode is counted per model (which stage succeeded, failures, schema issues) in
+data/llm_json_stats.json, so fallback rates can be compared when picking a model:
+
+    python llm_json.py              # per-model stage table
+    python llm_json.py --self-test  # run SELF_TEST_CASES through parse()
+"""
+
+import os
+import re
+import sys
+import json
+import atexit
+import argparse
+import threading
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATS_PATH = os.path.join(BASE_DIR, "data", "llm_json_stats.json")
+
+STAGES = ["fast", "tolerant", "repair", "failed"]
+FLUSH_EVERY = 25  # decodes between stats file writes (the rest is written at exit)
+FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+BARE_WORD = re.compile(r"[^,:{}\[\]\n]*")
+# What may follow the comma after a closing quote: an object key, or the start of an array value
+# (a closing bracket covers trailing commas)
+KEY_AHEAD = re.compile(r"\s*(?:\"[^\"\n]*\"|'[^'\n]*'|[A-Za-z_$][\w$-]*)\s*:|\s*[\"'][^\"'\n]*$|\s*[}\]]|\s*$")
+VALUE_AHEAD = re.compile(r"""\s*(?:["'{\[\]]|[-+.\d]|(?:true|false|null|none|nan)\b)|\s*$""", re.IGNORECASE)
+LITERALS = {"true": True, "false": False, "null": None, "none": None, "nan": None}
+ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class LLMJSONError(ValueError):
+    """Raised when no stage could decode a response."""
+
+def _load_repair():
+    try:
+        from json_repair import repair_json
+        return repair_json
+    except ImportError:
+        return None
+
+_repair_json = _load_repair()
+
+# ==========================================
+# 🧹 TOLERANT SINGLE-PASS PARSER
+# ==========================================
+class _TolerantParser:
+    def __init__(self, text):
+        self.s = text
+        self.n = len(text)
+        self.i = 0
+
+    def parse(self):
+        starts = [p for p in (self.s.find("{"), self.s.find("[")) if p >= 0]
+        if not starts:
+            raise LLMJSONError("no JSON object or array in response")
+        self.i = min(starts)
+        return self._value()
+
+    def _skip(self):
+        s, n = self.s, self.n
+        while self.i < n:
+            ch = s[self.i]
+            if ch in " \t\r\n":
+                self.i += 1
+            elif s.startswith("//", self.i):
+                end = s.find("\n", self.i)
+                self.i = n if end < 0 else end + 1
+            elif s.startswith("/*", self.i):
+                end = s.find("*/", self.i + 2)
+                self.i = n if end < 0 else end + 2
+            else:
+                return
+
+    def _value(self, context=None):
+        self._skip()
+        if self.i >= self.n:
+            return None  # truncated right before a value
+        ch = self.s[self.i]
+        if ch == "{":
+            return self._object()
+        if ch == "[":
+            return self._array()
+        if ch == '"' or ch == "'":
+            return self._string(ch, context)
+        number = NUMBER.match(self.s, self.i)
+        if number and (number.end() >= self.n or self.s[number.end()] in " \t\r\n,}]"):
+            self.i = number.end()
+            text = number.group(0)
+            return float(text) if any(c in text for c in ".eE") else int(text)
+        # Bare word: Python / JS literal or an unquoted string
+        word = BARE_WORD.match(self.s, self.i)
+        # Always advance, so a stray ':' cannot stall the enclosing array
+        self.i = max(word.end(), self.i + 1)
+        text = word.group(0).strip()
+        return LITERALS[text.lower()] if text.lower() in LITERALS else text
+
+    def _object(self):
+        self.i += 1
+        out = {}
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return out
+            ch = self.s[self.i]
+            if ch == "}":
+                self.i += 1
+                return out
+            if ch == "]":
+                return out  # mismatched close: let the enclosing array consume it
+            if ch == ",":
+                self.i += 1
+                continue
+            if ch == '"' or ch == "'":
+                key = self._string(ch, "key")
+            else:
+                end = self.s.find(":", self.i)
+                if end < 0:
+                    return out
+                key = self.s[self.i:end].strip()
+                self.i = end
+            self._skip()
+            if self.i < self.n and self.s[self.i] == ":":
+                self.i += 1
+            out[key] = self._value(KEY_AHEAD)
+
+    def _array(self):
+        self.i += 1
+        out = []
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return out
+            ch = self.s[self.i]
+            if ch == "]":
+                self.i += 1
+                return out
+            if ch == "}":
+                self.i += 1  # stray close inside an array
+                continue
+            if ch == ",":
+                self.i += 1
+                continue
+            out.append(self._value(VALUE_AHEAD))
+
+    def _string(self, quote, context=None):
+        """
+        context: "key" for object keys, else the pattern the text after a ',' must match for the
+        quote before it to close the string (KEY_AHEAD in objects, VALUE_AHEAD in arrays).
+        """
+        s, n = self.s, self.n
+        self.i += 1
+        parts = []
+        while self.i < n:
+            # Jump to the next quote or backslash
+            q = s.find(quote, self.i)
+            b = s.find("\\", self.i)
+            stop = min(p for p in (q, b, n) if p >= 0)
+            parts.append(s[self.i:stop])
+            self.i = stop
+            if stop >= n:
+                break
+            if stop == b:
+                esc = s[self.i + 1:self.i + 2]
+                if esc == "u" and re.match(r"[0-9a-fA-F]{4}", s[self.i + 2:self.i + 6]):
+                    code = int(s[self.i + 2:self.i + 6], 16)
+                    self.i += 6
+                    low = s[self.i + 2:self.i + 6] if s.startswith("\\u", self.i) else ""
+                    if 0xD800 <= code < 0xDC00 and re.match(r"[dD][c-fC-F][0-9a-fA-F]{2}", low):
+                        # Surrogate pair (emoji escaped by json.dumps): one character, as json.loads gives
+                        code = 0x10000 + ((code - 0xD800) << 10) + (int(low, 16) - 0xDC00)
+                        self.i += 6
+                    parts.append(chr(code))
+                else:
+                    parts.append(ESCAPES.get(esc, esc))
+                    self.i += 2
+                continue
+            # A quote only closes the string when a delimiter follows; otherwise it is an
+            # unescaped quote inside handicapper notes ("He "won" easily"). A comma only counts
+            # when a key / value follows it ("He said "hi", then left" stays one string).
+            j = self.i + 1
+            while j < n and s[j] in " \t\r\n":
+                j += 1
+            self.i += 1
+            if j >= n or s[j] in "}]":
+                return "".join(parts)
+            if context == "key" and s[j] == ":":
+                return "".join(parts)
+            if s[j] == "," and (context in (None, "key") or context.match(s, j + 1)):
+                return "".join(parts)
+            if context is None and s[j] == ":":
+                return "".join(parts)
+            parts.append(quote)
+        return "".join(parts)
+
+def strip_fences(text):
+    """Text without a surrounding ```json fence (cheap no-op when there is none)."""
+    text = (text or "").strip()
+    return FENCE.sub("", text).strip() if text.startswith("```") or text.endswith("```") else text
+
+def parse(text):
+    """(value, stage) for an LLM response. Raises LLMJSONError when every stage fails."""
+    body = strip_fences(text)
+    try:
+        return json.loads(body), "fast"
+    except ValueError:
+        pass
+    try:
+        return _TolerantParser(body).parse(), "tolerant"
+    except (LLMJSONError, RecursionError):
+        pass
+    if _repair_json is not None:
+        try:
+            return json.loads(_repair_json(body)), "repair"
+        except Exception:
+            pass
+    raise LLMJSONError(f"could not decode model output ({len(body)} chars)")
+
+# ==========================================
+# ✅ CONTENDER SCHEMA
+# ==========================================
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def validate_race(race):
+    """Schema problems for one race object in the handicapping format ([] when valid)."""
+    if not isinstance(race, dict):
+        return ["race is not an object"]
+    issues = []
+    if not _is_number(race.get("race_number")):
+        issues.append("race_number missing or not a number")
+    contenders = race.get("contenders")
+    if not isinstance(contenders, list) or not contenders:
+        return issues + ["no contenders"]
+    for pos, horse in enumerate(contenders, start=1):
+        if not isinstance(horse, dict):
+            issues.append(f"contender {pos} is not an object")
+            continue
+        if not str(horse.get("horse_name") or "").strip():
+            issues.append(f"contender {pos} has no horse_name")
+        if not str(horse.get("program_number") or horse.get("number") or "").strip():
+            issues.append(f"contender {pos} has no program_number")
+        features = horse.get("features")
+        if not isinstance(features, dict):
+            issues.append(f"contender {pos} has no features")
+        elif not _is_number(features.get("ai_holistic_score")):
+            issues.append(f"contender {pos} ai_holistic_score missing or not a number")
+    return issues
+
+def race_objects(value):
+    """Race dicts from any shape a model returns: [race, ...], race or {"races": [...]}."""
+    if isinstance(value, dict) and isinstance(value.get("races"), list):
+        value = value["races"]
+    if isinstance(value, dict):
+        return [value]
+    return [r for r in value if isinstance(r, dict)] if isinstance(value, list) else []
+
+# ==========================================
+# 📊 PER-MODEL METRICS
+# ==========================================
+class DecodeStats:
+    """Per-model stage counters, merged into a JSON file so every script adds to the same totals."""
+
+    def __init__(self, path=STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._unflushed = 0
+        atexit.register(self.flush)
+
+    def record(self, model, stage, schema_issues=0):
+        with self._lock:
+            counts = self._pending.setdefault(model or "unknown", Counter())
+            counts["calls"] += 1
+            counts[stage] += 1
+            if schema_issues:
+                counts["schema_invalid"] += 1
+            self._unflushed += 1
+            due = self._unflushed >= FLUSH_EVERY
+        if due:
+            self.flush()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._unflushed = 0
+            totals = self.load()
+            for model, counts in self._pending.items():
+                merged = Counter(totals.get(model, {}))
+                merged.update(counts)
+                totals[model] = dict(merged)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(totals, f, indent=4, sort_keys=True)
+                os.replace(tmp_path, self.path)
+                self._pending = {}
+            except OSError:
+                pass  # read-only checkout: keep counting in memory
+
+stats = DecodeStats()
+
+def decode(text, model="", record=True):
+    """Decoded value of a model response (any JSON shape). Raises LLMJSONError."""
+    try:
+        value, stage = parse(text)
+    except LLMJSONError:
+        if record:
+            stats.record(model, "failed")
+        raise
+    if record:
+        stats.record(model, stage)
+    return value
+
+def decode_races(text, model="", record=True):
+    """
+    (races, issues) for a handicapping response: race dicts in any wrapping plus their schema
+    problems as "Race N: problem" strings. Raises LLMJSONError when nothing decodes.
+    """
+    try:
+        value, stage = parse(text)
+    except LLMJSONError:
+        if record:
+            stats.record(model, "failed")
+        raise
+    races = race_objects(value)
+    issues = [f"Race {r.get('race_number', '?')}: {problem}" for r in races for problem in validate_race(r)]
+    if not races:
+        issues.append("no race objects in response")
+    if record:
+        stats.record(model, stage, schema_issues=len(issues))
+    return races, issues
+
+# ==========================================
+# 🧪 SELF-CHECK
+# ==========================================
+# (model output, expected parse() value) for the shapes the tolerant parser has to handle
+SELF_TEST_CASES = [
+    ('{"a": 1, "b": [true, null]}', {"a": 1, "b": [True, None]}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Here are the picks:\n{"a": 1,}\nGood luck!', {"a": 1}),
+    ("{'a': 'x', 'b': True, 'c': None}", {"a": "x", "b": True, "c": None}),
+    ('{"a": 1, // note\n "b": 2 /* done */}', {"a": 1, "b": 2}),
+    ('{"a": [1, 2', {"a": [1, 2]}),
+    ('{"a": "x", "b', {"a": "x", "b": None}),
+    ('{"notes": "He "won" easily", "b": 1}', {"notes": 'He "won" easily', "b": 1}),
+    ('{"a":"x","b":"He said "hi", then left","c":1}', {"a": "x", "b": 'He said "hi", then left', "c": 1}),
+    ('["He said "hi", then left", "b"]', ['He said "hi", then left', "b"]),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ('{"a": "\\ud83d\\udccf Route", "b": "caf\\u00e9",}', {"a": "\U0001f4cf Route", "b": "caf\u00e9"}),
+    ('[{"race_number": 1}, {"race_number": 2}]', [{"race_number": 1}, {"race_number": 2}]),
+]
+
+def self_test():
+    """Runs SELF_TEST_CASES through parse(); returns the number of failures."""
+    failures = 0
+    for text, expected in SELF_TEST_CASES:
+        try:
+            value, stage = parse(text)
+        except LLMJSONError as e:
+            value, stage = e, "failed"
+        if value != expected:
+            failures += 1
+            print(f"❌ {text!r}\n   expected {expected!r}\n   got      {value!r} ({stage})")
+    print(f"{len(SELF_TEST_CASES) - failures}/{len(SELF_TEST_CASES)} decode cases passed.")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-model LLM JSON decode stats.")
+    parser.add_argument("--self-test", action="store_true", help="Check the decoder against SELF_TEST_CASES")
+    args = parser.parse_args()
+    if args.self_test:
+        sys.exit(1 if self_test() else 0)
+
+    totals = stats.load()
+    if not totals:
+        print(f"No decodes recorded yet ({os.path.relpath(STATS_PATH, BASE_DIR)}).")
+    else:
+        print(f"{'Model':<32} | {'Calls':>6} | " + " | ".join(f"{s:>8}" for s in STAGES) + f" | {'Schema ✗':>8}")
+        print("-" * 100)
+        for model, counts in sorted(totals.items(), key=lambda kv: -kv[1].get("calls", 0)):
+            calls = counts.get("calls", 0) or 1
+            cells = " | ".join(f"{counts.get(s, 0) / calls * 100:>7.1f}%" for s in STAGES + ["schema_invalid"])
+            print(f"{model[:32]:<32} | {counts.get('calls', 0):>6} | {cells}")
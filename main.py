@@ -1,10 +1,11 @@
 import streamlit as st
 import google.generativeai as genai
 import pandas as pd
-import json
 import time
 from datetime import date
 
+import llm_json
+
 # --- PAGE SETUP ---
 st.set_page_config(page_title="PaceValue AI", page_icon="🏇", layout="wide")
 
@@ -89,7 +90,8 @@ def analyze_uploaded_file(uploaded_file):
         status_text.empty() # Clear status
         
         # Parse JSON
-        return json.loads(response.text).get("horses", [])
+        data = llm_json.decode(response.text, model_choice)
+        return data.get("horses", []) if isinstance(data, dict) else []
 
     except Exception as e:
         st.error(f"Analysis Failed: {e}")
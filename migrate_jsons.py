@@ -1,90 +1,167 @@
+"""
+Legacy JSON -> predictions migration (idempotent).
+
+Cards in logs/ are parsed in a process pool and normalized by prediction_rows.py (the same rows
+agents/backfill_db_from_logs.py writes), and rows are streamed in batches into a temp
+table keyed on (date, track, race_number). The diff against predictions is computed with set
+joins: new races are inserted, changed races are updated in place, unchanged ones are left
+alone, so running it twice changes nothing.
+
+    python migrate_jsons.py            # dry run: print the diff only
+    python migrate_jsons.py --apply    # print the diff, then upsert in one transaction
+"""
+
 import os
-import json
-import sqlite3
-
-# --- PATHS ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
-
-def migrate_old_jsons():
-    print("🚀 Starting JSON to SQLite Migration...")
-    
-    if not os.path.exists(DB_PATH):
-        print("❌ Database not found! Please run app.py once to create the database.")
-        return
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    files_processed = 0
-    races_inserted = 0
-
-    # Loop through everything in the logs folder
-    for filename in os.listdir(LOGS_DIR):
-        if filename.endswith(".json") and filename != "track_db.json":
-            filepath = os.path.join(LOGS_DIR, filename)
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                    
-                    # Handle if the AI wrapped it in a list
-                    if isinstance(data, list): data = data[0] if data else {}
-                    
-                    meta = data.get("meta", {})
-                    date = meta.get('date', 'Unknown Date')
-                    track = meta.get('track', 'Unknown Track')
-                    condition = meta.get('track_condition', 'Standard')
-                    
-                    for race in data.get("races", []):
-                        selections = race.get('selections', [])
-                        
-                        # Handle legacy formatting just in case
-                        if not selections and 'picks' in race:
-                            p = race['picks']
-                            selections = [p.get('top_pick', {}), p.get('danger_horse', {}), p.get('value_bet', {})]
-                            selections = [s for s in selections if s and s.get('name')]
-                        
-                        while len(selections) < 4: selections.append({})
-                        dang = race.get('danger_horse') or {}
-                        
-                        # Insert into the database
-                        c.execute('''
-                            INSERT INTO predictions (
-                                date, track, race_number, distance, surface, condition,
-                                p1_num, p1_barrier, p1_name, p1_reason,
-                                p2_num, p2_barrier, p2_name, p2_reason,
-                                p3_num, p3_barrier, p3_name, p3_reason,
-                                p4_num, p4_barrier, p4_name, p4_reason,
-                                danger_num, danger_barrier, danger_name, danger_reason,
-                                confidence, ai_model, temperature
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            date, track, str(race.get('number')), race.get('distance', ''), race.get('surface', ''), condition,
-                            selections[0].get('number', 'N/A'), selections[0].get('barrier', ''), selections[0].get('name', 'N/A'), selections[0].get('reason', 'N/A'),
-                            selections[1].get('number', ''), selections[1].get('barrier', ''), selections[1].get('name', ''), selections[1].get('reason', ''),
-                            selections[2].get('number', ''), selections[2].get('barrier', ''), selections[2].get('name', ''), selections[2].get('reason', ''),
-                            selections[3].get('number', ''), selections[3].get('barrier', ''), selections[3].get('name', ''), selections[3].get('reason', ''),
-                            dang.get('number', ''), dang.get('barrier', ''), dang.get('name', ''), dang.get('reason', ''),
-                            race.get('confidence_level', ''), 'Legacy JSON Import', 0.0
-                        ))
-                        races_inserted += 1
-                        
-                    files_processed += 1
-                    print(f"✅ Migrated: {filename}")
-                
-                except Exception as e:
-                    print(f"⚠️ Failed to parse {filename}: {e}")
-
-    conn.commit()
-    conn.close()
-    
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from storage import connect, invalidate_cache, DB_PATH, LOGS_DIR
+from prediction_rows import SKIP_FILES, KEY_COLUMNS, CARD_COLUMNS, ROW_COLUMNS, load_card, card_rows
+
+BATCH_SIZE = 2000
+SAMPLE_CHANGES = 10
+
+# Only set when the race is new (never overwrite what app2 logged for a live run)
+INSERT_ONLY = {"ai_model": "Legacy JSON Import", "temperature": 0.0}
+
+# ==========================================
+# 🧹 CARD PARSING (runs in worker processes)
+# ==========================================
+def parse_card(filepath):
+    """(filename, rows, error) for one card."""
+    filename = os.path.basename(filepath)
+    try:
+        return filename, card_rows(filename, load_card(filepath)), None
+    except Exception as e:
+        return filename, [], str(e)
+
+# ==========================================
+# 🔀 SET-BASED DIFF & UPSERT
+# ==========================================
+def _match(alias="t"):
+    return " AND ".join(f"p.{k} = {alias}.{k}" for k in KEY_COLUMNS)
+
+def _differs(alias="t"):
+    return " OR ".join(f"p.{k} IS NOT {alias}.{k}" for k in CARD_COLUMNS)
+
+def stage_rows(conn, filepaths, workers=None):
+    """Streams parsed cards from the pool into temp.migrate_rows in batches. Returns (files, errors)."""
+    conn.execute("DROP TABLE IF EXISTS temp.migrate_rows")
+    conn.execute(f"CREATE TEMP TABLE migrate_rows ({', '.join(ROW_COLUMNS)}, PRIMARY KEY ({', '.join(KEY_COLUMNS)}))")
+    insert = f"INSERT OR REPLACE INTO temp.migrate_rows VALUES ({', '.join('?' * len(ROW_COLUMNS))})"
+
+    batch, files, errors = [], 0, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps file order, so when two cards cover the same race the later file wins
+        for filename, rows, error in pool.map(parse_card, filepaths, chunksize=16):
+            if error:
+                errors.append((filename, error))
+                continue
+            files += 1
+            batch.extend(rows)
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(insert, batch)
+                batch = []
+    if batch:
+        conn.executemany(insert, batch)
+    return files, errors
+
+def diff_staged(conn):
+    """Counts of new / changed / unchanged races, duplicate predictions rows and a sample of changes."""
+    total = conn.execute("SELECT COUNT(*) FROM temp.migrate_rows").fetchone()[0]
+    new = conn.execute(f"SELECT COUNT(*) FROM temp.migrate_rows t WHERE NOT EXISTS (SELECT 1 FROM predictions p WHERE {_match()})").fetchone()[0]
+    changed = conn.execute(f"""
+        SELECT COUNT(*) FROM temp.migrate_rows t
+        WHERE EXISTS (SELECT 1 FROM predictions p WHERE {_match()} AND ({_differs()}))
+    """).fetchone()[0]
+    duplicates = conn.execute(f"""
+        SELECT COALESCE(SUM(n - 1), 0) FROM (
+            SELECT COUNT(*) AS n FROM predictions p JOIN temp.migrate_rows t ON {_match()} GROUP BY p.date, p.track, p.race_number
+        ) WHERE n > 1
+    """).fetchone()[0]
+    flags = ", ".join(f"p.{k} IS NOT t.{k}" for k in CARD_COLUMNS)
+    sample = []
+    for row in conn.execute(f"""
+        SELECT t.date, t.track, t.race_number, {flags} FROM temp.migrate_rows t JOIN predictions p ON {_match()}
+        WHERE {_differs()} LIMIT {SAMPLE_CHANGES}
+    """):
+        sample.append((row[:3], [col for col, diff in zip(CARD_COLUMNS, row[3:]) if diff]))
+    return {"total": total, "new": new, "changed": changed, "unchanged": total - new - changed,
+            "duplicates": duplicates, "sample": sample}
+
+def apply_staged(conn, dedupe=False):
+    """Upserts the staged rows in one transaction. Returns (inserted, updated, deduped)."""
+    insert_cols = ROW_COLUMNS + list(INSERT_ONLY)
+    with conn:
+        deduped = 0
+        if dedupe:
+            # Earlier non-idempotent runs left copies of the same race; keep the newest row per key
+            deduped = conn.execute(f"""
+                DELETE FROM predictions WHERE id IN (
+                    SELECT p.id FROM predictions p JOIN temp.migrate_rows t ON {_match()}
+                    WHERE p.id < (SELECT MAX(p2.id) FROM predictions p2
+                                  WHERE p2.date = p.date AND p2.track = p.track AND p2.race_number = p.race_number)
+                )
+            """).rowcount
+        updated = conn.execute(f"""
+            UPDATE predictions AS p SET ({', '.join(CARD_COLUMNS)}) = (
+                SELECT {', '.join(CARD_COLUMNS)} FROM temp.migrate_rows t WHERE {_match()}
+            )
+            WHERE EXISTS (SELECT 1 FROM temp.migrate_rows t WHERE {_match()} AND ({_differs()}))
+        """).rowcount
+        inserted = conn.execute(f"""
+            INSERT INTO predictions ({', '.join(insert_cols)})
+            SELECT {', '.join('t.' + k for k in ROW_COLUMNS)}, {', '.join('?' * len(INSERT_ONLY))}
+            FROM temp.migrate_rows t
+            WHERE NOT EXISTS (SELECT 1 FROM predictions p WHERE {_match()})
+        """, list(INSERT_ONLY.values())).rowcount
+    invalidate_cache()
+    return inserted, updated, deduped
+
+def migrate_old_jsons(logs_dir=LOGS_DIR, db_path=DB_PATH, apply=False, dedupe=False, workers=None):
+    print("🚀 Starting JSON to SQLite Migration..." + ("" if apply else " (dry run)"))
+    started = time.time()
+
+    filepaths = sorted(os.path.join(logs_dir, f) for f in os.listdir(logs_dir)
+                       if f.endswith(".json") and f not in SKIP_FILES)
+    conn = connect(db_path)
+    try:
+        files, errors = stage_rows(conn, filepaths, workers)
+        for filename, error in errors:
+            print(f"⚠️ Failed to parse {filename}: {error}")
+        diff = diff_staged(conn)
+
+        print("\n" + "="*40)
+        print(f"📁 Files Parsed: {files} ({len(errors)} failed)")
+        print(f"🏇 Races in Archive: {diff['total']}")
+        print(f"   ➕ New:       {diff['new']}")
+        print(f"   ✏️  Changed:   {diff['changed']}")
+        print(f"   ✅ Unchanged: {diff['unchanged']}")
+        if diff["duplicates"]:
+            print(f"   ♊ Duplicate prediction rows for these races: {diff['duplicates']} (remove with --dedupe)")
+        for (date, track, race_num), cols in diff["sample"]:
+            print(f"      {track} {date} R{race_num}: {', '.join(cols)}")
+
+        if not apply:
+            print("\nDry run only - re-run with --apply to write these changes.")
+            return diff
+        inserted, updated, deduped = apply_staged(conn, dedupe)
+    finally:
+        conn.close()
+
     print("\n" + "="*40)
-    print(f"🎉 MIGRATION COMPLETE!")
-    print(f"📁 Files Processed: {files_processed}")
-    print(f"🏇 Total Races Added: {races_inserted}")
+    print(f"🎉 MIGRATION COMPLETE! ({time.time() - started:.1f}s)")
+    print(f"🏇 Races Added: {inserted} | Updated: {updated}" + (f" | Duplicates Removed: {deduped}" if dedupe else ""))
     print("="*40)
+    return diff
 
 if __name__ == "__main__":
-    migrate_old_jsons()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Idempotent migration of legacy meeting JSON into predictions.")
+    parser.add_argument("--apply", action="store_true", help="Write the changes (default: dry-run diff only)")
+    parser.add_argument("--dedupe", action="store_true", help="With --apply, also drop older duplicate rows per race")
+    parser.add_argument("--dir", default=LOGS_DIR, help="Folder of meeting JSON cards (default: logs/)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+    migrate_old_jsons(args.dir, args.db, args.apply, args.dedupe, args.workers)
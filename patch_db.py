@@ -1,5 +1,6 @@
 import sqlite3
-import json
+
+from raw_store import load_raw_features
 
 DB_PATH = 'logs/master_betting_history.db'
 
@@ -44,16 +45,13 @@ def repair_and_backfill():
         strat_to_save = ""
         # Try to extract strategy from raw_features blob if current column is empty
         if raw_feat:
-            try:
-                # Fix single quote JSON formatting if present
-                clean_blob = raw_feat.replace("'", '"').replace("True", "true").replace("False", "false")
-                parsed = json.loads(clean_blob)
-                if isinstance(parsed, dict):
-                    strat_to_save = str(parsed.get("exotic_strategy", ""))
-            except Exception:
-                # Fallback regex if JSON parsing fails
-                if "exotic_strategy" in raw_feat:
-                    strat_to_save = raw_feat
+            # Side-store refs, inline JSON and old repr() blobs all resolve here
+            parsed = load_raw_features(raw_feat)
+            if isinstance(parsed, dict) and parsed:
+                strat_to_save = str(parsed.get("exotic_strategy", ""))
+            elif "exotic_strategy" in raw_feat:
+                # Fallback if the blob cannot be parsed
+                strat_to_save = raw_feat
 
         # Clean out any rogue #$ typos
         strat_to_save = strat_to_save.replace("#$", "#")
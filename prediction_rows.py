@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Meeting Card -> predictions Rows
+One normalizer from a meeting card (any of its historical shapes) to flat predictions rows,
+shared by migrate_jsons.py and agents/backfill_db_from_logs.py. Either tool writes exactly the
+rows the other would, so re-running one after the other over unchanged cards changes nothing.
+
+Picks come from the first non-empty source of: "selections" (current cards), "all_contenders"
+(same order as selections where both exist), raw model "contenders", then the legacy
+"picks" dict. Missing ratings stay NULL rather than 0.
+"""
+
+import re
+import json
+from datetime import datetime
+
+SKIP_FILES = {"track_db.json"}
+
+KEY_COLUMNS = ["date", "track", "race_number"]
+# Card-derived columns: written on insert and refreshed on update
+CARD_COLUMNS = [
+    "distance", "surface", "condition",
+    "p1_num", "p1_barrier", "p1_name", "p1_reason", "p1_rating",
+    "p2_num", "p2_barrier", "p2_name", "p2_reason", "p2_rating",
+    "p3_num", "p3_barrier", "p3_name", "p3_reason", "p3_rating",
+    "p4_num", "p4_barrier", "p4_name", "p4_reason", "p4_rating",
+    "danger_num", "danger_barrier", "danger_name", "danger_reason",
+    "confidence", "exotic_strategy", "rating_gap", "has_best_bet", "has_solo_lock",
+]
+ROW_COLUMNS = KEY_COLUMNS + CARD_COLUMNS
+
+PICK_SOURCES = ["selections", "all_contenders", "contenders"]
+LEGACY_PICK_ORDER = ["top_pick", "danger_horse", "value_bet", "fourth_pick"]
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%B %d, %Y", "%A, %B %d, %Y", "%d %B %Y", "%b %d, %Y"]
+
+SOLO_LOCK_RATING = 88.0
+SOLO_LOCK_GAP = 5.0
+BEST_BET_GAP = 3.0
+
+def load_card(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    data = json.loads(content) if content else {}
+    # Handle if the AI double-encoded it or wrapped it in a list
+    if isinstance(data, str): data = json.loads(data)
+    if isinstance(data, list): data = data[0] if data else {}
+    return data if isinstance(data, dict) else {}
+
+def normalize_date(meta_date, filename):
+    """YYYY-MM-DD from the card meta, else from the <Track>_<date>.json file name, else the raw value."""
+    raw = str(meta_date or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    match = re.search(r"(\d{4}-\d{2}-\d{2})", filename)
+    return match.group(1) if match else (raw or "Unknown Date")
+
+def card_meta(filename, data):
+    """(date, track, condition) for a card."""
+    meta = data.get("meta") or {}
+    date = normalize_date(meta.get("date"), filename)
+    track = meta.get("track") or filename[:-len(".json")].rsplit("_", 1)[0].replace("_", " ")
+    return date, track, meta.get("track_condition", "Standard")
+
+def race_number(race, idx):
+    """Printed race number (cards use "number"; model output uses "race_number"), else the 1-based position."""
+    return str(race.get("number") or race.get("race_number") or idx)
+
+def normalize_pick(pick):
+    """One pick as {number, barrier, name, reason, rating} from any card shape."""
+    if not isinstance(pick, dict):
+        return {}
+    rating = pick.get("rating")
+    if rating in (None, ""):
+        rating = (pick.get("features") or {}).get("ai_holistic_score")
+    try:
+        rating = float(rating) if rating not in (None, "") else None
+    except (TypeError, ValueError):
+        rating = None
+    return {
+        "number": str(pick.get("number") or pick.get("program_number") or ""),
+        "barrier": str(pick.get("barrier") or ""),
+        "name": pick.get("name") or pick.get("horse_name") or "",
+        "reason": pick.get("reason") or pick.get("handicapper_notes") or "",
+        "rating": rating,
+    }
+
+def race_selections(race):
+    """Four normalized picks (padded) plus the danger horse for a current or legacy race."""
+    picks = []
+    for source in PICK_SOURCES:
+        picks = [p for p in (normalize_pick(s) for s in race.get(source) or []) if p.get("name")]
+        if picks:
+            break
+    danger = race.get("danger_horse")
+
+    # Legacy formatting: picks = {top_pick, danger_horse, value_bet, fourth_pick}
+    if not picks and isinstance(race.get("picks"), dict):
+        legacy = race["picks"]
+        picks = [normalize_pick(legacy.get(k)) for k in LEGACY_PICK_ORDER]
+        picks = [p for p in picks if p.get("name")]
+        danger = danger or legacy.get("danger_horse")
+
+    while len(picks) < 4: picks.append({})
+    return picks[:4], normalize_pick(danger)
+
+def card_rows(filename, data):
+    """predictions rows (ROW_COLUMNS order) for one card."""
+    date, track, condition = card_meta(filename, data)
+
+    rows = []
+    for idx, race in enumerate(data.get("races") or [], start=1):
+        if not isinstance(race, dict):
+            continue
+        picks, dang = race_selections(race)
+        pick_cols = []
+        for rank, p in enumerate(picks):
+            pick_cols += [p.get("number", "N/A" if rank == 0 else ""), p.get("barrier", ""),
+                          p.get("name", "N/A" if rank == 0 else ""), p.get("reason", "N/A" if rank == 0 else ""),
+                          p.get("rating")]
+        r1, r2 = picks[0].get("rating"), picks[1].get("rating")
+        gap = round(r1 - r2, 2) if r1 is not None and r2 is not None else 0.0
+        has_lock = int(r1 is not None and r1 >= SOLO_LOCK_RATING and gap >= SOLO_LOCK_GAP)
+        rows.append((
+            date, track, race_number(race, idx),
+            race.get("distance", ""), race.get("surface", ""), condition,
+            *pick_cols,
+            dang.get("number", ""), dang.get("barrier", ""), dang.get("name", ""), dang.get("reason", ""),
+            race.get("confidence_level", ""), str(race.get("exotic_strategy", "")).replace("#$", "#"),
+            gap, int(gap >= BEST_BET_GAP), has_lock,
+        ))
+    return rows
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Win Probability Model
+Turns contender ratings into win and ordered-finish probabilities so exotic pricing, staking and
+ROI tools work on probability arrays instead of rating-gap thresholds.
+
+- Win:   softmax(rating / T) per race (a Luce model). T is fitted per track by maximum likelihood
+         from predictions + results and shrunk toward the global fit when a track has few races.
+- Order: Harville - P(i, j) = p_i * p_j / (1 - p_i), and likewise for trifectas.
+
+Ratings are batched as a (races x max_field) array padded with NaN, so a whole card (or the
+whole history) is one vectorized call.
+
+The model also stores the median winning price of our 1st..4th rated pick. The staking engine uses it
+when a card has no live odds.
+
+    python probability.py           # fit temperatures + rank odds, write data/probability_model.json
+    python probability.py --report  # show the current fit without writing
+"""
+
+import os
+import json
+import argparse
+import threading
+
+import numpy as np
+
+from storage import connect, DB_PATH
+from track_registry import lookup_track, normalize_track_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+MODEL_PATH = os.path.join(DATA_DIR, "probability_model.json")
+
+DEFAULT_TEMPERATURE = 4.0     # rating points per e-fold of win odds before any history is fitted
+TEMPERATURE_BOUNDS = (0.5, 40.0)
+PRIOR_RACES = 30              # a track needs about this many settled races to outweigh the global fit
+MIN_TRACK_RACES = 5
+DEFAULT_LISTED_SHARE = 0.75   # share of races won by one of the card's listed contenders (cards never list the full field)
+RANKS = 4                     # predictions keep our four top-rated picks
+
+# ==========================================
+# 📐 VECTORIZED PROBABILITY MATH
+# ==========================================
+def pad_ratings(rating_lists):
+    """List of per-race rating lists -> (races, max_field) float array, NaN where a race has no runner."""
+    width = max((len(r) for r in rating_lists), default=0)
+    out = np.full((len(rating_lists), width), np.nan)
+    for i, ratings in enumerate(rating_lists):
+        out[i, :len(ratings)] = ratings
+    return out
+
+def win_probabilities(ratings, temperature=DEFAULT_TEMPERATURE):
+    """
+    Softmax of ratings / temperature along the last axis. NaN ratings (padding, unrated runners)
+    get probability 0. temperature may be a scalar or one value per race.
+    """
+    r = np.asarray(ratings, dtype=float)
+    t = np.asarray(temperature, dtype=float)
+    if t.ndim and r.ndim > 1:
+        t = t.reshape(t.shape + (1,) * (r.ndim - t.ndim))
+    z = np.where(np.isnan(r), -np.inf, r / t)
+    z_max = np.max(z, axis=-1, keepdims=True)
+    z_max = np.where(np.isfinite(z_max), z_max, 0.0)
+    e = np.exp(z - z_max)
+    total = e.sum(axis=-1, keepdims=True)
+    return np.divide(e, total, out=np.zeros_like(e), where=total > 0)
+
+def exacta_probabilities(p):
+    """Harville P(i first, j second) with shape (..., n, n); the diagonal is 0."""
+    p = np.asarray(p, dtype=float)
+    rest = 1.0 - p
+    second = np.divide(p[..., None, :], rest[..., :, None], out=np.zeros(p.shape + p.shape[-1:]),
+                       where=rest[..., :, None] > 1e-12)
+    out = p[..., :, None] * second
+    idx = np.arange(p.shape[-1])
+    out[..., idx, idx] = 0.0
+    return out
+
+def trifecta_probabilities(p):
+    """Harville P(i, j, k in order) with shape (..., n, n, n); repeated runners are 0."""
+    p = np.asarray(p, dtype=float)
+    n = p.shape[-1]
+    ex = exacta_probabilities(p)
+    rest = 1.0 - p[..., :, None] - p[..., None, :]
+    third = np.divide(p[..., None, None, :], rest[..., :, :, None], out=np.zeros(p.shape[:-1] + (n, n, n)),
+                      where=rest[..., :, :, None] > 1e-12)
+    out = ex[..., :, :, None] * third
+    idx = np.arange(n)
+    out[..., idx, :, idx] = 0.0
+    out[..., :, idx, idx] = 0.0
+    return out
+
+def place_probabilities(p):
+    """(top-2, top-3) finish probability per runner under Harville."""
+    ex = exacta_probabilities(p)
+    tri = trifecta_probabilities(p)
+    top2 = np.asarray(p) + ex.sum(axis=-2)
+    top3 = top2 + tri.sum(axis=(-3, -2))
+    return np.clip(top2, 0.0, 1.0), np.clip(top3, 0.0, 1.0)
+
+def log_likelihood(ratings, winner_idx, temperatures):
+    """Summed log P(observed winner) for each candidate temperature (vectorized over both)."""
+    r = np.asarray(ratings, dtype=float)
+    temps = np.asarray(temperatures, dtype=float)[:, None, None]
+    z = np.where(np.isnan(r), -np.inf, r[None, :, :] / temps)
+    z_max = np.max(z, axis=-1, keepdims=True)
+    lse = np.log(np.exp(z - z_max).sum(axis=-1)) + z_max[..., 0]
+    rows = np.arange(r.shape[0])
+    return (z[:, rows, winner_idx] - lse).sum(axis=-1)
+
+def fit_temperature(ratings, winner_idx, bounds=TEMPERATURE_BOUNDS):
+    """Maximum-likelihood temperature: log-spaced grid, then golden-section refinement."""
+    if len(winner_idx) == 0:
+        return DEFAULT_TEMPERATURE
+    grid = np.geomspace(bounds[0], bounds[1], 48)
+    ll = log_likelihood(ratings, winner_idx, grid)
+    best = int(np.argmax(ll))
+    lo, hi = np.log(grid[max(best - 1, 0)]), np.log(grid[min(best + 1, len(grid) - 1)])
+
+    golden = (np.sqrt(5) - 1) / 2
+    for _ in range(30):
+        a, b = hi - golden * (hi - lo), lo + golden * (hi - lo)
+        ll_a, ll_b = log_likelihood(ratings, winner_idx, np.exp([a, b]))
+        if ll_a > ll_b:
+            hi = b
+        else:
+            lo = a
+    return float(np.exp((lo + hi) / 2))
+
+# ==========================================
+# 🎯 PER-TRACK CALIBRATION
+# ==========================================
+def track_key(track_name):
+    """Temperatures are keyed by registry slug so 'Eagle_Farm' and 'Eagle Farm' share a fit."""
+    entry = lookup_track(track_name)
+    return entry["slug"] if entry else normalize_track_name(track_name).replace(" ", "_")
+
+def _settled_pick_rows(conn):
+    """(track, [(num, rating), ...], win_num) per settled race from predictions and legacy selections."""
+    rows = conn.execute("""
+        SELECT p.track, p.p1_num, p.p1_rating, p.p2_num, p.p2_rating,
+               p.p3_num, p.p3_rating, p.p4_num, p.p4_rating, r.win_num
+        FROM predictions p
+        JOIN results r ON p.date = r.date AND p.track = r.track AND p.race_number = r.race_number
+        WHERE r.win_num IS NOT NULL AND r.win_num != ''
+    """).fetchall()
+    for track, *picks, win_num in rows:
+        yield track, list(zip(picks[0::2], picks[1::2])), win_num
+
+    # Races folded in from racing_ledger.db keep their ranked picks in selections
+    legacy = {}
+    for race_id, track, num, rating, win_num in conn.execute("""
+        SELECT ra.id, ra.track, s.horse_number, s.rating, r.win_num
+        FROM selections s
+        JOIN races ra ON s.race_id = ra.id
+        JOIN results r ON r.date = ra.date AND r.track = ra.track AND r.race_number = ra.race_number
+        WHERE r.win_num IS NOT NULL AND r.win_num != '' AND s.rating IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM predictions p WHERE p.date = ra.date AND p.track = ra.track
+                          AND p.race_number = ra.race_number)
+        ORDER BY ra.id, s.rank
+    """):
+        legacy.setdefault(race_id, (track, [], win_num))[1].append((num, rating))
+    yield from legacy.values()
+
+def load_settled_races(db_path=DB_PATH):
+    """
+    (track_keys, ratings (n, width), winner_idx, missed) for settled races whose winner was one of our
+    rated picks; missed counts informative races won by a runner we did not list.
+    """
+    conn = connect(db_path, readonly=True)
+    try:
+        rows = list(_settled_pick_rows(conn))
+    finally:
+        conn.close()
+
+    tracks, ratings, winners, missed = [], [], [], 0
+    for track, picks, win_num in rows:
+        nums = [str(n).strip() for n, _ in picks]
+        vals = [float(v) if v not in (None, "") else np.nan for _, v in picks]
+        win_num = str(win_num).strip()
+        if np.sum(~np.isnan(vals)) >= 2 and np.nanmax(vals) > np.nanmin(vals) and win_num not in nums:
+            missed += 1
+        # Under the Luce model, P(i wins | winner among our picks) is the softmax over the picks
+        # alone, so races won by an unrated runner are simply left out.
+        if win_num not in nums or np.isnan(vals[nums.index(win_num)]) or np.sum(~np.isnan(vals)) < 2:
+            continue
+        # Flat ratings (legacy rows saved as 0) say nothing about the temperature
+        if np.nanmax(vals) == np.nanmin(vals):
+            continue
+        tracks.append(track_key(track))
+        ratings.append(vals)
+        winners.append(nums.index(win_num))
+    return tracks, pad_ratings(ratings), np.array(winners, dtype=int), missed
+
+def fit_temperatures(tracks, ratings, winners, missed=0, prior_races=PRIOR_RACES):
+    """Model dict from settled races: global + per-track temperatures (log-space shrinkage toward the global fit)."""
+    global_t = fit_temperature(ratings, winners)
+    settled = len(winners) + missed
+    listed_share = len(winners) / settled if settled else DEFAULT_LISTED_SHARE
+    model = {"global": {"temperature": global_t, "races": int(len(winners)), "listed_share": listed_share},
+             "tracks": {}}
+
+    track_arr = np.array(tracks)
+    for key in sorted(set(tracks)):
+        mask = track_arr == key
+        n = int(mask.sum())
+        if n < MIN_TRACK_RACES:
+            continue
+        raw_t = fit_temperature(ratings[mask], winners[mask])
+        weight = n / (n + prior_races)
+        shrunk = float(np.exp(weight * np.log(raw_t) + (1 - weight) * np.log(global_t)))
+        model["tracks"][key] = {"temperature": shrunk, "raw_temperature": raw_t, "races": n}
+    return model
+
+def fit_rank_odds(won, payout):
+    """
+    Median winning price (decimal odds) of our 1st..4th rated pick, from won (races, ranks) and the
+    $1 win dividend per race. None for a rank that never won (its price is unknown, so it is never staked).
+    """
+    odds = []
+    for rank in range(won.shape[1]):
+        paid = payout[won[:, rank] & (payout > 1.0)]
+        odds.append(round(float(np.median(paid)), 2) if len(paid) else None)
+    return odds
+
+def load_rank_payouts(db_path=DB_PATH):
+    """(won (races, RANKS) bool, $1 win dividend per race) for settled predictions."""
+    conn = connect(db_path, readonly=True)
+    try:
+        rows = conn.execute("""
+            SELECT p.p1_num, p.p2_num, p.p3_num, p.p4_num, r.win_num, r.win_payout
+            FROM predictions p
+            JOIN results r ON p.date = r.date AND p.track = r.track AND p.race_number = r.race_number
+            WHERE r.win_num IS NOT NULL AND r.win_num != ''
+        """).fetchall()
+    finally:
+        conn.close()
+    won = np.array([[str(num).strip() == str(row[4]).strip() for num in row[:RANKS]] for row in rows],
+                   dtype=bool).reshape(len(rows), RANKS)
+    payout = np.array([float(row[5]) / 2.0 if row[5] else 0.0 for row in rows])
+    return won, payout
+
+def fit_track_temperatures(db_path=DB_PATH, prior_races=PRIOR_RACES):
+    """Fitted model for the whole settled history: temperatures, listed share and rank odds."""
+    tracks, ratings, winners, missed = load_settled_races(db_path)
+    model = fit_temperatures(tracks, ratings, winners, missed, prior_races)
+    model["global"]["rank_odds"] = fit_rank_odds(*load_rank_payouts(db_path))
+    return model
+
+def save_model(model, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=2, sort_keys=True)
+    _model_cache.clear()
+
+_model_cache = {}
+_model_lock = threading.Lock()
+
+def load_model(path=MODEL_PATH):
+    """Fitted model (cached per file mtime); a default-temperature model when nothing is fitted yet."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {"global": {"temperature": DEFAULT_TEMPERATURE, "races": 0}, "tracks": {}}
+    with _model_lock:
+        cached = _model_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                model = json.load(f)
+        except (OSError, ValueError):
+            model = {"global": {"temperature": DEFAULT_TEMPERATURE, "races": 0}, "tracks": {}}
+        _model_cache[path] = (mtime, model)
+        return model
+
+def listed_share(model=None):
+    """Probability that the winner is one of the card's listed contenders."""
+    model = model or load_model()
+    return model["global"].get("listed_share", DEFAULT_LISTED_SHARE)
+
+def rank_odds(model=None):
+    """Fitted decimal odds per rating rank (None where unknown; all None before the first fit)."""
+    model = model or load_model()
+    odds = model["global"].get("rank_odds") or []
+    return [odds[i] if i < len(odds) else None for i in range(RANKS)]
+
+def temperature_for_track(track_name, model=None):
+    model = model or load_model()
+    fit = model["tracks"].get(track_key(track_name)) if track_name else None
+    return (fit or model["global"])["temperature"]
+
+# ==========================================
+# 🏇 CARD HELPERS
+# ==========================================
+def contender_rating(contender):
+    """Rating used everywhere on the card: rating, else features.ai_holistic_score, else NaN."""
+    if not isinstance(contender, dict):
+        return np.nan
+    value = contender.get("rating") or (contender.get("features") or {}).get("ai_holistic_score")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def race_win_probabilities(contenders, track_name="", temperature=None):
+    """Win probability per contender (same order as contenders)."""
+    if not contenders:
+        return np.zeros(0)
+    t = temperature if temperature is not None else temperature_for_track(track_name)
+    return win_probabilities(np.array([contender_rating(c) for c in contenders]), t)
+
+def card_win_probabilities(races, track_name="", temperature=None):
+    """One padded (races, max_field) probability array for a whole card, plus the rating array."""
+    ratings = pad_ratings([[contender_rating(c) for c in (r.get("all_contenders") or r.get("selections") or [])]
+                           for r in races])
+    t = temperature if temperature is not None else temperature_for_track(track_name)
+    return win_probabilities(ratings, t), ratings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit per-track rating temperatures from settled results.")
+    parser.add_argument("--report", action="store_true", help="Print the fit without saving it")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    fitted = fit_track_temperatures(args.db)
+    g = fitted["global"]
+    print(f"🌐 Global temperature {g['temperature']:.2f} from {g['races']} settled races "
+          f"(listed contenders won {g['listed_share']:.0%}), rank odds {g['rank_odds']}")
+    for key, fit in sorted(fitted["tracks"].items(), key=lambda kv: -kv[1]["races"]):
+        print(f"   {key:<28} T={fit['temperature']:.2f} (raw {fit['raw_temperature']:.2f}, {fit['races']} races)")
+    if not args.report:
+        save_model(fitted)
+        print(f"✅ Saved {MODEL_PATH}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Prompt Builder
+Assembles the handicapping prompts for app2.py.
+
+The system instruction (regional rules + track facts + output schema) only depends on the
+region, the track profile and the rules file, so it is rendered once per
+(region, rules file version, track, profile version, budget) and reused from an LRU cache for every
+card at that track. Content is not repeated between prompts: the track facts live only in the
+system instruction and the scratches only in the per-race prompt, which the model sees on every
+call anyway.
+
+Token counts are estimated (about four characters per token for this English / JSON mix) and
+the track profile is trimmed to a budget by dropping its lowest-value fields first, so the big
+profiles (post position matrices, nicknames, ...) stop costing input tokens on every race.
+
+    python prompt_builder.py Saratoga --budget 600
+"""
+
+import os
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import track_registry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGIC_DIR = os.path.join(BASE_DIR, "logic")
+FALLBACK_SYSTEM_FILE = "system_usa.md"
+FALLBACK_RULES = "You are an elite Horse Racing AI Handicapper."
+NO_PROFILE_TEXT = "No historical bias data."
+NO_SCRATCHES_TEXT = "No scratches provided."
+
+CHARS_PER_TOKEN = 4
+PROFILE_TOKEN_BUDGET = 1000
+CACHE_CAPACITY = 32
+
+# Profile fields from most to least useful to the handicapper; trimming drops from the end.
+# Fields not listed sit between the two groups (kept before identifiers, dropped before facts).
+FIELD_PRIORITY = [
+    "bias_notes", "courses", "par_adjustment", "run_style_bias", "handicapping_angles",
+    "track_characteristics", "post_position_matrix", "shipper_conversion_rules", "surface",
+    "distance", "track_type", "type", "layout", "direction", "straight_length", "home_straight_m",
+    "circumference_m", "passing_lane",
+]
+LOW_VALUE_FIELDS = ["location", "jurisdiction", "default_weights", "nicknames", "track_name", "track_code"]
+
+SYSTEM_TEMPLATE = """\
+You are an Elite Horse Racing AI Handicapper & Feature Extraction Engine for ({region}).
+Your primary directive is to strictly evaluate past form, class shifts, pace scenarios, and track biases using the master rules below.
+
+[MASTER HANDICAPPING RULES - {system_file}]
+{rules}
+
+[TODAY'S TRACK BIAS & FACTS]
+{track_facts}
+
+[STRICT OUTPUT SCHEMA]
+Return ONLY a valid JSON array conforming strictly to this format. No Markdown, no prose text outside JSON.
+[
+  {{
+    "race_number": 1,
+    "distance_surface": "7 Furlongs Dirt",
+    "confidence_level": "High",
+    "suggested_wager": "Exacta Box 1, 2, 5",
+    "contenders": [
+      {{
+        "program_number": "5",
+        "barrier": "5",
+        "horse_name": "Credit Risk",
+        "handicapper_notes": "Explicitly state if score was boosted due to Class Drop Elevator, Pace Meltdown, or Lone Speed.",
+        "features": {{
+          "class_drop_bonus_applied": true,
+          "pace_scenario_eval": "Standard",
+          "ai_holistic_score": 88,
+          "running_style": "P",
+          "is_lone_speed": false,
+          "distance_transition": "Route to Sprint",
+          "trouble_trip": "None",
+          "is_danger_horse": false
+        }}
+      }}
+    ]
+  }}
+]
+"""
+
+# Directives 2-6 are shared by the per-race and whole-card prompts
+DIRECTIVES = """\
+2. SCRATCHES ARE ABSOLUTE: Fully ignore scratched horses listed above.
+3. OFF-TURF DIRECTIVE: If scratches/updates state 'all races off the turf', 'off turf', 'off-turf', or 'moved to dirt', treat ALL turf races as DIRT races! Re-evaluate contenders based on dirt speed figures, dirt past performances, and prioritize Main Track Only (MTO) entrants!
+4. FIELD COVERAGE: Extract and rank AT LEAST 5 to 6 CONTENDERS in 'contenders'.
+5. ENFORCE OVERRIDE RULES:
+- Class Drop Elevator: If dropping from MSW ($75k+) or Allowance to MCL/CLM, set 'class_drop_bonus_applied': true and grant +10 points.
+- Post-Scratch Lone Speed: If scratches leave only ONE 'E' runner, set 'is_lone_speed': true, set 'pace_scenario_eval': 'Lone Speed (+6)', and grant +6 points.
+6. STRICT STRING SANITIZATION: NEVER use double quotes (") inside text string fields like 'handicapper_notes'. Use single quotes (') or omit them entirely to maintain valid JSON syntax.
+"""
+
+RACE_TEMPLATE = """\
+[TASK] Deeply handicap Race {race_num} ONLY from the attached PDF for {track}.
+[OFFICIAL SCRATCHES & UPDATES]
+{scratches}
+
+[CRITICAL HANDICAPPING DIRECTIVES FOR RACE {race_num}]
+1. ANALYZE RACE {race_num} ONLY.
+""" + DIRECTIVES
+
+CARD_TEMPLATE = """\
+[TASK] Deeply handicap {race_scope} from the attached PDF for {track}.
+[OFFICIAL SCRATCHES & UPDATES]
+{scratches}
+
+[CRITICAL HANDICAPPING DIRECTIVES FOR EVERY RACE]
+1. WHOLE CARD: Return ONE object per race in the JSON array, in race order, finishing each race object completely before starting the next.
+""" + DIRECTIVES
+
+def _scratches_text(scratches):
+    return scratches.strip() if scratches and scratches.strip() else NO_SCRATCHES_TEXT
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+def _field_rank(key):
+    if key in FIELD_PRIORITY:
+        return FIELD_PRIORITY.index(key)
+    if key in LOW_VALUE_FIELDS:
+        return len(FIELD_PRIORITY) + 1 + LOW_VALUE_FIELDS.index(key)
+    return len(FIELD_PRIORITY)
+
+def trim_profile(profile_text, budget=PROFILE_TOKEN_BUDGET):
+    """
+    (text, dropped fields) for a compact JSON profile: lowest-value fields are dropped until it
+    fits the token budget. The most useful field is always kept whole.
+    """
+    if estimate_tokens(profile_text) <= budget:
+        return profile_text, []
+    profile = json.loads(profile_text)
+    # Least useful (highest rank) first; stable within a rank so the output is deterministic
+    drop_order = sorted(profile, key=_field_rank, reverse=True)
+    dropped = []
+    for key in drop_order[:-1]:
+        del profile[key]
+        dropped.append(key)
+        text = json.dumps(profile, ensure_ascii=False, separators=(",", ":"))
+        if estimate_tokens(text) <= budget:
+            return text, dropped
+    return json.dumps(profile, ensure_ascii=False, separators=(",", ":")), dropped
+
+class PromptBuilder:
+    """Renders and caches system instructions; see the module docstring."""
+
+    def __init__(self, logic_dir=LOGIC_DIR, capacity=CACHE_CAPACITY):
+        self.logic_dir = logic_dir
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._rules = {}                # path -> (mtime, text)
+        self._entries = OrderedDict()
+
+    def _read_rules(self, system_file):
+        """(file name used, mtime, text) for a regional rules file, falling back to the USA rules."""
+        for name in (system_file, FALLBACK_SYSTEM_FILE):
+            path = os.path.join(self.logic_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            cached = self._rules.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, "r", encoding="utf-8") as f:
+                    cached = (mtime, f.read())
+                self._rules[path] = cached
+            return name, cached[0], cached[1]
+        return system_file, 0, FALLBACK_RULES
+
+    def system_instruction(self, track, region, category="", budget=PROFILE_TOKEN_BUDGET):
+        """
+        {"text", "tokens", "profile_tokens", "dropped_fields", "system_file", "cached"} for the
+        track's system instruction.
+        """
+        system_file = track_registry.get_system_prompt_file(track, category, region)
+        profile_text = track_registry.get_track_prompt(track)
+        with self._lock:
+            system_file, mtime, rules = self._read_rules(system_file)
+            # The profile text itself is the profile version: a rebuilt bundle with new facts misses
+            key = (region, system_file, mtime, profile_text, budget)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return dict(self._entries[key], cached=True)
+
+        facts, dropped = trim_profile(profile_text, budget) if profile_text else (NO_PROFILE_TEXT, [])
+        text = SYSTEM_TEMPLATE.format(region=region, system_file=system_file, rules=rules, track_facts=facts)
+        entry = {
+            "text": text,
+            "tokens": estimate_tokens(text),
+            "profile_tokens": estimate_tokens(facts),
+            "dropped_fields": dropped,
+            "system_file": system_file,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return dict(entry, cached=False)
+
+    def race_prompt(self, race_num, track, scratches=""):
+        return RACE_TEMPLATE.format(race_num=race_num, track=track, scratches=_scratches_text(scratches))
+
+    def card_prompt(self, total_races, track, scratches=""):
+        """
+        Whole-card prompt: every race in one streamed response (see card_session.choose_mode).
+        With total_races None the model is asked for every race on the card, so no count is needed.
+        """
+        if total_races:
+            race_scope = f"ALL {total_races} races (Race 1 through Race {total_races})"
+        else:
+            race_scope = "EVERY race on the card (Race 1 through the last race in the program)"
+        return CARD_TEMPLATE.format(race_scope=race_scope, track=track, scratches=_scratches_text(scratches))
+
+_builder = PromptBuilder()
+
+def system_instruction(track, region, category="", budget=PROFILE_TOKEN_BUDGET):
+    return _builder.system_instruction(track, region, category, budget)
+
+def race_prompt(race_num, track, scratches=""):
+    return _builder.race_prompt(race_num, track, scratches)
+
+def card_prompt(total_races, track, scratches=""):
+    return _builder.card_prompt(total_races, track, scratches)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the assembled prompts and their token estimates for a track.")
+    parser.add_argument("track")
+    parser.add_argument("--region", default="")
+    parser.add_argument("--budget", type=int, default=PROFILE_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    region = args.region or track_registry.classify_track(args.track)["region"]
+    system = system_instruction(args.track, region, budget=args.budget)
+    race = race_prompt(1, args.track)
+    print(f"🧾 {system['system_file']} | system ≈{system['tokens']} tokens (profile ≈{system['profile_tokens']})"
+          f" | race prompt ≈{estimate_tokens(race)} tokens")
+    if system["dropped_fields"]:
+        print(f"✂️  Trimmed profile fields: {', '.join(system['dropped_fields'])}")
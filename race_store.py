@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Per-Race Meeting Store
+Splits an enriched meeting card into a lightweight skeleton (meta, exotic tickets, one
+navigator line per race) and one payload per race (contenders, notes, raw features).
+The React card view loads the skeleton plus the active race and fetches other races on demand.
+
+- api.py serves both from an in-process store of pre-serialized payloads, rebuilt only when
+  the card file changes on disk.
+- export_static.py writes the same payloads to frontend/public/api/races/<id>/ for static hosting.
+
+Races are addressed by 1-based position on the card (race numbers on older cards are not
+always unique or numeric); the skeleton lists both the index and the printed race number.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from enrichment import load_meeting_json, enrich_meeting, enrichment_stamp
+
+# Per-race fields small enough to ship with the skeleton (everything RaceNavigator needs)
+SKELETON_RACE_FIELDS = ["number", "race_number", "distance", "surface", "distance_surface", "confidence_level",
+                        "rating_gap", "has_solo_lock", "has_best_bet"]
+STORE_CAPACITY = 64  # meetings kept in memory by the live API
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def split_meeting(data):
+    """(skeleton, races) for an enriched card; races[i] is the full payload of race index i + 1."""
+    races = [r for r in (data.get("races") or []) if isinstance(r, dict)]
+    skeleton = {k: v for k, v in data.items() if k != "races"}
+
+    skeleton_races = []
+    for idx, race in enumerate(races, start=1):
+        entry = {"index": idx}
+        for field in SKELETON_RACE_FIELDS:
+            if field in race:
+                entry[field] = race[field]
+        entry.setdefault("number", race.get("race_number") or idx)
+        entry["contender_count"] = len(race.get("all_contenders") or race.get("selections") or [])
+        skeleton_races.append(entry)
+
+    skeleton["races"] = skeleton_races
+    skeleton["race_count"] = len(races)
+    return skeleton, races
+
+def write_meeting_store(data, store_dir):
+    """Writes skeleton.json and race-<n>.json for one enriched card; returns the files written."""
+    skeleton, races = split_meeting(data)
+    os.makedirs(store_dir, exist_ok=True)
+
+    payloads = {"skeleton.json": _dumps(skeleton)}
+    for idx, race in enumerate(races, start=1):
+        payloads[f"race-{idx}.json"] = _dumps(race)
+
+    # Races dropped from a re-exported card must not linger
+    for fname in os.listdir(store_dir):
+        if fname.endswith(".json") and fname not in payloads:
+            os.remove(os.path.join(store_dir, fname))
+    for fname, payload in payloads.items():
+        tmp_path = os.path.join(store_dir, fname + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, os.path.join(store_dir, fname))
+    return list(payloads)
+
+class RaceStore:
+    """
+    LRU of split, pre-serialized cards keyed by file path. An entry is reused while the
+    file's size and mtime and the enrichment inputs (enrichment_stamp) are unchanged, so a card
+    is parsed and enriched once per edit or model refit.
+    """
+
+    def __init__(self, capacity=STORE_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _entry(self, filepath):
+        st = os.stat(filepath)
+        stamp = (st.st_size, st.st_mtime, *enrichment_stamp())
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry and entry["stamp"] == stamp:
+                self._entries.move_to_end(filepath)
+                return entry
+
+        skeleton, races = split_meeting(enrich_meeting(load_meeting_json(filepath)))
+        entry = {"stamp": stamp, "skeleton": _dumps(skeleton), "races": [_dumps(r) for r in races]}
+        with self._lock:
+            self._entries[filepath] = entry
+            self._entries.move_to_end(filepath)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return entry
+
+    def skeleton(self, filepath):
+        """Serialized skeleton JSON (bytes)."""
+        return self._entry(filepath)["skeleton"]
+
+    def race(self, filepath, index):
+        """Serialized race JSON (bytes) for 1-based index, or None when out of range."""
+        races = self._entry(filepath)["races"]
+        if 1 <= index <= len(races):
+            return races[index - 1]
+        return None
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Raw Feature Side Store
+Content-addressed, gzip-compressed storage for the raw LLM race payloads (raw_features_dump).
+
+Published meeting cards keep only a "raw_features_ref" per race ("sha256:<hex>"), and
+predictions.raw_features stores the same ref, so each payload lives on disk exactly once:
+logs/raw/<2-char prefix>/<hex>.json.gz. Analytics, the optimizer and patch scripts resolve refs
+on demand with load_raw_features(); older rows holding inline JSON or repr() text still load.
+
+    python raw_store.py            # slim existing cards in logs/ + api/output/ and convert DB rows
+    python raw_store.py --dry-run  # report the savings without writing
+"""
+
+import os
+import ast
+import json
+import gzip
+import hashlib
+import argparse
+from functools import lru_cache
+
+import storage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_STORE_DIR = os.path.join(BASE_DIR, "logs", "raw")
+CARD_DIRS = [os.path.join(BASE_DIR, "logs"), os.path.join(BASE_DIR, "api", "output")]
+
+REF_PREFIX = "sha256:"
+# Raw-dump fields the card view still reads when the race itself does not carry them
+HOISTED_FIELDS = {"suggested_wager": "strategy", "danger_horse": "danger_horse"}
+
+def _canonical(payload):
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def is_raw_ref(value):
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+def _ref_path(ref, store_dir):
+    digest = ref[len(REF_PREFIX):]
+    return os.path.join(store_dir, digest[:2], digest + ".json.gz")
+
+def put_raw(payload, store_dir=RAW_STORE_DIR, write=True):
+    """Stores a JSON-serializable payload (once per distinct content) and returns its ref."""
+    body = _canonical(payload)
+    ref = REF_PREFIX + hashlib.sha256(body).hexdigest()
+    path = _ref_path(ref, store_dir)
+    if write and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(body, compresslevel=9, mtime=0))
+        os.replace(tmp_path, path)
+    return ref
+
+@lru_cache(maxsize=2048)
+def _read_raw(ref, store_dir):
+    with open(_ref_path(ref, store_dir), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+def get_raw(ref, store_dir=RAW_STORE_DIR):
+    """Payload for a ref; raises FileNotFoundError when the blob is missing."""
+    return json.loads(_read_raw(ref, store_dir))
+
+def load_raw_features(value, store_dir=RAW_STORE_DIR):
+    """
+    Raw features from a predictions.raw_features value or a card race: a ref, inline JSON,
+    a Python repr (older save_predictions_to_db rows) or an already-parsed dict. {} if unreadable.
+    """
+    if isinstance(value, dict):
+        if "raw_features_dump" in value:
+            return value["raw_features_dump"]
+        value = value.get("raw_features_ref")
+    if not value:
+        return {}
+    if is_raw_ref(value):
+        try:
+            return get_raw(value, store_dir)
+        except (OSError, ValueError):
+            return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return {}
+
+def raw_features_text(value, store_dir=RAW_STORE_DIR):
+    """Searchable text for a predictions.raw_features value (refs are expanded)."""
+    if is_raw_ref(value):
+        try:
+            return _read_raw(value, store_dir)
+        except OSError:
+            return ""
+    return str(value or "")
+
+def slim_meeting(data, store_dir=RAW_STORE_DIR, write=True):
+    """Copy of a card with each race's raw_features_dump moved to the side store."""
+    slim = dict(data)
+    races = []
+    for race in data.get("races") or []:
+        if isinstance(race, dict) and "raw_features_dump" in race:
+            race = dict(race)
+            raw = race.pop("raw_features_dump")
+            if isinstance(raw, dict):
+                for raw_field, race_field in HOISTED_FIELDS.items():
+                    if raw.get(raw_field) and not race.get(race_field):
+                        race[race_field] = raw[raw_field]
+            race["raw_features_ref"] = put_raw(raw, store_dir, write)
+        races.append(race)
+    if "races" in data:
+        slim["races"] = races
+    return slim
+
+def hydrate_meeting(data, store_dir=RAW_STORE_DIR):
+    """Inverse of slim_meeting for tools that want the full LLM payload back inline."""
+    full = dict(data)
+    if "races" in data:
+        full["races"] = []
+        for race in data["races"]:
+            if isinstance(race, dict) and is_raw_ref(race.get("raw_features_ref")):
+                race = dict(race)
+                race["raw_features_dump"] = load_raw_features(race.pop("raw_features_ref"), store_dir)
+            full["races"].append(race)
+    return full
+
+def write_meeting_json(data, paths):
+    """Writes the (already slimmed) card minified to every path."""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    for path in paths:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+def migrate_card_dirs(card_dirs=CARD_DIRS, store_dir=RAW_STORE_DIR, dry_run=False):
+    """Slims every card in card_dirs in place. Returns (files_slimmed, bytes_before, bytes_after)."""
+    slimmed, before, after = 0, 0, 0
+    for card_dir in card_dirs:
+        if not os.path.isdir(card_dir):
+            continue
+        for fname in sorted(os.listdir(card_dir)):
+            if not fname.endswith(".json"):
+                continue
+            path = os.path.join(card_dir, fname)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            # Leave double-encoded / list-wrapped legacy cards alone
+            if not isinstance(data, dict):
+                continue
+
+            size = os.path.getsize(path)
+            slim = slim_meeting(data, store_dir, write=not dry_run)
+            slim_size = len(json.dumps(slim, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            if slim_size >= size:
+                continue
+            if not dry_run:
+                write_meeting_json(slim, [path])
+            slimmed += 1
+            before += size
+            after += slim_size
+    return slimmed, before, after
+
+def migrate_predictions(db_path=None, store_dir=RAW_STORE_DIR):
+    """Replaces inline predictions.raw_features blobs with refs. Returns rows converted."""
+    conn = storage.connect(db_path or storage.DB_PATH)
+    c = conn.cursor()
+    rows = c.execute(f"SELECT id, raw_features FROM predictions WHERE raw_features IS NOT NULL "
+                     f"AND raw_features != '' AND raw_features NOT LIKE '{REF_PREFIX}%'").fetchall()
+    converted = 0
+    for row_id, raw in rows:
+        payload = load_raw_features(raw, store_dir)
+        if not payload:
+            continue
+        c.execute("UPDATE predictions SET raw_features = ? WHERE id = ?", (put_raw(payload, store_dir), row_id))
+        converted += 1
+    conn.commit()
+    conn.close()
+    storage.invalidate_cache()
+    return converted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move raw LLM race payloads out of cards and predictions.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how much the cards would shrink")
+    parser.add_argument("--skip-db", action="store_true", help="Leave predictions.raw_features untouched")
+    args = parser.parse_args()
+
+    count, before, after = migrate_card_dirs(dry_run=args.dry_run)
+    verb = "Would slim" if args.dry_run else "Slimmed"
+    print(f"📦 {verb} {count} cards: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    if not args.dry_run and not args.skip_db:
+        print(f"🗄️ Converted {migrate_predictions()} predictions.raw_features rows to side-store refs")
@@ -1,14 +1,28 @@
-import sqlite3
 import json
 import os
+import sys
 import glob
-from db_manager import ingest_json_logs
+from db_manager import ingest_json_logs, load_log_json
+from storage import connect, LOGS_DIR
 
-DB_NAME = "racing_data.db"
-LOGS_DIR = "logs"
+def forget_meeting_logs(c, track, date):
+    """Drops the ingest_manifest rows of the log cards for one meeting, so the next incremental
+    ingest re-reads just those cards. Returns the file names."""
+    forgotten = []
+    for filepath in glob.glob(os.path.join(LOGS_DIR, "*.json")):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data, error = load_log_json(f.read().strip() or "{}")
+        except (OSError, ValueError):
+            continue
+        meta = data.get('meta') if data else None
+        if isinstance(meta, dict) and meta.get('track', 'Unknown') == track and meta.get('date', 'Unknown') == date:
+            forgotten.append(os.path.basename(filepath))
+    c.executemany("DELETE FROM ingest_manifest WHERE path = ?", [(name,) for name in forgotten])
+    return forgotten
 
-def repair_meeting():
-    conn = sqlite3.connect(DB_NAME)
+def repair_meeting(full=False):
+    conn = connect()
     c = conn.cursor()
 
     print("\n" + "="*40)
@@ -17,7 +31,11 @@ def repair_meeting():
     print("Use this if a meeting shows up but has no picks.")
 
     # 1. List Meetings
-    c.execute("SELECT id, track, date FROM meetings ORDER BY date DESC, track ASC")
+    c.execute("""
+        SELECT id, track, date FROM meetings m
+        WHERE EXISTS (SELECT 1 FROM races r WHERE r.meeting_id = m.id)
+        ORDER BY date DESC, track ASC
+    """)
     meetings = c.fetchall()
 
     if not meetings:
@@ -64,8 +82,11 @@ def repair_meeting():
             c.execute("DELETE FROM races WHERE meeting_id = ?", (meeting_id,))
         
         c.execute("DELETE FROM meetings WHERE id = ?", (meeting_id,))
+        cards = forget_meeting_logs(c, track_name, date_str)
         conn.commit()
         print("   - Corrupt SQL data wiped.")
+        if not cards and not full:
+            print("   ⚠️ No log card matches this meeting; re-run with --full to re-import every log.")
 
     except Exception as e:
         print(f"❌ Error deleting SQL data: {e}")
@@ -79,10 +100,11 @@ def repair_meeting():
     # We call the function from your existing db_manager.py
     # Make sure db_manager.py is in the same folder!
     try:
-        ingest_json_logs()
+        # Only the forgotten cards are new to the manifest; --full re-parses every log
+        ingest_json_logs(force=full)
         print("\n✅ REPAIR COMPLETE. Try entering results now.")
     except Exception as e:
         print(f"❌ Re-import failed: {e}")
 
 if __name__ == "__main__":
-    repair_meeting()
\ No newline at end of file
+    repair_meeting(full="--full" in sys.argv)
\ No newline at end of file
@@ -1,35 +1,26 @@
-import sqlite3
 import pandas as pd
 import itertools
 import os
 import json
 
+import track_registry
+from storage import connect, DB_PATH
+
 # ==========================================
 # 1. PATHS & DATABASE SETUP
 # ==========================================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
-DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
-TRACKS_DIR = os.path.join(BASE_DIR, "tracks")
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
 def get_track_profile(track_name):
-    """Loads an individual track profile directly from the tracks folder."""
-    filename = f"{track_name.lower().replace(' ', '_').replace('-', '_')}.json"
-    filepath = os.path.join(TRACKS_DIR, filename)
-    
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Track profile from the compiled track bundle (any spelling the registry knows)."""
+    return track_registry.get_track_profile(track_name)
 
 def get_all_tracks():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(readonly=True)
     try:
         query = """
             SELECT DISTINCT p.track 
@@ -45,7 +36,7 @@ def get_all_tracks():
         return []
 
 def load_track_data(track_name):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(readonly=True)
     query = """
         SELECT 
             p.race_number, p.track, p.distance, p.surface,
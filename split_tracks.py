@@ -1,6 +1,9 @@
 import os
 import json
 
+import track_bundle
+import track_registry
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MASTER_DB_PATH = os.path.join(BASE_DIR, "data", "track_db.json")
 TRACKS_DIR = os.path.join(BASE_DIR, "tracks")
@@ -51,5 +54,9 @@ def split_master_database():
     total_extracted = recursive_extract(data, "")
     print(f"Successfully extracted and saved {total_extracted} track files into the 'tracks/' folder!")
 
+    # Recompile the runtime bundle so the next app start reads one file instead of every profile
+    track_bundle.write_bundle(track_registry.compile_bundle(TRACKS_DIR))
+    print(f"Compiled {os.path.relpath(track_bundle.BUNDLE_PATH, BASE_DIR)}")
+
 if __name__ == "__main__":
     split_master_database()
\ No newline at end of file
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Staking Engine
+Sizes bets from model win probability (probability.py) and decimal odds instead of the
+hand-tuned $25 / $10 / PASS and 20 / 10 / 5 tiers.
+
+- kelly:  full, fractional or capped Kelly. Bets on several runners in one race are mutually
+          exclusive, so they are sized together (Smoczynski-Tomkins): runners are added in order
+          of expected return while p * odds beats the reserve rate R of the runners already in.
+- flat / tiered: fixed dollar stakes (the legacy tiers live here as the "tiered" policy).
+
+Policies are plain dicts; data/staking_policies.json overrides or adds to DEFAULT_POLICIES so
+stakes are re-tuned without code edits. Without live odds the price comes from our rank. That price
+is the historical median winning dividend at the rank, fitted and saved with the probability model.
+Before the first fit the price is unknown and Kelly policies PASS. card_stakes() also holds a whole
+card to the policy's card_exposure.
+
+backtest() replays every settled race under several policies at once and returns the bankroll
+trajectories as a (policies, races + 1) array. The replay is walk-forward: each month is priced
+with temperatures and rank odds fitted on earlier months only.
+
+    python staking.py                      # backtest every policy against the results table
+    python staking.py --policy half_kelly
+"""
+
+import os
+import json
+import argparse
+
+import numpy as np
+
+from storage import connect, DB_PATH
+from probability import RANKS, win_probabilities, fit_temperatures, fit_rank_odds, rank_odds, track_key
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POLICY_PATH = os.path.join(BASE_DIR, "data", "staking_policies.json")
+
+DEFAULT_BANKROLL = 1000.0
+MIN_STAKE = 2.0                        # below this a bet is a PASS
+DEFAULT_POLICY = "quarter_kelly"
+MIN_TRAIN_RACES = 100                  # settled races the walk-forward backtest fits on before it starts betting
+
+DEFAULT_POLICIES = {
+    "tiered": {"kind": "tiered", "stakes": {"solo_lock": 20.0, "best_bet": 10.0, "top_pick": 5.0}},
+    "flat": {"kind": "flat", "stake": 10.0},
+    "kelly": {"kind": "kelly", "fraction": 1.0, "cap": 0.25, "max_exposure": 1.0, "card_exposure": 1.0},
+    "half_kelly": {"kind": "kelly", "fraction": 0.5, "cap": 0.10, "max_exposure": 0.5, "card_exposure": 0.5},
+    "quarter_kelly": {"kind": "kelly", "fraction": 0.25, "cap": 0.05, "max_exposure": 0.25, "card_exposure": 0.25},
+}
+
+# ==========================================
+# ⚙️ POLICIES
+# ==========================================
+def load_policies(path=POLICY_PATH):
+    """DEFAULT_POLICIES updated with data/staking_policies.json (if present)."""
+    policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for name, policy in json.load(f).items():
+                    policies[name] = {**policies.get(name, {}), **policy}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [Staking] Ignoring unreadable {path}: {e}")
+    return policies
+
+def get_policy(name=None):
+    """Named policy (DEFAULT_POLICY when name is empty). Raises ValueError for unknown names."""
+    policies = load_policies()
+    name = name or DEFAULT_POLICY
+    if name not in policies:
+        raise ValueError(f"unknown staking policy '{name}' (choose from {', '.join(sorted(policies))})")
+    return {"name": name, **policies[name]}
+
+# ==========================================
+# 📐 KELLY MATH (vectorized)
+# ==========================================
+def race_kelly(p, odds):
+    """
+    Kelly fractions for simultaneous win bets on runners of the same race, (..., runners) arrays.
+    NaN / missing odds never get a stake.
+    """
+    p = np.nan_to_num(np.asarray(p, dtype=float))
+    odds = np.asarray(odds, dtype=float)
+    valid = np.isfinite(odds) & (odds > 1.0) & (p > 0)
+    odds = np.where(valid, odds, 1.0)
+    edge = np.where(valid, p * odds, 0.0)
+
+    order = np.argsort(-edge, axis=-1, kind="stable")
+    e_sorted = np.take_along_axis(edge, order, axis=-1)
+    p_sorted = np.take_along_axis(p, order, axis=-1)
+    inv_sorted = np.take_along_axis(np.where(valid, 1.0 / odds, 0.0), order, axis=-1)
+
+    # R_k = (1 - sum p) / (1 - sum 1/odds) over the k best runners; R_0 = 1
+    cum_p = np.cumsum(p_sorted, axis=-1)
+    cum_inv = np.cumsum(inv_sorted, axis=-1)
+    denom = 1.0 - cum_inv
+    reserve = np.divide(1.0 - cum_p, denom, out=np.full(cum_p.shape, np.inf), where=denom > 1e-12)
+    prev_reserve = np.concatenate([np.ones(reserve.shape[:-1] + (1,)), reserve[..., :-1]], axis=-1)
+    # A runner is in while every better runner was in and it beats the reserve rate so far
+    included = np.cumprod(e_sorted > prev_reserve, axis=-1).astype(bool)
+    k = included.sum(axis=-1, keepdims=True)
+    final_reserve = np.take_along_axis(np.concatenate([np.ones(k.shape), reserve], axis=-1), k, axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f_sorted = np.where(included, p_sorted - final_reserve * inv_sorted, 0.0)
+    out = np.zeros_like(f_sorted)
+    np.put_along_axis(out, order, np.clip(f_sorted, 0.0, 1.0), axis=-1)
+    return out
+
+def apply_policy(fractions, policy):
+    """Scales raw Kelly fractions by the policy fraction, per-bet cap and per-race exposure cap."""
+    f = np.asarray(fractions, dtype=float) * policy.get("fraction", 1.0)
+    f = np.minimum(f, policy.get("cap", 1.0))
+    total = f.sum(axis=-1, keepdims=True)
+    limit = policy.get("max_exposure", 1.0)
+    return np.where(total > limit, f * limit / np.where(total > 0, total, 1.0), f)
+
+def estimated_odds(ranks, odds_table=None):
+    """
+    Decimal odds estimate for 0-based rating ranks from the fitted rank odds (probability model).
+    NaN (never staked) for ranks beyond the table or never seen winning.
+    """
+    table = np.array([np.nan if o is None else o for o in (odds_table or rank_odds())], dtype=float)
+    ranks = np.asarray(ranks)
+    return np.where(ranks < len(table), table[np.minimum(ranks, len(table) - 1)], np.nan)
+
+# ==========================================
+# 💵 BET SIZING
+# ==========================================
+def stake_amount(fraction, bankroll=DEFAULT_BANKROLL, min_stake=MIN_STAKE):
+    """Whole-dollar stake for a bankroll fraction; 0.0 (PASS) when under min_stake."""
+    stake = float(np.floor(fraction * bankroll))
+    return stake if stake >= min_stake else 0.0
+
+def tier_for(has_solo_lock, has_best_bet):
+    return "solo_lock" if has_solo_lock else ("best_bet" if has_best_bet else "top_pick")
+
+def race_stakes(probs, odds=None, policy=None, bankroll=DEFAULT_BANKROLL, tier="top_pick"):
+    """
+    Dollar stake per runner for one race. probs / odds are in rating order (odds None ->
+    fitted rank odds). Tiered / flat policies only ever back the top pick.
+    """
+    policy = policy or get_policy()
+    probs = np.asarray(probs, dtype=float)
+    stakes = np.zeros(len(probs))
+    if not len(probs):
+        return stakes
+    if policy["kind"] == "tiered":
+        stakes[0] = policy["stakes"].get(tier, 0.0)
+        return stakes
+    if policy["kind"] == "flat":
+        stakes[0] = policy["stake"]
+        return stakes
+
+    if odds is None:
+        odds = estimated_odds(np.arange(len(probs)))
+    odds = np.array([np.nan if o is None else o for o in odds], dtype=float)
+    fractions = apply_policy(race_kelly(probs, odds), policy)
+    return np.array([stake_amount(f, bankroll) for f in fractions])
+
+def card_stakes(races, policy=None, bankroll=DEFAULT_BANKROLL):
+    """
+    Stakes for simultaneous bets across a card: races is a list of (probs, odds) pairs. Each race
+    is sized on its own, then the whole card is scaled down to the policy's card exposure cap
+    (bets that fall under MIN_STAKE become a PASS).
+    """
+    policy = policy or get_policy()
+    per_race = [race_stakes(p, o, policy, bankroll) for p, o in races]
+    total = sum(float(s.sum()) for s in per_race)
+    limit = policy.get("card_exposure", 1.0) * bankroll
+    if policy["kind"] == "kelly" and total > limit > 0:
+        scaled = [np.floor(s * limit / total) for s in per_race]
+        per_race = [np.where(s >= MIN_STAKE, s, 0.0) for s in scaled]
+    return per_race
+
+# ==========================================
+# 📈 BULK BACKTEST
+# ==========================================
+def load_backtest_races(db_path=DB_PATH):
+    """
+    Settled races in date order with our four ranked picks, their ratings and the official result,
+    plus out-of-sample probabilities and odds (walk_forward).
+    """
+    conn = connect(db_path, readonly=True)
+    try:
+        rows = conn.execute("""
+            SELECT p.date, p.track, p.race_number,
+                   p.p1_num, p.p2_num, p.p3_num, p.p4_num,
+                   p.p1_rating, p.p2_rating, p.p3_rating, p.p4_rating,
+                   p.has_solo_lock, p.has_best_bet, p.rating_gap, r.win_num, r.win_payout
+            FROM predictions p
+            JOIN results r ON p.date = r.date AND p.track = r.track AND p.race_number = r.race_number
+            WHERE r.win_num IS NOT NULL AND r.win_num != ''
+            ORDER BY p.date, p.track, p.race_number
+        """).fetchall()
+    finally:
+        conn.close()
+
+    n = len(rows)
+    ratings = np.full((n, 4), np.nan)
+    won = np.zeros((n, 4), dtype=bool)
+    payout = np.zeros(n)
+    tiers, keys = [], []
+    for i, (date, track, race_num, *rest) in enumerate(rows):
+        nums, vals = rest[0:4], rest[4:8]
+        has_lock, has_best, gap, win_num, win_paid = rest[8:]
+        ratings[i] = [float(v) if v not in (None, "") else np.nan for v in vals]
+        won[i] = [str(num).strip() == str(win_num).strip() for num in nums]
+        payout[i] = float(win_paid) / 2.0 if win_paid else 0.0
+        gap = float(gap or 0.0)
+        tiers.append(tier_for(bool(has_lock) or (ratings[i, 0] >= 88.0 and gap >= 5.0), bool(has_best) or gap >= 3.0))
+        keys.append((date, track_key(track), race_num))
+    return walk_forward({"keys": keys, "ratings": ratings, "won": won, "payout": payout, "tiers": tiers})
+
+def _subset(history, mask):
+    out = {k: v[mask] for k, v in history.items() if isinstance(v, np.ndarray)}
+    out["keys"] = [k for k, m in zip(history["keys"], mask) if m]
+    out["tiers"] = [t for t, m in zip(history["tiers"], mask) if m]
+    return out
+
+def walk_forward(history, min_train=MIN_TRAIN_RACES):
+    """
+    Out-of-sample pricing for the backtest. At the start of each month, temperatures, listed share
+    and rank odds are refitted on the races settled before that month, and those fits price the
+    month's races. Months that start before min_train settled races are dropped. Adds "probs" and
+    "odds" (races, RANKS) to the returned history.
+    """
+    ratings, won = history["ratings"], history["won"]
+    n = len(history["keys"])
+    valid = ~np.isnan(ratings)
+    top = np.where(valid, ratings, -np.inf).max(axis=1)
+    bottom = np.where(valid, ratings, np.inf).min(axis=1)
+    # Same race filter as probability.load_settled_races: two or more distinct ratings
+    informative = (valid.sum(axis=1) >= 2) & (top > bottom)
+    winner_idx = won.argmax(axis=1)
+    listed = informative & won.any(axis=1) & valid[np.arange(n), winner_idx]
+    tracks = np.array([key for _, key, _ in history["keys"]])
+    months = np.array([date[:7] for date, _, _ in history["keys"]])
+
+    probs = np.zeros(ratings.shape)
+    odds = np.full(ratings.shape, np.nan)
+    keep = np.zeros(n, dtype=bool)
+    for month in np.unique(months):
+        rows = months == month
+        start = int(np.argmax(rows))  # history is in date order
+        if start < min_train:
+            continue
+        train = listed[:start]
+        model = fit_temperatures(tracks[:start][train], ratings[:start][train], winner_idx[:start][train],
+                                 missed=int((informative[:start] & ~won[:start].any(axis=1)).sum()))
+        temps = np.array([(model["tracks"].get(key) or model["global"])["temperature"] for key in tracks[rows]])
+        probs[rows] = win_probabilities(ratings[rows], temps) * model["global"]["listed_share"]
+        odds[rows] = estimated_odds(np.arange(RANKS), fit_rank_odds(won[:start], history["payout"][:start]))
+        keep[rows] = True
+    return _subset(dict(history, probs=probs, odds=odds), keep)
+
+def policy_fractions(history, policies):
+    """
+    (policies, races, 4) stakes: bankroll fractions for Kelly policies, dollars for tiered / flat.
+    Also returns a bool mask of which policies compound (Kelly).
+    """
+    probs = history["probs"]
+    raw_kelly = race_kelly(probs, history["odds"])
+
+    stakes = np.zeros((len(policies),) + probs.shape)
+    compounding = np.zeros(len(policies), dtype=bool)
+    for j, policy in enumerate(policies):
+        if policy["kind"] == "kelly":
+            stakes[j] = apply_policy(raw_kelly, policy)
+            compounding[j] = True
+        elif policy["kind"] == "flat":
+            stakes[j, :, 0] = policy["stake"]
+        else:
+            stakes[j, :, 0] = [policy["stakes"].get(t, 0.0) for t in history["tiers"]]
+    return stakes, compounding
+
+def race_net(history, policies):
+    """Net dollars (flat / tiered) or net bankroll fraction (Kelly) per policy per race, (policies, races)."""
+    stakes, compounding = policy_fractions(history, policies)
+    # Per-unit return of each bet: the decimal dividend when it won, else 0
+    returns = np.where(history["won"], history["payout"][:, None], 0.0)
+    return (stakes * (returns[None] - 1.0)).sum(axis=-1), compounding
+
+def replay(net, compounding, bankroll=DEFAULT_BANKROLL):
+    """
+    Bankroll paths (..., policies, races + 1) for net results (..., policies, races). Kelly policies
+    compound; tiered / flat policies add dollars. A bankroll that hits zero stays there.
+    """
+    compounding = np.asarray(compounding)[:, None]
+    multiplicative = bankroll * np.cumprod(np.maximum(1.0 + net, 0.0), axis=-1)
+    additive = bankroll + np.cumsum(net, axis=-1)
+    # Once a flat-stake bankroll is exhausted it stays exhausted
+    additive = np.where(np.minimum.accumulate(additive, axis=-1) <= 0, 0.0, additive)
+    paths = np.where(compounding, multiplicative, additive)
+    start = np.full(paths.shape[:-1] + (1,), float(bankroll))
+    return np.concatenate([start, paths], axis=-1)
+
+def backtest(policy_names=None, db_path=DB_PATH, bankroll=DEFAULT_BANKROLL, history=None):
+    """
+    Replays the settled history under every policy at once. Kelly policies compound (stake a
+    fraction of the running bankroll); tiered / flat policies stake fixed dollars. A bankroll that
+    hits zero stays there. Returns (names, trajectories (policies, races + 1), history).
+    """
+    history = history or load_backtest_races(db_path)
+    names = policy_names or sorted(load_policies())
+    net, compounding = race_net(history, [get_policy(name) for name in names])
+    return names, replay(net, compounding, bankroll), history
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest staking policies against settled results.")
+    parser.add_argument("--policy", nargs="+", help="Policies to replay (default: all)")
+    parser.add_argument("--bankroll", type=float, default=DEFAULT_BANKROLL)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    names, paths, history = backtest(args.policy, args.db, args.bankroll)
+    print(f"📈 {len(history['keys'])} settled races priced out-of-sample (after {MIN_TRAIN_RACES} training races)")
+    for name, path in zip(names, paths):
+        print(f"   {name:<15} final ${path[-1]:>10,.2f}  low ${path.min():>10,.2f}  high ${path.max():>10,.2f}")
@@ -1,35 +1,34 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import datetime
 
+from storage import connect
+
 # --- CONFIG ---
 st.set_page_config(page_title="Handicapping Stats", page_icon="📈", layout="wide")
-DB_FILE = "racing_ledger.db"
 
 # --- DB HELPERS ---
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    return connect()
 
 def load_data():
     conn = get_connection()
+    # pick_rank: 1 = top pick, 99 = danger horse (see storage.graded_selections)
     query = """
     SELECT 
-        r.race_uuid,
-        r.track,
-        r.date,
-        r.race_number,
-        r.betting_strategy,
-        p.horse_number,
-        p.rank_prediction,
-        p.confidence_level,
-        res.winner_number,
-        res.second_number,
-        res.third_number,
-        res.win_payout
-    FROM predictions p
-    JOIN results res ON p.race_uuid = res.race_uuid
-    JOIN races r ON p.race_uuid = r.race_uuid
+        race_uuid,
+        track,
+        date,
+        race_number,
+        betting_strategy,
+        horse_number,
+        pick_rank AS rank_prediction,
+        confidence_level,
+        winner_number,
+        second_number,
+        third_number,
+        win_payout
+    FROM graded_selections
     """
     try:
         df = pd.read_sql_query(query, conn)
@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+Unified Storage Engine
+One SQLite database (logs/master_betting_history.db) and one schema for every script:
+  - predictions / results / bet_ledger  : flat per-race model used by app2.py, api.py and the agents
+  - meetings / races / selections       : per-horse card model (formerly racing_data.db + racing_ledger.db)
+  - graded_selections (view)            : selections joined to their race and official result
+  - ingest_manifest                     : incremental log ingestion fingerprints (db_manager.py)
+
+Connections: connect() for short-lived scripts, get_connection() / get_readonly_connection() for
+long-running servers (one reused connection per thread). The database runs in WAL mode with a busy
+timeout, so analytics readers and the race-day writers (app2.py, api.py, agents) no longer lock each other out.
+
+Run `python storage.py --migrate` once to fold the legacy racing_data.db and racing_ledger.db into it.
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+DB_PATH = os.path.join(LOGS_DIR, "master_betting_history.db")
+LEGACY_DATA_DB_PATH = os.path.join(BASE_DIR, "racing_data.db")
+LEGACY_LEDGER_DB_PATH = os.path.join(BASE_DIR, "racing_ledger.db")
+
+SCHEMA = [
+    # Flat per-race prediction rows (one row per race, top 4 + danger)
+    """
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT, track TEXT, race_number TEXT, distance TEXT, surface TEXT, condition TEXT,
+        p1_num TEXT, p1_barrier TEXT, p1_name TEXT, p1_reason TEXT,
+        p2_num TEXT, p2_barrier TEXT, p2_name TEXT, p2_reason TEXT,
+        p3_num TEXT, p3_barrier TEXT, p3_name TEXT, p3_reason TEXT,
+        p4_num TEXT, p4_barrier TEXT, p4_name TEXT, p4_reason TEXT,
+        danger_num TEXT, danger_barrier TEXT, danger_name TEXT, danger_reason TEXT,
+        confidence TEXT, ai_model TEXT, temperature REAL, raw_features TEXT,
+        exotic_strategy TEXT DEFAULT '',
+        p1_rating REAL, p2_rating REAL, p3_rating REAL, p4_rating REAL,
+        rating_gap REAL DEFAULT 0.0,
+        has_best_bet INTEGER DEFAULT 0,
+        has_solo_lock INTEGER DEFAULT 0,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Official results & payouts (one row per race)
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        date TEXT, track TEXT, race_number TEXT, win_num TEXT, place_num TEXT, show_num TEXT,
+        win_payout REAL DEFAULT 0.0, place_payout REAL DEFAULT 0.0, show_payout REAL DEFAULT 0.0,
+        p2_place_payout REAL DEFAULT 0.0, p2_show_payout REAL DEFAULT 0.0, p3_show_payout REAL DEFAULT 0.0,
+        exacta_payout REAL DEFAULT 0.0, trifecta_payout REAL DEFAULT 0.0, superfecta_payout REAL DEFAULT 0.0,
+        scratches TEXT DEFAULT 'None',
+        PRIMARY KEY (date, track, race_number)
+    )
+    """,
+    # Meeting index: one row per (track, date), stable integer id for races.meeting_id
+    """
+    CREATE TABLE IF NOT EXISTS meetings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT,
+        track TEXT,
+        date TEXT,
+        track_condition TEXT,
+        region TEXT,
+        race_count INTEGER,
+        solo_locks_count INTEGER,
+        best_bets_count INTEGER,
+        UNIQUE(track, date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS races (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        meeting_id INTEGER,
+        race_number INTEGER,
+        race_uuid TEXT UNIQUE,
+        track TEXT,
+        date TEXT,
+        distance TEXT,
+        surface TEXT,
+        race_class TEXT,
+        confidence TEXT,
+        strategy TEXT,
+        danger_horse_name TEXT,
+        FOREIGN KEY (meeting_id) REFERENCES meetings(id),
+        UNIQUE(meeting_id, race_number)
+    )
+    """,
+    # Per-horse picks. rank: 1-4 pick order, 99 = danger horse, NULL = unranked label only
+    """
+    CREATE TABLE IF NOT EXISTS selections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        race_id INTEGER,
+        rank INTEGER,
+        horse_number TEXT,
+        horse_name TEXT,
+        barrier TEXT,
+        reason TEXT,
+        rating REAL,
+        rank_prediction TEXT,
+        confidence_level TEXT,
+        finish_position INTEGER DEFAULT NULL,
+        win_paid REAL DEFAULT 0.0,
+        FOREIGN KEY (race_id) REFERENCES races(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bet_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        track TEXT,
+        date TEXT,
+        race_number INTEGER,
+        horse_number TEXT,
+        horse_name TEXT,
+        bet_type TEXT,
+        stake REAL,
+        status TEXT DEFAULT 'PENDING'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        path TEXT PRIMARY KEY,
+        size INTEGER,
+        mtime REAL,
+        content_hash TEXT,
+        ingested_at TEXT,
+        status TEXT DEFAULT 'ingested'
+    )
+    """,
+]
+
+VIEWS = [
+    # Cross-cutting join that used to need two databases: picks + race + official result
+    """
+    CREATE VIEW IF NOT EXISTS graded_selections AS
+    SELECT
+        r.race_uuid, r.track, r.date, r.race_number, r.surface, r.distance,
+        r.strategy AS betting_strategy,
+        s.id AS selection_id, s.rank AS pick_rank, s.rank_prediction, s.confidence_level,
+        s.horse_number, s.horse_name, s.barrier, s.rating, s.finish_position,
+        res.win_num AS winner_number, res.place_num AS second_number, res.show_num AS third_number,
+        res.win_payout, res.exacta_payout, res.trifecta_payout
+    FROM selections s
+    JOIN races r ON s.race_id = r.id
+    JOIN results res ON res.date = r.date AND res.track = r.track AND res.race_number = CAST(r.race_number AS TEXT)
+    """,
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_predictions_track_date_race ON predictions (track, date, race_number)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_date ON predictions (date)",
+    "CREATE INDEX IF NOT EXISTS idx_results_track_date ON results (track, date)",
+    "CREATE INDEX IF NOT EXISTS idx_meetings_filename ON meetings (filename)",
+    # Meeting selector listing (api.py /api/meetings): newest-first keyset pages, optionally per region / track
+    "CREATE INDEX IF NOT EXISTS idx_meetings_listing ON meetings (date DESC, track) WHERE filename IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_meetings_region_listing ON meetings (region, date DESC, track) WHERE filename IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_meetings_track_listing ON meetings (track COLLATE NOCASE, date DESC, track) WHERE filename IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_races_track_date ON races (track, date, race_number)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_selections_race_rank ON selections (race_id, rank)",
+    "CREATE INDEX IF NOT EXISTS idx_selections_graded ON selections (finish_position, race_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bet_ledger_track_date ON bet_ledger (track, date, race_number)",
+]
+
+# Columns added after a table first shipped; (table, column, type) applied with ALTER TABLE when missing
+COLUMN_MIGRATIONS = [
+    ("predictions", "p1_barrier", "TEXT"), ("predictions", "p1_reason", "TEXT"),
+    ("predictions", "p2_barrier", "TEXT"), ("predictions", "p2_reason", "TEXT"),
+    ("predictions", "p3_barrier", "TEXT"), ("predictions", "p3_reason", "TEXT"),
+    ("predictions", "p4_barrier", "TEXT"), ("predictions", "p4_reason", "TEXT"),
+    ("predictions", "danger_barrier", "TEXT"), ("predictions", "danger_reason", "TEXT"),
+    ("predictions", "confidence", "TEXT"), ("predictions", "ai_model", "TEXT"),
+    ("predictions", "temperature", "REAL"), ("predictions", "raw_features", "TEXT"),
+    ("predictions", "exotic_strategy", "TEXT DEFAULT ''"),
+    ("predictions", "p1_rating", "REAL"), ("predictions", "p2_rating", "REAL"),
+    ("predictions", "p3_rating", "REAL"), ("predictions", "p4_rating", "REAL"),
+    ("predictions", "rating_gap", "REAL DEFAULT 0.0"),
+    ("predictions", "has_best_bet", "INTEGER DEFAULT 0"),
+    ("predictions", "has_solo_lock", "INTEGER DEFAULT 0"),
+    ("results", "place_payout", "REAL DEFAULT 0.0"), ("results", "show_payout", "REAL DEFAULT 0.0"),
+    ("results", "p2_place_payout", "REAL DEFAULT 0.0"), ("results", "p2_show_payout", "REAL DEFAULT 0.0"),
+    ("results", "p3_show_payout", "REAL DEFAULT 0.0"), ("results", "exacta_payout", "REAL DEFAULT 0.0"),
+    ("results", "trifecta_payout", "REAL DEFAULT 0.0"), ("results", "superfecta_payout", "REAL DEFAULT 0.0"),
+    ("results", "scratches", "TEXT DEFAULT 'None'"),
+    ("ingest_manifest", "status", "TEXT DEFAULT 'ingested'"),
+]
+
+MEETING_COLUMNS = ["filename", "track_condition", "region", "race_count", "solo_locks_count", "best_bets_count"]
+RACE_COLUMNS = ["distance", "surface", "race_class", "confidence", "strategy", "danger_horse_name"]
+
+# Legacy ledger rank labels -> selection rank (99 = danger horse)
+RANK_LABELS = {"top pick": 1, "fourth": 4, "danger": 99}
+
+# Applied to every connection. WAL itself is persistent and is switched on once in init_storage().
+BUSY_TIMEOUT_MS = 10000
+CONNECTION_PRAGMAS = [
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",  # wait for a competing writer instead of failing with "database is locked"
+    "PRAGMA synchronous = NORMAL",               # safe under WAL; only the last commits can be lost on power failure
+    "PRAGMA cache_size = -16000",                # ~16 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+]
+
+_initialized_paths = set()
+_init_lock = threading.Lock()
+_thread_local = threading.local()
+
+def open_connection(db_path, readonly=False, **kwargs):
+    """
+    Opens a tuned connection (busy timeout, synchronous=NORMAL, larger cache) to any SQLite file
+    without touching its schema. Read-only connections can never take the write lock.
+    """
+    kwargs.setdefault("timeout", BUSY_TIMEOUT_MS / 1000)
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, **kwargs)
+    else:
+        conn = sqlite3.connect(db_path, **kwargs)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def enable_wal(db_path):
+    """Switches a database file to WAL so readers never block the writer (persistent per file)."""
+    conn = open_connection(db_path)
+    try:
+        return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+def file_identity(db_path):
+    """(device, inode) of a database file, None when missing. Changes when the file is replaced (os.replace)."""
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+def connect(db_path=DB_PATH, readonly=False, **kwargs):
+    """Opens a new tuned connection to the unified database, creating/upgrading the schema on first use."""
+    init_storage(db_path)
+    return open_connection(db_path, readonly=readonly, **kwargs)
+
+def _thread_connection(db_path, readonly):
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    key = (db_path, readonly)
+    identity = file_identity(db_path)
+    cached = connections.get(key)
+    if cached and cached[1] != identity:
+        # The file was replaced under us; the old handle still points at the unlinked file
+        cached[0].close()
+        cached = None
+    if cached is None:
+        conn = connect(db_path, readonly=readonly)
+        cached = connections[key] = (conn, file_identity(db_path))
+    return cached[0]
+
+def get_connection(db_path=DB_PATH):
+    """
+    Read/write connection reused for the lifetime of the calling thread.
+    Commit (or roll back) as usual but never close it; see close_thread_connections().
+    """
+    return _thread_connection(db_path, False)
+
+def get_readonly_connection(db_path=DB_PATH):
+    """Per-thread read-only connection for analytics; runs alongside a writer without blocking it."""
+    return _thread_connection(db_path, True)
+
+def close_thread_connections():
+    """Closes the connections cached for the calling thread (e.g. when a worker thread exits)."""
+    connections = getattr(_thread_local, "connections", None) or {}
+    for conn, _ in connections.values():
+        conn.close()
+    connections.clear()
+
+def _table_columns(c, table):
+    c.execute(f'PRAGMA table_info("{table}")')
+    return [col[1] for col in c.fetchall()]
+
+def _copy_legacy_meetings_index(c):
+    """The old master meetings index was keyed on filename; move its rows into the id-keyed table."""
+    c.execute("""
+        INSERT INTO meetings (filename, track, date, region, race_count, solo_locks_count, best_bets_count)
+        SELECT filename, track, date, region, race_count, solo_locks_count, best_bets_count
+        FROM meetings_filename_index WHERE true
+        ON CONFLICT(track, date) DO UPDATE SET
+            filename = excluded.filename, region = excluded.region, race_count = excluded.race_count,
+            solo_locks_count = excluded.solo_locks_count, best_bets_count = excluded.best_bets_count
+    """)
+    c.execute("DROP TABLE meetings_filename_index")
+
+def create_schema(conn):
+    """Creates every table, view and index of the unified schema on an open connection (idempotent)."""
+    c = conn.cursor()
+    meeting_cols = _table_columns(c, "meetings")
+    legacy_meetings = bool(meeting_cols) and "id" not in meeting_cols
+    if legacy_meetings:
+        c.execute("ALTER TABLE meetings RENAME TO meetings_filename_index")
+    for stmt in SCHEMA:
+        c.execute(stmt)
+    if legacy_meetings:
+        _copy_legacy_meetings_index(c)
+
+    existing = {}
+    for table, col_name, col_type in COLUMN_MIGRATIONS:
+        if table not in existing:
+            existing[table] = set(_table_columns(c, table))
+        if col_name not in existing[table]:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}")
+            existing[table].add(col_name)
+
+    # Collapse legacy duplicate picks before enforcing one row per (race, rank)
+    c.execute("""
+        DELETE FROM selections WHERE rank IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM selections WHERE rank IS NOT NULL GROUP BY race_id, rank
+        )
+    """)
+    for stmt in VIEWS + INDEXES:
+        c.execute(stmt)
+    conn.commit()
+
+def init_storage(db_path=DB_PATH):
+    """Ensures the unified schema exists at db_path. Cheap after the first call per process."""
+    if db_path in _initialized_paths:
+        return
+    with _init_lock:
+        if db_path in _initialized_paths:
+            return
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = open_connection(db_path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            create_schema(conn)
+        finally:
+            conn.close()
+        _initialized_paths.add(db_path)
+
+def make_race_uuid(track, date, race_number):
+    """Stable race key shared with the legacy ledger (e.g. gulfstream_park_2026-01-25_R1)."""
+    s_track = str(track).lower().strip().replace(" ", "_")
+    s_num = str(race_number).upper().replace("R", "").strip()
+    return f"{s_track}_{str(date).strip()}_R{s_num}"
+
+def selection_rank(rank_prediction):
+    """Maps a legacy ledger rank_prediction ('1', 'Top Pick', 'Danger', '99', ...) to a selection rank."""
+    if rank_prediction is None:
+        return None
+    label = str(rank_prediction).strip()
+    if label.isdigit():
+        return int(label)
+    return RANK_LABELS.get(label.lower())
+
+def upsert_meeting(c, track, date, **fields):
+    """Inserts or updates the (track, date) meeting and returns its stable id. Unknown fields are ignored."""
+    values = {k: fields[k] for k in MEETING_COLUMNS if fields.get(k) is not None}
+    cols = ["track", "date"] + list(values)
+    updates = ", ".join(f"{k} = excluded.{k}" for k in values) or "track = excluded.track"
+    c.execute(f"""
+        INSERT INTO meetings ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})
+        ON CONFLICT(track, date) DO UPDATE SET {updates}
+    """, [track, date] + list(values.values()))
+    c.execute("SELECT id FROM meetings WHERE track = ? AND date = ?", (track, date))
+    return c.fetchone()[0]
+
+def upsert_races(c, meeting_id, track, date, race_rows):
+    """
+    Batched race upsert for one meeting. race_rows are dicts with race_number plus any RACE_COLUMNS.
+    Returns {str(race_number): race_id}.
+    """
+    by_uuid = {make_race_uuid(track, date, row["race_number"]): row for row in race_rows}
+    race_ids = {}
+    if by_uuid:
+        # Spelling variants of a track ("Eagle_Farm" / "Eagle Farm") share a race_uuid: reuse that race
+        placeholders = ",".join("?" * len(by_uuid))
+        c.execute(f"SELECT race_uuid, id FROM races WHERE race_uuid IN ({placeholders}) AND meeting_id IS NOT ?",
+                  list(by_uuid) + [meeting_id])
+        for race_uuid, race_id in c.fetchall():
+            row = by_uuid.pop(race_uuid)
+            sets = ", ".join(f"{k} = COALESCE(?, {k})" for k in RACE_COLUMNS)
+            c.execute(f"UPDATE races SET {sets} WHERE id = ?", [row.get(k) for k in RACE_COLUMNS] + [race_id])
+            race_ids[str(row["race_number"])] = race_id
+
+    params = [[meeting_id, row["race_number"], race_uuid, track, date] + [row.get(k) for k in RACE_COLUMNS]
+              for race_uuid, row in by_uuid.items()]
+    if params:
+        updates = ", ".join(f"{k} = COALESCE(excluded.{k}, races.{k})" for k in RACE_COLUMNS)
+        c.executemany(f"""
+            INSERT INTO races (meeting_id, race_number, race_uuid, track, date, {', '.join(RACE_COLUMNS)})
+            VALUES ({', '.join('?' * (5 + len(RACE_COLUMNS)))})
+            ON CONFLICT(meeting_id, race_number) DO UPDATE SET {updates}
+        """, params)
+    c.execute("SELECT race_number, id FROM races WHERE meeting_id = ?", (meeting_id,))
+    race_ids.update({str(row[0]): row[1] for row in c.fetchall()})
+    return race_ids
+
+def upsert_selections(c, selection_rows):
+    """
+    Batched upsert keyed on (race_id, rank). selection_rows are tuples of
+    (race_id, rank, horse_number, horse_name, barrier, reason, rating, rank_prediction, confidence_level).
+    Graded finish positions survive unless the horse in that slot changed.
+    """
+    c.executemany("""
+        INSERT INTO selections (race_id, rank, horse_number, horse_name, barrier, reason, rating, rank_prediction, confidence_level)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(race_id, rank) DO UPDATE SET
+            finish_position = CASE WHEN selections.horse_number IS excluded.horse_number THEN selections.finish_position ELSE NULL END,
+            win_paid = CASE WHEN selections.horse_number IS excluded.horse_number THEN selections.win_paid ELSE 0.0 END,
+            horse_number = excluded.horse_number, horse_name = excluded.horse_name,
+            barrier = excluded.barrier, reason = excluded.reason,
+            rating = COALESCE(excluded.rating, selections.rating),
+            rank_prediction = COALESCE(excluded.rank_prediction, selections.rank_prediction),
+            confidence_level = COALESCE(excluded.confidence_level, selections.confidence_level)
+    """, selection_rows)
+
+def upsert_result(c, date, track, race_number, **payouts):
+    """Inserts or updates one official result row; only the columns passed in are overwritten."""
+    cols = ["date", "track", "race_number"] + list(payouts)
+    updates = ", ".join(f"{k} = excluded.{k}" for k in payouts) or "track = excluded.track"
+    c.execute(f"""
+        INSERT INTO results ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})
+        ON CONFLICT(date, track, race_number) DO UPDATE SET {updates}
+    """, [date, track, str(race_number)] + list(payouts.values()))
+
+def find_race_by_uuid(c, race_uuid):
+    """Returns (race_id, track, date, race_number) for a race_uuid, or None."""
+    c.execute("SELECT id, track, date, race_number FROM races WHERE race_uuid = ?", (race_uuid,))
+    return c.fetchone()
+
+# ==========================================
+# 🧠 SHARED QUERY CACHE
+# ==========================================
+class QueryCache:
+    """
+    Process-wide read cache. Entries are dropped whenever PRAGMA data_version reports a
+    commit from another connection, or when a writer in this process calls invalidate().
+    The connection is reopened when the database file is replaced.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._identity = None
+        self._version = None
+        self._entries = {}
+
+    def _connection(self):
+        identity = file_identity(self.db_path)
+        if self._conn is not None and identity != self._identity:
+            self._conn.close()
+            self._conn = None
+            self._version = None
+        if self._conn is None:
+            self._conn = connect(self.db_path, readonly=True, check_same_thread=False)
+            self._identity = file_identity(self.db_path)
+        return self._conn
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def query(self, sql, params=()):
+        key = (sql, tuple(params))
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key not in self._entries:
+                self._entries[key] = conn.execute(sql, params).fetchall()
+            return self._entries[key]
+
+_query_cache = QueryCache()
+
+def cached_query(sql, params=()):
+    """Runs a read-only query through the shared cache and returns its rows."""
+    return _query_cache.query(sql, params)
+
+def invalidate_cache():
+    _query_cache.invalidate()
+
+# ==========================================
+# 🔀 LEGACY DATABASE MIGRATION
+# ==========================================
+def _open_legacy(legacy_path):
+    return open_connection(legacy_path, readonly=True)
+
+def _merge_racing_data(c, legacy_path):
+    legacy = _open_legacy(legacy_path)
+    lc = legacy.cursor()
+    try:
+        meetings = lc.execute("SELECT id, track, date, track_condition FROM meetings").fetchall()
+        race_rows = lc.execute("""
+            SELECT meeting_id, id, race_number, distance, surface, confidence, strategy, danger_horse_name
+            FROM races
+        """).fetchall()
+        selection_rows = lc.execute("""
+            SELECT race_id, rank, horse_number, horse_name, barrier, reason, finish_position, win_paid
+            FROM selections ORDER BY id
+        """).fetchall()
+        manifest_rows = []
+        if "ingest_manifest" in [r[0] for r in lc.execute("SELECT name FROM sqlite_master WHERE type='table'")]:
+            manifest_rows = lc.execute("SELECT path, size, mtime, content_hash, ingested_at FROM ingest_manifest").fetchall()
+    finally:
+        legacy.close()
+
+    races_by_meeting = {}
+    for row in race_rows:
+        races_by_meeting.setdefault(row[0], []).append(row)
+
+    race_id_map = {}
+    for old_id, track, date, cond in meetings:
+        meeting_id = upsert_meeting(c, track, date, track_condition=cond)
+        legacy_races = races_by_meeting.get(old_id, [])
+        new_ids = upsert_races(c, meeting_id, track, date, [
+            {"race_number": r[2], "distance": r[3], "surface": r[4], "confidence": r[5], "strategy": r[6], "danger_horse_name": r[7]}
+            for r in legacy_races
+        ])
+        for r in legacy_races:
+            race_id_map[r[1]] = new_ids.get(str(r[2]))
+
+    picks = []
+    grades = []
+    for race_id, rank, num, name, barrier, reason, finish, paid in selection_rows:
+        new_race_id = race_id_map.get(race_id)
+        if new_race_id is None:
+            continue
+        picks.append((new_race_id, rank, num, name, barrier, reason, None, None, None))
+        if finish is not None or paid:
+            grades.append((finish, paid or 0.0, new_race_id, rank))
+    upsert_selections(c, picks)
+    c.executemany("UPDATE selections SET finish_position = ?, win_paid = ? WHERE race_id = ? AND rank = ?", grades)
+
+    # Log files were already ingested against the legacy DB; keep their fingerprints
+    c.executemany("INSERT OR IGNORE INTO ingest_manifest (path, size, mtime, content_hash, ingested_at) VALUES (?, ?, ?, ?, ?)", manifest_rows)
+    return len(meetings), len(race_rows), len(picks)
+
+def _merge_racing_ledger(c, legacy_path):
+    legacy = _open_legacy(legacy_path)
+    lc = legacy.cursor()
+    try:
+        race_cols = _table_columns(lc, "races")
+        optional = [col for col in ["betting_strategy", "distance", "surface", "class"] if col in race_cols]
+        select_cols = ", ".join(["race_uuid", "track", "date", "race_number"] + optional)
+        races = [dict(zip(["race_uuid", "track", "date", "race_number"] + optional, row))
+                 for row in lc.execute(f"SELECT {select_cols} FROM races").fetchall()]
+
+        pred_cols = _table_columns(lc, "predictions")
+        wanted = ["race_uuid", "horse_number", "horse_name", "rating", "rank_prediction", "confidence_level", "reasoning"]
+        pred_select = ", ".join(col if col in pred_cols else f"NULL AS {col}" for col in wanted)
+        predictions = lc.execute(f"SELECT {pred_select} FROM predictions ORDER BY id").fetchall()
+
+        results = lc.execute("""
+            SELECT race_uuid, winner_number, second_number, third_number, win_payout, exacta_payout, trifecta_payout
+            FROM results
+        """).fetchall()
+    finally:
+        legacy.close()
+
+    uuid_to_race = {}
+    by_meeting = {}
+    for r in races:
+        by_meeting.setdefault((r["track"], r["date"]), []).append(r)
+    for (track, date), meeting_races in by_meeting.items():
+        meeting_id = upsert_meeting(c, track, date)
+        new_ids = upsert_races(c, meeting_id, track, date, [
+            {"race_number": r["race_number"], "distance": r.get("distance"), "surface": r.get("surface"),
+             "race_class": r.get("class"), "strategy": r.get("betting_strategy")}
+            for r in meeting_races
+        ])
+        for r in meeting_races:
+            uuid_to_race[r["race_uuid"]] = (new_ids.get(str(r["race_number"])), track, date, r["race_number"])
+
+    ranked = []
+    unranked = 0
+    for race_uuid, num, name, rating, rank_pred, conf, reasoning in predictions:
+        race = uuid_to_race.get(race_uuid)
+        if not race or race[0] is None:
+            continue
+        rank = selection_rank(rank_pred)
+        if rank is not None:
+            ranked.append((race[0], rank, num, name, None, reasoning, rating, rank_pred, conf))
+            continue
+        # Label-only picks ('Value', ...) have no slot; attach to an existing row for the horse or add one
+        c.execute("""
+            UPDATE selections SET rank_prediction = COALESCE(rank_prediction, ?), rating = COALESCE(rating, ?),
+                   confidence_level = COALESCE(confidence_level, ?)
+            WHERE race_id = ? AND horse_number IS ?
+        """, (rank_pred, rating, conf, race[0], num))
+        if c.rowcount == 0:
+            c.execute("""
+                INSERT INTO selections (race_id, rank, horse_number, horse_name, reason, rating, rank_prediction, confidence_level)
+                VALUES (?, NULL, ?, ?, ?, ?, ?, ?)
+            """, (race[0], num, name, reasoning, rating, rank_pred, conf))
+            unranked += 1
+    upsert_selections(c, ranked)
+
+    merged_results = 0
+    for race_uuid, win_num, place_num, show_num, win_pay, exacta_pay, trifecta_pay in results:
+        race = uuid_to_race.get(race_uuid)
+        if not race:
+            continue
+        _, track, date, race_number = race
+        # Fill gaps only: results already captured in the master DB win over the ledger copy
+        c.execute("""
+            INSERT INTO results (date, track, race_number, win_num, place_num, show_num, win_payout, exacta_payout, trifecta_payout)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(date, track, race_number) DO UPDATE SET
+                win_num = COALESCE(NULLIF(results.win_num, ''), excluded.win_num),
+                place_num = COALESCE(NULLIF(results.place_num, ''), excluded.place_num),
+                show_num = COALESCE(NULLIF(results.show_num, ''), excluded.show_num),
+                win_payout = CASE WHEN results.win_payout > 0 THEN results.win_payout ELSE excluded.win_payout END,
+                exacta_payout = CASE WHEN results.exacta_payout > 0 THEN results.exacta_payout ELSE excluded.exacta_payout END,
+                trifecta_payout = CASE WHEN results.trifecta_payout > 0 THEN results.trifecta_payout ELSE excluded.trifecta_payout END
+        """, (date, track, str(race_number), win_num, place_num, show_num, win_pay or 0.0, exacta_pay or 0.0, trifecta_pay or 0.0))
+        merged_results += 1
+    return len(races), len(ranked) + unranked, merged_results
+
+def migrate_legacy_databases(data_db_path=LEGACY_DATA_DB_PATH, ledger_db_path=LEGACY_LEDGER_DB_PATH, db_path=DB_PATH):
+    """
+    Folds racing_data.db and racing_ledger.db into the unified database in one transaction.
+    Idempotent: meetings/races/selections/results are upserted on their natural keys.
+    """
+    conn = connect(db_path)
+    c = conn.cursor()
+    try:
+        if os.path.exists(data_db_path):
+            m_count, r_count, s_count = _merge_racing_data(c, data_db_path)
+            print(f"[Storage] Merged {os.path.basename(data_db_path)}: {m_count} meetings, {r_count} races, {s_count} selections")
+        if os.path.exists(ledger_db_path):
+            r_count, p_count, res_count = _merge_racing_ledger(c, ledger_db_path)
+            print(f"[Storage] Merged {os.path.basename(ledger_db_path)}: {r_count} races, {p_count} predictions, {res_count} results")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    invalidate_cache()
+    print(f"✅ Unified database ready: {db_path}")
+
+if __name__ == "__main__":
+    init_storage()
+    if "--migrate" in sys.argv:
+        migrate_legacy_databases()
+    else:
+        print(f"✅ Unified schema ready at {DB_PATH}. Run with --migrate to merge racing_data.db and racing_ledger.db.")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Stress Check
+Runs many analytics readers alongside bet-logging writers against a throwaway database with the
+unified schema and reports throughput plus "database is locked" failures.
+
+    python stress_db.py                  # compare both modes
+    python stress_db.py --mode tuned     # storage connections (WAL + busy timeout, per-thread reuse)
+    python stress_db.py --mode default   # plain sqlite3.connect, rollback journal (old behaviour)
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+import storage
+
+READ_SQL = """
+    SELECT p.track, COUNT(*), SUM(CASE WHEN r.win_num = p.p1_num THEN r.win_payout ELSE 0 END)
+    FROM predictions p
+    LEFT JOIN results r ON p.date = r.date AND p.track = r.track AND p.race_number = r.race_number
+    GROUP BY p.track
+"""
+WRITE_SQL = """
+    INSERT INTO bet_ledger (timestamp, track, date, race_number, horse_number, horse_name, bet_type, stake)
+    VALUES (?, 'Stress Park', '2026-07-01', ?, ?, 'Load Test', 'WIN', 5.0)
+"""
+
+def seed_database(db_path, races=5000, journal_mode="WAL"):
+    storage.init_storage(db_path)
+    conn = storage.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.executemany(
+        "INSERT INTO predictions (date, track, race_number, p1_num) VALUES (?, ?, ?, ?)",
+        [("2026-07-01", f"Track {i % 40}", str(i), str(i % 12 + 1)) for i in range(races)]
+    )
+    conn.executemany(
+        "INSERT INTO results (date, track, race_number, win_num, win_payout) VALUES (?, ?, ?, ?, ?)",
+        [("2026-07-01", f"Track {i % 40}", str(i), str(i % 7 + 1), 4.2) for i in range(races)]
+    )
+    conn.commit()
+    conn.close()
+
+def open_for_mode(db_path, mode, readonly):
+    if mode == "default":
+        return sqlite3.connect(db_path)
+    return storage.get_readonly_connection(db_path) if readonly else storage.get_connection(db_path)
+
+def run_stress(mode="tuned", readers=8, writers=3, writes=400, races=5000):
+    work_dir = tempfile.mkdtemp(prefix="stress_db_")
+    db_path = os.path.join(work_dir, "stress.db")
+    seed_database(db_path, races, journal_mode="DELETE" if mode == "default" else "WAL")
+
+    counters = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+    lock = threading.Lock()
+    writers_left = [writers]
+    done = threading.Event()
+
+    def reader():
+        conn = open_for_mode(db_path, mode, readonly=True)
+        while not done.is_set():
+            try:
+                conn.execute(READ_SQL).fetchall()
+                key = "reads"
+            except sqlite3.OperationalError:
+                key = "read_errors"
+            with lock:
+                counters[key] += 1
+        if mode == "default":
+            conn.close()
+        else:
+            storage.close_thread_connections()
+
+    def writer():
+        conn = open_for_mode(db_path, mode, readonly=False)
+        try:
+            for i in range(writes):
+                try:
+                    conn.execute(WRITE_SQL, (time.time(), i % 12 + 1, str(i % 14 + 1)))
+                    conn.commit()
+                    key = "writes"
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    key = "write_errors"
+                with lock:
+                    counters[key] += 1
+        finally:
+            with lock:
+                writers_left[0] -= 1
+                if writers_left[0] == 0:
+                    done.set()
+        if mode == "default":
+            conn.close()
+        else:
+            storage.close_thread_connections()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return dict(counters, mode=mode, readers=readers, writers=writers, seconds=round(elapsed, 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Many readers + concurrent writers against the unified schema.")
+    parser.add_argument("--mode", choices=["tuned", "default", "both"], default="both")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=3)
+    parser.add_argument("--writes", type=int, default=400, help="Commits per writer")
+    args = parser.parse_args()
+
+    modes = ["default", "tuned"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        r = run_stress(mode, readers=args.readers, writers=args.writers, writes=args.writes)
+        print(f"[{r['mode']:>7}] {r['readers']} readers + {r['writers']} writers in {r['seconds']}s | "
+              f"writes ok {r['writes']} / locked {r['write_errors']} | "
+              f"reads ok {r['reads']} / locked {r['read_errors']}")
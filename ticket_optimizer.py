@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Multi-Race Ticket Optimizer
+Chooses pick-N legs (daily double .. pick 6) from per-race win probabilities under a budget,
+instead of singling "High" confidence races or spreading a fixed top-2/top-3.
+
+Legs are independent, so a ticket that takes the top k_l contenders in each leg hits with
+prod(P_l(k_l)) and costs base * prod(k_l). A dynamic program over the legs keeps, for every
+reachable combination count, the best log hit probability and drops states beaten by a cheaper
+one (branch-and-bound on the Pareto frontier), which makes the search exact and takes a few
+milliseconds per window. Objectives:
+
+- "hit": highest hit probability within budget (cheapest on ties).
+- "ev":  highest expected profit hit * payout - cost, given an estimated payout per winning
+         base-stake ticket; windows are then ranked by EV per dollar.
+
+    python ticket_optimizer.py logs/Saratoga_2026-07-18.json --budget 24
+"""
+
+import math
+import time
+import argparse
+
+import numpy as np
+
+from enrichment import load_meeting_json
+from exotic_sim import PICK_LEGS, BASE_STAKES, DEFAULT_FIELD_SIZE, card_fields, format_ticket
+
+MAX_LEG_SPREAD = 6
+# Default spend per window when the card is enriched (whole-dollar tickets at the usual bases)
+DEFAULT_BUDGETS = {"daily_double": 6.0, "pick_3": 12.0, "pick_4": 24.0, "pick_5": 36.0, "pick_6": 38.4}
+
+def leg_hit_curve(numbers, probs, max_spread=MAX_LEG_SPREAD):
+    """P(winner among the top k listed) for k = 1..min(max_spread, listed)."""
+    return np.cumsum(probs[:min(max_spread, len(numbers))])
+
+def optimize_legs(curves, max_combos):
+    """
+    Pareto frontier of (combinations, log hit, spreads) for independent legs with the given
+    cumulative hit curves, limited to max_combos combinations.
+    """
+    states = [(1, 0.0, ())]
+    for curve in curves:
+        with np.errstate(divide="ignore"):
+            log_curve = np.log(curve)
+        best = {}
+        for combos, log_hit, spreads in states:
+            for k in range(1, len(curve) + 1):
+                nc = combos * k
+                if nc > max_combos:
+                    break
+                value = log_hit + log_curve[k - 1]
+                if nc not in best or value > best[nc][1]:
+                    best[nc] = (nc, value, spreads + (k,))
+        # Bound: a state is only worth extending if no cheaper state already hits more often
+        states, top = [], -math.inf
+        for nc in sorted(best):
+            if best[nc][1] > top:
+                states.append(best[nc])
+                top = best[nc][1]
+    return states
+
+def best_ticket(bet_type, race_nums, fields, budget, objective="hit", payout=None):
+    """Optimal ticket dict for one window, or None when nothing fits the budget."""
+    base = BASE_STAKES[bet_type]
+    max_combos = int(budget / base + 1e-9)
+    if max_combos < 1:
+        return None
+    frontier = optimize_legs([leg_hit_curve(numbers, probs) for numbers, probs in fields], max_combos)
+
+    if objective == "ev":
+        if not payout:
+            raise ValueError("the ev objective needs an estimated payout")
+        combos, log_hit, spreads = max(frontier, key=lambda s: (math.exp(s[1]) * payout - s[0] * base, -s[0]))
+    else:
+        combos, log_hit, spreads = frontier[-1]
+    hit_rate = math.exp(log_hit)
+    if hit_rate <= 0:
+        return None
+
+    legs = [numbers[:k] for (numbers, _), k in zip(fields, spreads)]
+    ticket = format_ticket(bet_type, race_nums, legs, combos, hit_rate)
+    if payout:
+        ev = hit_rate * payout - ticket["cost"]
+        ticket["expected_value"] = round(ev, 2)
+        ticket["ev_per_dollar"] = round(ev / ticket["cost"], 4)
+    return ticket
+
+def optimize_card(data, budgets=None, objective="hit", payouts=None, field_size=DEFAULT_FIELD_SIZE, ranked=True):
+    """
+    {bet_type: [tickets]} for every consecutive window on the card, best first (card order when
+    ranked is False). budgets / payouts map bet type -> dollars; a single number applies to all.
+    """
+    budgets = DEFAULT_BUDGETS if budgets is None else budgets
+    race_nums, fields = card_fields(data, field_size)
+    out = {}
+    for bet_type, legs in PICK_LEGS.items():
+        budget = budgets.get(bet_type) if isinstance(budgets, dict) else budgets
+        payout = payouts.get(bet_type) if isinstance(payouts, dict) else payouts
+        if not budget:
+            continue
+        tickets = []
+        for i in range(len(fields) - legs + 1):
+            window = fields[i:i + legs]
+            if not all(numbers for numbers, _ in window):
+                continue
+            ticket = best_ticket(bet_type, race_nums[i:i + legs], window, budget, objective, payout)
+            if ticket:
+                tickets.append(ticket)
+        if ranked:
+            rank = "ev_per_dollar" if objective == "ev" else "hit_rate"
+            tickets.sort(key=lambda t: (-t[rank], t["cost"]))
+        out[bet_type] = tickets
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimize pick-N leg selections for a card under a budget.")
+    parser.add_argument("card", help="Meeting JSON file")
+    parser.add_argument("--budget", type=float, help="Budget per ticket (default: per bet type defaults)")
+    parser.add_argument("--objective", choices=["hit", "ev"], default="hit")
+    parser.add_argument("--payout", type=float, help="Estimated payout per winning base-stake ticket (ev objective)")
+    args = parser.parse_args()
+
+    started = time.time()
+    result = optimize_card(load_meeting_json(args.card), args.budget, args.objective, args.payout)
+    print(f"🧮 Optimized {sum(len(t) for t in result.values())} windows in {time.time() - started:.3f}s")
+    for bet_type, tickets in result.items():
+        for t in tickets[:3]:
+            extra = f"  EV/$ {t['ev_per_dollar']:+.2f}" if "ev_per_dollar" in t else ""
+            print(f"   {t['hit_rate']:7.2%}  ${t['cost']:>6.2f}{extra}  {t['ticket']}")
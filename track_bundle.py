@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Track Profile Bundle
+tracks/*.json compiled into one file (data/track_bundle.bin) so a process reads one file at
+start-up instead of parsing ~224 indented JSON files, and the analysis prompt gets a ready-made
+text block instead of re-serializing the profile on every run.
+
+Layout:
+    MAGIC (8 bytes) | index length (uint32 LE) | index (compact JSON) | blob area
+
+The index holds the source stamp (file name, mtime, size of every track file), the profiles per
+file with the few keys the registry classifies on, and one (offset, length) span per profile for
+its compact JSON and its prompt text in the blob area. The file is read once per process and
+each profile / prompt is only decoded the first time it is asked for.
+
+track_registry.py loads the bundle and rebuilds it whenever the source stamp no longer matches
+tracks/, so running this by hand (or via split_tracks.py) is only needed to pre-build it:
+
+    python track_bundle.py
+"""
+
+import os
+import json
+import struct
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_PATH = os.path.join(BASE_DIR, "data", "track_bundle.bin")
+
+MAGIC = b"GHTRK001"
+HEADER = struct.Struct("<8sI")
+
+# Filing tags we add ourselves; not track knowledge the model needs to read
+PROMPT_EXCLUDED_KEYS = ("region_group",)
+
+def source_stamp(tracks_dir):
+    """[[file name, mtime_ns, size]] for every track file; a bundle is fresh while this matches."""
+    stamp = []
+    with os.scandir(tracks_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                st = entry.stat()
+                stamp.append([entry.name, st.st_mtime_ns, st.st_size])
+    return sorted(stamp)
+
+def prompt_text(profile):
+    """Prompt-ready profile text: compact JSON without our filing tags."""
+    facts = {k: v for k, v in profile.items() if k not in PROMPT_EXCLUDED_KEYS}
+    return json.dumps(facts, ensure_ascii=False, separators=(",", ":"))
+
+def pack_bundle(files, source):
+    """
+    Bundle bytes for files = [(file_slug, [(slug, aliases, meta, profile)])] (the registry's
+    parse of each track file, in file order).
+    """
+    blobs, spans, index_files = [], [], []
+    offset = 0
+    for file_slug, profiles in files:
+        entries = []
+        for slug, aliases, meta, profile in profiles:
+            profile_bytes = json.dumps(profile, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            prompt_bytes = prompt_text(profile).encode("utf-8")
+            spans.append([offset, len(profile_bytes), offset + len(profile_bytes), len(prompt_bytes)])
+            blobs += [profile_bytes, prompt_bytes]
+            offset += len(profile_bytes) + len(prompt_bytes)
+            entries.append([slug, aliases, meta, len(spans) - 1])
+        index_files.append([file_slug, entries])
+
+    index = json.dumps({"source": source, "files": index_files, "spans": spans},
+                       ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(MAGIC, len(index)) + index + b"".join(blobs)
+
+class TrackBundle:
+    """Read side of a bundle: the index is parsed up front, profiles / prompts lazily by span id."""
+
+    def __init__(self, data):
+        magic, index_len = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a track bundle")
+        start = HEADER.size + index_len
+        index = json.loads(bytes(data[HEADER.size:start]).decode("utf-8"))
+        self.source = index["source"]
+        self.files = index["files"]
+        self._spans = index["spans"]
+        self._blob = memoryview(data)[start:]
+        self._profiles = {}
+        self._prompts = {}
+
+    def _text(self, offset, length):
+        return bytes(self._blob[offset:offset + length]).decode("utf-8")
+
+    def profile(self, span_id):
+        profile = self._profiles.get(span_id)
+        if profile is None:
+            p_off, p_len, _, _ = self._spans[span_id]
+            # setdefault: two threads decoding the same profile end up sharing one dict
+            profile = self._profiles.setdefault(span_id, json.loads(self._text(p_off, p_len)))
+        return profile
+
+    def prompt(self, span_id):
+        text = self._prompts.get(span_id)
+        if text is None:
+            _, _, t_off, t_len = self._spans[span_id]
+            text = self._prompts.setdefault(span_id, self._text(t_off, t_len))
+        return text
+
+def load_bundle(path=BUNDLE_PATH, source=None):
+    """The bundle at path, or None when it is missing, unreadable or (given source) stale."""
+    try:
+        with open(path, "rb") as f:
+            bundle = TrackBundle(f.read())
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if source is not None and bundle.source != source:
+        return None
+    return bundle
+
+def write_bundle(data, path=BUNDLE_PATH):
+    """Atomic write; returns False when the folder is read-only (callers keep the in-memory copy)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+if __name__ == "__main__":
+    import time
+    import track_registry
+
+    started = time.time()
+    data = track_registry.compile_bundle()
+    write_bundle(data)
+    bundle = TrackBundle(data)
+    print(f"📦 {sum(len(p) for _, p in bundle.files)} profiles from {len(bundle.source)} files -> "
+          f"{os.path.relpath(BUNDLE_PATH, BASE_DIR)} ({len(data) / 1024:.0f} KB, {time.time() - started:.2f}s)")
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Track Registry
+One classifier for every track name in the system, built once per process from tracks/*.json
+(read through the compiled bundle in data/track_bundle.bin, see track_bundle.py).
+
+Each track file becomes an entry with its display name, region ("Australia", "Europe", ...),
+short region code used on cards and badges ("AUS", "UK", "ASIA", "HARNESS", "USA"), category,
+system prompt file and track code. Every spelling we know for it (file slug, display name,
+nested profile keys, nicknames) is normalized into a hash index, so a lookup is an exact dict
+hit instead of a substring scan. Track codes are matched separately (lookup_track_code), since a
+code can collide with another track's name (Bathurst's "BATH" vs UK Bath). Names that carry a trailing qualifier we do not
+index ("Ballarat Synthetic", "Belmont AU", "Wolverhampton_Unknown") fall back to their longest
+indexed prefix.
+
+Only the keys needed to classify a track are read at start-up; full profiles and their
+prompt-ready text are decoded from the bundle the first time a track is analysed.
+
+Used by enrichment.py (card regions), app2.py (track catalog, profiles, system prompts),
+run_optimizer.py and the static export.
+
+    python track_registry.py "Eagle Farm" Bath   # how names resolve
+    python track_registry.py --self-test         # run SELF_TEST_CASES
+"""
+
+import os
+import re
+import json
+import threading
+
+import track_bundle
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACKS_DIR = os.path.join(BASE_DIR, "tracks")
+
+DEFAULT_REGION = "USA"
+DEFAULT_CATEGORY = "Thoroughbred"
+
+# region_group prefix -> display region (the first matching prefix wins)
+REGION_GROUP_PREFIXES = [
+    ("AUSTRALIA", "Australia"), ("NEW_ZEALAND", "New Zealand"), ("ASIA", "Asia"),
+    ("CANADA", "Canada"), ("EUROPE", "Europe"), ("USA", "USA"),
+]
+# display region -> (card region code, system prompt file)
+REGION_PROFILES = {
+    "Australia": ("AUS", "system_aus.md"),
+    "New Zealand": ("AUS", "system_aus.md"),
+    "Europe": ("UK", "system_uk.md"),
+    "Asia": ("ASIA", "system_asia.md"),
+    "Canada": ("USA", "system_usa.md"),
+    "USA": ("USA", "system_usa.md"),
+    "Other": ("USA", "system_usa.md"),
+}
+HARNESS_PROFILE = ("HARNESS", "system_harness.md")
+
+# Location keywords for track files that ship without a region_group (pasted / nested profiles)
+LOCATION_REGIONS = [
+    ("Australia", ["VIC", "NSW", "QLD", "SA", "WA", "TAS", "ACT", "NT", "AUSTRALIA"]),
+    ("New Zealand", ["NZ", "NEW ZEALAND"]),
+    ("Europe", ["UK", "ENGLAND", "IRELAND", "SCOTLAND", "WALES", "FRANCE", "EUROPE"]),
+    ("Asia", ["HONG KONG", "JAPAN", "SINGAPORE", "KOREA", "ASIA", "UAE", "SAUDI"]),
+    ("Canada", ["CANADA"]),
+]
+
+# Keys that mark a dict as a track profile rather than a {"Track Name": {...}} wrapper
+PROFILE_KEYS = ("location", "courses", "par_adjustment", "bias_notes", "type", "layout", "track_code", "track_type")
+# Profile keys the registry classifies and indexes on (kept in the bundle index, decoded at start-up)
+META_KEYS = ("region_group", "location", "type", "track_code", "nicknames")
+
+# Trailing words card names carry that are not part of the track's own name; region qualifiers
+# also have to agree with the track they resolve to ("Belmont Park WA" is not Belmont Park, NY)
+QUALIFIER_REGIONS = {
+    "au": "Australia", "aus": "Australia", "wa": "Australia", "nsw": "Australia", "vic": "Australia",
+    "qld": "Australia", "sa": "Australia", "nz": "New Zealand", "uk": "Europe", "gb": "Europe",
+    "ire": "Europe", "fr": "Europe", "us": "USA", "usa": "USA",
+}
+QUALIFIER_WORDS = {"synthetic", "poly", "polytrack", "tapeta", "turf", "dirt", "inner", "outer", "unknown"}
+# Suffixes tried when a bare name misses ("Yonkers" -> "Yonkers Raceway")
+COMMON_SUFFIXES = ["raceway", "racecourse", "park", "downs", "racetrack"]
+
+# Alias priorities: a stronger claim wins; equal claims by different tracks make the alias ambiguous
+_PRIORITY_SLUG, _PRIORITY_PROFILE_KEY, _PRIORITY_NICKNAME = 0, 1, 2
+
+def normalize_track_name(name):
+    """'Eagle_Farm', 'eagle-farm ', 'EAGLE FARM' -> 'eagle farm'."""
+    return " ".join(re.sub(r"[_\-/().,']+", " ", str(name or "")).lower().split())
+
+def _region_from_group(region_group):
+    group = str(region_group or "").upper()
+    for prefix, region in REGION_GROUP_PREFIXES:
+        if group.startswith(prefix):
+            return region
+    return None
+
+def region_from_location(location):
+    """Display region for a free-text location ("Ascot, Berkshire, England, UK"), or None."""
+    tokens = set(re.split(r"[^A-Z]+", str(location or "").upper()))
+    text = " " + " ".join(str(location or "").upper().split()) + " "
+    for region, keywords in LOCATION_REGIONS:
+        if any(k in tokens or (" " in k and f" {k} " in text) for k in keywords):
+            return region
+    if "USA" in tokens or "US" in tokens:
+        return "USA"
+    return None
+
+def region_group_for(region, category=DEFAULT_CATEGORY):
+    """region_group tag for a new track file ('Australia', 'Harness') -> 'Australia_Harness'."""
+    return f"{region.replace(' ', '_')}_{category}"
+
+def _profiles_in_file(slug, data):
+    """(slug, profile, aliases) for a track file; nested files ({"Ascot": {...}}) hold one or more profiles."""
+    if not isinstance(data, dict):
+        return []
+    if any(k in data for k in PROFILE_KEYS):
+        return [(slug, data, [])]
+
+    nested = [(k, v) for k, v in data.items() if isinstance(v, dict)]
+    if not nested:
+        return [(slug, data, [])]
+    if len(nested) == 1:
+        key, profile = nested[0]
+        profile = dict(profile, region_group=profile.get("region_group") or data.get("region_group"))
+        return [(slug, profile, [key])]
+
+    # Collection file (flat_tracks.json): every key is its own track
+    profiles = []
+    for key, profile in nested:
+        profile = dict(profile, region_group=profile.get("region_group") or data.get("region_group"))
+        profiles.append((normalize_track_name(key).replace(" ", "_"), profile, [key]))
+    return profiles
+
+def _scan_track_files(tracks_dir):
+    """[(file_slug, [(slug, aliases, meta, profile)])] for every readable track file, in file order."""
+    files = []
+    for filename in sorted(os.listdir(tracks_dir)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(tracks_dir, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles = _profiles_in_file(filename[:-len(".json")], data)
+        files.append((filename[:-len(".json")], [
+            (slug, aliases, {k: profile[k] for k in META_KEYS if k in profile}, profile)
+            for slug, profile, aliases in profiles
+        ]))
+    return files
+
+def compile_bundle(tracks_dir=TRACKS_DIR):
+    """Bundle bytes for tracks_dir (the build step behind track_bundle.py)."""
+    return track_bundle.pack_bundle(_scan_track_files(tracks_dir), track_bundle.source_stamp(tracks_dir))
+
+class TrackRegistry:
+    def __init__(self, tracks_dir=TRACKS_DIR, bundle_path=track_bundle.BUNDLE_PATH):
+        self.tracks_dir = tracks_dir
+        self.bundle_path = bundle_path
+        self.bundle = None
+        self.tracks = {}   # slug -> entry
+        self._spans = {}   # slug -> bundle span id of its profile
+        self._index = {}   # normalized alias -> slug
+        self._claims = {}  # normalized alias -> priority
+        self._aliases = {}  # slug -> every normalized alias it claimed
+        self._codes = {}   # upper-case track code -> slug (None when two tracks share it)
+        self._memo = {}
+        self._load()
+
+    def _claim(self, alias, slug, priority):
+        key = normalize_track_name(alias)
+        if not key:
+            return
+        self._aliases.setdefault(slug, []).append(key)
+        held = self._claims.get(key)
+        if held is None or priority < held:
+            self._index[key] = slug
+            self._claims[key] = priority
+        elif priority == held and self._index.get(key) not in (slug, None):
+            self._index[key] = None  # ambiguous: two tracks share this nickname
+
+    def _add(self, slug, meta, extra_aliases, span_id):
+        category = "Harness" if ("HARNESS" in str(meta.get("region_group", "")).upper()
+                                 or str(meta.get("type", "")).lower() == "harness") else DEFAULT_CATEGORY
+        region = (_region_from_group(meta.get("region_group"))
+                  or region_from_location(meta.get("location"))
+                  or "Other")
+        region_code, system_prompt = HARNESS_PROFILE if category == "Harness" else REGION_PROFILES[region]
+
+        if slug in self.tracks:
+            # A standalone file beats the same track repeated inside a collection file
+            return
+        self.tracks[slug] = {
+            "slug": slug,
+            "name": slug.replace("_", " ").title(),
+            "region": region,
+            "region_code": region_code,
+            "category": category,
+            "system_prompt": system_prompt,
+            "track_code": meta.get("track_code"),
+            "region_group": meta.get("region_group") or region_group_for(region, category),
+        }
+        self._spans[slug] = span_id
+        self._claim(slug, slug, _PRIORITY_SLUG)
+        for alias in extra_aliases:
+            self._claim(alias, slug, _PRIORITY_PROFILE_KEY)
+        for alias in meta.get("nicknames") or []:
+            if isinstance(alias, str):
+                self._claim(alias, slug, _PRIORITY_NICKNAME)
+        # Codes are kept out of the name index: Bathurst's "BATH" must not capture UK "Bath"
+        code = str(meta.get("track_code") or "").strip().upper()
+        if code:
+            self._codes[code] = slug if self._codes.get(code, slug) == slug else None
+
+    def _load(self):
+        if not os.path.isdir(self.tracks_dir):
+            return
+        source = track_bundle.source_stamp(self.tracks_dir)
+        self.bundle = track_bundle.load_bundle(self.bundle_path, source)
+        if self.bundle is None:
+            # Missing or stale (a track file was added / edited): recompile and save for the next process
+            data = compile_bundle(self.tracks_dir)
+            track_bundle.write_bundle(data, self.bundle_path)
+            self.bundle = track_bundle.TrackBundle(data)
+
+        collections = []
+        for _, profiles in self.bundle.files:
+            if len(profiles) > 1:
+                collections.append(profiles)
+                continue
+            for slug, aliases, meta, span_id in profiles:
+                self._add(slug, meta, aliases, span_id)
+        for profiles in collections:
+            for slug, aliases, meta, span_id in profiles:
+                self._add(slug, meta, aliases, span_id)
+
+    def profile(self, entry):
+        """Full tracks/*.json profile for a registry entry ({} for unknown tracks)."""
+        span_id = self._spans.get(entry["slug"]) if entry else None
+        return self.bundle.profile(span_id) if span_id is not None else {}
+
+    def prompt(self, entry):
+        """Prompt-ready profile text for a registry entry ("" for unknown tracks)."""
+        span_id = self._spans.get(entry["slug"]) if entry else None
+        return self.bundle.prompt(span_id) if span_id is not None else ""
+
+    def lookup(self, name):
+        """Registry entry for any known spelling of a track, or None."""
+        key = normalize_track_name(name)
+        if key in self._memo:
+            return self._memo[key]
+        slug = self._index.get(key)
+        if slug is None:
+            slug = self._resolve_qualified(key.split())
+        if slug is None:
+            slug = next((self._index[f"{key} {sfx}"] for sfx in COMMON_SUFFIXES if self._index.get(f"{key} {sfx}")), None)
+        entry = self.tracks.get(slug) if slug else None
+        self._memo[key] = entry
+        return entry
+
+    def lookup_code(self, code):
+        """Registry entry for an explicit track code ("BATH" -> Bathurst), or None. Exact match only."""
+        slug = self._codes.get(str(code or "").strip().upper())
+        return self.tracks.get(slug) if slug else None
+
+    def _resolve_qualified(self, words):
+        # "Ballarat Synthetic" / "Belmont Park WA": strip known trailing qualifiers, honouring region hints
+        region_hint = None
+        while len(words) > 1 and (words[-1] in QUALIFIER_WORDS or words[-1] in QUALIFIER_REGIONS):
+            region_hint = region_hint or QUALIFIER_REGIONS.get(words[-1])
+            words = words[:-1]
+            slug = self._index.get(" ".join(words))
+            if slug and region_hint is None or slug and self.tracks[slug]["region"] == region_hint:
+                return slug
+        if region_hint:
+            # The qualifier names a region the bare name does not match; try the next shorter prefix
+            while len(words) > 1:
+                words = words[:-1]
+                slug = self._index.get(" ".join(words))
+                if slug and self.tracks[slug]["region"] == region_hint:
+                    return slug
+            return None
+
+        # "Tokyo City Keiba Ohi": the trailing words are the start of one of the track's own aliases
+        for cut in range(len(words) - 1, 0, -1):
+            slug = self._index.get(" ".join(words[:cut]))
+            tail = " ".join(words[cut:])
+            if slug and any(alias.startswith(tail) for alias in self._aliases.get(slug, [])):
+                return slug
+        return None
+
+    def classify(self, name):
+        """Entry for name, or a default USA thoroughbred entry for unknown tracks (never None)."""
+        entry = self.lookup(name)
+        if entry:
+            return entry
+        region_code, system_prompt = REGION_PROFILES[DEFAULT_REGION]
+        return {
+            "slug": normalize_track_name(name).replace(" ", "_"), "name": str(name or ""),
+            "region": DEFAULT_REGION, "region_code": region_code, "category": DEFAULT_CATEGORY,
+            "system_prompt": system_prompt, "track_code": None,
+            "region_group": region_group_for(DEFAULT_REGION),
+        }
+
+    def catalog(self):
+        """{category: {region: [display names]}} for the track pickers."""
+        catalog = {}
+        for entry in self.tracks.values():
+            catalog.setdefault(entry["category"], {}).setdefault(entry["region"], []).append(entry["name"])
+        for regions in catalog.values():
+            for region in regions:
+                regions[region] = sorted(regions[region])
+        return catalog
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TrackRegistry()
+    return _registry
+
+def reload_registry():
+    """Rebuilds the index (call after writing a new tracks/*.json file)."""
+    global _registry
+    with _registry_lock:
+        _registry = TrackRegistry()
+    return _registry
+
+def lookup_track(name):
+    return get_registry().lookup(name)
+
+def lookup_track_code(code):
+    return get_registry().lookup_code(code)
+
+def classify_track(name):
+    return get_registry().classify(name)
+
+def get_region_code(name):
+    """Card / badge region code: AUS, UK, ASIA, HARNESS or USA."""
+    return classify_track(name)["region_code"]
+
+def get_track_profile(name):
+    """The tracks/*.json profile for name ({} when unknown)."""
+    registry = get_registry()
+    return registry.profile(registry.lookup(name))
+
+def get_track_prompt(name):
+    """Compact, prompt-ready profile text for name ("" when unknown)."""
+    registry = get_registry()
+    return registry.prompt(registry.lookup(name))
+
+def get_system_prompt_file(name, category="", region=""):
+    """System prompt file for a track; an explicit harness category or region picked in the UI wins."""
+    if "HARNESS" in str(category).upper():
+        return HARNESS_PROFILE[1]
+    entry = lookup_track(name)
+    if entry:
+        return entry["system_prompt"]
+    if region in REGION_PROFILES:
+        return REGION_PROFILES[region][1]
+    return REGION_PROFILES[DEFAULT_REGION][1]
+
+# ==========================================
+# 🧪 SELF-CHECK
+# ==========================================
+# (lookup, name or code, expected slug or None) against the tracks/ folder
+SELF_TEST_CASES = [
+    ("name", "Bathurst", "bathurst"),
+    ("name", "Bath", None),             # UK Bath must not resolve to Bathurst through its BATH code
+    ("name", "BATH", None),
+    ("code", "BATH", "bathurst"),
+    ("code", "bath", "bathurst"),
+    ("code", "Bathurst", None),
+    ("name", "Eagle_Farm", "eagle_farm"),
+    ("name", "Belmont_Park_WA", "belmont"),
+    ("name", "Tokyo_City_Keiba_Ohi", "tokyo_city_keiba"),
+    ("name", "Yonkers", "yonkers_raceway"),
+]
+
+def self_test(registry=None):
+    """Runs SELF_TEST_CASES; returns the number of failures."""
+    registry = registry or get_registry()
+    failures = 0
+    for kind, name, expected in SELF_TEST_CASES:
+        entry = registry.lookup_code(name) if kind == "code" else registry.lookup(name)
+        got = entry["slug"] if entry else None
+        if got != expected:
+            failures += 1
+            print(f"❌ {kind} {name!r}: expected {expected!r}, got {got!r}")
+    print(f"{len(SELF_TEST_CASES) - failures}/{len(SELF_TEST_CASES)} track lookups passed.")
+    return failures
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["--self-test"]:
+        sys.exit(1 if self_test() else 0)
+    registry = get_registry()
+    print(f"📚 {len(registry.tracks)} tracks, {sum(1 for v in registry._index.values() if v)} aliases")
+    for arg in sys.argv[1:]:
+        entry = registry.lookup(arg)
+        print(f"{arg!r}: " + (f"{entry['name']} | {entry['region']} ({entry['region_code']}) | "
+                              f"{entry['category']} | {entry['system_prompt']}" if entry else "unknown"))
@@ -7,7 +7,6 @@ Launch: python -m streamlit run training_device/app.py --server.port 8502
 
 import os
 import json
-import sqlite3
 import pandas as pd
 import streamlit as st
 from datetime import datetime
@@ -15,7 +14,11 @@ from datetime import datetime
 from training_db import (
     init_db, get_bankroll, reset_bankroll, place_manual_bet, get_bets, settle_pending_bets
 )
+from storage import open_connection  # importable once training_db has put the project root on sys.path
 from live_odds_fetcher import fetch_live_tab_meetings, get_equibase_chart_url
+from odds_poller import start_background_poller, get_shared_store, get_runner_odds, meetings_key
+from probability import race_win_probabilities, listed_share
+from staking import race_stakes
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
@@ -52,16 +55,39 @@ st.markdown("""
 init_db()
 bankroll = get_bankroll()
 
+def kelly_stake(contenders, runner_num, odds, balance, track):
+    # Default staking policy for a single WIN bet at the entered odds (model probability from the logged AI ratings)
+    probs = race_win_probabilities(contenders, track) * listed_share()
+    runner_odds = [odds if str(c["num"]) == str(runner_num) else None for c in contenders]
+    return float(race_stakes(probs, runner_odds, bankroll=balance)[[str(c["num"]) for c in contenders].index(str(runner_num))])
+
+# One background poller per server process (it follows the current date); calling this on every
+# rerun restarts it if the thread has died. Reruns only read its snapshots.
+odds_poller = start_background_poller()
+odds_store = get_shared_store()
+
 # Header Title & Real-Time Status Indicator
 col_title, col_status = st.columns([3, 1])
 with col_title:
     st.title("🎯 Standalone Handicapper Training Device")
     st.caption("Personal Virtual Bankroll & Manual Betting Simulator (100% Isolated from Main App)")
 with col_status:
-    st.markdown("""
-    <div style="background:#064e3b; border:1px solid #059669; padding:8px 12px; border-radius:8px; text-align:center; margin-top:10px;">
-        <span style="color:#34d399; font-weight:bold;">🟢 FREE LIVE FEEDS CONNECTED</span><br>
-        <small style="color:#a7f3d0;">TAB AU & Equibase $0.00</small>
+    feed_entry = odds_store.get_entry(meetings_key(odds_poller.date_str))
+    if feed_entry and feed_entry["is_fresh"]:
+        feed_age = int(datetime.now().timestamp() - feed_entry["fetched_at"])
+        feed_bg, feed_border, feed_color = "#064e3b", "#059669", "#34d399"
+        feed_label = f"🟢 LIVE FEEDS CONNECTED ({feed_age}s ago)"
+    elif feed_entry:
+        feed_bg, feed_border, feed_color = "#78350f", "#d97706", "#fbbf24"
+        feed_label = "🟠 LIVE FEEDS STALE"
+    else:
+        feed_bg, feed_border, feed_color = "#7f1d1d", "#dc2626", "#f87171"
+        feed_label = "🔴 LIVE FEEDS OFFLINE"
+    feed_detail = odds_poller.last_error[:60] if odds_poller.last_error and not (feed_entry and feed_entry["is_fresh"]) else "TAB AU & Equibase $0.00"
+    st.markdown(f"""
+    <div style="background:{feed_bg}; border:1px solid {feed_border}; padding:8px 12px; border-radius:8px; text-align:center; margin-top:10px;">
+        <span style="color:{feed_color}; font-weight:bold;">{feed_label}</span><br>
+        <small style="color:#a7f3d0;">{feed_detail}</small>
     </div>
     """, unsafe_allow_html=True)
 
@@ -101,7 +127,7 @@ tab_betting, tab_ledger, tab_upload = st.tabs(["🎟️ Manual Bet Slip & Race C
 def get_user_ran_tracks():
     if not os.path.exists(MASTER_DB_PATH):
         return ["Saratoga", "Del Mar", "Goodwood", "Scone"]
-    conn = sqlite3.connect(MASTER_DB_PATH)
+    conn = open_connection(MASTER_DB_PATH, readonly=True)
     c = conn.cursor()
     c.execute("SELECT DISTINCT track FROM predictions WHERE track IS NOT NULL AND track != '' ORDER BY track ASC")
     rows = c.fetchall()
@@ -118,7 +144,7 @@ def get_user_ran_tracks():
 def get_dates_for_track(track_name):
     if not os.path.exists(MASTER_DB_PATH):
         return [datetime(2026, 7, 30).date()]
-    conn = sqlite3.connect(MASTER_DB_PATH)
+    conn = open_connection(MASTER_DB_PATH, readonly=True)
     c = conn.cursor()
     c.execute("""
         SELECT DISTINCT date FROM predictions 
@@ -157,7 +183,7 @@ with tab_betting:
     # Query Race Details from SQLite Master DB
     races_data = []
     if os.path.exists(MASTER_DB_PATH):
-        conn = sqlite3.connect(MASTER_DB_PATH)
+        conn = open_connection(MASTER_DB_PATH, readonly=True)
         c = conn.cursor()
         c.execute("""
             SELECT p1_num, p1_name, p1_rating, p1_barrier,
@@ -184,6 +210,9 @@ with tab_betting:
         def calc_odds_str(num, rating):
             if official_win_num and str(num).strip() == official_win_num and official_win_payout:
                 return f"${official_win_payout:.2f} (WINNER)"
+            live_odds = get_runner_odds(odds_store, selected_track, date_str, race_num_digit, num)
+            if live_odds:
+                return f"${live_odds:.2f} (LIVE)"
             try:
                 r_val = float(rating)
                 if r_val >= 100:
@@ -255,17 +284,25 @@ with tab_betting:
                 stake_20 = st.form_submit_button("Bet $20")
                 
             submit_bet = st.form_submit_button("🎟️ Confirm & Place Manual Bet", type="primary")
+            stake_kelly = st.form_submit_button("📐 Bet Kelly Stake", disabled=not races_data, help="WIN bets only: default staking policy at the entered odds")
             
-            if submit_bet or stake_5 or stake_10 or stake_20:
+            if stake_kelly and bet_type != "WIN":
+                st.warning("Kelly sizing is only available for WIN bets.")
+            elif submit_bet or stake_5 or stake_10 or stake_20 or stake_kelly:
                 final_stake = 5.0 if stake_5 else (10.0 if stake_10 else (20.0 if stake_20 else stake_amount))
-                success, msg = place_manual_bet(
-                    date_str, selected_track, race_num_digit, bet_type, selected_num, selected_name, final_stake, odds_input
-                )
-                if success:
-                    st.success(msg)
-                    st.rerun()
+                if stake_kelly:
+                    final_stake = kelly_stake(races_data, selected_num, odds_input, bankroll["current_balance"], selected_track)
+                if final_stake <= 0:
+                    st.warning(f"📐 No edge at ${odds_input:.2f} for #{selected_num} — Kelly says PASS.")
                 else:
-                    st.error(msg)
+                    success, msg = place_manual_bet(
+                        date_str, selected_track, race_num_digit, bet_type, selected_num, selected_name, final_stake, odds_input
+                    )
+                    if success:
+                        st.success(msg)
+                        st.rerun()
+                    else:
+                        st.error(msg)
 
     st.divider()
     
@@ -3,14 +3,21 @@
 Standalone Live Odds & Race Status Fetcher
 Fetches free TAB Australia live racing feeds and Equibase public chart URLs.
 Zero-cost: No API keys or paid subscriptions required.
+
+The TAB host can be overridden with the TAB_API_BASE environment variable
+(e.g. http://127.0.0.1:8765) to run against a local fake TAB endpoint.
 """
 
+import os
 import urllib.request
 import json
 from datetime import datetime
 
-TAB_MEETINGS_URL = "https://api.tab.com.au/v1/tab-info-service/racing/dates/{date}/meetings?jurisdiction=VIC"
-TAB_RACE_URL = "https://api.tab.com.au/v1/tab-info-service/racing/dates/{date}/meetings/{meeting_id}/races/{race_num}"
+TAB_API_BASE = os.environ.get("TAB_API_BASE", "https://api.tab.com.au").rstrip("/")
+TAB_MEETINGS_PATH = "/v1/tab-info-service/racing/dates/{date}/meetings?jurisdiction={jurisdiction}"
+TAB_RACE_PATH = "/v1/tab-info-service/racing/dates/{date}/meetings/{meeting_id}/races/{race_num}"
+TAB_MEETINGS_URL = TAB_API_BASE + TAB_MEETINGS_PATH
+TAB_RACE_URL = TAB_API_BASE + TAB_RACE_PATH
 EQUIBASE_SUMMARY_BASE = "https://www.equibase.com/static/chart/summary/"
 
 TRACK_CODES_US = {
@@ -25,36 +32,86 @@ TRACK_CODES_US = {
     "woodbine": "WO"
 }
 
-def fetch_live_tab_meetings(date_str=None):
+class TabFeedError(Exception):
+    """Raised when a TAB feed request fails or returns an unusable payload."""
+
+def fetch_tab_json(url, timeout=5):
     """
-    Fetches live Australian race meetings from free TAB Australia API.
+    Performs a single GET against the TAB info service and returns the decoded JSON.
+    Raises TabFeedError instead of hiding network / HTTP / decode failures.
     """
-    if not date_str:
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        
-    url = TAB_MEETINGS_URL.format(date=date_str)
-    
     try:
         req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'})
-        with urllib.request.urlopen(req, timeout=5) as response:
-            if response.status == 200:
-                payload = json.loads(response.read().decode('utf-8'))
-                meetings = payload.get("meetings", [])
-                
-                parsed_meetings = []
-                for m in meetings:
-                    parsed_meetings.append({
-                        "meeting_id": m.get("meetingId"),
-                        "name": m.get("meetingName"),
-                        "mnemonic": m.get("venueMnemonic"),
-                        "location": m.get("location"),
-                        "race_type": m.get("raceType"),
-                        "race_count": len(m.get("races", [])),
-                        "races": m.get("races", [])
-                    })
-                return parsed_meetings
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            if response.status != 200:
+                raise TabFeedError(f"HTTP {response.status} from {url}")
+            return json.loads(response.read().decode('utf-8'))
+    except TabFeedError:
+        raise
     except Exception as e:
-        pass
+        raise TabFeedError(f"{url}: {e}") from e
+
+def parse_tab_meetings(payload):
+    """Normalizes a TAB meetings payload into the flat meeting dicts used by the device."""
+    parsed_meetings = []
+    for m in payload.get("meetings", []):
+        races = m.get("races", [])
+        parsed_meetings.append({
+            "meeting_id": m.get("meetingId") or m.get("venueMnemonic"),
+            "name": m.get("meetingName"),
+            "mnemonic": m.get("venueMnemonic"),
+            "location": m.get("location"),
+            "race_type": m.get("raceType"),
+            "race_count": len(races),
+            "races": races
+        })
+    return parsed_meetings
+
+def parse_tab_race(payload):
+    """
+    Normalizes a TAB race payload into race status, jump time and per-runner odds.
+    Fixed odds are preferred; tote (parimutuel) returns are used when fixed odds are absent.
+    """
+    runners = []
+    for r in payload.get("runners", []):
+        fixed = r.get("fixedOdds") or {}
+        tote = r.get("parimutuel") or {}
+        runners.append({
+            "number": str(r.get("runnerNumber", "")),
+            "name": r.get("runnerName", ""),
+            "win_odds": float(fixed.get("returnWin") or tote.get("returnWin") or 0.0),
+            "place_odds": float(fixed.get("returnPlace") or tote.get("returnPlace") or 0.0),
+            "scratched": str(fixed.get("bettingStatus", "")).lower() == "scratched"
+        })
+    return {
+        "race_number": payload.get("raceNumber"),
+        "race_name": payload.get("raceName", ""),
+        "status": payload.get("raceStatus", ""),
+        "start_time": payload.get("raceStartTime", ""),
+        "runners": runners
+    }
+
+def fetch_tab_meetings(date_str=None, jurisdiction="VIC", timeout=5):
+    """Fetches and parses TAB meetings for a date. Raises TabFeedError on failure."""
+    if not date_str:
+        date_str = datetime.now().strftime("%Y-%m-%d")
+    url = TAB_MEETINGS_URL.format(date=date_str, jurisdiction=jurisdiction)
+    return parse_tab_meetings(fetch_tab_json(url, timeout=timeout))
+
+def fetch_tab_race(date_str, meeting_id, race_num, timeout=5):
+    """Fetches and parses one TAB race (status + runner odds). Raises TabFeedError on failure."""
+    url = TAB_RACE_URL.format(date=date_str, meeting_id=meeting_id, race_num=race_num)
+    return parse_tab_race(fetch_tab_json(url, timeout=timeout))
+
+def fetch_live_tab_meetings(date_str=None):
+    """
+    Fetches live Australian race meetings from free TAB Australia API.
+    Blocking call kept for scripts; the Streamlit device reads odds_poller snapshots instead.
+    """
+    try:
+        return fetch_tab_meetings(date_str)
+    except TabFeedError as e:
+        print(f"[Live Odds] TAB meetings fetch failed: {e}")
     return []
 
 def get_equibase_chart_url(track_name, date_str=None):
@@ -63,16 +120,16 @@ def get_equibase_chart_url(track_name, date_str=None):
     """
     if not date_str:
         date_str = datetime.now().strftime("%Y-%m-%d")
-        
+
     clean_track = track_name.lower().strip()
     code = TRACK_CODES_US.get(clean_track, clean_track[:3].upper())
-    
+
     try:
         dt = datetime.strptime(date_str, "%Y-%m-%d")
         mmddyy = dt.strftime("%m%d%y")
     except Exception:
         mmddyy = date_str.replace("-", "")[4:] + date_str[:4][2:]
-        
+
     return f"{EQUIBASE_SUMMARY_BASE}{code}{mmddyy}USA-EQB.html"
 
 if __name__ == "__main__":
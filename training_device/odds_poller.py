@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Background TAB Live Odds Poller & Snapshot Store
+Refreshes TAB Australia meetings and per-race odds on an adaptive schedule
+(faster as jump time approaches) into a shared in-memory + SQLite snapshot store.
+Streamlit reruns and bet settlement only ever read snapshots, so they never block on the network.
+Snapshot Database: training_device/db/odds_snapshots.db
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from storage import open_connection
+from live_odds_fetcher import fetch_tab_meetings, fetch_tab_race, TabFeedError
+
+DB_DIR = os.path.join(BASE_DIR, "db")
+SNAPSHOT_DB_PATH = os.path.join(DB_DIR, "odds_snapshots.db")
+
+MEETINGS_REFRESH_SECS = 600
+ERROR_BACKOFF_SECS = 30
+
+# (seconds until jump lower bound, poll interval) - first matching row wins
+ADAPTIVE_SCHEDULE = [
+    (3600, 300),   # > 1 hour out: every 5 minutes
+    (900, 60),     # 15-60 minutes out: every minute
+    (120, 20),     # 2-15 minutes out: every 20 seconds
+    (-600, 5),     # final 2 minutes until 10 minutes after the jump: every 5 seconds
+]
+POST_RACE_INTERVAL = 600  # resulted / abandoned races only need a slow refresh for final dividends
+
+def meetings_key(date_str):
+    return f"meetings:{date_str}"
+
+def race_key(date_str, meeting_id, race_num):
+    return f"race:{date_str}:{meeting_id}:{race_num}"
+
+def parse_jump_time(start_time):
+    """Parses TAB ISO-8601 jump times (e.g. 2026-07-30T04:15:00.000Z) into epoch seconds."""
+    if not start_time:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(start_time).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except ValueError:
+        return None
+
+def poll_interval_for(seconds_to_jump, status=""):
+    """Returns how many seconds to wait before refreshing a race, given time to jump and race status."""
+    if str(status).lower() in ["final", "paying", "abandoned", "closed", "resulted"]:
+        return POST_RACE_INTERVAL
+    if seconds_to_jump is None:
+        return ADAPTIVE_SCHEDULE[0][1]
+    for lower_bound, interval in ADAPTIVE_SCHEDULE:
+        if seconds_to_jump > lower_bound:
+            return interval
+    return POST_RACE_INTERVAL
+
+class OddsSnapshotStore:
+    """
+    Thread-safe snapshot cache. Reads hit memory first and fall back to SQLite,
+    which lets a poller in one process feed readers in another (e.g. Streamlit reruns).
+    The memory layer is dropped whenever PRAGMA data_version reports a commit from another
+    connection, so a reader picks up snapshots written by a poller elsewhere.
+    Every snapshot carries a TTL; expired snapshots are still returned when allow_stale=True.
+    """
+
+    def __init__(self, db_path=SNAPSHOT_DB_PATH, clock=time.time):
+        self.db_path = db_path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._data_version = None
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = open_connection(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")  # other processes read snapshots while the poller writes
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS odds_snapshots (
+                key TEXT PRIMARY KEY,
+                payload TEXT,
+                fetched_at REAL,
+                expires_at REAL
+            )
+        """)
+        self._conn.commit()
+
+    def put(self, key, payload, ttl):
+        now = self.clock()
+        entry = {"payload": payload, "fetched_at": now, "expires_at": now + ttl}
+        with self._lock:
+            self._memory[key] = entry
+            self._conn.execute(
+                "INSERT OR REPLACE INTO odds_snapshots (key, payload, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(payload), entry["fetched_at"], entry["expires_at"])
+            )
+            self._conn.commit()
+
+    def get_entry(self, key):
+        """Returns {payload, fetched_at, expires_at, is_fresh} or None. Never touches the network."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._memory.clear()
+                self._data_version = version
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT payload, fetched_at, expires_at FROM odds_snapshots WHERE key=?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                entry = {"payload": json.loads(row[0]), "fetched_at": row[1], "expires_at": row[2]}
+                self._memory[key] = entry
+        return dict(entry, is_fresh=self.clock() < entry["expires_at"])
+
+    def get(self, key, allow_stale=False):
+        entry = self.get_entry(key)
+        if entry is None or (not entry["is_fresh"] and not allow_stale):
+            return None
+        return entry["payload"]
+
+    def purge_expired(self, older_than_secs=86400):
+        cutoff = self.clock() - older_than_secs
+        with self._lock:
+            self._memory = {k: v for k, v in self._memory.items() if v["expires_at"] >= cutoff}
+            self._conn.execute("DELETE FROM odds_snapshots WHERE expires_at < ?", (cutoff,))
+            self._conn.commit()
+
+class OddsPoller(threading.Thread):
+    """
+    Daemon thread that keeps the snapshot store warm for one racing date (today's date,
+    re-read every cycle, unless a fixed date_str is given).
+    Meetings are refreshed every MEETINGS_REFRESH_SECS; each race is refreshed on its own
+    adaptive interval (see ADAPTIVE_SCHEDULE). Feed errors, including malformed payloads,
+    are recorded in `last_error` and retried with backoff; they never end the thread.
+    """
+
+    def __init__(self, store, date_str=None, jurisdiction="VIC", fetch_meetings=None, fetch_race=None, clock=time.time):
+        super().__init__(daemon=True, name="tab-odds-poller")
+        self.store = store
+        self.fixed_date = date_str
+        self.jurisdiction = jurisdiction
+        self.fetch_meetings = fetch_meetings or (lambda d: fetch_tab_meetings(d, jurisdiction=self.jurisdiction))
+        self.fetch_race = fetch_race or fetch_tab_race
+        self.clock = clock
+        self.last_error = None
+        self.last_cycle_at = None
+        self._stop_event = threading.Event()
+        self._next_due = {}
+
+    @property
+    def date_str(self):
+        return self.fixed_date or datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _record_error(self, e):
+        # TabFeedError messages are already descriptive; anything else is a malformed payload or a bug
+        self.last_error = str(e) if isinstance(e, TabFeedError) else f"{type(e).__name__}: {e}"
+
+    def poll_once(self):
+        """Refreshes everything that is due and returns the number of seconds until the next due item."""
+        now = self.clock()
+        date_str = self.date_str
+        m_key = meetings_key(date_str)
+        if m_key not in self._next_due:
+            # New racing date (first cycle or past midnight): forget yesterday's schedule
+            self._next_due = {}
+
+        if self._next_due.get(m_key, 0) <= now:
+            try:
+                meetings = self.fetch_meetings(date_str)
+                self.store.put(m_key, meetings, ttl=MEETINGS_REFRESH_SECS * 2)
+                self._next_due[m_key] = now + MEETINGS_REFRESH_SECS
+            except Exception as e:
+                self._record_error(e)
+                self._next_due[m_key] = now + ERROR_BACKOFF_SECS
+
+        meetings = self.store.get(m_key, allow_stale=True) or []
+        for m in meetings:
+            for r in m.get("races", []):
+                r_num = r.get("raceNumber")
+                if r_num is None:
+                    continue
+                r_key = race_key(date_str, m.get("meeting_id"), r_num)
+                if self._next_due.get(r_key, 0) > now:
+                    continue
+
+                jump = parse_jump_time(r.get("raceStartTime"))
+                try:
+                    race = self.fetch_race(date_str, m.get("meeting_id"), r_num)
+                    jump = parse_jump_time(race.get("start_time")) or jump
+                    interval = poll_interval_for(None if jump is None else jump - now, race.get("status"))
+                    race["meeting_name"] = m.get("name")
+                    self.store.put(r_key, race, ttl=interval * 2)
+                except Exception as e:
+                    self._record_error(e)
+                    interval = ERROR_BACKOFF_SECS
+                self._next_due[r_key] = now + interval
+
+        self.last_cycle_at = now
+        pending = [due for due in self._next_due.values()]
+        return max(1.0, min(pending) - now) if pending else ERROR_BACKOFF_SECS
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                wait_secs = self.poll_once()
+            except Exception as e:
+                # e.g. a meetings payload of the wrong shape: back off and try again, never die
+                self._record_error(e)
+                wait_secs = ERROR_BACKOFF_SECS
+            self._stop_event.wait(wait_secs)
+
+def _normalize_track(name):
+    return str(name or "").lower().replace("_", " ").strip()
+
+def find_race_snapshot(store, track, date_str, race_number, allow_stale=True):
+    """Looks up the latest race snapshot by track display name (non-blocking)."""
+    meetings = store.get(meetings_key(date_str), allow_stale=True) or []
+    target = _normalize_track(track)
+    for m in meetings:
+        if _normalize_track(m.get("name")) == target:
+            return store.get(race_key(date_str, m.get("meeting_id"), race_number), allow_stale=allow_stale)
+    return None
+
+def get_runner_odds(store, track, date_str, race_number, runner_num):
+    """Returns the latest win odds (decimal) for a runner from snapshots, or None if unknown."""
+    race = find_race_snapshot(store, track, date_str, race_number)
+    if not race:
+        return None
+    for runner in race.get("runners", []):
+        if runner.get("number") == str(runner_num).strip() and runner.get("win_odds", 0) > 0:
+            return runner["win_odds"]
+    return None
+
+_shared_store = None
+_shared_poller = None
+_shared_lock = threading.Lock()
+
+def get_shared_store():
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = OddsSnapshotStore()
+        return _shared_store
+
+def start_background_poller(date_str=None, jurisdiction="VIC"):
+    """
+    Starts (once per process) the background poller feeding the shared snapshot store.
+    Safe to call on every Streamlit rerun: a poller thread that has died is replaced.
+    """
+    global _shared_poller
+    store = get_shared_store()
+    with _shared_lock:
+        if _shared_poller is None or not _shared_poller.is_alive():
+            _shared_poller = OddsPoller(store, date_str=date_str, jurisdiction=jurisdiction)
+            _shared_poller.start()
+        return _shared_poller
+
+def serve_fake_tab(date_str, meetings_payload, races_payload, port=0):
+    """
+    Serves canned TAB payloads on 127.0.0.1 for offline runs of the poller.
+    races_payload maps (meeting_id, race_num) -> TAB race JSON. Returns (server, base_url).
+    """
+    import http.server
+
+    class FakeTabHandler(http.server.BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            body = None
+            if parts[-1] == "meetings":
+                body = meetings_payload
+            elif len(parts) >= 2 and parts[-2] == "races":
+                body = races_payload.get((parts[-3], parts[-1]))
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), FakeTabHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    import live_odds_fetcher
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    jump = datetime.now(timezone.utc).isoformat()
+    fake_meetings = {"meetings": [{"meetingId": "FLE", "meetingName": "Flemington", "venueMnemonic": "FLE",
+                                   "raceType": "R", "races": [{"raceNumber": 1, "raceStartTime": jump}]}]}
+    fake_races = {("FLE", "1"): {"raceNumber": 1, "raceStatus": "Open", "raceStartTime": jump, "runners": [
+        {"runnerNumber": 1, "runnerName": "Local Hero", "fixedOdds": {"returnWin": 3.4, "returnPlace": 1.5}},
+        {"runnerNumber": 2, "runnerName": "Back Marker", "fixedOdds": {"returnWin": 7.0, "returnPlace": 2.4}}]}}
+
+    server, base_url = serve_fake_tab(today, fake_meetings, fake_races)
+    live_odds_fetcher.TAB_MEETINGS_URL = base_url + live_odds_fetcher.TAB_MEETINGS_PATH
+    live_odds_fetcher.TAB_RACE_URL = base_url + live_odds_fetcher.TAB_RACE_PATH
+
+    store = OddsSnapshotStore(db_path=":memory:")
+    poller = OddsPoller(store, date_str=today)
+    next_wait = poller.poll_once()
+    print(f"Fake TAB at {base_url} -> next refresh in {next_wait:.0f}s, last error: {poller.last_error}")
+    print("Flemington R1 #1 win odds:", get_runner_odds(store, "Flemington", today, 1, "1"))
+    server.shutdown()
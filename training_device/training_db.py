@@ -6,18 +6,24 @@ Database Location: training_device/db/training_simulator.db
 """
 
 import os
-import sqlite3
+import sys
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from storage import open_connection
+from odds_poller import get_shared_store, get_runner_odds
+
 DB_DIR = os.path.join(BASE_DIR, "db")
 DB_PATH = os.path.join(DB_DIR, "training_simulator.db")
 MASTER_DB_PATH = os.path.join(os.path.dirname(BASE_DIR), "logs", "master_betting_history.db")
 
 def init_db(default_bankroll=1000.0):
     os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_connection(DB_PATH)
     c = conn.cursor()
+    c.execute("PRAGMA journal_mode = WAL")  # Streamlit reruns and settlement write concurrently
     
     # 1. Bankroll Table
     c.execute("""
@@ -65,7 +71,7 @@ def init_db(default_bankroll=1000.0):
 
 def get_bankroll():
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_connection(DB_PATH)
     c = conn.cursor()
     c.execute("SELECT current_balance, starting_balance, total_staked, total_returned, net_pnl FROM bankroll WHERE id=1")
     row = c.fetchone()
@@ -82,7 +88,7 @@ def get_bankroll():
 
 def reset_bankroll(amount=1000.0):
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_connection(DB_PATH)
     c = conn.cursor()
     c.execute("""
         UPDATE bankroll 
@@ -101,7 +107,7 @@ def place_manual_bet(date_str, track, race_number, bet_type, runner_nums, runner
     if stake > bankroll["current_balance"]:
         return False, f"Insufficient balance (${bankroll['current_balance']:.2f}) for stake (${stake:.2f})"
         
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_connection(DB_PATH)
     c = conn.cursor()
     
     # Deduct stake from bankroll
@@ -127,7 +133,7 @@ def place_manual_bet(date_str, track, race_number, bet_type, runner_nums, runner
 
 def get_bets(status_filter=None):
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_connection(DB_PATH)
     c = conn.cursor()
     if status_filter:
         c.execute("SELECT bet_id, date, track, race_number, bet_type, runner_nums, runner_names, stake, odds, status, payout, net_pnl, created_at FROM bets WHERE status=? ORDER BY bet_id DESC", (status_filter,))
@@ -166,10 +172,10 @@ def settle_pending_bets():
     if not os.path.exists(MASTER_DB_PATH):
         return 0, "Master betting database not found."
         
-    conn_master = sqlite3.connect(MASTER_DB_PATH)
+    conn_master = open_connection(MASTER_DB_PATH, readonly=True)
     c_m = conn_master.cursor()
     
-    conn_local = sqlite3.connect(DB_PATH)
+    conn_local = open_connection(DB_PATH)
     c_l = conn_local.cursor()
     
     settled_count = 0
@@ -199,7 +205,12 @@ def settle_pending_bets():
             continue
             
         win_num = str(res[0]).strip()
-        win_payout = float(res[1]) if res[1] and float(res[1]) > 0 else 6.0
+        if res[1] and float(res[1]) > 0:
+            win_payout = float(res[1])
+        else:
+            # No official dividend yet: use the last polled TAB win odds (decimal -> $2 dividend)
+            snapshot_odds = get_runner_odds(get_shared_store(), b["track"], b["date"], b["race_number"], win_num)
+            win_payout = snapshot_odds * 2.0 if snapshot_odds else 6.0
         
         stake = b["stake"]
         bet_type = b["bet_type"].upper()